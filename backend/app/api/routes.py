@@ -7,20 +7,19 @@ import logging
 import shutil
 from datetime import datetime
 from typing import Dict, Any, List, Optional
-from fastapi import APIRouter, File, UploadFile, Depends, HTTPException, Form, Query, Body
+from fastapi import APIRouter, File, UploadFile, Depends, HTTPException, Form, Query, Body, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import FileResponse
 
 # 设置日志
 logger = logging.getLogger(__name__)
 
 from .schemas import (
-    TextToImageRequest, ImageToVideoRequest, TaskResponse, TaskSubmissionResponse,
+    TextToImageRequest, ImageToVideoRequest, TaskResponse, TaskListResponse, TaskSubmissionResponse,
     WorkflowInfo, WorkflowListResponse, SystemConfigResponse, HealthCheckResponse,
     ErrorResponse, TaskTypeEnum, TaskStatusEnum,
     NodeInfo, NodeRegistrationRequest, ClusterStatsResponse, NodesListResponse,
     LoadBalancingConfigResponse, NodeOperationResponse, NodeStatusEnum,
-    ReloadTaskRequest
+    ReloadTaskRequest, BatchTaskRequest, BatchTaskResponse, BatchStatusResponse, TaskArchiveRequest
 )
 from ..auth import verify_token
 from ..core.task_manager import get_task_type_manager
@@ -41,10 +40,13 @@ os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 # 导入路径工具
-from ..utils.path_utils import get_output_dir, is_safe_path
+from ..utils.path_utils import get_output_dir, is_safe_path, output_path_to_url
+from ..core.file_response import conditional_file_response
+from ..utils.thumbnails import get_thumbnail_service, thumbnail_urls
 
 # 导入任务状态管理器
 from ..core.task_status_manager import get_task_status_manager
+from ..database.executor import run_sync
 
 # 获取数据库任务状态管理器实例
 def get_status_manager():
@@ -52,10 +54,51 @@ def get_status_manager():
     return get_database_task_status_manager()
 
 
+def _create_task_with_status(task_data: Dict[str, Any], initial_status: Dict[str, Any]):
+    """在同一工作单元中创建任务并写入初始状态（同步调用，在数据库线程池中执行），失败时回滚并抛出500"""
+    from ..database.unit_of_work import unit_of_work
+    status_manager = get_status_manager()
+    with unit_of_work():
+        if not status_manager.create_task(task_data, source_type='client'):
+            logger.error(f"[TASK_CREATE] 任务 {task_data['task_id']} 数据库创建失败")
+            raise HTTPException(status_code=500, detail="任务创建失败")
+        status_manager.set_task_status(task_data['task_id'], initial_status)
+
+
+def _build_text_to_image_task_data(request_data: Dict[str, Any], client_id: str, estimated_time) -> Dict[str, Any]:
+    """根据文生图请求构建任务数据（单个提交与批量提交共用），parameters中保存请求的全部字段"""
+    return {
+        'task_id': request_data['task_id'],
+        'client_id': client_id,
+        'task_type': TaskType.TEXT_TO_IMAGE.value,
+        'workflow_name': request_data.get('workflow_name', 'sd_basic'),
+        'prompt': request_data.get('prompt', ''),
+        'negative_prompt': request_data.get('negative_prompt', ''),
+        'width': request_data.get('width', 512),
+        'height': request_data.get('height', 512),
+        'model_name': request_data.get('checkpoint', ''),
+        'steps': request_data.get('steps'),
+        'cfg_scale': request_data.get('cfg_scale'),
+        'sampler': request_data.get('sampler'),
+        'scheduler': request_data.get('scheduler'),
+        'seed': request_data.get('seed'),
+        'batch_size': request_data.get('batch_size', 1),
+        'status': TaskStatusEnum.QUEUED.value,
+        'priority': request_data.get('priority', 1),
+        'progress': 0,
+        'message': '文生图任务已提交到队列',
+        'estimated_time': estimated_time,
+        'parameters': [
+            {'parameter_name': key, 'parameter_value': str(value), 'parameter_type': 'string'}
+            for key, value in request_data.items()
+            if key not in ('task_id', 'user_id', 'task_type')
+        ]
+    }
+
+
 def convert_file_path_to_url(file_path: str) -> str:
     """将文件路径转换为静态文件URL"""
     import os
-    import re
 
     # 调试日志
     logger.debug(f"转换文件路径: {file_path}")
@@ -70,40 +113,10 @@ def convert_file_path_to_url(file_path: str) -> str:
         logger.debug(f"分布式相对路径: /api/v2/files/{file_path}")
         return f"/api/v2/files/{file_path}"
 
-    # 尝试匹配backend/outputs目录
-    if '/backend/outputs/' in file_path or 'backend/outputs/' in file_path:
-        # 使用正则表达式匹配outputs之后的路径
-        match = re.search(r'backend/outputs/(.+)$', file_path)
-        if match:
-            url_path = match.group(1)
-            logger.debug(f"Backend输出URL: /outputs/{url_path}")
-            return f"/outputs/{url_path}"
-
-    # 尝试匹配项目根目录下的outputs目录
-    if '/outputs/' in file_path:
-        # 使用正则表达式匹配最后一个outputs之后的路径
-        match = re.search(r'outputs/(.+)$', file_path)
-        if match:
-            url_path = match.group(1)
-            logger.debug(f"项目输出URL: /outputs/{url_path}")
-            return f"/outputs/{url_path}"
-
-    # 尝试匹配ComfyUI output目录
-    if '/ComfyUI/output/' in file_path or 'ComfyUI/output/' in file_path:
-        # 使用正则表达式匹配output之后的路径
-        match = re.search(r'ComfyUI/output/(.+)$', file_path)
-        if match:
-            url_path = match.group(1)
-            logger.debug(f"ComfyUI输出URL: /comfyui-output/{url_path}")
-            return f"/comfyui-output/{url_path}"
-
-    # 尝试匹配任何output目录（兜底）
-    if '/output/' in file_path:
-        match = re.search(r'output/(.+)$', file_path)
-        if match:
-            url_path = match.group(1)
-            logger.debug(f"通用输出URL: /comfyui-output/{url_path}")
-            return f"/comfyui-output/{url_path}"
+    # 按前缀表匹配输出目录
+    url = output_path_to_url(file_path)
+    if url:
+        return url
 
     # 如果都不匹配，使用文件代理接口作为兜底
     logger.debug(f"使用代理接口: /api/v2/files/{os.path.basename(file_path)}")
@@ -145,27 +158,8 @@ async def submit_text_to_image_task(
         for key, value in request_data.items():
             logger.info(f"  - {key}: {value} (type: {type(value).__name__})")
 
-        task_data = {
-            'task_id': task_id,
-            'client_id': user.get('client_id', user['sub']),  # 优先使用client_id，否则使用用户名
-            'task_type': TaskType.TEXT_TO_IMAGE.value,
-            'workflow_name': workflow_name,
-            'prompt': request_data.get('prompt', ''),
-            'negative_prompt': request_data.get('negative_prompt', ''),
-            'width': request_data.get('width', 512),
-            'height': request_data.get('height', 512),
-            'model_name': request_data.get('checkpoint', ''),
-            'steps': request_data.get('steps'),
-            'cfg_scale': request_data.get('cfg_scale'),
-            'sampler': request_data.get('sampler'),
-            'scheduler': request_data.get('scheduler'),
-            'seed': request_data.get('seed'),
-            'batch_size': request_data.get('batch_size', 1),
-            'status': TaskStatusEnum.QUEUED.value,
-            'progress': 0,
-            'message': '文生图任务已提交到队列',
-            'estimated_time': estimated_time
-        }
+        # 优先使用client_id，否则使用用户名
+        task_data = _build_text_to_image_task_data(request_data, user.get('client_id', user['sub']), estimated_time)
 
         # 调试日志：显示准备存储的任务数据
         logger.info(f"[TASK_CREATE] 任务 {task_id} 准备存储的数据:")
@@ -180,27 +174,9 @@ async def submit_text_to_image_task(
             logger.info(f"  - {param}: {value} ({'✓' if value is not None else '✗'})")
 
 
-        # 准备参数数据
-        parameters = []
-        for key, value in request_data.items():
-            if key not in ['task_id', 'user_id', 'task_type']:
-                parameters.append({
-                    'parameter_name': key,
-                    'parameter_value': str(value),
-                    'parameter_type': 'string'
-                })
-
-        # 创建任务到数据库
+        # 创建任务到数据库：任务、参数与初始状态在同一工作单元中提交，提交后再进入队列
         status_manager = get_status_manager()
         logger.info(f"[TASK_CREATE] 任务 {task_id} 开始创建到数据库...")
-        task_created = status_manager.create_task(task_data, source_type='client')
-
-        if task_created:
-            logger.info(f"[TASK_CREATE] 任务 {task_id} 数据库创建成功")
-        else:
-            logger.error(f"[TASK_CREATE] 任务 {task_id} 数据库创建失败")
-            raise HTTPException(status_code=500, detail="任务创建失败")
-
         # 初始化任务状态（只包含数据库模型中存在的字段）
         initial_status = {
             'status': TaskStatusEnum.QUEUED.value,
@@ -208,7 +184,8 @@ async def submit_text_to_image_task(
             'message': '文生图任务已提交到队列',
             'estimated_time': estimated_time
         }
-        status_manager.set_task_status(task_id, initial_status)
+        await run_sync(_create_task_with_status, task_data, initial_status)
+        logger.info(f"[TASK_CREATE] 任务 {task_id} 数据库创建成功")
         
         # 提交到任务队列 - 增强错误处理
         try:
@@ -219,16 +196,16 @@ async def submit_text_to_image_task(
             if 'task_id' not in request_data:
                 raise ValueError("request_data缺少task_id字段")
 
-            celery_task = execute_text_to_image_task.delay(request_data)
+            celery_task = await run_sync(execute_text_to_image_task.delay, request_data)
 
             # 更新任务状态，添加Celery任务ID
-            status_manager.update_task_status(task_id, {'celery_task_id': celery_task.id})
+            await run_sync(status_manager.update_task_status, task_id, {'celery_task_id': celery_task.id})
             logger.info(f"任务已成功提交到Celery队列: {task_id} -> {celery_task.id}")
 
         except ImportError as e:
             error_msg = f"Celery任务模块导入失败: {str(e)}"
             logger.error(error_msg)
-            status_manager.update_task_status(task_id, {
+            await run_sync(status_manager.update_task_status, task_id, {
                 'status': TaskStatusEnum.FAILED.value,
                 'error_message': error_msg,
                 'updated_at': datetime.now().isoformat()
@@ -238,7 +215,7 @@ async def submit_text_to_image_task(
             error_msg = f"任务队列提交失败: {str(e)}"
             logger.error(f"{error_msg} (task_id: {task_id})")
             # 更新任务状态为失败
-            status_manager.update_task_status(task_id, {
+            await run_sync(status_manager.update_task_status, task_id, {
                 'status': TaskStatusEnum.FAILED.value,
                 'error_message': error_msg,
                 'updated_at': datetime.now().isoformat()
@@ -255,8 +232,8 @@ async def submit_text_to_image_task(
     except Exception as e:
         # 更新任务状态为失败
         status_manager = get_status_manager()
-        if status_manager.get_task_status(task_id):
-            status_manager.update_task_status(task_id, {
+        if await status_manager.get_task_status_async(task_id):
+            await run_sync(status_manager.update_task_status, task_id, {
                 'status': TaskStatusEnum.FAILED.value,
                 'error_message': str(e),
                 'updated_at': datetime.now().isoformat()
@@ -265,6 +242,106 @@ async def submit_text_to_image_task(
         raise HTTPException(status_code=500, detail=f"任务提交失败: {str(e)}")
 
 
+@router.post("/api/v2/tasks/batch", response_model=BatchTaskResponse)
+async def submit_batch_tasks(
+    request: BatchTaskRequest,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """批量提交文生图任务
+
+    所有任务先校验，再在每个数据库各一个事务中批量写入，最后以Celery group一次入队。
+    """
+    user = verify_token(credentials.credentials)
+    client_id = user.get('client_id', user['sub'])
+
+    max_batch_size = get_config_manager().get_system_config().get('max_batch_size', 50)
+    if len(request.tasks) > max_batch_size:
+        raise HTTPException(status_code=400, detail=f"批量任务数量超过上限: {max_batch_size}")
+
+    batch_id = str(uuid.uuid4())
+    task_manager = get_task_type_manager()
+    processor = task_manager.get_processor(TaskType.TEXT_TO_IMAGE)
+
+    # 校验并准备所有任务，任何一个不合法则整批拒绝
+    batch_tasks = []
+    for index, item in enumerate(request.tasks):
+        task_id = str(uuid.uuid4())
+        request_data = item.dict(exclude_none=True)
+        if 'priority' not in item.__fields_set__:
+            request_data['priority'] = request.priority
+        request_data.update({
+            'task_id': task_id,
+            'user_id': user['sub'],
+            'task_type': TaskType.TEXT_TO_IMAGE.value
+        })
+
+        try:
+            task_request = task_manager.create_task_request(request_data)
+            task_manager.validate_task_request(task_request)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"第{index + 1}个任务参数无效: {str(e)}")
+
+        estimated_time = processor.estimate_processing_time(request_data) if processor else 60
+
+        task_data = _build_text_to_image_task_data(request_data, client_id, estimated_time)
+        # 预先分配Celery任务ID，随任务一起写入，避免入队后再回写
+        task_data['celery_task_id'] = str(uuid.uuid4())
+        task_data['parameters'].append({'parameter_name': 'batch_id', 'parameter_value': batch_id, 'parameter_type': 'string'})
+        task_data['parameters'].append({'parameter_name': 'batch_index', 'parameter_value': str(index), 'parameter_type': 'integer'})
+        if request.batch_name:
+            task_data['parameters'].append({'parameter_name': 'batch_name', 'parameter_value': request.batch_name, 'parameter_type': 'string'})
+
+        batch_tasks.append({'request_data': request_data, 'task_data': task_data})
+
+    task_ids = [entry['task_data']['task_id'] for entry in batch_tasks]
+
+    status_manager = get_status_manager()
+    if not await run_sync(status_manager.create_tasks_bulk, [entry['task_data'] for entry in batch_tasks], source_type='client'):
+        raise HTTPException(status_code=500, detail="批量任务创建失败")
+
+    try:
+        from celery import group
+        from ..queue.tasks import execute_text_to_image_task
+
+        await run_sync(group(
+            execute_text_to_image_task.s(entry['request_data']).set(task_id=entry['task_data']['celery_task_id'])
+            for entry in batch_tasks
+        ).apply_async)
+        logger.info(f"批量任务已提交到Celery队列: {batch_id} ({len(task_ids)} 个任务)")
+
+    except Exception as e:
+        error_msg = f"任务队列提交失败: {str(e)}"
+        logger.error(f"{error_msg} (batch_id: {batch_id})")
+        await run_sync(status_manager.set_tasks_status_bulk, task_ids, {
+            'status': TaskStatusEnum.FAILED.value,
+            'error_message': error_msg
+        })
+        raise HTTPException(status_code=500, detail=error_msg)
+
+    return BatchTaskResponse(
+        batch_id=batch_id,
+        task_ids=task_ids,
+        total_tasks=len(task_ids),
+        message=f"批量任务已提交到队列，共 {len(task_ids)} 个"
+    )
+
+
+@router.get("/api/v2/tasks/batch/{batch_id}", response_model=BatchStatusResponse)
+async def get_batch_status(
+    batch_id: str,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """获取批量任务的聚合状态"""
+    user = verify_token(credentials.credentials)
+
+    status_manager = get_status_manager()
+    batch_status = await run_sync(status_manager.get_batch_status, batch_id, user.get('client_id', user['sub']))
+    if not batch_status:
+        raise HTTPException(status_code=404, detail="批次不存在")
+
+    return BatchStatusResponse(**batch_status)
+
+
 @router.post("/api/generate/image", response_model=TaskSubmissionResponse)
 async def generate_image_form(
     prompt: str = Form(..., description="正面提示词"),
@@ -348,10 +425,10 @@ async def generate_image_form(
         # 提交到任务队列
         try:
             from ..queue.tasks import execute_text_to_image_task
-            celery_task = execute_text_to_image_task.delay(request_data)
+            celery_task = await run_sync(execute_text_to_image_task.delay, request_data)
 
             # 更新任务的Celery ID
-            status_manager.update_task_status(task_id, {
+            await run_sync(status_manager.update_task_status, task_id, {
                 'celery_task_id': celery_task.id
             })
 
@@ -359,7 +436,7 @@ async def generate_image_form(
         except Exception as e:
             logger.error(f"提交任务到Celery失败: {e}")
             # 更新任务状态为失败
-            status_manager.update_task_status(task_id, {
+            await run_sync(status_manager.update_task_status, task_id, {
                 'status': TaskStatusEnum.FAILED.value,
                 'error_message': f'任务队列连接失败: {str(e)}'
             })
@@ -377,8 +454,8 @@ async def generate_image_form(
     except Exception as e:
         # 更新任务状态为失败
         status_manager = get_status_manager()
-        if status_manager.get_task_status(task_id):
-            status_manager.update_task_status(task_id, {
+        if await status_manager.get_task_status_async(task_id):
+            await run_sync(status_manager.update_task_status, task_id, {
                 'status': TaskStatusEnum.FAILED.value,
                 'error_message': str(e),
                 'updated_at': datetime.now().isoformat()
@@ -450,10 +527,8 @@ async def submit_image_to_video_task(
                     'parameter_type': 'string'
                 })
 
-        # 创建任务到数据库
+        # 创建任务到数据库：任务、参数与初始状态在同一工作单元中提交，提交后再进入队列
         status_manager = get_status_manager()
-        task_created = status_manager.create_task(task_data, source_type='client')
-
         # 初始化任务状态（只包含数据库模型中存在的字段）
         initial_status = {
             'status': TaskStatusEnum.QUEUED.value,
@@ -461,7 +536,7 @@ async def submit_image_to_video_task(
             'message': '图生视频任务已提交到队列',
             'estimated_time': estimated_time
         }
-        status_manager.set_task_status(task_id, initial_status)
+        await run_sync(_create_task_with_status, task_data, initial_status)
 
         # 提交到任务队列 - 增强错误处理
         try:
@@ -472,16 +547,16 @@ async def submit_image_to_video_task(
             if 'task_id' not in request_data:
                 raise ValueError("request_data缺少task_id字段")
 
-            celery_task = execute_image_to_video_task.delay(request_data)
+            celery_task = await run_sync(execute_image_to_video_task.delay, request_data)
 
             # 更新任务状态，添加Celery任务ID
-            status_manager.update_task_status(task_id, {'celery_task_id': celery_task.id})
+            await run_sync(status_manager.update_task_status, task_id, {'celery_task_id': celery_task.id})
             logger.info(f"图生视频任务已成功提交到Celery队列: {task_id} -> {celery_task.id}")
 
         except ImportError as e:
             error_msg = f"Celery任务模块导入失败: {str(e)}"
             logger.error(error_msg)
-            status_manager.update_task_status(task_id, {
+            await run_sync(status_manager.update_task_status, task_id, {
                 'status': TaskStatusEnum.FAILED.value,
                 'error_message': error_msg,
                 'updated_at': datetime.now().isoformat()
@@ -491,7 +566,7 @@ async def submit_image_to_video_task(
         except Exception as e:
             error_msg = f"任务队列提交失败: {str(e)}"
             logger.error(error_msg)
-            status_manager.update_task_status(task_id, {
+            await run_sync(status_manager.update_task_status, task_id, {
                 'status': TaskStatusEnum.FAILED.value,
                 'error_message': error_msg,
                 'updated_at': datetime.now().isoformat()
@@ -511,7 +586,7 @@ async def submit_image_to_video_task(
         # 更新任务状态为失败
         if task_id:
             status_manager = get_status_manager()
-            status_manager.update_task_status(task_id, {
+            await run_sync(status_manager.update_task_status, task_id, {
                 'status': TaskStatusEnum.FAILED.value,
                 'error_message': str(e),
                 'updated_at': datetime.now().isoformat()
@@ -533,24 +608,21 @@ async def upload_image(
     if file.content_type not in allowed_types:
         raise HTTPException(status_code=400, detail="不支持的文件类型，请上传 JPG、PNG 或 WebP 格式的图片")
 
-    # 检查文件大小 (限制为10MB)
-    max_size = 10 * 1024 * 1024  # 10MB
-    file_content = await file.read()
-    if len(file_content) > max_size:
-        raise HTTPException(status_code=400, detail="文件大小超过限制（最大10MB）")
+    # 边读取边检查文件大小（默认限制为10MB）
+    max_size = get_config_manager().get_system_config().get('max_upload_image_size', 10) * 1024 * 1024
 
     try:
-        from ..services.file_service import get_file_service
+        from ..services.file_service import get_file_service, UploadTooLargeError
         file_service = get_file_service()
 
-        # 使用文件服务保存文件
+        # 使用文件服务流式保存文件
         client_id = user.get('client_id', user['sub'])
-        file_info = file_service.save_uploaded_file(    
-            file_content=file_content,
-            original_filename=file.filename,
-            client_id=client_id,
-            file_type='image'
-        )
+        try:
+            file_info = await file_service.save_upload_stream(
+                file, client_id=client_id, file_type='image', max_size=max_size
+            )
+        except UploadTooLargeError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
         if not file_info:
             raise HTTPException(status_code=500, detail="文件保存失败")
@@ -572,6 +644,7 @@ async def upload_image(
             "file_size": file_info['file_size'],
             "width": file_info['width'],
             "height": file_info['height'],
+            "deduplicated": file_info['deduplicated'],
             "message": "图片上传成功"
         }
 
@@ -597,7 +670,8 @@ async def list_user_files(
         file_service = get_file_service()
 
         client_id = user.get('client_id', user['sub'])
-        files = file_service.get_user_files(
+        files = await run_sync(
+            file_service.get_user_files,
             client_id=client_id,
             file_type=file_type,
             limit=limit,
@@ -628,7 +702,7 @@ async def get_file_info(
         from ..services.file_service import get_file_service
         file_service = get_file_service()
 
-        file_info = file_service.get_file_info(file_id)
+        file_info = await run_sync(file_service.get_file_info, file_id)
         if not file_info:
             raise HTTPException(status_code=404, detail="文件不存在")
 
@@ -654,7 +728,7 @@ async def delete_file(
         file_service = get_file_service()
 
         client_id = user.get('client_id', user['sub'])
-        success = file_service.delete_file(file_id, client_id)
+        success = await run_sync(file_service.delete_file, file_id, client_id)
 
         if not success:
             raise HTTPException(status_code=404, detail="文件不存在或无权限删除")
@@ -671,6 +745,7 @@ async def delete_file(
 @router.get("/api/v2/uploads/{file_path:path}")
 async def get_uploaded_file(
     file_path: str,
+    request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
     """获取上传的文件"""
@@ -687,16 +762,95 @@ async def get_uploaded_file(
     if not os.path.exists(full_path):
         raise HTTPException(status_code=404, detail="文件不存在")
 
-    # 返回文件
-    return FileResponse(full_path)
+    # 返回文件（上传文件可被覆盖，每次按ETag重新验证）
+    return await conditional_file_response(request, full_path)
+
+
+async def _proxy_node_file(file_path: str, request: Request):
+    """从所属节点流式代理输出文件：优先按结果位置索引直接路由，未记录时才逐个在线节点尝试"""
+    from ..core.node_manager import get_node_manager
+    from ..core.file_proxy import get_node_file_proxy
+    from ..database.result_locations import get_result_location_index, location_keys
+    node_manager = get_node_manager()
+    file_proxy = get_node_file_proxy()
+    location_index = get_result_location_index()
+
+    def local_copy(location):
+        # 已同步到主机的结果直接返回本地副本
+        local_path = location.get('local_path') if location else None
+        return local_path if local_path and os.path.exists(local_path) else None
+
+    try:
+        location = await run_sync(location_index.lookup, file_path)
+    except Exception as e:
+        logger.warning(f"查询结果文件位置失败: {e}")
+        location = None
+
+    if local_copy(location):
+        return await conditional_file_response(request, local_copy(location))
+
+    if location:
+        from ..core.file_cache import get_node_file_cache
+        file_cache = get_node_file_cache()
+        cache_key = f"{location['node_id']}/{location_keys(file_path)[0]}"
+        # 已缓存的文件直接返回，所属节点离线时也可访问
+        cached_path = await file_cache.get(cache_key) if file_cache else None
+        if cached_path:
+            return await file_cache.file_response(request, cached_path, location['filename'])
+
+        node = node_manager.get_node_by_id(location['node_id'])
+        if node is not None and node.status.value == 'online':
+            upstream = None
+            if file_cache:
+                # 未命中时下载到缓存，同一文件的并发请求共享一次下载
+                cached = await file_cache.fetch(cache_key, location['filename'], lambda: file_proxy.open(
+                    node.url, location['filename'], location['subfolder']), stream_through=True)
+                if isinstance(cached, str):
+                    return await file_cache.file_response(request, cached, location['filename'])
+                if cached is not None:
+                    upstream = cached.upstream
+                    # 不缓存的完整响应不满足范围请求，改为携带Range重新请求节点
+                    if upstream.status == 200 and 'range' in request.headers:
+                        cached.close()
+                        upstream = None
+
+            if upstream is None:
+                upstream = await file_proxy.open(node.url, location['filename'], location['subfolder'],
+                                                 request_headers=request.headers)
+            if upstream is not None:
+                logger.debug(f"按位置索引从节点 {node.node_id} 代理文件: {file_path} ({upstream.status})")
+                return file_proxy.stream_response(upstream, location['filename'])
+
+        # 节点离线或已清理输出时，文件可能已同步到主机而本进程缓存的位置尚未更新
+        location_index.invalidate(file_path)
+        refreshed = await run_sync(location_index.lookup, file_path)
+        if local_copy(refreshed):
+            return await conditional_file_response(request, local_copy(refreshed))
+        logger.warning(f"文件所属节点 {location['node_id']} 不可用，回退为全节点查找: {file_path}")
+
+    filename = os.path.basename(file_path)
+    # 如果文件在子目录中，需要添加subfolder参数
+    subfolder = os.path.dirname(file_path) if ('/' in file_path or '\\' in file_path) else ''
+
+    for node in node_manager.get_all_nodes().values():
+        if node.status.value != 'online':
+            continue
+        if location and node.node_id == location['node_id']:
+            continue
+        upstream = await file_proxy.open(node.url, filename, subfolder, request_headers=request.headers)
+        if upstream is not None:
+            logger.info(f"✅ 全节点查找命中 {node.node_id}，流式代理文件: {file_path} ({upstream.status})")
+            return file_proxy.stream_response(upstream, filename)
+    return None
 
 
 @router.get("/api/v2/files/{file_path:path}")
 async def get_output_file(
     file_path: str,
+    request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
-    """获取输出文件 - 支持分布式图片代理"""
+    """获取输出文件 - 支持分布式图片代理（流式转发，透传Range）"""
     verify_token(credentials.credentials)
 
     # 首先尝试本地文件
@@ -709,7 +863,7 @@ async def get_output_file(
 
     # 检查本地文件是否存在
     if os.path.exists(full_path):
-        return FileResponse(full_path)
+        return await conditional_file_response(request, full_path)
 
     # 本地文件不存在，尝试从分布式节点获取
     try:
@@ -717,57 +871,10 @@ async def get_output_file(
         config_manager = get_config_manager()
 
         if config_manager.is_distributed_mode():
-            # 尝试从所有节点获取文件
             logger.debug(f"开始分布式文件获取 - 文件路径: {file_path}")
-            from ..core.node_manager import get_node_manager
-            node_manager = get_node_manager()
-
-            nodes_dict = node_manager.get_all_nodes()
-            logger.debug(f"获取到 {len(nodes_dict)} 个节点")
-
-            for node in nodes_dict.values():
-                if node.status.value == 'online':
-                    try:
-                        # 尝试从节点获取文件
-                        import requests
-                        node_url = f"{node.url}/view"
-                        params = {"filename": os.path.basename(file_path)}
-
-                        # 如果文件在子目录中，需要添加subfolder参数
-                        # 注意：ComfyUI期望使用反斜杠作为路径分隔符
-                        if '/' in file_path or '\\' in file_path:
-                            subfolder = os.path.dirname(file_path)
-                            # 保持原始路径分隔符，不进行转换
-                            # 因为ComfyUI会根据操作系统自动处理路径分隔符
-                            params["subfolder"] = subfolder
-                            logger.debug(f"从节点 {node.node_id} 获取文件: filename={params['filename']}, subfolder='{subfolder}', 原始路径='{file_path}'")
-                        else:
-                            logger.debug(f"从节点 {node.node_id} 获取文件: filename={params['filename']}, 无子目录")
-
-                        logger.debug(f"请求URL: {node_url}?{requests.compat.urlencode(params)}")
-                        response = requests.get(node_url, params=params, timeout=10)
-                        logger.debug(f"节点 {node.node_id} 响应状态码: {response.status_code}")
-
-                        if response.status_code == 200:
-                            content = response.content
-                            content_type = response.headers.get('content-type', 'application/octet-stream')
-                            logger.info(f"✅ 成功从节点 {node.node_id} 获取文件: {file_path}, 大小: {len(content)} bytes, 类型: {content_type}")
-
-                            # 返回代理的文件内容
-                            from fastapi.responses import Response
-                            return Response(
-
-                                content=content,
-                                media_type=content_type,
-                                headers={
-                                    "Content-Disposition": f"inline; filename={os.path.basename(file_path)}"
-                                }
-                            )
-                        else:
-                            logger.warning(f"节点 {node.node_id} 返回错误: {response.status_code}, 响应: {response.text[:200]}")
-                    except Exception as e:
-                        logger.error(f"从节点 {node.node_id} 获取文件失败: {e}")
-                        continue
+            response = await _proxy_node_file(file_path, request)
+            if response is not None:
+                return response
 
     except Exception as e:
         logger.error(f"分布式文件获取失败: {e}")
@@ -787,7 +894,7 @@ async def get_task_status_v2(
 
     # 从数据库状态管理器获取
     status_manager = get_status_manager()
-    task_info = status_manager.get_task_status(task_id)
+    task_info = await status_manager.get_task_status_async(task_id)
 
     if not task_info:
         raise HTTPException(status_code=404, detail="任务不存在")
@@ -876,10 +983,9 @@ async def health_check_v2():
     celery_app = get_celery_app()
     services = {}
 
-    # 检查Celery状态
+    # 检查Celery状态（inspect需等待Worker回复，在线程池中执行）
     try:
-        inspect = celery_app.control.inspect()
-        stats = inspect.stats()
+        stats = await run_sync(lambda: celery_app.control.inspect().stats())
         services['celery'] = 'healthy' if stats else 'unhealthy'
     except Exception:
         services['celery'] = 'unhealthy'
@@ -897,7 +1003,7 @@ async def health_check_v2():
             socket_connect_timeout=1,  # 快速检查，1秒超时
             socket_timeout=1
         )
-        r.ping()
+        await run_sync(r.ping)
         services['redis'] = 'healthy'
     except Exception:
         services['redis'] = 'unhealthy'
@@ -992,7 +1098,7 @@ async def health_check_v2():
     queue_info = {}
     try:
         status_manager = get_status_manager()
-        all_tasks = status_manager.list_tasks()
+        all_tasks = await run_sync(status_manager.list_tasks)
         active_tasks = len([t for t in all_tasks.values()
                           if t.get('status') in ['queued', 'processing']])
         queue_info = {
@@ -1002,6 +1108,20 @@ async def health_check_v2():
     except Exception:
         queue_info = {'active_tasks': 0, 'total_tasks': 0}
 
+    # 任务状态读缓存命中率与延迟（当前进程）
+    from ..database.status_cache import get_task_status_cache
+    status_cache = get_task_status_cache()
+    if status_cache:
+        queue_info['status_cache'] = status_cache.get_stats()
+
+    # 数据库线程池与事件循环阻塞统计
+    from ..database.executor import get_database_executor
+    from ..core.loop_monitor import get_loop_block_detector
+    queue_info['db_executor'] = get_database_executor().get_status()
+    loop_detector = get_loop_block_detector()
+    if loop_detector:
+        queue_info['event_loop'] = loop_detector.get_status()
+
     overall_status = 'healthy' if all(status == 'healthy' for status in services.values()) else 'degraded'
 
     return HealthCheckResponse(
@@ -1021,7 +1141,7 @@ async def cancel_task_v2(
     verify_token(credentials.credentials)
 
     status_manager = get_status_manager()
-    task_info = status_manager.get_task_status(task_id)
+    task_info = await status_manager.get_task_status_async(task_id)
     if not task_info:
         raise HTTPException(status_code=404, detail="任务不存在")
 
@@ -1029,21 +1149,25 @@ async def cancel_task_v2(
     if task_info.get('status') in ['completed', 'failed']:
         raise HTTPException(status_code=400, detail="任务已完成或失败，无法取消")
 
+    if task_info.get('status') == TaskStatusEnum.CANCELLED.value:
+        return {'message': '任务已取消', 'task_id': task_id}
+
     try:
-        # 取消Celery任务
-        if 'celery_task_id' in task_info:
-            from ..queue.tasks import cancel_task
-            cancel_task(task_info['celery_task_id'])
-
-        # 更新任务状态
-        task_info.update({
-            'status': TaskStatusEnum.CANCELLED.value,
-            'message': '任务已取消',
-            'updated_at': datetime.now().isoformat()
-        })
+        # 撤销Celery任务并停止ComfyUI节点上的提示词，释放节点并清理部分输出
+        from ..core.task_canceller import get_task_canceller
+        result = await get_task_canceller().cancel_task(task_info)
+        if not result.get('cancelled'):
+            raise HTTPException(status_code=400, detail="任务已完成或失败，无法取消")
 
-        return {'message': '任务已取消', 'task_id': task_id}
+        return {
+            'message': '任务已取消',
+            'task_id': task_id,
+            'prompt_action': result.get('prompt_action'),
+            'removed_files': result.get('removed_files', 0)
+        }
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"取消任务失败: {str(e)}")
 
@@ -1051,6 +1175,7 @@ async def cancel_task_v2(
 @router.get("/api/v2/tasks/{task_id}/download")
 async def download_task_result_v2(
     task_id: str,
+    request: Request,
     index: Optional[int] = Query(None, description="批量结果索引"),
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
@@ -1059,7 +1184,7 @@ async def download_task_result_v2(
 
     # 从Redis状态管理器获取任务信息
     status_manager = get_status_manager()
-    task_info = status_manager.get_task_status(task_id)
+    task_info = await status_manager.get_task_status_async(task_id)
 
     if not task_info:
         raise HTTPException(status_code=404, detail="任务不存在")
@@ -1105,7 +1230,7 @@ async def download_task_result_v2(
                     file_path = os.path.basename(file_path)
 
             # 调用分布式文件获取逻辑
-            return await get_output_file(file_path, credentials)
+            return await get_output_file(file_path, request, credentials)
         except HTTPException as e:
             # 如果分布式获取也失败，返回原始错误
             logger.error(f"分布式文件获取失败 - 任务ID: {task_id}, 文件路径: {file_path}, 错误: {e.detail}")
@@ -1117,15 +1242,222 @@ async def download_task_result_v2(
             raise HTTPException(status_code=404, detail=f"文件不存在: {str(e)}")
 
     filename = os.path.basename(file_path)
-    return FileResponse(file_path, filename=filename)
+    return await conditional_file_response(request, file_path, filename=filename)
+
+
+async def _resolve_local_result_file(file_path: str) -> Optional[str]:
+    """获取结果文件的本地路径：本地输出、已同步到主机的副本或节点文件缓存，都没有时返回None"""
+    if os.path.isabs(file_path):
+        return file_path if os.path.exists(file_path) else None
+
+    output_dir = get_output_dir()
+    full_path = os.path.join(output_dir, file_path)
+    if not is_safe_path(full_path, output_dir):
+        return None
+    if os.path.exists(full_path):
+        return full_path
+
+    if not get_config_manager().is_distributed_mode():
+        return None
+    from ..database.result_locations import get_result_location_index, location_keys
+    location = await run_sync(get_result_location_index().lookup, file_path)
+    if not location:
+        return None
+    if location.get('local_path') and os.path.exists(location['local_path']):
+        return location['local_path']
+
+    from ..core.file_cache import get_node_file_cache
+    from ..core.file_proxy import get_node_file_proxy
+    from ..core.node_manager import get_node_manager
+    file_cache = get_node_file_cache()
+    node = get_node_manager().get_node_by_id(location['node_id'])
+    if file_cache is None or node is None or node.status.value != 'online':
+        return None
+    return await file_cache.fetch(
+        f"{location['node_id']}/{location_keys(file_path)[0]}", location['filename'],
+        lambda: get_node_file_proxy().open(node.url, location['filename'], location['subfolder'])
+    )
+
+
+async def _open_result_file(file_path: str):
+    """打开结果文件用于打包：本地输出、已同步副本或节点缓存直接读取，否则从所属节点流式读取"""
+    from ..core.zip_stream import open_local_file, open_node_file
+
+    output_dir = get_output_dir()
+    if os.path.isabs(file_path):
+        if os.path.exists(file_path):
+            return await open_local_file(file_path)
+        relative_path = os.path.relpath(file_path, output_dir)
+        file_path = relative_path if not relative_path.startswith('..') else os.path.basename(file_path)
+
+    full_path = os.path.join(output_dir, file_path)
+    if not is_safe_path(full_path, output_dir):
+        return None
+    if os.path.exists(full_path):
+        return await open_local_file(full_path)
+    if not get_config_manager().is_distributed_mode():
+        return None
+
+    from ..core.file_cache import get_node_file_cache
+    from ..core.file_proxy import get_node_file_proxy
+    from ..core.node_manager import get_node_manager
+    from ..database.result_locations import get_result_location_index, location_keys
+    node_manager = get_node_manager()
+    file_proxy = get_node_file_proxy()
+
+    location = await run_sync(get_result_location_index().lookup, file_path)
+    if location:
+        if location.get('local_path') and os.path.exists(location['local_path']):
+            return await open_local_file(location['local_path'])
+        file_cache = get_node_file_cache()
+        cached_path = await file_cache.get(f"{location['node_id']}/{location_keys(file_path)[0]}") if file_cache else None
+        if cached_path:
+            return await open_local_file(cached_path)
+        # 打包时直接流式读取节点文件，不写入缓存
+        node = node_manager.get_node_by_id(location['node_id'])
+        if node is not None and node.status.value == 'online':
+            source = await open_node_file(file_proxy, node.url, location['filename'], location['subfolder'])
+            if source is not None:
+                return source
+
+    filename = os.path.basename(file_path)
+    subfolder = os.path.dirname(file_path)
+    for node in node_manager.get_all_nodes().values():
+        if node.status.value != 'online':
+            continue
+        source = await open_node_file(file_proxy, node.url, filename, subfolder)
+        if source is not None:
+            return source
+    return None
+
+
+def _archive_entries(task_files: Dict[str, List[str]], use_task_dirs: bool):
+    """生成归档条目：多任务时按任务ID分目录，同名文件追加序号"""
+    entries = []
+    for task_id, files in task_files.items():
+        used_names = set()
+        for file_path in files:
+            name, ext = os.path.splitext(os.path.basename(file_path))
+            arcname = f"{name}{ext}"
+            counter = 1
+            while arcname in used_names:
+                arcname = f"{name}_{counter}{ext}"
+                counter += 1
+            used_names.add(arcname)
+            if use_task_dirs:
+                arcname = f"{task_id}/{arcname}"
+            entries.append((arcname, lambda file_path=file_path: _open_result_file(file_path)))
+    return entries
+
+
+def _archive_response(task_files: Dict[str, List[str]], filename: str, skipped: Optional[List[str]] = None):
+    """边打包边输出的ZIP响应"""
+    from fastapi.responses import StreamingResponse
+    from ..core.zip_stream import stream_zip
+
+    entries = _archive_entries(task_files, use_task_dirs=len(task_files) > 1 or bool(skipped))
+    missing = [f"{task_id}/ (任务不存在或尚未完成)" for task_id in skipped or []]
+    return StreamingResponse(
+        stream_zip(entries, missing=missing),
+        media_type='application/zip',
+        headers={
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            'Cache-Control': 'private, no-cache'
+        }
+    )
+
+
+async def _completed_task_files(task_id: str) -> Optional[List[str]]:
+    """已完成任务的结果文件列表，任务不存在或尚未完成时返回None"""
+    task_info = await get_status_manager().get_task_status_async(task_id)
+    if not task_info or task_info.get('status') != TaskStatusEnum.COMPLETED.value:
+        return None
+    files = (task_info.get('result_data') or {}).get('files', [])
+    return files if isinstance(files, list) else [files]
+
+
+@router.get("/api/v2/tasks/{task_id}/archive")
+async def download_task_archive_v2(
+    task_id: str,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """以ZIP流式下载任务的全部结果文件"""
+    verify_token(credentials.credentials)
+
+    files = await _completed_task_files(task_id)
+    if files is None:
+        raise HTTPException(status_code=404, detail="任务不存在或尚未完成")
+    if not files:
+        raise HTTPException(status_code=404, detail="未找到结果文件")
+    return _archive_response({task_id: files}, f"{task_id}.zip")
+
+
+@router.post("/api/v2/tasks/archive")
+async def download_tasks_archive_v2(
+    request: TaskArchiveRequest,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """以ZIP流式下载多个任务的结果文件（按任务ID分目录，不存在或未完成的任务记入MISSING.txt）"""
+    verify_token(credentials.credentials)
+
+    task_files, skipped = {}, []
+    for task_id in request.task_ids:
+        files = await _completed_task_files(task_id)
+        if files:
+            task_files[task_id] = files
+        else:
+            skipped.append(task_id)
+    if not task_files:
+        raise HTTPException(status_code=404, detail="没有可下载的结果文件")
+    filename = f"tasks_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+    return _archive_response(task_files, filename, skipped)
 
 
-@router.get("/api/v2/tasks")
+@router.get("/api/v2/tasks/{task_id}/thumbnail")
+async def get_task_thumbnail_v2(
+    task_id: str,
+    request: Request,
+    index: int = Query(0, description="批量结果索引"),
+    size: Optional[int] = Query(None, description="缩略图尺寸（长边像素），取不小于该值的已配置尺寸"),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """获取任务结果的WebP缩略图，首次访问时生成"""
+    verify_token(credentials.credentials)
+
+    thumbnail_service = get_thumbnail_service()
+    if thumbnail_service is None:
+        raise HTTPException(status_code=404, detail="缩略图未启用")
+
+    status_manager = get_status_manager()
+    task_info = await status_manager.get_task_status_async(task_id)
+    if not task_info:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    if task_info.get('status') != TaskStatusEnum.COMPLETED.value:
+        raise HTTPException(status_code=400, detail="任务尚未完成")
+
+    files = (task_info.get('result_data') or {}).get('files', [])
+    if not isinstance(files, list):
+        files = [files]
+    if index < 0 or index >= len(files):
+        raise HTTPException(status_code=404, detail="文件索引超出范围")
+
+    source = await _resolve_local_result_file(files[index])
+    if not source:
+        raise HTTPException(status_code=404, detail="结果文件不存在")
+
+    thumb_path = await thumbnail_service.ensure(source, size)
+    if not thumb_path:
+        raise HTTPException(status_code=404, detail="无法生成缩略图")
+    return await conditional_file_response(request, thumb_path, media_type='image/webp')
+
+
+@router.get("/api/v2/tasks", response_model=TaskListResponse)
 async def list_tasks_v2(
     status: Optional[TaskStatusEnum] = Query(None, description="按状态过滤"),
     task_type: Optional[TaskTypeEnum] = Query(None, description="按任务类型过滤"),
     limit: int = Query(50, ge=1, le=100, description="返回数量限制"),
-    offset: int = Query(0, ge=0, description="偏移量"),
+    offset: int = Query(0, ge=0, description="偏移量（提供cursor时忽略）"),
+    cursor: Optional[str] = Query(None, description="分页游标，取自上一页的next_cursor"),
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
     """获取任务列表"""
@@ -1134,22 +1466,24 @@ async def list_tasks_v2(
     try:
         status_manager = get_status_manager()
 
-        # 获取用户的任务（使用client_id）
+        # 获取用户的任务（使用client_id），过滤与分页在数据库中完成
         client_id = user.get('client_id', user['sub'])
-        user_tasks = status_manager.get_user_tasks(client_id, source_type='client', limit=limit + offset)
-
-        # 过滤任务
-        filtered_tasks = []
-        for task_info in user_tasks:
-            # 按状态过滤
-            if status and task_info.get('status') != status.value:
-                continue
-
-            # 按任务类型过滤
-            if task_type and task_info.get('task_type') != task_type.value:
-                continue
+        try:
+            page = await run_sync(
+                status_manager.list_user_tasks_page,
+                client_id,
+                source_type='client',
+                status=status.value if status else None,
+                task_type=task_type.value if task_type else None,
+                limit=limit,
+                cursor=cursor,
+                offset=offset
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
-            task_response = TaskResponse(
+        tasks = [
+            TaskResponse(
                 task_id=task_info.get('task_id'),
                 status=TaskStatusEnum(task_info.get('status', 'queued')),
                 message=task_info.get('message', ''),
@@ -1158,28 +1492,30 @@ async def list_tasks_v2(
                 error_message=task_info.get('error_message'),
                 created_at=task_info.get('created_at'),
                 updated_at=task_info.get('updated_at'),
-                estimated_time=task_info.get('estimated_time')
+                estimated_time=task_info.get('estimated_time'),
+                thumbnailUrls=task_info.get('thumbnailUrls') or []
             )
-            filtered_tasks.append(task_response)
-
-        # 分页
-        total = len(filtered_tasks)
-        tasks = filtered_tasks[offset:offset + limit]
+            for task_info in page['tasks']
+        ]
 
         return {
             'tasks': tasks,
-            'total': total,
+            'total': page['total'],
             'limit': limit,
-            'offset': offset
+            'offset': offset,
+            'next_cursor': page['next_cursor']
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"获取任务列表失败: {e}")
         return {
             'tasks': [],
             'total': 0,
             'limit': limit,
-            'offset': offset
+            'offset': offset,
+            'next_cursor': None
         }
 
 
@@ -1424,7 +1760,7 @@ async def get_task_status_legacy(
     verify_token(credentials.credentials)
 
     status_manager = get_status_manager()
-    task_info = status_manager.get_task_status(task_id)
+    task_info = await status_manager.get_task_status_async(task_id)
     if not task_info:
         raise HTTPException(status_code=404, detail="任务不存在")
 
@@ -1480,12 +1816,15 @@ async def get_task_status_legacy(
                     result['resultUrl'] = f"/api/v2/tasks/{task_id}/download"
                     result['resultUrls'] = [result['resultUrl']]
 
+            result['thumbnailUrls'] = thumbnail_urls(task_id, files if isinstance(files, list) else [files])
+
     return result
 
 
 @router.get("/api/download/{task_id}")
 async def download_task_result_legacy(
     task_id: str,
+    request: Request,
     index: Optional[int] = Query(None, description="文件索引"),
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
@@ -1493,7 +1832,7 @@ async def download_task_result_legacy(
     verify_token(credentials.credentials)
 
     status_manager = get_status_manager()
-    task_info = status_manager.get_task_status(task_id)
+    task_info = await status_manager.get_task_status_async(task_id)
     if not task_info:
         raise HTTPException(status_code=404, detail="任务不存在")
 
@@ -1524,7 +1863,7 @@ async def download_task_result_legacy(
         raise HTTPException(status_code=404, detail="文件不存在")
 
     filename = os.path.basename(file_path)
-    return FileResponse(file_path, filename=filename)
+    return await conditional_file_response(request, file_path, filename=filename)
 
 
 # ==================== 节点管理API ====================
@@ -1748,7 +2087,7 @@ async def reload_task(
     # logger.info(f"[TASK_RELOAD] 开始重新加载任务: {task_id}")
 
     status_manager = get_status_manager()
-    task_info = status_manager.get_task_status(task_id)
+    task_info = await status_manager.get_task_status_async(task_id)
     if not task_info:
         logger.error(f"[TASK_RELOAD] 任务不存在: {task_id}")
         raise HTTPException(status_code=404, detail="任务不存在")
@@ -1793,7 +2132,7 @@ async def reload_task(
                 'workflow_name': task_info.get('workflow_name', 'sd_basic'),
                 'priority': task_info.get('priority', 1)
             }
-            celery_task = execute_text_to_image_task.delay(task_data)
+            celery_task = await run_sync(execute_text_to_image_task.delay, task_data)
         elif task_type == 'image_to_video':
             from ..queue.tasks import execute_image_to_video_task
             # 构建任务数据（保持原有task_id）
@@ -1807,7 +2146,7 @@ async def reload_task(
                 'workflow_name': task_info.get('workflow_name', 'Wan2.1 i2v'),
                 'priority': task_info.get('priority', 1)
             }
-            celery_task = execute_image_to_video_task.delay(task_data)
+            celery_task = await run_sync(execute_image_to_video_task.delay, task_data)
         else:
             raise HTTPException(status_code=400, detail=f"不支持的任务类型: {task_type}")
 
@@ -1830,7 +2169,7 @@ async def reload_task(
             'seed': task_info.get('seed') or task_data.get('seed'),
             'batch_size': task_info.get('batch_size') or task_data.get('batch_size', 1)
         }
-        status_manager.update_task_status(task_id, updated_status)
+        await run_sync(status_manager.update_task_status, task_id, updated_status)
         logger.info(f"任务已重新提交到Celery队列: {task_id} -> {celery_task.id}")
 
         # 预估处理时间
@@ -83,6 +83,16 @@ class TaskResponse(BaseModel):
     created_at: Optional[str] = Field(None, description="创建时间")
     updated_at: Optional[str] = Field(None, description="更新时间")
     estimated_time: Optional[float] = Field(None, description="预估处理时间（秒）")
+    thumbnailUrls: List[Optional[str]] = Field(default_factory=list, description="结果文件的缩略图URL，非图片结果为None")
+
+
+class TaskListResponse(BaseModel):
+    """任务列表响应"""
+    tasks: List[TaskResponse] = Field(default_factory=list, description="任务列表（按状态过滤时可能少于limit条）")
+    total: Optional[int] = Field(None, description="匹配的任务总数，只在首页（未提供cursor）统计，翻页时为None")
+    limit: int = Field(..., description="返回数量限制")
+    offset: int = Field(0, description="偏移量")
+    next_cursor: Optional[str] = Field(None, description="下一页游标，没有更多任务时为None")
 
 
 class TaskSubmissionResponse(BaseModel):
@@ -139,6 +149,26 @@ class BatchTaskRequest(BaseModel):
     batch_name: Optional[str] = Field(None, description="批次名称")
     priority: int = Field(1, ge=1, le=10, description="批次优先级")
 
+    @validator('tasks')
+    def validate_tasks(cls, v):
+        if not v:
+            raise ValueError('任务列表不能为空')
+        return v
+
+
+class TaskArchiveRequest(BaseModel):
+    """多任务结果打包下载请求"""
+    task_ids: List[str] = Field(..., description="任务ID列表")
+
+    @validator('task_ids')
+    def validate_task_ids(cls, v):
+        if not v:
+            raise ValueError('任务ID列表不能为空')
+        if len(v) > 1000:
+            raise ValueError('单次最多打包1000个任务')
+        # 去重并保持顺序
+        return list(dict.fromkeys(v))
+
 
 class BatchTaskResponse(BaseModel):
     """批量任务响应"""
@@ -148,6 +178,16 @@ class BatchTaskResponse(BaseModel):
     message: str = Field(..., description="提交消息")
 
 
+class BatchStatusResponse(BaseModel):
+    """批量任务聚合状态响应"""
+    batch_id: str = Field(..., description="批次ID")
+    total_tasks: int = Field(..., description="总任务数")
+    status_counts: Dict[str, int] = Field(..., description="各状态任务数")
+    progress: float = Field(0.0, ge=0.0, le=100.0, description="整体进度百分比")
+    finished: bool = Field(..., description="是否全部结束")
+    tasks: List[Dict[str, Any]] = Field(..., description="任务状态列表")
+
+
 class TaskStatistics(BaseModel):
     """任务统计"""
     total_tasks: int = Field(..., description="总任务数")
@@ -162,6 +162,11 @@ class NodeManagementError(Exception):
     pass
 
 
+class TaskCancelledError(Exception):
+    """任务已被取消异常"""
+    pass
+
+
 class NodeStatus(Enum):
     """节点状态枚举"""
     ONLINE = "online"
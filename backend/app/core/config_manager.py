@@ -15,6 +15,9 @@ from .base import (
 
 logger = logging.getLogger(__name__)
 
+# 优先使用libyaml的C实现解析配置（比纯Python解析快约一个数量级）
+_YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
 
 class ConfigValidationError(ConfigurationError):
     """配置验证错误"""
@@ -36,7 +39,7 @@ class ConfigManager:
         """加载配置文件"""
         try:
             with open(self.config_path, 'r', encoding='utf-8') as f:
-                self.config_data = yaml.safe_load(f)
+                self.config_data = yaml.load(f, Loader=_YAML_LOADER)
             
             # 验证配置结构
             self._validate_config()
@@ -194,6 +197,13 @@ class ConfigManager:
             if not isinstance(cache_ttl, int) or cache_ttl <= 0:
                 raise ConfigValidationError("file_management.cache_ttl必须是正整数")
 
+            max_cache_size = file_management.get('max_cache_size', '1GB')
+            try:
+                from .file_cache import parse_size
+                parse_size(max_cache_size)
+            except ValueError:
+                raise ConfigValidationError("file_management.max_cache_size格式无效，应为如 1GB、512MB 的大小")
+
         # 验证同步配置
         sync_config = distributed_config.get('sync', {})
         if sync_config:
@@ -209,6 +219,10 @@ class ConfigManager:
             if not isinstance(sync_patterns, list):
                 raise ConfigValidationError("sync.sync_patterns必须是列表")
 
+            max_concurrent_downloads = sync_config.get('max_concurrent_downloads', 4)
+            if not isinstance(max_concurrent_downloads, int) or max_concurrent_downloads <= 0:
+                raise ConfigValidationError("sync.max_concurrent_downloads必须是正整数")
+
     def _validate_nodes_config(self):
         """验证节点配置"""
         nodes_config = self.config_data.get('nodes', {})
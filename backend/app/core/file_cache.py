@@ -0,0 +1,330 @@
+"""
+节点输出文件磁盘缓存
+代理过的节点输出文件缓存在 proxy_output_dir 下的 cache 目录中：总大小受 max_cache_size 限制，
+按最近访问淘汰（LRU），超过 cache_ttl 的条目视为过期；先写临时文件再原子替换，
+并发请求同一文件时只向节点发起一次下载（singleflight），命中时直接返回本地文件（支持Range）。
+不适合缓存的上游响应（过大或非200）保持打开交还给发起下载的请求直接转发，不再重复请求节点；
+目录扫描、文件检查与删除在线程中执行；下载数据在内存中攒满 write_buffer_size 后才写一次磁盘，
+收尾的写入、原子替换与淘汰文件删除合并为一次线程调用，不阻塞事件循环。
+"""
+import asyncio
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+import time
+import uuid
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+from fastapi import Request
+from fastapi.responses import Response
+
+logger = logging.getLogger(__name__)
+
+_SIZE_UNITS = {'B': 1, 'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3, 'TB': 1024 ** 4}
+
+
+def parse_size(value) -> int:
+    """解析 "1GB"、"512MB"、1048576 等形式的大小配置，返回字节数"""
+    if isinstance(value, int):
+        return value
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMGT]?B)?\s*', str(value).upper())
+    if not match:
+        raise ValueError(f"无法解析的大小: {value}")
+    return int(float(match.group(1)) * _SIZE_UNITS[match.group(2) or 'B'])
+
+
+class StreamThrough:
+    """不写入缓存的上游响应（过大或非200），由发起下载的请求直接转发"""
+
+    def __init__(self, upstream):
+        self.upstream = upstream
+
+    def close(self):
+        """关闭未转发的上游响应"""
+        if self.upstream is not None:
+            self.upstream.close()
+            self.upstream = None
+
+
+class NodeFileCache:
+    """节点输出文件磁盘缓存（条目索引保存在内存中，启动时从缓存目录重建）"""
+
+    def __init__(self, cache_dir: str, max_size: int = 1024 ** 3, ttl: int = 3600,
+                 chunk_size: int = 64 * 1024, max_entry_size: Optional[int] = None,
+                 write_buffer_size: int = 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.ttl = ttl
+        self.chunk_size = chunk_size
+        # 下载数据攒到该大小才写一次磁盘，避免每个网络分块都切换一次线程
+        self.write_buffer_size = write_buffer_size
+        # 默认单个文件超过总容量的1/4时不缓存，避免一个大视频挤掉全部图片
+        self.max_entry_size = max_entry_size if max_entry_size is not None else max_size // 4
+        # key -> (缓存文件路径, 文件大小, 下载时间)，按访问顺序排列
+        self._entries: 'OrderedDict[str, Tuple[str, int, float]]' = OrderedDict()
+        self._total_size = 0
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.downloads = 0
+        self._loaded = False
+        self._loading: Optional[asyncio.Task] = None
+
+    async def load(self):
+        """首次使用时在线程中扫描缓存目录重建索引（并发调用只扫描一次）"""
+        if self._loaded:
+            return
+        if self._loading is None or self._loading.done():
+            self._loading = asyncio.ensure_future(self._load())
+        await asyncio.shield(self._loading)
+
+    async def _load(self):
+        found = await asyncio.to_thread(self._scan)
+        if self._loaded:
+            return
+        for mtime, key_hash, path, size in sorted(found):
+            self._entries[key_hash] = (path, size, mtime)
+            self._total_size += size
+        evicted = self._evict()
+        self._loaded = True
+        if evicted:
+            await asyncio.to_thread(self._remove_files, evicted)
+        if found:
+            logger.info(f"文件缓存已加载 {len(self._entries)} 个文件，共 {self._total_size} 字节")
+
+    def _scan(self):
+        """扫描缓存目录，清理上次遗留的临时文件，返回 (修改时间, 键哈希, 路径, 大小) 列表"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        found = []
+        for root, _, names in os.walk(self.cache_dir):
+            for name in names:
+                path = os.path.join(root, name)
+                if name.endswith('.tmp'):
+                    self._remove_file(path)
+                    continue
+                stat = os.stat(path)
+                found.append((stat.st_mtime, os.path.splitext(name)[0], path, stat.st_size))
+        return found
+
+    @staticmethod
+    def _hash(key: str) -> str:
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def _cache_path(self, key_hash: str, filename: str) -> str:
+        # 保留扩展名，便于排查；按哈希前两位分目录，避免单目录文件过多
+        return os.path.join(self.cache_dir, key_hash[:2], key_hash + os.path.splitext(filename)[1].lower())
+
+    async def get(self, key: str) -> Optional[str]:
+        """查询缓存，命中且未过期时返回缓存文件路径（索引尚未加载时视为未命中）"""
+        key_hash = self._hash(key)
+        entry = self._entries.get(key_hash)
+        if entry is None:
+            return None
+        path, size, fetched_at = entry
+        if time.time() - fetched_at > self.ttl or not await asyncio.to_thread(os.path.exists, path):
+            # 检查期间条目可能已被替换或淘汰
+            if self._entries.get(key_hash) is entry:
+                await asyncio.to_thread(self._remove_files, [self._discard(key_hash)])
+            return None
+        if self._entries.get(key_hash) is not entry:
+            return None
+        self._entries.move_to_end(key_hash)
+        self.hits += 1
+        return path
+
+    async def fetch(self, key: str, filename: str, open_upstream: Callable[[], Awaitable],
+                    stream_through: bool = False) -> Union[str, StreamThrough, None]:
+        """
+        获取缓存文件，未命中时下载到缓存
+
+        Args:
+            key: 缓存键（节点ID与文件路径）
+            filename: 原始文件名
+            open_upstream: 打开上游响应的协程函数，文件不存在时返回None
+            stream_through: 不适合缓存时是否取回已打开的上游响应直接转发
+
+        Returns:
+            缓存文件路径；文件不存在时返回None；不适合缓存（过大、非200响应）时，
+            stream_through为True的发起请求得到StreamThrough，其余请求得到None
+        """
+        await self.load()
+        path = await self.get(key)
+        if path is not None:
+            return path
+
+        key_hash = self._hash(key)
+        task = self._inflight.get(key_hash)
+        owner = task is None
+        if owner:
+            task = asyncio.ensure_future(self._download(key_hash, filename, open_upstream))
+            self._inflight[key_hash] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key_hash, None))
+        try:
+            # 共享同一个下载任务；某个客户端断开不会中断其他请求等待的下载
+            result = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if owner:
+                # 发起请求已断开，下载结束后关闭无人转发的上游响应
+                task.add_done_callback(self._close_unclaimed)
+            raise
+
+        if isinstance(result, StreamThrough):
+            # 上游响应只能转发一次，只交给发起下载的请求，其余请求自行向节点请求
+            if owner and stream_through:
+                return result
+            if owner:
+                result.close()
+            return None
+        return result
+
+    @staticmethod
+    def _close_unclaimed(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is None and isinstance(task.result(), StreamThrough):
+            task.result().close()
+
+    async def _download(self, key_hash: str, filename: str,
+                        open_upstream: Callable[[], Awaitable]) -> Union[str, StreamThrough, None]:
+        self.downloads += 1
+        upstream = await open_upstream()
+        if upstream is None:
+            return None
+
+        if upstream.status != 200 or (upstream.content_length or 0) > self.max_entry_size:
+            return StreamThrough(upstream)
+
+        path = self._cache_path(key_hash, filename)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        f = None
+        try:
+            f = await asyncio.to_thread(self._open_temp, tmp_path)
+            size = 0
+            buffer = []
+            buffered = 0
+            async for chunk in upstream.content.iter_chunked(self.chunk_size):
+                size += len(chunk)
+                if size > self.max_entry_size:
+                    return None
+                buffer.append(chunk)
+                buffered += len(chunk)
+                if buffered >= self.write_buffer_size:
+                    await asyncio.to_thread(f.writelines, buffer)
+                    buffer, buffered = [], 0
+
+            # 先在索引中为新文件腾出空间，剩余数据的写入、替换与淘汰文件的删除在一次线程调用中完成
+            self._discard(key_hash)
+            evicted = self._evict(incoming=size)
+            await asyncio.to_thread(self._commit_temp, f, buffer, tmp_path, path, evicted)
+            f = tmp_path = None
+
+            self._entries[key_hash] = (path, size, time.time())
+            self._total_size += size
+            logger.debug(f"已缓存节点文件: {filename} ({size} bytes)")
+            return path
+
+        except Exception as e:
+            logger.error(f"缓存节点文件失败 [{filename}]: {e}")
+            return None
+        finally:
+            if tmp_path:
+                await asyncio.to_thread(self._abort_temp, f, tmp_path)
+            if upstream.content.at_eof():
+                upstream.release()
+            else:
+                upstream.close()
+
+    @staticmethod
+    def _open_temp(tmp_path: str):
+        """创建缓存子目录并打开临时文件（在线程中执行）"""
+        os.makedirs(os.path.dirname(tmp_path), exist_ok=True)
+        return open(tmp_path, 'wb')
+
+    @classmethod
+    def _commit_temp(cls, f, chunks: List[bytes], tmp_path: str, path: str, evicted: List[str]):
+        """写入剩余数据并关闭临时文件，原子替换为缓存文件，再删除被淘汰的文件（在线程中执行）"""
+        with f:
+            f.writelines(chunks)
+        os.replace(tmp_path, path)
+        cls._remove_files(evicted)
+
+    @classmethod
+    def _abort_temp(cls, f, tmp_path: str):
+        """关闭并删除未完成的临时文件（在线程中执行）"""
+        if f is not None:
+            f.close()
+        cls._remove_file(tmp_path)
+
+    def _evict(self, incoming: int = 0) -> List[str]:
+        """从索引中移除过期条目，再按最近访问顺序淘汰直到总大小（加上即将写入的文件）不超过上限，
+        返回需要删除的文件路径（由调用方在线程中删除）"""
+        now = time.time()
+        evicted = [self._discard(key_hash) for key_hash, (_, _, fetched_at) in list(self._entries.items())
+                   if now - fetched_at > self.ttl]
+        while self._total_size + incoming > self.max_size and self._entries:
+            evicted.append(self._discard(next(iter(self._entries))))
+        return evicted
+
+    def _discard(self, key_hash: str) -> Optional[str]:
+        """从索引中移除条目，返回其缓存文件路径"""
+        entry = self._entries.pop(key_hash, None)
+        if entry is None:
+            return None
+        self._total_size -= entry[1]
+        return entry[0]
+
+    @classmethod
+    def _remove_files(cls, paths: List[Optional[str]]):
+        for path in paths:
+            if path:
+                cls._remove_file(path)
+
+    @staticmethod
+    def _remove_file(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"删除缓存文件失败 [{path}]: {e}")
+
+    @staticmethod
+    async def file_response(request: Request, path: str, filename: str) -> Response:
+        """以原始文件名返回缓存文件（支持ETag条件请求与Range）"""
+        from .file_response import conditional_file_response
+        media_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        return await conditional_file_response(request, path, filename=filename, media_type=media_type,
+                                               content_disposition_type='inline')
+
+    def get_status(self) -> Dict:
+        """获取缓存状态"""
+        return {
+            'files': len(self._entries),
+            'total_size': self._total_size,
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'downloads': self.downloads,
+            'inflight': len(self._inflight)
+        }
+
+
+# 全局文件缓存实例
+_node_file_cache = None
+
+
+def get_node_file_cache() -> Optional[NodeFileCache]:
+    """获取全局节点文件缓存实例，未启用文件缓存时返回None"""
+    global _node_file_cache
+    if _node_file_cache is None:
+        from .config_manager import get_config_manager
+        from ..utils.path_utils import resolve_path
+        file_config = get_config_manager().get_config('distributed').get('file_management', {}) or {}
+        if not file_config.get('enable_file_cache', True):
+            return None
+        _node_file_cache = NodeFileCache(
+            cache_dir=os.path.join(resolve_path(file_config.get('proxy_output_dir', 'outputs/distributed')), 'cache'),
+            max_size=parse_size(file_config.get('max_cache_size', '1GB')),
+            ttl=file_config.get('cache_ttl', 3600),
+            chunk_size=file_config.get('proxy_chunk_size', 64 * 1024)
+        )
+    return _node_file_cache
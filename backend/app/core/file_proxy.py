@@ -0,0 +1,136 @@
+"""
+节点输出文件代理
+通过共享的aiohttp连接池从ComfyUI节点的 /view 接口流式转发文件：
+透传Range、Content-Length、Content-Type等响应头，按固定大小分块转发，
+单个请求的内存占用不超过读缓冲大小；客户端断开时立即中止上游连接。
+"""
+import asyncio
+import logging
+from typing import Dict, Mapping, Optional
+
+import aiohttp
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
+logger = logging.getLogger(__name__)
+
+# 从上游透传给客户端的响应头
+PASSTHROUGH_HEADERS = (
+    'Content-Type', 'Content-Length', 'Content-Range', 'Accept-Ranges',
+    'Last-Modified', 'ETag', 'Cache-Control'
+)
+
+# 从客户端转发给上游的请求头（范围请求与条件请求）
+FORWARDED_REQUEST_HEADERS = ('Range', 'If-Range', 'If-None-Match', 'If-Modified-Since')
+
+
+class NodeFileProxy:
+    """节点文件流式代理（每个事件循环共享一个连接池）"""
+
+    def __init__(self, connection_limit: int = 100, chunk_size: int = 64 * 1024,
+                 connect_timeout: float = 5, read_timeout: float = 30):
+        self.connection_limit = connection_limit
+        self.chunk_size = chunk_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            connector = aiohttp.TCPConnector(limit=self.connection_limit)
+            # read_bufsize限制上游读缓冲，客户端消费慢时反压到上游TCP连接，而不是在内存中堆积
+            self._session = aiohttp.ClientSession(connector=connector, read_bufsize=self.chunk_size)
+            self._session_loop = loop
+        return self._session
+
+    async def open(self, node_url: str, filename: str, subfolder: str = '',
+                   range_header: Optional[str] = None,
+                   request_headers: Optional[Mapping[str, str]] = None) -> Optional[aiohttp.ClientResponse]:
+        """向节点发起文件请求，返回已收到响应头的上游响应；文件不存在或节点不可达时返回None
+
+        request_headers为客户端请求头，其中的Range与条件请求头转发给节点
+        """
+        params = {'filename': filename}
+        if subfolder:
+            # ComfyUI会根据操作系统自动处理路径分隔符，保持原样传递
+            params['subfolder'] = subfolder
+        headers = {}
+        if request_headers:
+            headers = {name: request_headers[name] for name in FORWARDED_REQUEST_HEADERS if name in request_headers}
+        if range_header:
+            headers['Range'] = range_header
+        timeout = aiohttp.ClientTimeout(sock_connect=self.connect_timeout, sock_read=self.read_timeout)
+
+        try:
+            response = await self._get_session().get(
+                f"{node_url}/view", params=params, headers=headers, timeout=timeout
+            )
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning(f"请求节点文件失败 [{node_url}]: {e}")
+            return None
+
+        # 304表示客户端缓存仍有效，416表示Range越界，由客户端处理，不再尝试其他节点
+        if response.status in (200, 206, 304, 416):
+            return response
+        logger.debug(f"节点 {node_url} 返回 {response.status}: {filename}")
+        response.release()
+        return None
+
+    def stream_response(self, upstream: aiohttp.ClientResponse, filename: str) -> StreamingResponse:
+        """将上游响应包装为流式响应（客户端断开时后台任务关闭上游连接）"""
+        headers: Dict[str, str] = {
+            name: upstream.headers[name] for name in PASSTHROUGH_HEADERS if name in upstream.headers
+        }
+        headers.setdefault('Accept-Ranges', 'bytes')
+        headers['Content-Disposition'] = f"inline; filename={filename}"
+        media_type = headers.pop('Content-Type', 'application/octet-stream')
+
+        return StreamingResponse(
+            self.iter_body(upstream),
+            status_code=upstream.status,
+            headers=headers,
+            media_type=media_type,
+            background=BackgroundTask(self._close_upstream, upstream)
+        )
+
+    async def iter_body(self, upstream: aiohttp.ClientResponse):
+        """分块读取上游响应体，结束或中止时关闭上游连接"""
+        try:
+            async for chunk in upstream.content.iter_chunked(self.chunk_size):
+                yield chunk
+        finally:
+            await self._close_upstream(upstream)
+
+    @staticmethod
+    async def _close_upstream(upstream: aiohttp.ClientResponse):
+        """完整读取的连接归还连接池，未读完（客户端断开）时直接关闭以中止上游传输"""
+        if upstream.content.at_eof():
+            upstream.release()
+        else:
+            upstream.close()
+
+    async def close(self):
+        """关闭连接池"""
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+# 全局文件代理实例
+_node_file_proxy = None
+
+
+def get_node_file_proxy() -> NodeFileProxy:
+    """获取全局节点文件代理实例"""
+    global _node_file_proxy
+    if _node_file_proxy is None:
+        from .config_manager import get_config_manager
+        file_config = get_config_manager().get_config('distributed').get('file_management', {}) or {}
+        _node_file_proxy = NodeFileProxy(
+            connection_limit=file_config.get('proxy_connection_limit', 100),
+            chunk_size=file_config.get('proxy_chunk_size', 64 * 1024),
+            read_timeout=file_config.get('proxy_read_timeout', 30)
+        )
+    return _node_file_proxy
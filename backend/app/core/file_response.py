@@ -0,0 +1,209 @@
+"""
+条件请求与范围请求的文件响应
+ETag取自文件内容哈希（按路径、大小、修改时间缓存），If-None-Match命中时返回304；
+支持单个Range返回206（Starlette 0.27的FileResponse不支持Range），越界返回416。
+输出文件名在清理后可能被重新使用，默认每次按ETag重新验证；
+只有URL带有与内容哈希一致的版本参数（?v=<ETag>）时才设置 Cache-Control: immutable，
+本地结果在保存时记录内容版本，任务接口返回的结果URL据此带上版本参数。
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from email.utils import formatdate
+from typing import Optional, Tuple
+
+import anyio
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+
+logger = logging.getLogger(__name__)
+
+# 私有（需要认证的接口）与公开静态文件的缓存策略：默认重新验证，带内容版本的URL长期缓存
+REVALIDATE_PRIVATE = 'private, no-cache'
+REVALIDATE_PUBLIC = 'public, no-cache'
+IMMUTABLE_PRIVATE = 'private, max-age=31536000, immutable'
+IMMUTABLE_PUBLIC = 'public, max-age=31536000, immutable'
+
+# 携带内容版本（ETag去掉引号）的查询参数
+VERSION_PARAM = 'v'
+
+_RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class ContentETagCache:
+    """文件内容哈希ETag缓存，文件大小或修改时间变化时重新计算"""
+
+    def __init__(self, max_entries: int = 10000, read_size: int = 1024 * 1024):
+        self.max_entries = max_entries
+        self.read_size = read_size
+        self._entries: 'OrderedDict[Tuple[str, int, int], str]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str, stat_result: os.stat_result) -> str:
+        """返回带引号的强ETag（在线程池中调用，首次计算需要读取整个文件）"""
+        key = (os.path.abspath(path), stat_result.st_size, stat_result.st_mtime_ns)
+        with self._lock:
+            etag = self._entries.get(key)
+            if etag is not None:
+                self._entries.move_to_end(key)
+                return etag
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(self.read_size), b''):
+                digest.update(block)
+        etag = f'"{digest.hexdigest()[:32]}"'
+
+        with self._lock:
+            self._entries[key] = etag
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return etag
+
+
+_etag_cache = ContentETagCache()
+
+
+def content_version(path: str) -> Optional[str]:
+    """文件内容版本（ETag去掉引号），文件不存在时返回None（首次计算需要读取整个文件，不要在事件循环中调用）"""
+    try:
+        return _etag_cache.get(path, os.stat(path)).strip('"')
+    except OSError:
+        return None
+
+
+def versioned_url(url: str, version: Optional[str]) -> str:
+    """为URL附加内容版本参数，版本为空时原样返回"""
+    if not version:
+        return url
+    return f"{url}{'&' if '?' in url else '?'}{VERSION_PARAM}={version}"
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match是否命中（弱比较）"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    candidates = [value.strip() for value in if_none_match.split(',')]
+    return etag in [value[2:] if value.startswith('W/') else value for value in candidates]
+
+
+def parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    解析单个字节范围
+
+    Returns:
+        (start, end) 闭区间；未请求Range或格式不支持（如多个范围）时返回None
+    Raises:
+        ValueError: 范围不可满足（应返回416）
+    """
+    if not range_header:
+        return None
+    match = _RANGE_PATTERN.match(range_header.strip())
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # bytes=-N 表示最后N个字节
+        length = int(end)
+        if length == 0 or size == 0:
+            raise ValueError(range_header)
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError(range_header)
+    return start, end
+
+
+class RangeFileResponse(FileResponse):
+    """支持单个字节范围的文件响应"""
+
+    def __init__(self, path, byte_range: Optional[Tuple[int, int]] = None, **kwargs):
+        super().__init__(path, **kwargs)
+        self.byte_range = byte_range
+        if byte_range is not None:
+            start, end = byte_range
+            self.status_code = 206
+            self.headers['content-range'] = f"bytes {start}-{end}/{self.stat_result.st_size}"
+            self.headers['content-length'] = str(end - start + 1)
+
+    async def __call__(self, scope, receive, send):
+        if self.byte_range is None:
+            await super().__call__(scope, receive, send)
+            return
+
+        start, end = self.byte_range
+        await send({'type': 'http.response.start', 'status': self.status_code, 'headers': self.raw_headers})
+        if self.send_header_only:
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+        else:
+            async with await anyio.open_file(self.path, mode='rb') as file:
+                await file.seek(start)
+                remaining = end - start + 1
+                while remaining > 0:
+                    chunk = await file.read(min(self.chunk_size, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': remaining > 0})
+                if remaining > 0:
+                    await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+        if self.background is not None:
+            await self.background()
+
+
+async def conditional_file_response(request: Request, path: str, filename: Optional[str] = None,
+                                    media_type: Optional[str] = None,
+                                    cache_control: str = REVALIDATE_PRIVATE,
+                                    immutable_cache_control: Optional[str] = IMMUTABLE_PRIVATE,
+                                    content_disposition_type: str = 'attachment') -> Response:
+    """
+    返回带内容哈希ETag、支持304与Range的文件响应
+
+    Args:
+        request: 当前请求
+        path: 文件路径
+        filename: 下载文件名，为空时不设置Content-Disposition
+        media_type: MIME类型，为空时按文件名推断
+        cache_control: Cache-Control头
+        immutable_cache_control: URL版本参数与当前ETag一致时使用的Cache-Control头，为空时不区分
+        content_disposition_type: attachment或inline
+    """
+    stat_result = await asyncio.to_thread(os.stat, path)
+    etag = await asyncio.to_thread(_etag_cache.get, path, stat_result)
+    # 版本参数与内容哈希一致时URL对应的内容不会再变化，可以长期缓存
+    if immutable_cache_control and request.query_params.get(VERSION_PARAM) == etag.strip('"'):
+        cache_control = immutable_cache_control
+    headers = {
+        'ETag': etag,
+        'Last-Modified': formatdate(stat_result.st_mtime, usegmt=True),
+        'Cache-Control': cache_control,
+        'Accept-Ranges': 'bytes'
+    }
+
+    if etag_matches(request.headers.get('if-none-match'), etag):
+        return Response(status_code=304, headers=headers)
+
+    byte_range = None
+    if_range = request.headers.get('if-range')
+    # If-Range与当前ETag不一致时文件已变化，返回完整内容
+    if not if_range or if_range.strip() == etag:
+        try:
+            byte_range = parse_range(request.headers.get('range'), stat_result.st_size)
+        except ValueError:
+            return Response(status_code=416, headers={
+                'Content-Range': f"bytes */{stat_result.st_size}", 'ETag': etag, 'Accept-Ranges': 'bytes'
+            })
+
+    return RangeFileResponse(
+        path, byte_range=byte_range, headers=headers, media_type=media_type, filename=filename,
+        stat_result=stat_result, method=request.method, content_disposition_type=content_disposition_type
+    )
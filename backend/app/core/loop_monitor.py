@@ -0,0 +1,116 @@
+"""
+事件循环阻塞检测
+事件循环中的心跳协程每隔interval醒来一次，实际间隔超过threshold即记录一次阻塞；
+独立的监视线程发现心跳停滞时抓取事件循环线程当前的调用栈，指出阻塞事件循环的同步代码。
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LoopBlockDetector:
+    """事件循环阻塞检测器"""
+
+    def __init__(self, threshold: float = 0.1, interval: float = 0.02, max_events: int = 50):
+        self.threshold = threshold
+        self.interval = interval
+        self.blocked_count = 0
+        self.max_block = 0.0
+        self._events = deque(maxlen=max_events)
+        self._lock = threading.Lock()
+        self._last_beat = time.monotonic()
+        self._pending_stack: Optional[str] = None
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._watch_thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    def start(self):
+        """在事件循环中启动检测（需在协程中调用）"""
+        if self._heartbeat_task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop_event.clear()
+        self._heartbeat_task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._watch_thread = threading.Thread(target=self._watch, name='loop-monitor', daemon=True)
+        self._watch_thread.start()
+        logger.info(f"事件循环阻塞检测已启动，阈值 {self.threshold * 1000:.0f}ms")
+
+    async def stop(self):
+        """停止检测"""
+        self._stop_event.set()
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            try:
+                await self._heartbeat_task
+            except asyncio.CancelledError:
+                pass
+            self._heartbeat_task = None
+        if self._watch_thread is not None:
+            self._watch_thread.join(timeout=1)
+            self._watch_thread = None
+
+    async def _heartbeat(self):
+        while True:
+            self._last_beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+            delay = time.monotonic() - self._last_beat - self.interval
+            if delay > self.threshold:
+                self._record_block(delay)
+
+    def _watch(self):
+        """心跳停滞超过阈值时抓取事件循环线程的调用栈（每次阻塞只抓取一次）"""
+        while not self._stop_event.wait(self.interval):
+            stalled = time.monotonic() - self._last_beat - self.interval
+            if stalled <= self.threshold or self._pending_stack is not None:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is not None:
+                self._pending_stack = ''.join(traceback.format_stack(frame, limit=20))
+
+    def _record_block(self, duration: float):
+        with self._lock:
+            stack, self._pending_stack = self._pending_stack, None
+            self.blocked_count += 1
+            self.max_block = max(self.max_block, duration)
+            self._events.append({
+                'at': datetime.now().isoformat(),
+                'duration_ms': round(duration * 1000, 1),
+                'stack': stack
+            })
+        logger.warning(f"事件循环被阻塞 {duration * 1000:.0f}ms:\n{stack or '(未捕获到调用栈)'}")
+
+    def get_status(self) -> Dict[str, Any]:
+        """获取阻塞统计与最近的阻塞记录"""
+        with self._lock:
+            return {
+                'threshold_ms': round(self.threshold * 1000),
+                'blocked_count': self.blocked_count,
+                'max_block_ms': round(self.max_block * 1000, 1),
+                'recent': list(self._events)[-5:]
+            }
+
+
+# 全局事件循环阻塞检测器实例
+_loop_block_detector = None
+
+
+def get_loop_block_detector() -> Optional[LoopBlockDetector]:
+    """获取全局事件循环阻塞检测器实例，未启用时返回None"""
+    global _loop_block_detector
+    if _loop_block_detector is None:
+        from .config_manager import get_config_manager
+        monitor_config = get_config_manager().get_system_config().get('loop_monitor', {}) or {}
+        if not monitor_config.get('enabled', True):
+            return None
+        _loop_block_detector = LoopBlockDetector(threshold=monitor_config.get('threshold_ms', 100) / 1000)
+    return _loop_block_detector
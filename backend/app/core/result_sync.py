@@ -0,0 +1,323 @@
+"""
+结果文件同步
+分布式任务完成后立即把节点上的输出文件下载到主机，经 OutputManager 按日期整理后
+将结果记录的file_path改为本地副本，之后的首次访问不再经过GPU节点，节点也可清理输出。
+
+下载在独立事件循环线程中执行，并发数受 max_concurrent_downloads 限制；
+主服务进程另按 sync_interval 补扫遗漏（进程重启、节点临时离线）的结果。
+"""
+import asyncio
+import fnmatch
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+
+def _default_node_resolver(node_id: str) -> Optional[str]:
+    """返回在线节点的URL，节点不存在或离线时返回None"""
+    from .node_manager import get_node_manager
+    node = get_node_manager().get_node_by_id(node_id)
+    if node is None or node.status.value != 'online':
+        return None
+    return node.url
+
+
+class ResultFileSync:
+    """结果文件同步服务"""
+
+    def __init__(self, result_dao=None, task_dao=None, output_manager=None,
+                 node_resolver: Callable[[str], Optional[str]] = None,
+                 sync_patterns: Optional[List[str]] = None, max_concurrent_downloads: int = 4,
+                 sync_interval: int = 300, batch_size: int = 100, max_attempts: int = 3,
+                 connect_timeout: float = 5, read_timeout: float = 60, chunk_size: int = 64 * 1024):
+        if result_dao is None:
+            from ..database.dao.task_dao import GlobalTaskResultDAO
+            result_dao = GlobalTaskResultDAO()
+        if task_dao is None:
+            from ..database.dao.task_dao import GlobalTaskDAO
+            task_dao = GlobalTaskDAO()
+        if output_manager is None:
+            from ..utils.output_manager import get_output_manager
+            output_manager = get_output_manager()
+        self.result_dao = result_dao
+        self.task_dao = task_dao
+        self.output_manager = output_manager
+        self.node_resolver = node_resolver or _default_node_resolver
+        self.sync_patterns = [pattern.lower() for pattern in (sync_patterns or ['*'])]
+        self.max_concurrent_downloads = max_concurrent_downloads
+        self.sync_interval = sync_interval
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.chunk_size = chunk_size
+
+        self.synced_count = 0
+        self.failed_count = 0
+        self.last_sweep_time: Optional[datetime] = None
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._download_slots: Optional[asyncio.Semaphore] = None
+        self._sweep_task: Optional[asyncio.Task] = None
+        # 补扫游标：ID不大于该值的结果均已同步或放弃
+        self._cursor = 0
+        self._attempts: Dict[int, int] = {}
+        self._active_tasks = set()
+
+    @property
+    def running(self) -> bool:
+        return self._loop is not None and self._loop.is_running()
+
+    def start(self, sweep: bool = False):
+        """启动下载事件循环线程；sweep为True时同时定期补扫（只在主服务进程中开启）"""
+        with self._start_lock:
+            if not self.running:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name='result-file-sync', daemon=True
+                )
+                self._thread.start()
+                asyncio.run_coroutine_threadsafe(self._create_session(), self._loop).result()
+                logger.info(f"结果文件同步已启动，并发下载上限: {self.max_concurrent_downloads}")
+
+            if sweep and self._sweep_task is None:
+                self._sweep_task = asyncio.run_coroutine_threadsafe(self._sweep_loop(), self._loop)
+
+    def stop(self):
+        """停止下载事件循环线程（未完成的同步由下次补扫继续）"""
+        with self._start_lock:
+            if not self.running:
+                return
+            if self._sweep_task is not None:
+                self._sweep_task.cancel()
+                self._sweep_task = None
+            try:
+                asyncio.run_coroutine_threadsafe(self._close_session(), self._loop).result(timeout=5)
+            except Exception as e:
+                logger.warning(f"关闭结果同步连接池失败: {e}")
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._loop.close()
+            self._loop = None
+            logger.info("结果文件同步已停止")
+
+    async def _create_session(self):
+        connector = aiohttp.TCPConnector(limit=self.max_concurrent_downloads)
+        self._session = aiohttp.ClientSession(connector=connector)
+        self._download_slots = asyncio.Semaphore(self.max_concurrent_downloads)
+
+    async def _close_session(self):
+        if self._session:
+            await self._session.close()
+            self._session = None
+
+    def submit(self, task_id: str, task_db_id: int):
+        """任务完成后提交同步（不阻塞调用方）"""
+        try:
+            self.start()
+            asyncio.run_coroutine_threadsafe(self.sync_task(task_db_id, task_id), self._loop)
+        except Exception as e:
+            logger.error(f"提交结果同步失败 [{task_id}]: {e}")
+
+    def _matches(self, result: Dict[str, Any]) -> bool:
+        filename = result['result_metadata'].get('filename', '').lower()
+        return any(fnmatch.fnmatchcase(filename, pattern) for pattern in self.sync_patterns)
+
+    async def sync_task(self, task_db_id: int, task_id: Optional[str] = None) -> List[int]:
+        """同步一个任务的结果文件，返回未能同步的结果ID"""
+        if task_db_id in self._active_tasks:
+            return []
+        self._active_tasks.add(task_db_id)
+        results = []
+        try:
+            results, _ = await asyncio.to_thread(
+                self.result_dao.get_unsynced_node_results, 0, task_db_id, self.batch_size
+            )
+            results = [result for result in results if self._matches(result)]
+            if not results:
+                return []
+            # 任务的来源用户作为同步副本的所属用户记录到存储索引
+            task = await asyncio.to_thread(self.task_dao.get_by_id, task_db_id)
+            if task_id is None:
+                task_id = task.task_id if task else str(task_db_id)
+            owner = getattr(task, 'source_user_id', None)
+
+            staging_dir = tempfile.mkdtemp(prefix='.sync_', dir=self.output_manager.output_dir)
+            try:
+                downloaded = await asyncio.gather(*[
+                    self._download(result, os.path.join(staging_dir, str(i)))
+                    for i, result in enumerate(results)
+                ])
+                pending = [(result, path) for result, path in zip(results, downloaded) if path]
+                local_paths = await asyncio.to_thread(
+                    self.output_manager.organize_output_files, [path for _, path in pending], task_id, owner
+                )
+
+                synced_ids = set()
+                synced_paths = []
+                for (result, _), local_path in zip(pending, local_paths):
+                    # 整理失败时返回的是暂存路径
+                    if local_path.startswith(staging_dir):
+                        continue
+                    if await asyncio.to_thread(self.result_dao.mark_synced, result, local_path):
+                        synced_ids.add(result['id'])
+                        synced_paths.append(local_path)
+                        self._record_location(result, local_path)
+            finally:
+                shutil.rmtree(staging_dir, ignore_errors=True)
+
+            # 同步到主机后为本地副本生成缩略图
+            self._generate_thumbnails(synced_paths)
+
+            failed_ids = [result['id'] for result in results if result['id'] not in synced_ids]
+            self.synced_count += len(synced_ids)
+            self.failed_count += len(failed_ids)
+            logger.info(f"任务结果已同步到主机 [{task_id}]: {len(synced_ids)}/{len(results)}")
+            return failed_ids
+
+        except Exception as e:
+            logger.error(f"同步任务结果失败 [{task_db_id}]: {e}")
+            return [result['id'] for result in results]
+        finally:
+            self._active_tasks.discard(task_db_id)
+
+    async def _download(self, result: Dict[str, Any], dest_dir: str) -> Optional[str]:
+        """从所属节点下载结果文件到暂存目录，失败时返回None"""
+        metadata = result['result_metadata']
+        node_url = self.node_resolver(metadata['node_id'])
+        if not node_url:
+            logger.debug(f"节点 {metadata['node_id']} 不可用，稍后重试: {result['file_path']}")
+            return None
+
+        params = {'filename': metadata['filename']}
+        if metadata.get('subfolder'):
+            params['subfolder'] = metadata['subfolder']
+        timeout = aiohttp.ClientTimeout(sock_connect=self.connect_timeout, sock_read=self.read_timeout)
+        dest_path = os.path.join(dest_dir, os.path.basename(metadata['filename']))
+
+        async with self._download_slots:
+            try:
+                async with self._session.get(f"{node_url}/view", params=params, timeout=timeout) as response:
+                    if response.status != 200:
+                        logger.warning(f"下载结果文件失败 [{result['file_path']}]: HTTP {response.status}")
+                        return None
+                    os.makedirs(dest_dir, exist_ok=True)
+                    with open(dest_path, 'wb') as f:
+                        async for chunk in response.content.iter_chunked(self.chunk_size):
+                            f.write(chunk)
+                return dest_path
+            except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+                logger.warning(f"下载结果文件失败 [{result['file_path']}]: {e}")
+                return None
+
+    @staticmethod
+    def _record_location(result: Dict[str, Any], local_path: str):
+        try:
+            from ..database.result_locations import get_result_location_index
+            metadata = result['result_metadata']
+            get_result_location_index().record([{
+                'file_path': result['file_path'],
+                'node_id': metadata['node_id'],
+                'subfolder': metadata.get('subfolder', ''),
+                'filename': metadata['filename'],
+                'local_path': local_path
+            }])
+        except Exception as e:
+            logger.warning(f"更新结果位置索引失败: {e}")
+
+    @staticmethod
+    def _generate_thumbnails(local_paths: List[str]):
+        try:
+            from ..utils.thumbnails import get_thumbnail_service
+            thumbnail_service = get_thumbnail_service()
+            if thumbnail_service and local_paths:
+                thumbnail_service.submit(local_paths)
+        except Exception as e:
+            logger.warning(f"提交缩略图生成失败: {e}")
+
+    async def sync_pending(self) -> int:
+        """补扫尚未同步的结果，返回本次同步的文件数"""
+        synced_before = self.synced_count
+        after_id = self._cursor
+        retry_from = None
+        while True:
+            results, last_id = await asyncio.to_thread(
+                self.result_dao.get_unsynced_node_results, after_id, None, self.batch_size
+            )
+            task_db_ids = list(dict.fromkeys(result['task_db_id'] for result in results))
+            for task_db_id in task_db_ids:
+                failed_ids = await self.sync_task(task_db_id)
+                for result in results:
+                    if result['task_db_id'] == task_db_id and result['id'] not in failed_ids:
+                        self._attempts.pop(result['id'], None)
+                for result_id in failed_ids:
+                    attempts = self._attempts.get(result_id, 0) + 1
+                    if attempts >= self.max_attempts:
+                        logger.warning(f"结果文件多次同步失败，放弃: {result_id}")
+                        self._attempts.pop(result_id, None)
+                        continue
+                    self._attempts[result_id] = attempts
+                    retry_from = result_id if retry_from is None else min(retry_from, result_id)
+            if last_id == after_id:
+                break
+            after_id = last_id
+
+        # 有待重试的结果时游标停在其之前
+        self._cursor = retry_from - 1 if retry_from is not None else after_id
+        self.last_sweep_time = datetime.now()
+        return self.synced_count - synced_before
+
+    async def _sweep_loop(self):
+        while True:
+            try:
+                synced = await self.sync_pending()
+                if synced:
+                    logger.info(f"结果文件补扫完成，同步 {synced} 个文件")
+            except Exception as e:
+                logger.error(f"结果文件补扫失败: {e}")
+            await asyncio.sleep(self.sync_interval)
+
+    def get_status(self) -> Dict[str, Any]:
+        """获取同步状态"""
+        return {
+            'is_running': self.running,
+            'max_concurrent_downloads': self.max_concurrent_downloads,
+            'synced_count': self.synced_count,
+            'failed_count': self.failed_count,
+            'pending_retries': len(self._attempts),
+            'last_sweep_time': self.last_sweep_time.isoformat() if self.last_sweep_time else None
+        }
+
+
+# 全局结果同步实例
+_result_file_sync = None
+
+
+def get_result_file_sync() -> Optional[ResultFileSync]:
+    """获取全局结果文件同步实例，非分布式模式或未启用同步时返回None"""
+    global _result_file_sync
+    if _result_file_sync is None:
+        from .config_manager import get_config_manager
+        config_manager = get_config_manager()
+        if not config_manager.is_distributed_mode():
+            return None
+        sync_config = config_manager.get_config('distributed').get('sync', {}) or {}
+        if not sync_config.get('enable_file_sync', False):
+            return None
+        _result_file_sync = ResultFileSync(
+            sync_patterns=sync_config.get('sync_patterns'),
+            max_concurrent_downloads=sync_config.get('max_concurrent_downloads', 4),
+            sync_interval=sync_config.get('sync_interval', 300)
+        )
+    return _result_file_sync
@@ -0,0 +1,217 @@
+"""
+任务取消器
+取消任务时除撤销Celery任务外，还要让ComfyUI节点停止处理对应的提示词：
+排队中的提示词从节点队列中删除，正在执行的提示词通过/interrupt中断，
+随后释放节点占用并清理已生成的部分输出。
+数据库更新、Celery撤销与文件删除都是同步调用，在线程中执行，不阻塞事件循环
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Dict, Any, Optional, List
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+
+class TaskCanceller:
+    """任务取消器"""
+
+    def __init__(self, request_timeout: float = 10):
+        self.request_timeout = request_timeout
+
+    # ---------------- 节点定位 ----------------
+
+    def resolve_node_url(self, node_id: Optional[str]) -> str:
+        """根据节点ID解析ComfyUI地址，单机模式或未知节点使用配置文件中的ComfyUI实例"""
+        from .config_manager import get_config_manager
+        config_manager = get_config_manager()
+
+        if node_id and node_id != "default":
+            try:
+                from .node_manager import get_node_manager
+                node = get_node_manager().get_node_by_id(node_id)
+                if node:
+                    return node.url
+            except Exception as e:
+                logger.debug(f"从节点管理器获取节点失败 [{node_id}]: {e}")
+
+            # 节点管理器未启动（如API进程）时从静态节点配置查找
+            nodes_config = config_manager.get_config('nodes') or {}
+            for node_config in nodes_config.get('static_nodes', []):
+                if node_config.get('node_id') == node_id:
+                    return f"http://{node_config['host']}:{node_config['port']}"
+
+            logger.warning(f"未找到节点配置，使用默认ComfyUI实例: {node_id}")
+
+        comfyui_config = config_manager.get_comfyui_config()
+        return f"http://{comfyui_config.get('host', '127.0.0.1')}:{comfyui_config.get('port', 8188)}"
+
+    # ---------------- ComfyUI操作 ----------------
+
+    async def _get_queue(self, session: aiohttp.ClientSession, comfyui_url: str) -> Dict[str, Any]:
+        async with session.get(f"{comfyui_url}/queue") as response:
+            if response.status != 200:
+                raise Exception(f"获取ComfyUI队列失败，状态码: {response.status}")
+            return await response.json(content_type=None)
+
+    @staticmethod
+    def _queue_prompt_ids(queue_items: List) -> List[str]:
+        """队列项格式为 [序号, prompt_id, prompt, extra_data, outputs]"""
+        return [item[1] for item in queue_items if isinstance(item, (list, tuple)) and len(item) > 1]
+
+    async def cancel_prompt(self, comfyui_url: str, prompt_id: str) -> str:
+        """让ComfyUI停止处理指定提示词
+
+        Returns:
+            str: dequeued（已从队列删除）/ interrupted（已中断执行）/ not_found（已结束或不存在）
+        """
+        timeout = aiohttp.ClientTimeout(total=self.request_timeout)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            queue = await self._get_queue(session, comfyui_url)
+
+            if prompt_id in self._queue_prompt_ids(queue.get('queue_pending', [])):
+                async with session.post(f"{comfyui_url}/queue", json={'delete': [prompt_id]}) as response:
+                    response.raise_for_status()
+                logger.info(f"已从ComfyUI队列删除提示词: {prompt_id}")
+                return 'dequeued'
+
+            if prompt_id in self._queue_prompt_ids(queue.get('queue_running', [])):
+                # /interrupt只作用于节点当前正在执行的提示词，中断前再次确认，避免中断其他任务
+                queue = await self._get_queue(session, comfyui_url)
+                if prompt_id not in self._queue_prompt_ids(queue.get('queue_running', [])):
+                    logger.info(f"提示词已结束执行，跳过中断: {prompt_id}")
+                    return 'not_found'
+
+                # 新版ComfyUI会校验prompt_id，只在其仍在执行时才中断
+                async with session.post(f"{comfyui_url}/interrupt", json={'prompt_id': prompt_id}) as response:
+                    response.raise_for_status()
+                logger.info(f"已中断ComfyUI正在执行的提示词: {prompt_id}")
+                return 'interrupted'
+
+        return 'not_found'
+
+    async def cleanup_outputs(self, comfyui_url: str, prompt_id: str, node_id: Optional[str] = None) -> int:
+        """清理已取消提示词的部分输出，返回删除的本地文件数
+
+        单机模式下输出目录位于本机，直接删除已生成的文件；
+        分布式模式下文件在远程节点上，只清理节点的历史记录
+        """
+        removed = 0
+        timeout = aiohttp.ClientTimeout(total=self.request_timeout)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            async with session.get(f"{comfyui_url}/history/{prompt_id}") as response:
+                history = await response.json(content_type=None) if response.status == 200 else {}
+
+            if node_id in (None, "default") and prompt_id in history:
+                file_infos = [
+                    file_info
+                    for node_output in history[prompt_id].get('outputs', {}).values()
+                    for key in ('images', 'gifs', 'videos')
+                    for file_info in node_output.get(key, [])
+                    if file_info.get('type', 'output') == 'output' and file_info.get('filename')
+                ]
+                if file_infos:
+                    removed = await asyncio.to_thread(self._remove_output_files, file_infos)
+
+            async with session.post(f"{comfyui_url}/history", json={'delete': [prompt_id]}) as response:
+                response.raise_for_status()
+
+        if removed:
+            logger.info(f"已删除取消任务的部分输出文件: {prompt_id} ({removed}个)")
+        return removed
+
+    @staticmethod
+    def _remove_output_files(file_infos: List[Dict[str, Any]]) -> int:
+        """删除输出目录中的部分输出文件（忽略目录之外的路径），返回删除的文件数（在线程中执行）"""
+        from ..utils.path_utils import get_output_dir
+        output_dir = os.path.realpath(str(get_output_dir()))
+
+        removed = 0
+        for file_info in file_infos:
+            file_path = os.path.realpath(os.path.join(
+                output_dir, file_info.get('subfolder', ''), file_info['filename']
+            ))
+            if file_path.startswith(output_dir + os.sep) and os.path.isfile(file_path):
+                os.remove(file_path)
+                removed += 1
+        return removed
+
+    async def release_node(self, node_id: Optional[str], task_id: str):
+        """释放节点上的任务占用"""
+        if not node_id or node_id == "default":
+            return
+        try:
+            from .node_manager import get_node_manager
+            await get_node_manager().remove_task_from_node(node_id, task_id)
+        except Exception as e:
+            logger.warning(f"释放节点任务占用失败 [{task_id}]: {e}")
+
+    async def stop_prompt(self, prompt_id: str, node_id: Optional[str] = None,
+                          comfyui_url: Optional[str] = None) -> Dict[str, Any]:
+        """停止节点上的提示词并清理部分输出，失败时只记录日志"""
+        result = {'prompt_action': None, 'removed_files': 0}
+        comfyui_url = comfyui_url or self.resolve_node_url(node_id)
+
+        try:
+            result['prompt_action'] = await self.cancel_prompt(comfyui_url, prompt_id)
+        except Exception as e:
+            logger.error(f"停止ComfyUI提示词失败 [{prompt_id}]: {e}")
+
+        try:
+            result['removed_files'] = await self.cleanup_outputs(comfyui_url, prompt_id, node_id)
+        except Exception as e:
+            logger.warning(f"清理部分输出失败 [{prompt_id}]: {e}")
+
+        return result
+
+    # ---------------- 取消入口 ----------------
+
+    async def cancel_task(self, task_info: Dict[str, Any]) -> Dict[str, Any]:
+        """取消任务：撤销Celery任务、停止ComfyUI提示词、释放节点并持久化取消状态"""
+        task_id = task_info['task_id']
+        node_id = task_info.get('node_id')
+        prompt_id = task_info.get('prompt_id')
+
+        result = {'task_id': task_id, 'cancelled': False, 'prompt_action': None, 'removed_files': 0}
+
+        # 先持久化取消状态，执行中的任务轮询时据此停止，不再写入完成/失败状态；
+        # 任务已进入终态时更新不会生效，此时不能再清理其输出
+        from ..database.executor import run_sync
+        from ..database.task_status_manager import get_database_task_status_manager
+        if not await run_sync(get_database_task_status_manager().update_task_status, task_id, {
+            'status': 'cancelled',
+            'message': '任务已取消',
+            'completed_at': datetime.now()
+        }):
+            logger.warning(f"任务已结束，无法取消: {task_id}")
+            return result
+        result['cancelled'] = True
+
+        if task_info.get('celery_task_id'):
+            from ..queue.tasks import cancel_task
+            # 撤销需要连接消息代理，放到线程中执行
+            await run_sync(cancel_task, task_info['celery_task_id'])
+
+        if prompt_id:
+            result.update(await self.stop_prompt(prompt_id, node_id))
+
+        await self.release_node(node_id, task_id)
+
+        logger.info(f"任务已取消: {task_id} (提示词: {prompt_id}, 处理: {result['prompt_action']})")
+        return result
+
+
+# 全局任务取消器实例
+_task_canceller = None
+
+
+def get_task_canceller() -> TaskCanceller:
+    """获取全局任务取消器实例"""
+    global _task_canceller
+    if _task_canceller is None:
+        _task_canceller = TaskCanceller()
+    return _task_canceller
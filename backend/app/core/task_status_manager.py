@@ -5,7 +5,6 @@ import json
 import logging
 from datetime import datetime
 from typing import Dict, Any, Optional
-import redis
 
 logger = logging.getLogger(__name__)
 
@@ -14,6 +13,8 @@ class TaskStatusManager:
     """基于Redis的任务状态管理器"""
     
     def __init__(self, redis_host='localhost', redis_port=6379, redis_db=0):
+        import redis
+
         self.redis_client = redis.Redis(
             host=redis_host,
             port=redis_port,
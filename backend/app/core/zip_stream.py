@@ -0,0 +1,140 @@
+"""
+流式ZIP打包
+边读取边输出ZIP数据，不写临时文件：条目数据来自本地文件或节点代理流，
+zipfile写入只缓存当前块的输出缓冲，内存占用与归档大小无关。
+PNG、MP4等已压缩格式以存储方式（不再压缩）写入，其余格式使用deflate。
+"""
+import logging
+import os
+import time
+import zipfile
+from typing import AsyncIterator, Awaitable, Callable, Iterable, List, Optional, Tuple
+
+import anyio
+
+logger = logging.getLogger(__name__)
+
+# 已压缩的格式，不再重复压缩
+STORED_EXTENSIONS = (
+    '.png', '.jpg', '.jpeg', '.webp', '.gif', '.mp4', '.webm', '.mov', '.mkv', '.avi',
+    '.zip', '.gz', '.safetensors'
+)
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+class ZipSource:
+    """已打开的条目数据源"""
+
+    def __init__(self, chunks: AsyncIterator[bytes], size: Optional[int] = None, mtime: Optional[float] = None):
+        self.chunks = chunks
+        self.size = size
+        self.mtime = mtime if mtime is not None else time.time()
+
+
+# (归档内文件名, 打开数据源的协程函数；文件不可用时返回None)
+ZipEntry = Tuple[str, Callable[[], Awaitable[Optional[ZipSource]]]]
+
+
+class _StreamBuffer:
+    """zipfile的只写输出：写入的数据暂存到生成器取出为止（不支持seek，zipfile改用数据描述符）"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def compress_type_for(arcname: str) -> int:
+    """按扩展名选择压缩方式"""
+    if arcname.lower().endswith(STORED_EXTENSIONS):
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+async def open_local_file(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Optional[ZipSource]:
+    """以分块读取的方式打开本地文件"""
+    try:
+        stat_result = await anyio.to_thread.run_sync(os.stat, path)
+    except OSError:
+        return None
+
+    async def chunks():
+        async with await anyio.open_file(path, 'rb') as f:
+            while True:
+                chunk = await f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    return ZipSource(chunks(), stat_result.st_size, stat_result.st_mtime)
+
+
+async def open_node_file(file_proxy, node_url: str, filename: str, subfolder: str = '') -> Optional[ZipSource]:
+    """通过节点文件代理打开节点上的文件（不经过磁盘缓存）"""
+    upstream = await file_proxy.open(node_url, filename, subfolder)
+    if upstream is None:
+        return None
+    if upstream.status != 200:
+        upstream.release()
+        return None
+    return ZipSource(file_proxy.iter_body(upstream), upstream.content_length)
+
+
+async def stream_zip(entries: Iterable[ZipEntry], missing: Optional[List[str]] = None) -> AsyncIterator[bytes]:
+    """
+    按顺序打开各条目并输出ZIP数据块
+
+    无法打开的条目跳过，与调用方传入的missing一起写入归档末尾的 MISSING.txt；
+    条目传输中途失败时抛出异常中止响应，客户端收到的是不完整的归档。
+    """
+    buffer = _StreamBuffer()
+    missing = list(missing or [])
+    archive = zipfile.ZipFile(buffer, 'w')
+    try:
+        for arcname, opener in entries:
+            try:
+                source = await opener()
+            except Exception as e:
+                logger.warning(f"打开归档条目失败 [{arcname}]: {e}")
+                source = None
+            if source is None:
+                missing.append(arcname)
+                continue
+
+            info = zipfile.ZipInfo(arcname, date_time=time.localtime(max(source.mtime, 315619200))[:6])
+            info.compress_type = compress_type_for(arcname)
+            info.file_size = source.size or 0
+            # 大小未知时无法预判是否超过4GB，统一使用ZIP64本地头
+            force_zip64 = source.size is None
+            try:
+                with archive.open(info, 'w', force_zip64=force_zip64) as dest:
+                    async for chunk in source.chunks:
+                        dest.write(chunk)
+                        data = buffer.drain()
+                        if data:
+                            yield data
+            finally:
+                await source.chunks.aclose()
+            data = buffer.drain()
+            if data:
+                yield data
+
+        if missing:
+            archive.writestr('MISSING.txt', '\n'.join(missing) + '\n')
+        archive.close()
+        yield buffer.drain()
+    finally:
+        if archive.fp is not None:
+            # 中途中止时丢弃未输出的目录区
+            archive.fp = None
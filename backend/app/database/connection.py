@@ -2,6 +2,7 @@
 数据库连接管理器
 支持三数据库架构：客户端、管理端、共享数据库
 """
+import importlib.util
 import logging
 from typing import Dict, Any, Optional
 from sqlalchemy import create_engine, Engine, text
@@ -18,10 +19,13 @@ class DatabaseManager:
     def __init__(self):
         self.engines: Dict[str, Engine] = {}
         self.session_makers: Dict[str, sessionmaker] = {}
+        # 异步引擎（SQLAlchemy asyncio），供异步路由的热点查询使用；驱动未安装时为空
+        self.async_engines: Dict[str, Any] = {}
+        self.async_session_makers: Dict[str, Any] = {}
         self._initialized = False
     
-    def initialize(self, config: Dict[str, Any]):
-        """初始化数据库连接"""
+    def initialize(self, config: Dict[str, Any], use_async: bool = False):
+        """初始化数据库连接（use_async为True时同时创建异步引擎，仅API进程需要）"""
         try:
             mysql_config = config.get('mysql', {})
             
@@ -57,7 +61,10 @@ class DatabaseManager:
                 self.session_makers[db_name] = session_maker
                 
                 logger.info(f"数据库连接已初始化: {db_name} -> {db_config['database']}")
-            
+
+            if use_async:
+                self._initialize_async_engines(mysql_config)
+
             self._initialized = True
             logger.info("数据库管理器初始化完成")
             
@@ -65,7 +72,32 @@ class DatabaseManager:
             logger.error(f"数据库初始化失败: {e}")
             raise
     
-    def _build_database_url(self, config: Dict[str, Any]) -> str:
+    def _initialize_async_engines(self, mysql_config: Dict[str, Any]):
+        """创建异步引擎（异步驱动未安装时跳过，异步DAO回退为在线程池中执行同步查询）"""
+        driver = mysql_config.get('async_driver', 'aiomysql')
+        if not driver:
+            return
+        if importlib.util.find_spec(driver) is None:
+            logger.warning(f"异步数据库驱动 {driver} 未安装，异步路由中的数据库查询将在线程池中执行")
+            return
+
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+        for db_name in ['client', 'admin', 'shared']:
+            db_config = mysql_config[db_name]
+            engine = create_async_engine(
+                self._build_database_url(db_config, driver),
+                pool_size=db_config.get('async_pool_size', db_config.get('pool_size', 5)),
+                max_overflow=db_config.get('max_overflow', 10),
+                pool_timeout=db_config.get('pool_timeout', 30),
+                pool_recycle=db_config.get('pool_recycle', 3600),
+                pool_pre_ping=True
+            )
+            self.async_engines[db_name] = engine
+            self.async_session_makers[db_name] = async_sessionmaker(engine, expire_on_commit=False)
+        logger.info(f"异步数据库引擎已初始化 ({driver})")
+
+    def _build_database_url(self, config: Dict[str, Any], driver: str = 'pymysql') -> str:
         """构建数据库连接URL"""
         host = config.get('host', 'localhost')
         port = config.get('port', 3306)
@@ -74,7 +106,7 @@ class DatabaseManager:
         database = config.get('database', '')
         charset = config.get('charset', 'utf8mb4')
         
-        return f"mysql+pymysql://{user}:{password}@{host}:{port}/{database}?charset={charset}"
+        return f"mysql+{driver}://{user}:{password}@{host}:{port}/{database}?charset={charset}"
     
     def get_engine(self, db_name: str) -> Engine:
         """获取数据库引擎"""
@@ -116,6 +148,26 @@ class DatabaseManager:
         session_maker = self.get_session_maker(db_name)
         return session_maker()
     
+    def has_async_engine(self, db_name: str) -> bool:
+        """是否可以使用异步引擎访问该数据库"""
+        return db_name in self.async_session_makers
+
+    def get_async_session_direct(self, db_name: str):
+        """直接获取异步数据库会话（需要手动关闭）"""
+        if db_name not in self.async_session_makers:
+            raise ValueError(f"数据库没有可用的异步引擎: {db_name}")
+        return self.async_session_makers[db_name]()
+
+    async def close_async_engines(self):
+        """关闭所有异步引擎"""
+        for db_name, engine in self.async_engines.items():
+            try:
+                await engine.dispose()
+            except Exception as e:
+                logger.error(f"关闭异步数据库连接失败 [{db_name}]: {e}")
+        self.async_engines.clear()
+        self.async_session_makers.clear()
+
     def test_connections(self) -> Dict[str, bool]:
         """测试所有数据库连接"""
         results = {}
@@ -158,10 +210,10 @@ def get_database_manager() -> DatabaseManager:
     return _db_manager
 
 
-def initialize_database(config: Dict[str, Any]):
+def initialize_database(config: Dict[str, Any], use_async: bool = False):
     """初始化数据库连接"""
     db_manager = get_database_manager()
-    db_manager.initialize(config)
+    db_manager.initialize(config, use_async=use_async)
 
 
 # 便捷函数
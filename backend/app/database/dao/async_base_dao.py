@@ -0,0 +1,92 @@
+"""
+异步数据访问对象基类
+使用SQLAlchemy asyncio会话查询，供异步路由中的热点读取使用；
+数据库没有可用的异步引擎时（异步驱动未安装），在数据库线程池中执行对应的同步DAO方法。
+"""
+import logging
+from typing import Any, List, Optional, Type, TypeVar
+
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+
+from ..connection import get_database_manager
+from ..executor import run_sync
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class AsyncBaseDAO:
+    """异步数据访问对象基类"""
+
+    def __init__(self, db_name: str, model_class: Type[T], sync_dao=None):
+        self.db_name = db_name
+        self.model_class = model_class
+        self.db_manager = get_database_manager()
+        # 没有异步引擎时回退使用的同步DAO
+        self.sync_dao = sync_dao
+
+    @property
+    def is_async(self) -> bool:
+        """是否使用异步引擎查询"""
+        return self.db_manager.has_async_engine(self.db_name)
+
+    def get_session(self):
+        """获取异步数据库会话（调用方负责关闭，推荐 async with）"""
+        return self.db_manager.get_async_session_direct(self.db_name)
+
+    async def get_by_id(self, id_value: Any) -> Optional[T]:
+        """根据ID获取记录"""
+        if not self.is_async:
+            return await run_sync(self.sync_dao.get_by_id, id_value)
+        try:
+            async with self.get_session() as session:
+                result = await session.execute(
+                    select(self.model_class).where(self.model_class.id == id_value).limit(1)
+                )
+                return result.scalars().first()
+        except SQLAlchemyError as e:
+            logger.error(f"查询记录失败 [{self.model_class.__name__}]: {e}")
+            return None
+
+    async def get_by_field(self, field_name: str, field_value: Any) -> Optional[T]:
+        """根据字段获取记录"""
+        if not self.is_async:
+            return await run_sync(self.sync_dao.get_by_field, field_name, field_value)
+        try:
+            field = getattr(self.model_class, field_name)
+            async with self.get_session() as session:
+                result = await session.execute(select(self.model_class).where(field == field_value).limit(1))
+                return result.scalars().first()
+        except SQLAlchemyError as e:
+            logger.error(f"查询记录失败 [{self.model_class.__name__}]: {e}")
+            return None
+
+    async def get_all_by_field(self, field_name: str, values: List[Any]) -> List[T]:
+        """按字段批量获取记录（单次IN查询，按主键排序）"""
+        if not values:
+            return []
+        if not self.is_async:
+            return await run_sync(self._get_all_by_field_sync, field_name, values)
+        try:
+            field = getattr(self.model_class, field_name)
+            async with self.get_session() as session:
+                result = await session.execute(
+                    select(self.model_class).where(field.in_(values)).order_by(self.model_class.id)
+                )
+                return list(result.scalars().all())
+        except SQLAlchemyError as e:
+            logger.error(f"批量查询记录失败 [{self.model_class.__name__}]: {e}")
+            return []
+
+    def _get_all_by_field_sync(self, field_name: str, values: List[Any]) -> List[T]:
+        session = self.sync_dao.get_session()
+        try:
+            field = getattr(self.model_class, field_name)
+            return session.query(self.model_class).filter(field.in_(values)).order_by(self.model_class.id).all()
+        except SQLAlchemyError as e:
+            logger.error(f"批量查询记录失败 [{self.model_class.__name__}]: {e}")
+            return []
+        finally:
+            session.close()
@@ -0,0 +1,53 @@
+"""
+任务相关的异步数据访问对象
+覆盖异步路由中最频繁的读取：按task_id查询任务、批量查询已完成任务的结果
+"""
+import logging
+from typing import Dict, List, Optional
+
+from .async_base_dao import AsyncBaseDAO
+from .task_dao import GlobalTaskDAO, ClientTaskDAO
+from ..executor import run_sync
+from ..models.shared_models import GlobalTask, GlobalTaskResult
+from ..models.client_models import ClientTask, ClientTaskResult
+
+logger = logging.getLogger(__name__)
+
+
+class _AsyncTaskDAO(AsyncBaseDAO):
+    """任务表异步读取（全局任务与客户端任务结构相同）"""
+
+    def __init__(self, db_name: str, model_class, result_model_class, sync_dao):
+        super().__init__(db_name, model_class, sync_dao)
+        self.result_dao = AsyncBaseDAO(db_name, result_model_class, sync_dao)
+
+    async def get_task_by_task_id(self, task_id: str):
+        """根据task_id获取任务"""
+        if not self.is_async:
+            return await run_sync(self.sync_dao.get_task_by_task_id, task_id)
+        return await self.get_by_field('task_id', task_id)
+
+    async def get_results_by_task_ids(self, task_db_ids: List[int]) -> Dict[int, list]:
+        """按任务主键批量获取结果（单次IN查询），返回 {任务主键: [结果]}"""
+        if not task_db_ids:
+            return {}
+        if not self.is_async:
+            return await run_sync(self.sync_dao.get_results_by_task_ids, task_db_ids)
+        grouped: Dict[int, list] = {}
+        for result in await self.result_dao.get_all_by_field('task_id', task_db_ids):
+            grouped.setdefault(result.task_id, []).append(result)
+        return grouped
+
+
+class AsyncGlobalTaskDAO(_AsyncTaskDAO):
+    """全局任务异步数据访问对象"""
+
+    def __init__(self, sync_dao: Optional[GlobalTaskDAO] = None):
+        super().__init__('shared', GlobalTask, GlobalTaskResult, sync_dao or GlobalTaskDAO())
+
+
+class AsyncClientTaskDAO(_AsyncTaskDAO):
+    """客户端任务异步数据访问对象"""
+
+    def __init__(self, sync_dao: Optional[ClientTaskDAO] = None):
+        super().__init__('client', ClientTask, ClientTaskResult, sync_dao or ClientTaskDAO())
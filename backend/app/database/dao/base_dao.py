@@ -6,6 +6,7 @@ from typing import List, Optional, Dict, Any, Type, TypeVar
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 from ..connection import get_database_manager
+from ..unit_of_work import get_current_unit_of_work
 
 logger = logging.getLogger(__name__)
 
@@ -21,7 +22,14 @@ class BaseDAO:
         self.db_manager = get_database_manager()
     
     def get_session(self) -> Session:
-        """获取数据库会话"""
+        """获取数据库会话
+
+        处于工作单元中时返回共享会话（commit只flush，由工作单元统一提交），
+        否则返回独立会话
+        """
+        unit = get_current_unit_of_work()
+        if unit is not None:
+            return unit.session(self.db_name)
         return self.db_manager.get_session_direct(self.db_name)
     
     def create(self, **kwargs) -> Optional[T]:
@@ -1,20 +1,155 @@
 """
 任务相关数据访问对象
 """
+import json
 import logging
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy import and_, or_, desc
+from sqlalchemy import and_, or_, desc, case, bindparam, insert, select
 
 from .base_dao import BaseDAO
-from ..models.shared_models import GlobalTask, GlobalTaskParameter, GlobalTaskResult
+from ..models.shared_models import GlobalTask, GlobalTaskParameter, GlobalTaskResult, TaskOutbox
 from ..models.client_models import ClientTask, ClientTaskParameter, ClientTaskResult
 from ..connection import get_database_manager
 
 logger = logging.getLogger(__name__)
 
+# 终态：任务进入后不再接受状态更新
+TERMINAL_STATUSES = ('completed', 'failed', 'cancelled')
+
+
+def _status_update_statement(model, columns, check_version: bool = False):
+    """构建单表部分状态更新语句（参数以v_前缀绑定，可直接用于executemany）
+
+    - 只SET传入的列，version自增
+    - progress只增不减
+    - 终态记录不再更新，queued不能覆盖processing
+    - check_version时要求version等于expected_version参数
+    """
+    table = model.__table__
+    values = {column: bindparam(f"v_{column}") for column in columns if column != 'progress'}
+    if 'progress' in columns:
+        new_progress = bindparam('v_progress')
+        values['progress'] = case((table.c.progress > new_progress, table.c.progress), else_=new_progress)
+    values['version'] = table.c.version + 1
+
+    stmt = table.update().where(table.c.task_id == bindparam('k_task_id')).values(values)
+    for status in TERMINAL_STATUSES:
+        stmt = stmt.where(table.c.status != status)
+    if 'status' in columns:
+        stmt = stmt.where(or_(bindparam('v_status') != 'queued', table.c.status != 'processing'))
+    if check_version:
+        stmt = stmt.where(table.c.version == bindparam('expected_version'))
+    return stmt
+
+
+def _add_outbox_rows(session: Session, records: List[Dict[str, Any]], target: str = 'client'):
+    """在当前事务中写入发件箱记录，records中每项包含task_id和要同步的列"""
+    rows = [
+        {
+            'task_id': record['task_id'],
+            'target': target,
+            'payload': json.dumps({k: v for k, v in record.items() if k != 'task_id'},
+                                  ensure_ascii=False, default=lambda v: v.isoformat() if isinstance(v, datetime) else str(v))
+        }
+        for record in records if len(record) > 1
+    ]
+    if rows:
+        session.execute(TaskOutbox.__table__.insert(), rows)
+
+
+def _task_versions(session: Session, model, task_ids: List[str]) -> Dict[str, int]:
+    """读取任务当前的version（在调用方的事务中执行，可见本事务已执行的更新）"""
+    table = model.__table__
+    return dict(session.execute(
+        select(table.c.task_id, table.c.version).where(table.c.task_id.in_(task_ids))
+    ).all())
+
+
+def _execute_status_updates(dao: BaseDAO, records: List[Dict[str, Any]],
+                            expected_version: Optional[int] = None,
+                            outbox_records: Optional[List[Dict[str, Any]]] = None) -> int:
+    """执行部分状态更新，列集合相同的记录合并为一条executemany语句
+
+    outbox_records不为空时，在更新前后读取任务的version，只为version变化（实际更新）的任务
+    在同一事务中写入发件箱（被终态、进度或版本规则拒绝的更新不同步到另一个库），
+    发件箱记录携带本次的updated_at，中继应用时沿用，增量对账不会把中继写入的记录当作新的变更。
+    记录未指定updated_at时使用当前时间。返回实际更新的行数
+    """
+    now = datetime.now()
+    groups: Dict[tuple, List[Dict[str, Any]]] = {}
+    for record in records:
+        fields = {k: v for k, v in record.items() if k != 'task_id'}
+        fields.setdefault('updated_at', now)
+        params = {f"v_{k}": v for k, v in fields.items()}
+        params['k_task_id'] = record['task_id']
+        if expected_version is not None:
+            params['expected_version'] = expected_version
+        groups.setdefault(tuple(sorted(fields)), []).append(params)
+
+    session = dao.get_session()
+    try:
+        outbox_task_ids = list({record['task_id'] for record in outbox_records or []})
+        versions_before = _task_versions(session, dao.model_class, outbox_task_ids) if outbox_task_ids else {}
+
+        updated = 0
+        for columns, params_list in groups.items():
+            stmt = _status_update_statement(dao.model_class, columns, expected_version is not None)
+            if len(params_list) == 1:
+                updated += session.execute(stmt, params_list[0]).rowcount
+            else:
+                updated += session.execute(stmt, params_list).rowcount
+
+        if outbox_task_ids and updated:
+            versions_after = _task_versions(session, dao.model_class, outbox_task_ids)
+            updated_task_ids = {
+                task_id for task_id, version in versions_after.items()
+                if version != versions_before.get(task_id)
+            }
+            _add_outbox_rows(session, [dict(r, updated_at=now) for r in outbox_records
+                                       if r['task_id'] in updated_task_ids])
+        session.commit()
+        return updated
+    except SQLAlchemyError as e:
+        session.rollback()
+        logger.error(f"部分更新任务状态失败 [{dao.model_class.__name__}]: {e}")
+        return -1
+    finally:
+        session.close()
+
+
+def _parameter_rows(model, task_db_id: int, parameters: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """构建参数表批量插入的行（只保留参数表中存在的列）"""
+    columns = model.__table__.c
+    return [
+        dict({k: v for k, v in param.items() if k in columns}, task_id=task_db_id)
+        for param in parameters
+    ]
+
+
+def _query_task_page(query, model, status: Optional[str] = None, task_type: Optional[str] = None,
+                     limit: int = 50, cursor: Optional[tuple] = None, offset: int = 0):
+    """在SQL中完成状态/类型过滤与分页，按 (created_at, id) 倒序
+
+    cursor为上一页最后一条记录的 (created_at, id)，提供时使用键集分页并忽略offset
+    """
+    if status:
+        query = query.filter(model.status == status)
+    if task_type:
+        query = query.filter(model.task_type == task_type)
+    if cursor:
+        created_at, task_db_id = cursor
+        query = query.filter(or_(
+            model.created_at < created_at,
+            and_(model.created_at == created_at, model.id < task_db_id)
+        ))
+    query = query.order_by(desc(model.created_at), desc(model.id))
+    if offset and not cursor:
+        query = query.offset(offset)
+    return query.limit(limit).all()
+
 
 class GlobalTaskDAO(BaseDAO):
     """全局任务数据访问对象"""
@@ -30,14 +165,11 @@ class GlobalTaskDAO(BaseDAO):
             task = GlobalTask(**task_data)
             session.add(task)
             session.flush()  # 获取任务ID
-            
-            # 创建参数
+
+            # 参数行一次批量插入
             if parameters:
-                for param in parameters:
-                    param['task_id'] = task.id
-                    task_param = GlobalTaskParameter(**param)
-                    session.add(task_param)
-            
+                session.execute(insert(GlobalTaskParameter), _parameter_rows(GlobalTaskParameter, task.id, parameters))
+
             session.commit()
             session.refresh(task)
             return task
@@ -47,6 +179,74 @@ class GlobalTaskDAO(BaseDAO):
             return None
         finally:
             session.close()
+
+    def bulk_create_tasks(self, tasks: List[Dict[str, Any]]) -> bool:
+        """在单个事务中批量创建任务及其参数
+
+        tasks中每项为 {'task_data': {...}, 'parameters': [...]}
+        """
+        session = self.get_session()
+        try:
+            instances = []
+            for item in tasks:
+                task = GlobalTask(**item['task_data'])
+                task.parameters = [GlobalTaskParameter(**param) for param in item.get('parameters') or []]
+                instances.append(task)
+
+            session.add_all(instances)
+            session.commit()
+            return True
+        except SQLAlchemyError as e:
+            session.rollback()
+            logger.error(f"批量创建全局任务失败: {e}")
+            return False
+        finally:
+            session.close()
+
+    def bulk_update_status(self, task_ids: List[str], status_data: Dict[str, Any],
+                           replicate: Optional[Dict[str, Any]] = None) -> int:
+        """批量更新任务状态（遵守终态与进度单调规则，version自增），返回实际更新的行数
+
+        replicate为需要同步到客户端任务表的列，只为实际更新的任务在同一事务中写入发件箱
+        """
+        fields = {k: v for k, v in status_data.items() if k != 'updated_at'}
+        outbox_records = [dict(replicate, task_id=task_id) for task_id in task_ids] if replicate else None
+        updated = _execute_status_updates(
+            self, [dict(fields, task_id=task_id) for task_id in task_ids], outbox_records=outbox_records
+        )
+        return max(updated, 0)
+
+    def get_batch_tasks(self, batch_id: str, source_user_id: str = None) -> List[Dict[str, Any]]:
+        """根据批次ID获取批次内任务的状态摘要"""
+        session = self.get_session()
+        try:
+            query = session.query(
+                GlobalTask.task_id, GlobalTask.status, GlobalTask.progress,
+                GlobalTask.message, GlobalTask.error_message
+            ).join(
+                GlobalTaskParameter, GlobalTaskParameter.task_id == GlobalTask.id
+            ).filter(
+                GlobalTaskParameter.parameter_name == 'batch_id',
+                GlobalTaskParameter.parameter_value == batch_id
+            )
+            if source_user_id:
+                query = query.filter(GlobalTask.source_user_id == source_user_id)
+
+            return [
+                {
+                    'task_id': row.task_id,
+                    'status': row.status,
+                    'progress': float(row.progress) if row.progress else 0.0,
+                    'message': row.message,
+                    'error_message': row.error_message
+                }
+                for row in query.order_by(GlobalTask.id).all()
+            ]
+        except SQLAlchemyError as e:
+            logger.error(f"查询批次任务失败 [{batch_id}]: {e}")
+            return []
+        finally:
+            session.close()
     
     def get_task_by_task_id(self, task_id: str) -> Optional[GlobalTask]:
         """根据task_id获取任务"""
@@ -55,11 +255,66 @@ class GlobalTaskDAO(BaseDAO):
     def get_task_by_celery_id(self, celery_task_id: str) -> Optional[GlobalTask]:
         """根据celery_task_id获取任务"""
         return self.get_by_field('celery_task_id', celery_task_id)
+
+    def get_task_status_value(self, task_id: str) -> Optional[str]:
+        """只查询任务的status列，供执行中的任务轮询取消状态"""
+        session = self.get_session()
+        try:
+            row = session.query(GlobalTask.status).filter(GlobalTask.task_id == task_id).first()
+            return row[0] if row else None
+        except SQLAlchemyError as e:
+            logger.error(f"查询任务状态值失败: {e}")
+            return None
+        finally:
+            session.close()
     
-    def update_task_status(self, task_id: str, status_data: Dict[str, Any]) -> bool:
-        """更新任务状态"""
-        status_data['updated_at'] = datetime.now()
-        return self.update_by_field('task_id', task_id, **status_data)
+    def update_task_status(self, task_id: str, status_data: Dict[str, Any],
+                           replicate: Optional[Dict[str, Any]] = None) -> bool:
+        """更新任务状态
+
+        replicate为需要同步到客户端任务表的列，与更新在同一事务中写入发件箱
+        """
+        if not replicate:
+            status_data['updated_at'] = datetime.now()
+            return self.update_by_field('task_id', task_id, **status_data)
+
+        session = self.get_session()
+        try:
+            status_data['updated_at'] = datetime.now()
+            updated = session.query(GlobalTask).filter(
+                GlobalTask.task_id == task_id
+            ).update(status_data, synchronize_session=False)
+            if updated:
+                _add_outbox_rows(session, [dict(replicate, task_id=task_id)])
+            session.commit()
+            return updated > 0
+        except SQLAlchemyError as e:
+            session.rollback()
+            logger.error(f"更新全局任务状态失败 [{task_id}]: {e}")
+            return False
+        finally:
+            session.close()
+
+    def partial_update_status(self, task_id: str, fields: Dict[str, Any],
+                              expected_version: Optional[int] = None,
+                              replicate: Optional[Dict[str, Any]] = None) -> bool:
+        """单条UPDATE部分更新任务状态（只更新传入列，遵守终态与进度单调规则）
+
+        replicate为需要同步到客户端任务表的列，更新生效时在同一事务中写入发件箱。
+        返回False表示任务不存在、已是终态或版本号不匹配
+        """
+        outbox_records = [dict(replicate, task_id=task_id)] if replicate else None
+        return _execute_status_updates(
+            self, [dict(fields, task_id=task_id)], expected_version, outbox_records
+        ) == 1
+
+    def bulk_partial_update_status(self, records: List[Dict[str, Any]],
+                                   replicate_records: Optional[List[Dict[str, Any]]] = None) -> bool:
+        """批量部分更新任务状态，records中每项包含task_id和要更新的列
+
+        replicate_records为需要同步到客户端任务表的记录，与更新在同一事务中写入发件箱
+        """
+        return _execute_status_updates(self, records, outbox_records=replicate_records) >= 0
     
     def get_tasks_by_user(self, source_user_id: str, source_type: str = None, 
                          limit: int = 50, offset: int = 0) -> List[GlobalTask]:
@@ -79,6 +334,32 @@ class GlobalTaskDAO(BaseDAO):
         finally:
             session.close()
     
+    def get_tasks_page(self, source_user_id: str, source_type: str = None, status: str = None,
+                       task_type: str = None, limit: int = 50, cursor: Optional[tuple] = None,
+                       offset: int = 0) -> List[GlobalTask]:
+        """分页获取用户任务（过滤与键集分页均在SQL中完成）"""
+        session = self.get_session()
+        try:
+            model = self.model_class
+            query = session.query(model).filter(model.source_user_id == source_user_id)
+            if source_type:
+                query = query.filter(model.source_type == source_type)
+            return _query_task_page(query, model, status, task_type, limit, cursor, offset)
+        except SQLAlchemyError as e:
+            logger.error(f"分页查询用户任务失败: {e}")
+            return []
+        finally:
+            session.close()
+
+    def count_user_tasks(self, source_user_id: str, source_type: str = None,
+                         status: str = None, task_type: str = None) -> int:
+        """统计满足过滤条件的用户任务数"""
+        filters = {'source_user_id': source_user_id}
+        for field, value in (('source_type', source_type), ('status', status), ('task_type', task_type)):
+            if value:
+                filters[field] = value
+        return self.count(**filters)
+
     def get_tasks_by_status(self, status: str, limit: int = 100) -> List[GlobalTask]:
         """根据状态获取任务"""
         session = self.get_session()
@@ -154,6 +435,26 @@ class GlobalTaskDAO(BaseDAO):
         finally:
             session.close()
 
+    def get_results_by_task_ids(self, task_db_ids: List[int]) -> Dict[int, List[GlobalTaskResult]]:
+        """按任务主键批量获取结果（单次IN查询），返回 {任务主键: [结果]}"""
+        if not task_db_ids:
+            return {}
+        session = self.get_session()
+        try:
+            results = session.query(GlobalTaskResult).filter(
+                GlobalTaskResult.task_id.in_(task_db_ids)
+            ).order_by(GlobalTaskResult.id).all()
+
+            grouped: Dict[int, List[GlobalTaskResult]] = {}
+            for result in results:
+                grouped.setdefault(result.task_id, []).append(result)
+            return grouped
+        except SQLAlchemyError as e:
+            logger.error(f"批量查询全局任务结果失败: {e}")
+            return {}
+        finally:
+            session.close()
+
 
 class ClientTaskDAO(BaseDAO):
     """客户端任务数据访问对象"""
@@ -170,12 +471,9 @@ class ClientTaskDAO(BaseDAO):
             session.add(task)
             session.flush()  # 获取任务ID
 
-            # 创建参数
+            # 参数行一次批量插入
             if parameters:
-                for param in parameters:
-                    param['task_id'] = task.id
-                    task_param = ClientTaskParameter(**param)
-                    session.add(task_param)
+                session.execute(insert(ClientTaskParameter), _parameter_rows(ClientTaskParameter, task.id, parameters))
 
             session.commit()
             session.refresh(task)
@@ -187,6 +485,43 @@ class ClientTaskDAO(BaseDAO):
         finally:
             session.close()
 
+    def bulk_create_tasks(self, tasks: List[Dict[str, Any]]) -> bool:
+        """在单个事务中批量创建客户端任务及其参数"""
+        session = self.get_session()
+        try:
+            instances = []
+            for item in tasks:
+                task = ClientTask(**item['task_data'])
+                task.parameters = [ClientTaskParameter(**param) for param in item.get('parameters') or []]
+                instances.append(task)
+
+            session.add_all(instances)
+            session.commit()
+            return True
+        except SQLAlchemyError as e:
+            session.rollback()
+            logger.error(f"批量创建客户端任务失败: {e}")
+            return False
+        finally:
+            session.close()
+
+    def bulk_update_status(self, task_ids: List[str], status_data: Dict[str, Any]) -> int:
+        """批量更新客户端任务状态，返回更新行数"""
+        session = self.get_session()
+        try:
+            status_data['updated_at'] = datetime.now()
+            result = session.query(ClientTask).filter(
+                ClientTask.task_id.in_(task_ids)
+            ).update(status_data, synchronize_session=False)
+            session.commit()
+            return result
+        except SQLAlchemyError as e:
+            session.rollback()
+            logger.error(f"批量更新客户端任务状态失败: {e}")
+            return 0
+        finally:
+            session.close()
+
     def get_task_by_task_id(self, task_id: str) -> Optional[ClientTask]:
         """根据task_id获取任务"""
         return self.get_by_field('task_id', task_id)
@@ -196,6 +531,18 @@ class ClientTaskDAO(BaseDAO):
         status_data['updated_at'] = datetime.now()
         return self.update_by_field('task_id', task_id, **status_data)
 
+    def partial_update_status(self, task_id: str, fields: Dict[str, Any],
+                              expected_version: Optional[int] = None) -> bool:
+        """单条UPDATE部分更新任务状态（只更新传入列，遵守终态与进度单调规则）
+
+        返回False表示任务不存在、已是终态或版本号不匹配
+        """
+        return _execute_status_updates(self, [dict(fields, task_id=task_id)], expected_version) == 1
+
+    def bulk_partial_update_status(self, records: List[Dict[str, Any]]) -> bool:
+        """批量部分更新任务状态，records中每项包含task_id和要更新的列"""
+        return _execute_status_updates(self, records) >= 0
+
     def get_tasks_by_client(self, client_id: str, limit: int = 50, offset: int = 0) -> List[ClientTask]:
         """获取客户端的任务列表"""
         session = self.get_session()
@@ -209,6 +556,28 @@ class ClientTaskDAO(BaseDAO):
         finally:
             session.close()
 
+    def get_tasks_page(self, client_id: str, status: str = None, task_type: str = None,
+                       limit: int = 50, cursor: Optional[tuple] = None, offset: int = 0) -> List[ClientTask]:
+        """分页获取客户端任务（过滤与键集分页均在SQL中完成）"""
+        session = self.get_session()
+        try:
+            model = self.model_class
+            query = session.query(model).filter(model.client_id == client_id)
+            return _query_task_page(query, model, status, task_type, limit, cursor, offset)
+        except SQLAlchemyError as e:
+            logger.error(f"分页查询客户端任务失败: {e}")
+            return []
+        finally:
+            session.close()
+
+    def count_client_tasks(self, client_id: str, status: str = None, task_type: str = None) -> int:
+        """统计满足过滤条件的客户端任务数"""
+        filters = {'client_id': client_id}
+        for field, value in (('status', status), ('task_type', task_type)):
+            if value:
+                filters[field] = value
+        return self.count(**filters)
+
     def get_task_results(self, task_id: str) -> List[ClientTaskResult]:
         """获取任务结果"""
         session = self.get_session()
@@ -229,6 +598,26 @@ class ClientTaskDAO(BaseDAO):
         finally:
             session.close()
 
+    def get_results_by_task_ids(self, task_db_ids: List[int]) -> Dict[int, List[ClientTaskResult]]:
+        """按任务主键批量获取结果（单次IN查询），返回 {任务主键: [结果]}"""
+        if not task_db_ids:
+            return {}
+        session = self.get_session()
+        try:
+            results = session.query(ClientTaskResult).filter(
+                ClientTaskResult.task_id.in_(task_db_ids)
+            ).order_by(ClientTaskResult.id).all()
+
+            grouped: Dict[int, List[ClientTaskResult]] = {}
+            for result in results:
+                grouped.setdefault(result.task_id, []).append(result)
+            return grouped
+        except SQLAlchemyError as e:
+            logger.error(f"批量查询客户端任务结果失败: {e}")
+            return {}
+        finally:
+            session.close()
+
 
 class GlobalTaskResultDAO(BaseDAO):
     """全局任务结果数据访问对象"""
@@ -237,6 +626,92 @@ class GlobalTaskResultDAO(BaseDAO):
         from ..models.shared_models import GlobalTaskResult
         super().__init__('shared', GlobalTaskResult)
 
+    @staticmethod
+    def _load_metadata(metadata) -> Dict[str, Any]:
+        if isinstance(metadata, str):
+            metadata = json.loads(metadata)
+        return metadata or {}
+
+    def get_file_location(self, file_paths: List[str]) -> Optional[Dict[str, Any]]:
+        """按文件路径查询结果文件所在位置（result_metadata中的node_id、subfolder、filename）
+
+        已同步到主机的结果file_path为本地副本路径，原节点路径保存在node_file_path中，
+        此时返回值包含local_path
+        """
+        import os
+        session = self.get_session()
+        try:
+            file_names = {os.path.basename(path) for path in file_paths}
+            rows = session.query(
+                self.model_class.file_path, self.model_class.result_metadata
+            ).filter(or_(
+                self.model_class.file_path.in_(file_paths),
+                self.model_class.file_name.in_(file_names)
+            )).order_by(self.model_class.id.desc()).limit(50).all()
+
+            for file_path, metadata in rows:
+                metadata = self._load_metadata(metadata)
+                if not metadata.get('node_id'):
+                    continue
+                node_file_path = metadata.get('node_file_path')
+                if file_path not in file_paths and node_file_path not in file_paths:
+                    continue
+                location = {
+                    'node_id': metadata['node_id'],
+                    'subfolder': metadata.get('subfolder', ''),
+                    'filename': metadata.get('filename') or metadata.get('original_filename')
+                }
+                if node_file_path:
+                    location['local_path'] = file_path
+                return location
+            return None
+        except (SQLAlchemyError, ValueError) as e:
+            logger.error(f"查询结果文件位置失败: {e}")
+            return None
+        finally:
+            session.close()
+
+    def get_unsynced_node_results(self, after_id: int = 0, task_db_id: Optional[int] = None,
+                                  limit: int = 100) -> Tuple[List[Dict[str, Any]], int]:
+        """按ID顺序查询仍在节点上、尚未同步到主机的结果（返回的last_id用于下一批查询）"""
+        session = self.get_session()
+        try:
+            query = session.query(
+                self.model_class.id, self.model_class.task_id,
+                self.model_class.file_path, self.model_class.result_metadata
+            ).filter(self.model_class.id > after_id)
+            if task_db_id is not None:
+                query = query.filter(self.model_class.task_id == task_db_id)
+            rows = query.order_by(self.model_class.id).limit(limit).all()
+
+            results = []
+            for result_id, task_id, file_path, metadata in rows:
+                metadata = self._load_metadata(metadata)
+                if metadata.get('node_id') and not metadata.get('node_file_path'):
+                    results.append({
+                        'id': result_id,
+                        'task_db_id': task_id,
+                        'file_path': file_path,
+                        'result_metadata': metadata
+                    })
+            return results, (rows[-1][0] if rows else after_id)
+        except (SQLAlchemyError, ValueError) as e:
+            logger.error(f"查询待同步结果失败: {e}")
+            return [], after_id
+        finally:
+            session.close()
+
+    def set_thumbnail_path(self, file_path: str, thumbnail_path: str) -> bool:
+        """记录结果文件的缩略图路径"""
+        return self.update_by_field('file_path', file_path, thumbnail_path=thumbnail_path)
+
+    def mark_synced(self, result: Dict[str, Any], local_path: str) -> bool:
+        """结果文件已同步到主机：file_path改为本地副本，原节点路径记入元数据"""
+        import os
+        metadata = dict(result['result_metadata'], node_file_path=result['file_path'])
+        return self.update(result['id'], file_path=local_path, file_size=os.path.getsize(local_path),
+                           result_metadata=metadata)
+
 
 class ClientTaskResultDAO(BaseDAO):
     """客户端任务结果数据访问对象"""
@@ -290,3 +765,50 @@ class ClientTaskResultDAO(BaseDAO):
             return []
         finally:
             session.close()
+
+
+class TaskOutboxDAO(BaseDAO):
+    """任务状态发件箱数据访问对象"""
+
+    def __init__(self):
+        super().__init__('shared', TaskOutbox)
+
+    def fetch_batch(self, limit: int = 500, target: str = 'client') -> List[Dict[str, Any]]:
+        """按写入顺序获取一批待应用的发件箱记录"""
+        session = self.get_session()
+        try:
+            rows = session.query(TaskOutbox.id, TaskOutbox.task_id, TaskOutbox.payload).filter(
+                TaskOutbox.target == target
+            ).order_by(TaskOutbox.id).limit(limit).all()
+            return [{'id': row.id, 'task_id': row.task_id, 'payload': json.loads(row.payload)} for row in rows]
+        except SQLAlchemyError as e:
+            logger.error(f"获取发件箱记录失败: {e}")
+            return []
+        finally:
+            session.close()
+
+    def delete_ids(self, outbox_ids: List[int]) -> int:
+        """删除已应用的发件箱记录
+
+        按id逐条删除而不是按id范围删除：自增id的事务可能乱序提交，
+        范围删除会误删读取时尚未提交的记录
+        """
+        if not outbox_ids:
+            return 0
+        session = self.get_session()
+        try:
+            deleted = session.query(TaskOutbox).filter(
+                TaskOutbox.id.in_(outbox_ids)
+            ).delete(synchronize_session=False)
+            session.commit()
+            return deleted
+        except SQLAlchemyError as e:
+            session.rollback()
+            logger.error(f"删除发件箱记录失败: {e}")
+            return 0
+        finally:
+            session.close()
+
+    def count_pending(self, target: str = 'client') -> int:
+        """统计待应用的发件箱记录数"""
+        return self.count(target=target)
@@ -0,0 +1,88 @@
+"""
+同步数据库调用的有界线程池
+异步路由中仍需调用同步DAO（以及同步Redis客户端、Celery入队）时，通过run_sync放到专用线程池执行：
+线程数与数据库连接池容量匹配，超出的调用在线程池队列中等待，
+既不阻塞事件循环，也不会因并发过高而耗尽连接池后等待超时。
+"""
+import asyncio
+import contextvars
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class DatabaseExecutor:
+    """同步数据库调用线程池"""
+
+    def __init__(self, max_workers: int = 16):
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.max_pending = 0
+        self.completed = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='db')
+        return self._executor
+
+    async def run(self, func: Callable[..., T], *args, **kwargs) -> T:
+        """在线程池中执行同步调用（复制当前上下文变量，如工作单元）"""
+        loop = asyncio.get_running_loop()
+        call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+        with self._lock:
+            self._pending += 1
+            self.max_pending = max(self.max_pending, self._pending)
+        try:
+            return await loop.run_in_executor(self._get_executor(), call)
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self.completed += 1
+
+    def shutdown(self):
+        """关闭线程池（等待已提交的调用完成）"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def get_status(self) -> Dict[str, Any]:
+        """获取线程池状态"""
+        return {
+            'max_workers': self.max_workers,
+            'pending': self._pending,
+            'max_pending': self.max_pending,
+            'completed': self.completed
+        }
+
+
+# 全局数据库线程池实例
+_database_executor = None
+
+
+def get_database_executor() -> DatabaseExecutor:
+    """获取全局数据库线程池实例"""
+    global _database_executor
+    if _database_executor is None:
+        try:
+            from ..core.config_manager import get_config_manager
+            max_workers = get_config_manager().get_mysql_config().get('executor_threads', 16)
+        except Exception as e:
+            logger.warning(f"读取数据库线程池配置失败，使用默认值: {e}")
+            max_workers = 16
+        _database_executor = DatabaseExecutor(max_workers=max_workers)
+    return _database_executor
+
+
+async def run_sync(func: Callable[..., T], *args, **kwargs) -> T:
+    """在数据库线程池中执行同步调用"""
+    return await get_database_executor().run(func, *args, **kwargs)
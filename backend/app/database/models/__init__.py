@@ -33,6 +33,7 @@ __all__ = [
     'GlobalTaskResult',
     'NodeTaskAssignment',
     'GlobalFile',
+    'StorageStat',
     'TaskQueueStatus',
     'SystemStatistic',
 ]
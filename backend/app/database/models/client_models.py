@@ -67,6 +67,7 @@ class ClientTask(Base, TimestampMixin):
     actual_time = Column(Integer, comment='实际处理时间(秒)')
     started_at = Column(DateTime, comment='开始处理时间')
     completed_at = Column(DateTime, comment='完成时间')
+    version = Column(Integer, nullable=False, default=0, comment='乐观锁版本号')
     
     # 关系
     client_user = relationship("ClientUser")
@@ -80,6 +81,8 @@ class ClientTask(Base, TimestampMixin):
         Index('idx_status', 'status'),
         Index('idx_task_type', 'task_type'),
         Index('idx_created_at', 'created_at'),
+        Index('idx_client_created', 'client_id', 'created_at'),
+        Index('idx_updated_id', 'updated_at', 'id'),
     )
 
 
@@ -127,6 +130,7 @@ class ClientTaskResult(Base):
     __table_args__ = (
         Index('idx_task_id', 'task_id'),
         Index('idx_result_type', 'result_type'),
+        Index('idx_file_path', 'file_path', mysql_length=191),
     )
 
 
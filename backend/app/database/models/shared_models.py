@@ -1,7 +1,7 @@
 """
 共享数据库模型
 """
-from sqlalchemy import Column, BigInteger, String, Text, Integer, Boolean, DECIMAL, DateTime, ForeignKey, JSON, Index, Date
+from sqlalchemy import Column, BigInteger, String, Text, Integer, Boolean, DECIMAL, DateTime, ForeignKey, JSON, Index, Date, func
 from sqlalchemy.orm import relationship
 from .base import Base, TimestampMixin
 
@@ -37,10 +37,12 @@ class GlobalTask(Base, TimestampMixin):
     error_message = Column(Text, comment='错误消息')
     celery_task_id = Column(String(36), comment='Celery任务ID')
     node_id = Column(String(100), comment='执行节点ID')
+    prompt_id = Column(String(64), comment='ComfyUI提示词ID')
     estimated_time = Column(Integer, comment='预估处理时间(秒)')
     actual_time = Column(Integer, comment='实际处理时间(秒)')
     started_at = Column(DateTime, comment='开始处理时间')
     completed_at = Column(DateTime, comment='完成时间')
+    version = Column(Integer, nullable=False, default=0, comment='乐观锁版本号')
     
     # 关系
     parameters = relationship("GlobalTaskParameter", back_populates="task", cascade="all, delete-orphan")
@@ -57,9 +59,40 @@ class GlobalTask(Base, TimestampMixin):
         Index('idx_created_at', 'created_at'),
         Index('idx_node_id', 'node_id'),
         Index('idx_celery_task_id', 'celery_task_id'),
+        Index('idx_prompt_id', 'prompt_id'),
+        Index('idx_source_user_status_created', 'source_user_id', 'status', 'created_at'),
     )
 
 
+class TaskOutbox(Base):
+    """任务状态变更发件箱表
+
+    状态变更与全局任务更新在同一事务中写入，由中继批量应用到客户端任务表
+    """
+    __tablename__ = 'task_outbox'
+
+    id = Column(BigInteger().with_variant(Integer, 'sqlite'), primary_key=True, autoincrement=True)
+    task_id = Column(String(36), nullable=False, comment='任务UUID')
+    target = Column(String(20), nullable=False, default='client', comment='目标表')
+    payload = Column(Text, nullable=False, comment='变更字段JSON')
+    created_at = Column(DateTime, server_default=func.now(), comment='创建时间')
+
+    __table_args__ = (
+        Index('idx_task_id', 'task_id'),
+        {'mysql_engine': 'InnoDB'},
+    )
+
+
+class SyncWatermark(Base):
+    """数据同步水位表，记录增量同步已处理到的 (updated_at, id) 位置"""
+    __tablename__ = 'sync_watermarks'
+
+    name = Column(String(50), primary_key=True, comment='同步任务名称')
+    watermark_at = Column(DateTime, comment='已同步记录的最大更新时间')
+    watermark_id = Column(BigInteger, nullable=False, default=0, comment='同一更新时间内已同步的最大记录ID')
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), comment='更新时间')
+
+
 class GlobalTaskParameter(Base):
     """全局任务参数表"""
     __tablename__ = 'global_task_parameters'
@@ -107,6 +140,8 @@ class GlobalTaskResult(Base):
     __table_args__ = (
         Index('idx_task_id', 'task_id'),
         Index('idx_result_type', 'result_type'),
+        Index('idx_file_path', 'file_path', mysql_length=191),
+        Index('idx_file_name', 'file_name', mysql_length=191),
     )
 
 
@@ -156,6 +191,7 @@ class GlobalFile(Base, TimestampMixin):
     is_public = Column(Boolean, default=False, comment='是否公开')
     is_temporary = Column(Boolean, default=False, comment='是否临时文件')
     expires_at = Column(DateTime, comment='过期时间')
+    date_bucket = Column(Date, comment='日期分桶（存储统计按此汇总）')
     download_count = Column(Integer, default=0, comment='下载次数')
     
     # 索引
@@ -167,9 +203,22 @@ class GlobalFile(Base, TimestampMixin):
         Index('idx_file_hash', 'file_hash'),
         Index('idx_is_temporary', 'is_temporary'),
         Index('idx_expires_at', 'expires_at'),
+        Index('idx_file_path', 'file_path', mysql_length=191),
     )
 
 
+class StorageStat(Base):
+    """存储统计表，按 (来源, 日期分桶, 扩展名) 累计文件数与大小，随存储索引增删同步更新"""
+    __tablename__ = 'storage_stats'
+
+    source_type = Column(String(20), primary_key=True, comment='文件来源')
+    date_bucket = Column(Date, primary_key=True, comment='日期分桶')
+    extension = Column(String(20), primary_key=True, comment='扩展名')
+    file_count = Column(BigInteger, nullable=False, default=0, comment='文件数')
+    total_size = Column(BigInteger, nullable=False, default=0, comment='总大小(字节)')
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), comment='更新时间')
+
+
 class TaskQueueStatus(Base, TimestampMixin):
     """任务队列状态表（Redis备份）"""
     __tablename__ = 'task_queue_status'
@@ -0,0 +1,141 @@
+"""
+任务状态发件箱中继
+状态变更只写入全局任务表，并在同一事务中写入发件箱记录；
+中继按写入顺序读取一批发件箱记录，合并同一任务的多次变更后
+以批量部分更新应用到客户端任务表，成功后删除已应用的记录
+"""
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+from sqlalchemy import DateTime
+
+from .dao.task_dao import TaskOutboxDAO, ClientTaskDAO
+
+logger = logging.getLogger(__name__)
+
+
+class TaskOutboxRelay:
+    """发件箱中继：将全局任务的状态变更同步到客户端任务表"""
+
+    def __init__(self, outbox_dao: TaskOutboxDAO = None, client_task_dao: ClientTaskDAO = None,
+                 relay_interval: float = 1.0, batch_size: int = 500):
+        self.outbox_dao = outbox_dao or TaskOutboxDAO()
+        self.client_task_dao = client_task_dao or ClientTaskDAO()
+        self.relay_interval = relay_interval
+        self.batch_size = batch_size
+
+        self.relayed_count = 0
+        self.last_relay_time: Optional[datetime] = None
+
+        self._relay_thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+        self._start_lock = threading.Lock()
+
+    def _decode_fields(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """还原发件箱JSON中的日期时间字段"""
+        columns = self.client_task_dao.model_class.__table__.c
+        fields = {}
+        for field, value in payload.items():
+            if field in columns and isinstance(columns[field].type, DateTime) and isinstance(value, str):
+                value = datetime.fromisoformat(value)
+            fields[field] = value
+        return fields
+
+    def relay_once(self) -> int:
+        """应用一批发件箱记录，返回应用的记录数；写入失败时保留记录等待重试"""
+        rows = self.outbox_dao.fetch_batch(self.batch_size)
+        if not rows:
+            return 0
+
+        # 同一任务的多次变更按写入顺序合并为一条更新
+        merged: Dict[str, Dict[str, Any]] = {}
+        for row in rows:
+            merged.setdefault(row['task_id'], {}).update(row['payload'])
+
+        records = [dict(self._decode_fields(fields), task_id=task_id) for task_id, fields in merged.items()]
+        if not self.client_task_dao.bulk_partial_update_status(records):
+            logger.error(f"发件箱记录应用失败，等待重试: {len(rows)} 条")
+            return 0
+
+        self.outbox_dao.delete_ids([row['id'] for row in rows])
+        self.relayed_count += len(rows)
+        self.last_relay_time = datetime.now()
+        logger.debug(f"发件箱已同步到客户端任务表: {len(rows)} 条记录，{len(records)} 个任务")
+        return len(rows)
+
+    def relay_all(self) -> int:
+        """应用所有待处理的发件箱记录"""
+        total = 0
+        while True:
+            relayed = self.relay_once()
+            if not relayed:
+                return total
+            total += relayed
+
+    def notify(self):
+        """有新的发件箱记录时唤醒中继线程"""
+        self._wake_event.set()
+
+    def start(self):
+        """启动后台中继线程（每个进程一个，重复调用无副作用）"""
+        with self._start_lock:
+            if self._relay_thread and self._relay_thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._relay_thread = threading.Thread(
+                target=self._relay_loop, name="task-outbox-relay", daemon=True
+            )
+            self._relay_thread.start()
+            logger.info(f"发件箱中继线程已启动，间隔 {self.relay_interval}s")
+
+    def stop(self):
+        """停止中继线程并应用剩余记录"""
+        self._stop_event.set()
+        self._wake_event.set()
+        if self._relay_thread:
+            self._relay_thread.join(timeout=self.relay_interval + 5)
+            self._relay_thread = None
+        self.relay_all()
+
+    def _relay_loop(self):
+        while not self._stop_event.is_set():
+            self._wake_event.wait(self.relay_interval)
+            self._wake_event.clear()
+            try:
+                self.relay_all()
+            except Exception as e:
+                logger.error(f"发件箱中继异常: {e}")
+
+    def get_status(self) -> Dict[str, Any]:
+        """获取中继状态"""
+        return {
+            'is_running': bool(self._relay_thread and self._relay_thread.is_alive()),
+            'relay_interval': self.relay_interval,
+            'batch_size': self.batch_size,
+            'pending': self.outbox_dao.count_pending(),
+            'relayed_count': self.relayed_count,
+            'last_relay_time': self.last_relay_time.isoformat() if self.last_relay_time else None
+        }
+
+
+# 全局发件箱中继实例
+_task_outbox_relay = None
+_task_outbox_relay_lock = threading.Lock()
+
+
+def get_task_outbox_relay() -> TaskOutboxRelay:
+    """获取全局发件箱中继实例"""
+    global _task_outbox_relay
+    if _task_outbox_relay is None:
+        with _task_outbox_relay_lock:
+            if _task_outbox_relay is None:
+                from ..core.config_manager import get_config_manager
+                outbox_config = get_config_manager().get_task_queue_config().get('outbox', {}) or {}
+                _task_outbox_relay = TaskOutboxRelay(
+                    relay_interval=outbox_config.get('relay_interval', 1.0),
+                    batch_size=outbox_config.get('batch_size', 500)
+                )
+    return _task_outbox_relay
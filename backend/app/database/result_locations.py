@@ -0,0 +1,84 @@
+"""
+结果文件位置索引
+分布式模式下任务完成时记录每个输出文件所在的节点、子目录和文件名
+（保存在结果记录的result_metadata中），下载时直接向所属节点请求，
+不再逐个节点尝试；已同步到主机的结果附带本地副本路径local_path。
+查询结果缓存在进程内LRU中。
+"""
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def location_keys(file_path: str) -> List[str]:
+    """文件路径的两种分隔符写法（ComfyUI在Windows节点上使用反斜杠）"""
+    forward = file_path.replace('\\', '/')
+    backward = forward.replace('/', '\\')
+    return [forward] if forward == backward else [forward, backward]
+
+
+class ResultLocationIndex:
+    """结果文件位置索引：进程内LRU + 数据库结果记录"""
+
+    def __init__(self, result_dao=None, max_entries: int = 10000):
+        if result_dao is None:
+            from .dao.task_dao import GlobalTaskResultDAO
+            result_dao = GlobalTaskResultDAO()
+        self.result_dao = result_dao
+        self.max_entries = max_entries
+        self._cache: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, locations: List[Dict[str, Any]]):
+        """记录输出文件位置（持久化随结果记录写入，这里只预热本进程缓存）"""
+        for location in locations:
+            entry = {
+                'node_id': location['node_id'],
+                'subfolder': location.get('subfolder', ''),
+                'filename': location['filename']
+            }
+            if location.get('local_path'):
+                entry['local_path'] = location['local_path']
+            self._put(location['file_path'], entry)
+
+    def invalidate(self, file_path: str):
+        """移除缓存的位置（文件已同步到主机等情况下重新从数据库读取）"""
+        with self._lock:
+            self._cache.pop(location_keys(file_path)[0], None)
+
+    def lookup(self, file_path: str) -> Optional[Dict[str, Any]]:
+        """查询文件所在的节点，未记录时返回None"""
+        key = location_keys(file_path)[0]
+        with self._lock:
+            location = self._cache.get(key)
+            if location is not None:
+                self._cache.move_to_end(key)
+                return location
+
+        location = self.result_dao.get_file_location(location_keys(file_path))
+        if location:
+            self._put(key, location)
+        return location
+
+    def _put(self, file_path: str, location: Dict[str, Any]):
+        key = location_keys(file_path)[0]
+        with self._lock:
+            self._cache[key] = location
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+
+# 全局结果位置索引实例
+_result_location_index = None
+
+
+def get_result_location_index() -> ResultLocationIndex:
+    """获取全局结果文件位置索引实例"""
+    global _result_location_index
+    if _result_location_index is None:
+        _result_location_index = ResultLocationIndex()
+    return _result_location_index
@@ -0,0 +1,388 @@
+"""
+数据保留与归档
+访问日志、系统日志、性能指标按月RANGE分区（见 database/migrations 中的分区迁移）：
+保留任务预先创建未来月份的分区，将超出保留期的整个分区归档为JSONL.gz后直接DROP，
+不再执行锁表的大DELETE。尚未分区的表（或非MySQL数据库）按主键分批归档并删除。
+
+全局任务表的task_id唯一键被同步upsert和结果/参数表外键依赖，无法按时间分区，
+已结束的旧任务连同参数与结果按批归档后删除。
+输出文件按存储索引中的过期时间删除（见 storage_index）。
+"""
+import gzip
+import json
+import logging
+import os
+import threading
+from datetime import datetime, date, timedelta
+from decimal import Decimal
+from typing import Dict, Any, List, Optional, Tuple
+
+from sqlalchemy import text, select, delete, and_
+
+logger = logging.getLogger(__name__)
+
+# 按月分区的表：表名 -> (数据库, 分区列)
+PARTITIONED_TABLES = {
+    'client_access_logs': ('client', 'access_time'),
+    'system_logs': ('shared', 'created_at'),
+    'performance_metrics': ('shared', 'recorded_at'),
+}
+
+# 接收新数据的兜底分区，未来月份的分区从中拆分
+FUTURE_PARTITION = 'p_future'
+
+
+def month_start(value: datetime) -> datetime:
+    """所在月份的第一天零点"""
+    return datetime(value.year, value.month, 1)
+
+
+def add_months(value: datetime, months: int) -> datetime:
+    """月份加减（结果为当月第一天）"""
+    index = value.year * 12 + value.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: datetime) -> str:
+    """月份分区名，如 p202610 保存2026年10月的数据"""
+    return f"p{month:%Y%m}"
+
+
+def parse_partition_bound(description: Optional[str]) -> Optional[datetime]:
+    """解析 INFORMATION_SCHEMA.PARTITIONS.PARTITION_DESCRIPTION，MAXVALUE返回None"""
+    if not description or description.upper() == 'MAXVALUE':
+        return None
+    return datetime.fromisoformat(description.strip("'\""))
+
+
+def plan_future_partitions(partitions: List[Tuple[str, Optional[datetime]]], now: datetime,
+                           months_ahead: int) -> List[datetime]:
+    """计算需要从兜底分区中拆分出的月份（保证当前月之后months_ahead个月都有独立分区）"""
+    bounds = [bound for _, bound in partitions if bound is not None]
+    if not bounds:
+        return []
+    next_month = month_start(max(bounds))
+    last_month = add_months(month_start(now), months_ahead)
+    months = []
+    while next_month <= last_month:
+        months.append(next_month)
+        next_month = add_months(next_month, 1)
+    return months
+
+
+def expired_partitions(partitions: List[Tuple[str, Optional[datetime]]], cutoff: datetime) -> List[str]:
+    """上界不晚于截止时间的分区（其中所有数据都已超出保留期）"""
+    return [name for name, bound in partitions if bound is not None and bound <= cutoff]
+
+
+def reorganize_future_sql(table: str, months: List[datetime]) -> str:
+    """从兜底分区中拆分出新月份分区的DDL（兜底分区为空时只修改元数据）"""
+    definitions = [
+        f"PARTITION {partition_name(month)} VALUES LESS THAN ('{add_months(month, 1):%Y-%m-%d}')"
+        for month in months
+    ]
+    definitions.append(f"PARTITION {FUTURE_PARTITION} VALUES LESS THAN (MAXVALUE)")
+    return f"ALTER TABLE {table} REORGANIZE PARTITION {FUTURE_PARTITION} INTO ({', '.join(definitions)})"
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, bytes):
+        return value.decode('utf-8', errors='replace')
+    return str(value)
+
+
+class RetentionManager:
+    """数据保留管理器：维护月分区、归档并删除超出保留期的数据"""
+
+    def __init__(self, db_manager=None, archive_dir: str = 'archives', archive: bool = True,
+                 months_ahead: int = 3, table_retention: Dict[str, int] = None,
+                 task_retention_days: int = 180, batch_size: int = 1000, run_interval: float = 86400):
+        if db_manager is None:
+            from .connection import get_database_manager
+            db_manager = get_database_manager()
+        self.db_manager = db_manager
+        self.archive_dir = archive_dir
+        self.archive = archive
+        self.months_ahead = months_ahead
+        # 各分区表保留的月数
+        self.table_retention = table_retention or {
+            'client_access_logs': 3, 'system_logs': 6, 'performance_metrics': 1
+        }
+        self.task_retention_days = task_retention_days
+        self.batch_size = batch_size
+        self.run_interval = run_interval
+
+        self.last_run_time: Optional[datetime] = None
+        self.last_run_summary: Dict[str, Any] = {}
+
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    # ---------- 分区维护 ----------
+
+    def get_partitions(self, db_name: str, table: str) -> List[Tuple[str, Optional[datetime]]]:
+        """读取表的分区及其上界，未分区或非MySQL数据库返回空列表"""
+        engine = self.db_manager.get_engine(db_name)
+        if engine.dialect.name != 'mysql':
+            return []
+        with engine.connect() as conn:
+            rows = conn.execute(text(
+                "SELECT PARTITION_NAME, PARTITION_DESCRIPTION FROM INFORMATION_SCHEMA.PARTITIONS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND PARTITION_NAME IS NOT NULL "
+                "ORDER BY PARTITION_ORDINAL_POSITION"
+            ), {'table': table}).all()
+        return [(name, parse_partition_bound(description)) for name, description in rows]
+
+    def ensure_future_partitions(self, db_name: str, table: str, now: datetime = None,
+                                 partitions: List[Tuple[str, Optional[datetime]]] = None) -> List[str]:
+        """预先创建未来月份的分区，返回新建的分区名"""
+        partitions = self.get_partitions(db_name, table) if partitions is None else partitions
+        if not any(name == FUTURE_PARTITION for name, _ in partitions):
+            return []
+        months = plan_future_partitions(partitions, now or datetime.now(), self.months_ahead)
+        if not months:
+            return []
+        # 兜底分区已有数据时REORGANIZE需要逐行复制并长时间锁表（如迁移执行时间晚于分区上界），
+        # 不自动拆分，由运维在低峰期处理
+        if self.partition_has_rows(db_name, table, FUTURE_PARTITION):
+            logger.warning(f"{table}.{FUTURE_PARTITION} 中已有数据，跳过拆分未来分区，"
+                           f"请在低峰期手动执行: {reorganize_future_sql(table, months)}")
+            return []
+        with self.db_manager.get_engine(db_name).begin() as conn:
+            conn.execute(text(reorganize_future_sql(table, months)))
+        created = [partition_name(month) for month in months]
+        logger.info(f"已创建分区 {table}: {', '.join(created)}")
+        return created
+
+    def partition_has_rows(self, db_name: str, table: str, partition: str) -> bool:
+        """分区中是否有数据"""
+        with self.db_manager.get_engine(db_name).connect() as conn:
+            return conn.execute(text(f"SELECT 1 FROM {table} PARTITION ({partition}) LIMIT 1")).first() is not None
+
+    def archive_partition(self, db_name: str, table: str, partition: str) -> int:
+        """将整个分区流式写入归档文件后删除分区，返回归档的行数"""
+        engine = self.db_manager.get_engine(db_name)
+        archived = 0
+        if self.archive:
+            with engine.connect() as conn:
+                result = conn.execution_options(stream_results=True).execute(
+                    text(f"SELECT * FROM {table} PARTITION ({partition})")
+                )
+                archived = self._write_archive(db_name, table, partition, result.mappings())
+        with engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE {table} DROP PARTITION {partition}"))
+        logger.info(f"已删除过期分区 {table}.{partition}（归档 {archived} 行）")
+        return archived
+
+    # ---------- 归档文件 ----------
+
+    def _archive_path(self, db_name: str, table: str, name: str) -> str:
+        directory = os.path.join(self.archive_dir, db_name, table)
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, f"{name}.jsonl.gz")
+
+    def _write_archive(self, db_name: str, table: str, name: str, rows) -> int:
+        """将记录写入JSONL.gz归档（先写临时文件再重命名，中断时不会留下不完整的归档）"""
+        path = self._archive_path(db_name, table, name)
+        temp_path = f"{path}.tmp"
+        count = 0
+        with gzip.open(temp_path, 'wt', encoding='utf-8') as f:
+            for row in rows:
+                f.write(json.dumps(dict(row), ensure_ascii=False, default=_json_default))
+                f.write('\n')
+                count += 1
+        os.replace(temp_path, path)
+        return count
+
+    # ---------- 未分区表的分批删除 ----------
+
+    def purge_before(self, db_name: str, table, column: str, cutoff: datetime) -> int:
+        """按主键分批归档并删除早于截止时间的记录，每批一个短事务，返回删除的行数"""
+        engine = self.db_manager.get_engine(db_name)
+        time_column = table.c[column]
+        run_tag = datetime.now().strftime('%Y%m%d%H%M%S')
+        deleted = 0
+        while True:
+            with engine.begin() as conn:
+                rows = conn.execute(
+                    select(table).where(time_column < cutoff).order_by(table.c.id).limit(self.batch_size)
+                ).mappings().all()
+                if not rows:
+                    break
+                ids = [row['id'] for row in rows]
+                if self.archive:
+                    self._write_archive(db_name, table.name, f"{run_tag}_{ids[0]}-{ids[-1]}", rows)
+                deleted += conn.execute(delete(table).where(table.c.id.in_(ids))).rowcount
+            if len(rows) < self.batch_size:
+                break
+        if deleted:
+            logger.info(f"已清理 {table.name} 中早于 {cutoff} 的记录 {deleted} 条")
+        return deleted
+
+    # ---------- 全局任务归档 ----------
+
+    def archive_tasks(self, cutoff: datetime, task_table=None, child_tables=None) -> int:
+        """归档并删除在截止时间前已结束的全局任务（含参数、结果等子表记录），返回任务数"""
+        from .dao.task_dao import TERMINAL_STATUSES
+        if task_table is None:
+            from .models.shared_models import GlobalTask, GlobalTaskParameter, GlobalTaskResult, NodeTaskAssignment
+            task_table = GlobalTask.__table__
+            child_tables = {
+                'parameters': GlobalTaskParameter.__table__,
+                'results': GlobalTaskResult.__table__,
+                'node_assignments': NodeTaskAssignment.__table__,
+            }
+        child_tables = child_tables or {}
+
+        engine = self.db_manager.get_engine('shared')
+        run_tag = datetime.now().strftime('%Y%m%d%H%M%S')
+        archived = 0
+        last_id = 0
+        while True:
+            with engine.begin() as conn:
+                tasks = conn.execute(
+                    select(task_table).where(and_(
+                        task_table.c.id > last_id,
+                        task_table.c.status.in_(TERMINAL_STATUSES),
+                        task_table.c.updated_at < cutoff
+                    )).order_by(task_table.c.id).limit(self.batch_size)
+                ).mappings().all()
+                if not tasks:
+                    break
+                ids = [task['id'] for task in tasks]
+                last_id = ids[-1]
+
+                records = {task_id: dict(task) for task_id, task in zip(ids, tasks)}
+                for key, child in child_tables.items():
+                    for record in records.values():
+                        record[key] = []
+                    for row in conn.execute(select(child).where(child.c.task_id.in_(ids))).mappings():
+                        records[row['task_id']][key].append(dict(row))
+
+                if self.archive:
+                    self._write_archive('shared', task_table.name, f"{run_tag}_{ids[0]}-{ids[-1]}",
+                                        records.values())
+                for child in child_tables.values():
+                    conn.execute(delete(child).where(child.c.task_id.in_(ids)))
+                archived += conn.execute(delete(task_table).where(task_table.c.id.in_(ids))).rowcount
+            if len(tasks) < self.batch_size:
+                break
+        if archived:
+            logger.info(f"已归档 {cutoff} 之前结束的全局任务 {archived} 个")
+        return archived
+
+    # ---------- 保留任务 ----------
+
+    def _table_model(self, table: str):
+        from .models.client_models import ClientAccessLog
+        from .models.shared_models import SystemLog, PerformanceMetric
+        return {
+            'client_access_logs': ClientAccessLog,
+            'system_logs': SystemLog,
+            'performance_metrics': PerformanceMetric,
+        }[table]
+
+    def run(self, now: datetime = None) -> Dict[str, Any]:
+        """执行一次保留任务：维护分区、删除过期分区（未分区的表分批删除）、归档旧任务"""
+        now = now or datetime.now()
+        summary: Dict[str, Any] = {}
+        for table, (db_name, column) in PARTITIONED_TABLES.items():
+            retention_months = self.table_retention.get(table)
+            if not retention_months:
+                continue
+            cutoff = add_months(month_start(now), -retention_months)
+            try:
+                partitions = self.get_partitions(db_name, table)
+                if partitions:
+                    created = self.ensure_future_partitions(db_name, table, now, partitions)
+                    dropped = expired_partitions(partitions, cutoff)
+                    archived = sum(self.archive_partition(db_name, table, name) for name in dropped)
+                    summary[table] = {'created': created, 'dropped': dropped, 'archived_rows': archived}
+                else:
+                    deleted = self.purge_before(db_name, self._table_model(table).__table__, column, cutoff)
+                    summary[table] = {'deleted_rows': deleted}
+            except Exception as e:
+                logger.error(f"数据保留任务失败 [{table}]: {e}")
+                summary[table] = {'error': str(e)}
+
+        if self.task_retention_days:
+            try:
+                summary['global_tasks'] = {
+                    'archived_tasks': self.archive_tasks(now - timedelta(days=self.task_retention_days))
+                }
+            except Exception as e:
+                logger.error(f"全局任务归档失败: {e}")
+                summary['global_tasks'] = {'error': str(e)}
+
+        # 删除存储索引中已过期的输出文件（按expires_at索引范围扫描）
+        try:
+            from .storage_index import get_storage_index
+            storage_index = get_storage_index()
+            if storage_index:
+                summary['output_files'] = {'deleted_files': storage_index.purge_expired(now)}
+        except Exception as e:
+            logger.error(f"清理过期输出文件失败: {e}")
+            summary['output_files'] = {'error': str(e)}
+
+        self.last_run_time = now
+        self.last_run_summary = summary
+        return summary
+
+    def start(self):
+        """启动后台保留任务线程（重复调用无副作用）"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run_loop, name="data-retention", daemon=True)
+        self._thread.start()
+        logger.info(f"数据保留任务已启动，间隔 {self.run_interval}s")
+
+    def stop(self):
+        """停止后台保留任务线程"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                self.run()
+            except Exception as e:
+                logger.error(f"数据保留任务异常: {e}")
+            self._stop_event.wait(self.run_interval)
+
+    def get_status(self) -> Dict[str, Any]:
+        """获取保留任务状态"""
+        return {
+            'is_running': bool(self._thread and self._thread.is_alive()),
+            'run_interval': self.run_interval,
+            'last_run_time': self.last_run_time.isoformat() if self.last_run_time else None,
+            'last_run_summary': self.last_run_summary
+        }
+
+
+# 全局保留管理器实例
+_retention_manager = None
+
+
+def get_retention_manager() -> RetentionManager:
+    """获取全局数据保留管理器实例"""
+    global _retention_manager
+    if _retention_manager is None:
+        from ..core.config_manager import get_config_manager
+        retention_config = get_config_manager().get_config('retention') or {}
+        _retention_manager = RetentionManager(
+            archive_dir=retention_config.get('archive_dir', 'archives'),
+            archive=retention_config.get('archive', True),
+            months_ahead=retention_config.get('months_ahead', 3),
+            table_retention=retention_config.get('tables'),
+            task_retention_days=retention_config.get('task_retention_days', 180),
+            batch_size=retention_config.get('batch_size', 1000),
+            run_interval=retention_config.get('run_interval', 86400)
+        )
+    return _retention_manager
@@ -0,0 +1,236 @@
+"""
+任务状态写缓冲（write-behind）
+排队/处理中等中间状态写入每个任务的Redis哈希，由后台线程周期性地批量刷新到MySQL；
+完成/失败/取消等终态仍同步写入数据库。读取状态时合并数据库与缓冲中的数据
+"""
+import json
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Any, Optional, List, Callable, Iterable
+
+from .dao.task_dao import TERMINAL_STATUSES
+
+logger = logging.getLogger(__name__)
+
+# 允许缓冲的字段，其余字段（生成参数、结果数据等）走同步写入
+BUFFERED_FIELDS = {'status', 'progress', 'message', 'node_id', 'prompt_id', 'updated_at'}
+
+
+
+class TaskStatusBuffer:
+    """基于Redis哈希的任务状态写缓冲"""
+
+    def __init__(self, redis_client, flush_interval: float = 2.0, batch_size: int = 200,
+                 ttl: int = 86400, key_prefix: str = "comfyui:task_status:"):
+        self.redis_client = redis_client
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.ttl = ttl
+        self.key_prefix = key_prefix
+        self.dirty_key = f"{key_prefix}dirty"
+
+        self._flush_writer: Optional[Callable[[Dict[str, Dict[str, Any]]], bool]] = None
+        self._flush_thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._start_lock = threading.Lock()
+
+    def _get_key(self, task_id: str) -> str:
+        """获取Redis键名"""
+        return f"{self.key_prefix}{task_id}"
+
+    @staticmethod
+    def _decode(raw: Dict[str, str]) -> Dict[str, Any]:
+        return {field: json.loads(value) for field, value in raw.items()}
+
+    # ---------------- 写入 ----------------
+
+    def is_bufferable(self, updates: Dict[str, Any]) -> bool:
+        """判断更新是否可以缓冲：非终态且只包含进度类字段"""
+        return updates.get('status') not in TERMINAL_STATUSES and set(updates) <= BUFFERED_FIELDS
+
+    def write(self, task_id: str, updates: Dict[str, Any]) -> bool:
+        """写入缓冲：一次往返完成哈希更新、过期设置与脏标记"""
+        try:
+            mapping = {
+                field: json.dumps(value, ensure_ascii=False, default=str)
+                for field, value in updates.items() if field != 'updated_at'
+            }
+            mapping['updated_at'] = json.dumps(datetime.now().isoformat())
+
+            key = self._get_key(task_id)
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.hset(key, mapping=mapping)
+            pipe.expire(key, self.ttl)
+            pipe.sadd(self.dirty_key, task_id)
+            pipe.execute()
+            return True
+
+        except Exception as e:
+            logger.error(f"写入状态缓冲失败 [{task_id}]: {e}")
+            return False
+
+    def discard(self, task_id: str):
+        """丢弃任务的缓冲数据（终态已同步写入数据库）"""
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.delete(self._get_key(task_id))
+            pipe.srem(self.dirty_key, task_id)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"清理状态缓冲失败 [{task_id}]: {e}")
+
+    # ---------------- 读取 ----------------
+
+    def read(self, task_id: str) -> Dict[str, Any]:
+        """读取任务的缓冲数据"""
+        try:
+            return self._decode(self.redis_client.hgetall(self._get_key(task_id)))
+        except Exception as e:
+            logger.warning(f"读取状态缓冲失败 [{task_id}]: {e}")
+            return {}
+
+    def read_many(self, task_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """批量读取多个任务的缓冲数据（单次往返）"""
+        task_ids = list(task_ids)
+        if not task_ids:
+            return {}
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for task_id in task_ids:
+                pipe.hgetall(self._get_key(task_id))
+            return {
+                task_id: self._decode(raw)
+                for task_id, raw in zip(task_ids, pipe.execute()) if raw
+            }
+        except Exception as e:
+            logger.warning(f"批量读取状态缓冲失败: {e}")
+            return {}
+
+    def merge(self, task_dict: Dict[str, Any], buffered: Dict[str, Any]) -> Dict[str, Any]:
+        """将缓冲数据合并到数据库状态上，数据库已是终态时以数据库为准"""
+        if buffered and task_dict.get('status') not in TERMINAL_STATUSES:
+            task_dict.update(buffered)
+        return task_dict
+
+    # ---------------- 刷新 ----------------
+
+    def flush(self, writer: Callable[[Dict[str, Dict[str, Any]]], bool]) -> int:
+        """取出一批脏任务并交给writer批量写入数据库，返回刷新的任务数
+
+        writer失败时将任务重新标记为脏，等待下次刷新
+        """
+        try:
+            task_ids = self.redis_client.spop(self.dirty_key, self.batch_size) or []
+        except Exception as e:
+            logger.warning(f"获取待刷新任务失败: {e}")
+            return 0
+
+        if not task_ids:
+            return 0
+
+        updates = self.read_many(task_ids)
+        if not updates:
+            return 0
+
+        try:
+            ok = writer(updates)
+        except Exception as e:
+            logger.error(f"刷新状态缓冲失败: {e}")
+            ok = False
+
+        if not ok:
+            try:
+                self.redis_client.sadd(self.dirty_key, *updates.keys())
+            except Exception as e:
+                logger.error(f"重新标记待刷新任务失败: {e}")
+            return 0
+
+        logger.debug(f"状态缓冲已刷新到数据库: {len(updates)} 个任务")
+        return len(updates)
+
+    def flush_all(self, writer: Callable[[Dict[str, Dict[str, Any]]], bool]) -> int:
+        """刷新所有脏任务"""
+        total = 0
+        while True:
+            flushed = self.flush(writer)
+            if not flushed:
+                return total
+            total += flushed
+
+    def start(self, writer: Callable[[Dict[str, Dict[str, Any]]], bool]):
+        """启动后台刷新线程（每个进程一个，重复调用无副作用）"""
+        with self._start_lock:
+            if self._flush_thread and self._flush_thread.is_alive():
+                return
+            self._flush_writer = writer
+            self._stop_event.clear()
+            self._flush_thread = threading.Thread(
+                target=self._flush_loop, name="status-buffer-flush", daemon=True
+            )
+            self._flush_thread.start()
+            logger.info(f"状态缓冲刷新线程已启动，间隔 {self.flush_interval}s")
+
+    def stop(self):
+        """停止刷新线程并刷新剩余数据"""
+        self._stop_event.set()
+        if self._flush_thread:
+            self._flush_thread.join(timeout=self.flush_interval + 5)
+            self._flush_thread = None
+        if self._flush_writer:
+            self.flush_all(self._flush_writer)
+
+    def _flush_loop(self):
+        while not self._stop_event.wait(self.flush_interval):
+            self.flush_all(self._flush_writer)
+
+
+# 全局状态缓冲实例（Redis不可用或未启用时为None）
+_task_status_buffer = None
+_task_status_buffer_resolved = False
+_task_status_buffer_lock = threading.Lock()
+
+
+def get_task_status_buffer() -> Optional[TaskStatusBuffer]:
+    """获取任务状态写缓冲实例，未启用或Redis不可用时返回None（调用方回退到同步写入）"""
+    global _task_status_buffer, _task_status_buffer_resolved
+    if _task_status_buffer_resolved:
+        return _task_status_buffer
+
+    with _task_status_buffer_lock:
+        if _task_status_buffer_resolved:
+            return _task_status_buffer
+
+        try:
+            from ..core.config_manager import get_config_manager
+            config_manager = get_config_manager()
+            buffer_config = config_manager.get_task_queue_config().get('status_buffer', {}) or {}
+
+            if buffer_config.get('enabled', False):
+                import redis
+
+                redis_config = config_manager.get_redis_config()
+                redis_client = redis.Redis(
+                    host=redis_config.get('host', 'localhost'),
+                    port=redis_config.get('port', 6379),
+                    db=redis_config.get('db', 0),
+                    password=redis_config.get('password'),
+                    decode_responses=True,
+                    socket_connect_timeout=1,
+                    socket_timeout=2
+                )
+                redis_client.ping()
+
+                _task_status_buffer = TaskStatusBuffer(
+                    redis_client,
+                    flush_interval=buffer_config.get('flush_interval', 2.0),
+                    batch_size=buffer_config.get('batch_size', 200),
+                    ttl=buffer_config.get('ttl', 86400)
+                )
+                logger.info("任务状态写缓冲已启用")
+        except Exception as e:
+            logger.warning(f"任务状态写缓冲不可用，状态将同步写入数据库: {e}")
+            _task_status_buffer = None
+
+        _task_status_buffer_resolved = True
+        return _task_status_buffer
@@ -0,0 +1,214 @@
+"""
+任务状态读缓存（read-through）
+单个任务的状态文档（数据库中的任务字段与结果URL）序列化后缓存在Redis中，
+进行中的任务使用较短的过期时间，终态任务使用较长的过期时间；
+状态管理器的每条写路径都会使缓存失效。
+
+每个任务有一个代数计数器：失效时递增，回填缓存时通过WATCH确认代数未变，
+避免读取到旧数据的请求在写入失效之后把旧文档写回缓存
+"""
+import json
+import logging
+import threading
+import time
+from typing import Dict, Any, Optional, Callable, Iterable, Awaitable, Tuple
+
+from .dao.task_dao import TERMINAL_STATUSES
+
+logger = logging.getLogger(__name__)
+
+
+class TaskStatusCache:
+    """基于Redis的任务状态读缓存"""
+
+    def __init__(self, redis_client, active_ttl: int = 10, terminal_ttl: int = 3600,
+                 key_prefix: str = "comfyui:task_doc:"):
+        self.redis_client = redis_client
+        self.active_ttl = active_ttl
+        self.terminal_ttl = terminal_ttl
+        self.key_prefix = key_prefix
+
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'hits': 0, 'misses': 0, 'errors': 0, 'invalidations': 0,
+            'hit_time': 0.0, 'miss_time': 0.0
+        }
+
+    def _get_key(self, task_id: str) -> str:
+        """获取状态文档键名"""
+        return f"{self.key_prefix}{task_id}"
+
+    def _get_generation_key(self, task_id: str) -> str:
+        """获取代数计数器键名"""
+        return f"{self.key_prefix}gen:{task_id}"
+
+    def _record(self, name: str, elapsed: Optional[float] = None):
+        with self._stats_lock:
+            self._stats[name] += 1
+            if elapsed is not None:
+                self._stats['hit_time' if name == 'hits' else 'miss_time'] += elapsed
+
+    # ---------------- 读取 ----------------
+
+    def get(self, task_id: str, loader: Callable[[str], Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        """读取任务状态文档，未命中时调用loader从数据库加载并回填缓存
+
+        Redis异常时直接回退到loader；任务不存在（loader返回None）时不缓存
+        """
+        start = time.perf_counter()
+        try:
+            document, generation = self._peek(task_id)
+            if document is not None:
+                self._record('hits', time.perf_counter() - start)
+                return document
+        except Exception as e:
+            logger.warning(f"读取状态缓存失败 [{task_id}]: {e}")
+            self._record('errors')
+            return loader(task_id)
+
+        document = loader(task_id)
+        if document is not None:
+            self._store(task_id, document, generation)
+        self._record('misses', time.perf_counter() - start)
+        return document
+
+    async def get_async(self, task_id: str,
+                        loader: Callable[[str], Awaitable[Optional[Dict[str, Any]]]]) -> Optional[Dict[str, Any]]:
+        """异步读取任务状态文档（loader为协程函数），Redis调用在数据库线程池中执行"""
+        from .executor import run_sync
+
+        start = time.perf_counter()
+        try:
+            document, generation = await run_sync(self._peek, task_id)
+            if document is not None:
+                self._record('hits', time.perf_counter() - start)
+                return document
+        except Exception as e:
+            logger.warning(f"读取状态缓存失败 [{task_id}]: {e}")
+            self._record('errors')
+            return await loader(task_id)
+
+        document = await loader(task_id)
+        if document is not None:
+            await run_sync(self._store, task_id, document, generation)
+        self._record('misses', time.perf_counter() - start)
+        return document
+
+    def _peek(self, task_id: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """读取缓存，命中时返回 (文档, None)，未命中时返回 (None, 当前代数)"""
+        raw = self.redis_client.get(self._get_key(task_id))
+        if raw is not None:
+            return json.loads(raw), None
+        return None, self.redis_client.get(self._get_generation_key(task_id))
+
+    def _store(self, task_id: str, document: Dict[str, Any], generation: Optional[str]):
+        """代数未变时写入缓存，期间发生失效则放弃写入"""
+        from redis.exceptions import WatchError
+
+        ttl = self.terminal_ttl if document.get('status') in TERMINAL_STATUSES else self.active_ttl
+        generation_key = self._get_generation_key(task_id)
+        try:
+            with self.redis_client.pipeline() as pipe:
+                pipe.watch(generation_key)
+                if pipe.get(generation_key) != generation:
+                    return
+                pipe.multi()
+                pipe.set(self._get_key(task_id), json.dumps(document, ensure_ascii=False, default=str), ex=ttl)
+                pipe.execute()
+        except WatchError:
+            logger.debug(f"状态缓存回填时任务已更新，跳过: {task_id}")
+        except Exception as e:
+            logger.warning(f"写入状态缓存失败 [{task_id}]: {e}")
+            self._record('errors')
+
+    # ---------------- 失效 ----------------
+
+    def invalidate(self, task_id: str):
+        """使单个任务的缓存失效"""
+        self.invalidate_many([task_id])
+
+    def invalidate_many(self, task_ids: Iterable[str]):
+        """批量使任务缓存失效（单次往返）"""
+        task_ids = [task_id for task_id in task_ids if task_id]
+        if not task_ids:
+            return
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for task_id in task_ids:
+                generation_key = self._get_generation_key(task_id)
+                pipe.delete(self._get_key(task_id))
+                pipe.incr(generation_key)
+                pipe.expire(generation_key, self.terminal_ttl)
+            pipe.execute()
+            with self._stats_lock:
+                self._stats['invalidations'] += len(task_ids)
+        except Exception as e:
+            logger.error(f"清除状态缓存失败 {task_ids[:5]}: {e}")
+            self._record('errors')
+
+    # ---------------- 统计 ----------------
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取命中率与延迟统计（当前进程）"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        return {
+            'hits': stats['hits'],
+            'misses': stats['misses'],
+            'errors': stats['errors'],
+            'invalidations': stats['invalidations'],
+            'hit_ratio': round(stats['hits'] / lookups, 4) if lookups else 0.0,
+            'avg_hit_ms': round(stats['hit_time'] * 1000 / stats['hits'], 3) if stats['hits'] else 0.0,
+            'avg_miss_ms': round(stats['miss_time'] * 1000 / stats['misses'], 3) if stats['misses'] else 0.0
+        }
+
+
+# 全局状态缓存实例（Redis不可用或未启用时为None）
+_task_status_cache = None
+_task_status_cache_resolved = False
+_task_status_cache_lock = threading.Lock()
+
+
+def get_task_status_cache() -> Optional[TaskStatusCache]:
+    """获取任务状态读缓存实例，未启用或Redis不可用时返回None（调用方直接查询数据库）"""
+    global _task_status_cache, _task_status_cache_resolved
+    if _task_status_cache_resolved:
+        return _task_status_cache
+
+    with _task_status_cache_lock:
+        if _task_status_cache_resolved:
+            return _task_status_cache
+
+        try:
+            from ..core.config_manager import get_config_manager
+            config_manager = get_config_manager()
+            cache_config = config_manager.get_task_queue_config().get('status_cache', {}) or {}
+
+            if cache_config.get('enabled', False):
+                import redis
+
+                redis_config = config_manager.get_redis_config()
+                redis_client = redis.Redis(
+                    host=redis_config.get('host', 'localhost'),
+                    port=redis_config.get('port', 6379),
+                    db=redis_config.get('db', 0),
+                    password=redis_config.get('password'),
+                    decode_responses=True,
+                    socket_connect_timeout=1,
+                    socket_timeout=2
+                )
+                redis_client.ping()
+
+                _task_status_cache = TaskStatusCache(
+                    redis_client,
+                    active_ttl=cache_config.get('active_ttl', 10),
+                    terminal_ttl=cache_config.get('terminal_ttl', 3600)
+                )
+                logger.info("任务状态读缓存已启用")
+        except Exception as e:
+            logger.warning(f"任务状态读缓存不可用，状态查询将直接访问数据库: {e}")
+            _task_status_cache = None
+
+        _task_status_cache_resolved = True
+        return _task_status_cache
@@ -0,0 +1,428 @@
+"""
+输出文件存储索引
+输出文件写入时记录到全局文件表（global_files，来源为output：大小、类型、日期分桶、所属用户、过期时间），
+同时在存储统计表（storage_stats）中按 (来源, 日期分桶, 扩展名) 累加文件数与大小，删除时在同一事务中扣减。
+存储统计直接读取聚合行，过期清理按 expires_at 索引范围扫描，不再遍历整个输出目录并逐个stat。
+过期时间在写入时按保留期计算，临时文件使用更短的保留期；索引建立前已有的文件通过 rebuild 补录
+（逐批更新记录，重建期间索引和统计始终完整可读）。
+默认不设置保留期（输出文件不过期）；清理文件时同时删除引用这些文件的任务结果记录，
+任务不会继续返回指向已删除文件的结果。
+"""
+import glob
+import logging
+import mimetypes
+import os
+import re
+import uuid
+from collections import defaultdict
+from datetime import datetime, date, timedelta
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, delete, and_, true
+
+logger = logging.getLogger(__name__)
+
+# 输出文件在全局文件表中的来源
+OUTPUT_SOURCE_TYPE = 'output'
+
+# 缩略图随原图生成和删除，不单独索引
+_THUMBNAIL_PATTERN = re.compile(r'_thumb_\d+\.webp$', re.IGNORECASE)
+
+
+def file_category(mime_type: str) -> str:
+    """按MIME类型归类文件类型"""
+    major = mime_type.split('/', 1)[0]
+    return major if major in ('image', 'video', 'audio') else 'other'
+
+
+def storage_key(file_path: str) -> str:
+    """索引中保存的文件路径（绝对路径、正斜杠）"""
+    return os.path.abspath(file_path).replace('\\', '/')
+
+
+class StorageIndex:
+    """输出文件存储索引"""
+
+    def __init__(self, db_manager=None, root_dir: Optional[str] = None, retention_days: int = 0,
+                 temporary_retention_hours: int = 24, batch_size: int = 500,
+                 source_type: str = OUTPUT_SOURCE_TYPE):
+        if db_manager is None:
+            from .connection import get_database_manager
+            db_manager = get_database_manager()
+        if root_dir is None:
+            from ..utils.path_utils import get_output_dir
+            root_dir = get_output_dir()
+        self.db_manager = db_manager
+        self.root_dir = os.path.abspath(root_dir)
+        # 0表示不过期
+        self.retention_days = retention_days
+        self.temporary_retention_hours = temporary_retention_hours
+        self.batch_size = batch_size
+        self.source_type = source_type
+
+    @property
+    def file_table(self):
+        from .models.shared_models import GlobalFile
+        return GlobalFile.__table__
+
+    @property
+    def stat_table(self):
+        from .models.shared_models import StorageStat
+        return StorageStat.__table__
+
+    @property
+    def result_tables(self) -> List[Tuple[str, Any]]:
+        """引用输出文件的任务结果表：(数据库, 表)"""
+        from .models.client_models import ClientTaskResult
+        from .models.shared_models import GlobalTaskResult
+        return [('shared', GlobalTaskResult.__table__), ('client', ClientTaskResult.__table__)]
+
+    def _engine(self):
+        return self.db_manager.get_engine('shared')
+
+    def expires_at_for(self, written_at: datetime, is_temporary: bool = False) -> Optional[datetime]:
+        """按写入时间和保留期计算过期时间"""
+        if is_temporary and self.temporary_retention_hours:
+            return written_at + timedelta(hours=self.temporary_retention_hours)
+        if self.retention_days:
+            return written_at + timedelta(days=self.retention_days)
+        return None
+
+    # ---------- 写入与删除 ----------
+
+    def _entry(self, file_path: str, owner: Optional[str], is_temporary: bool) -> Optional[Dict[str, Any]]:
+        """读取文件信息生成索引记录，文件不存在时返回None（写入时间取文件修改时间）"""
+        try:
+            stat_result = os.stat(file_path)
+        except OSError:
+            logger.debug(f"文件不存在，跳过索引: {file_path}")
+            return None
+        written_at = datetime.fromtimestamp(stat_result.st_mtime)
+        file_name = os.path.basename(file_path)
+        mime_type = mimetypes.guess_type(file_name)[0] or 'application/octet-stream'
+        return {
+            'file_id': str(uuid.uuid4()),
+            'source_type': self.source_type,
+            'source_user_id': owner,
+            'original_name': file_name,
+            'file_name': file_name,
+            'file_path': storage_key(file_path),
+            'file_size': stat_result.st_size,
+            'mime_type': mime_type,
+            'file_type': file_category(mime_type),
+            'is_public': False,
+            'is_temporary': is_temporary,
+            'expires_at': self.expires_at_for(written_at, is_temporary),
+            'date_bucket': written_at.date(),
+            'download_count': 0,
+            'created_at': written_at,
+            'updated_at': written_at
+        }
+
+    def add(self, file_paths: Iterable[str], owner: Optional[str] = None, is_temporary: bool = False) -> int:
+        """记录新写入的文件（同一路径已记录时替换原记录），返回记录的文件数"""
+        entries = [entry for entry in (self._entry(path, owner, is_temporary) for path in file_paths) if entry]
+        if not entries:
+            return 0
+        try:
+            with self._engine().begin() as conn:
+                self._delete_rows(conn, self._select_by_paths(conn, [entry['file_path'] for entry in entries]))
+                conn.execute(self.file_table.insert(), entries)
+                self._apply_stats(conn, [(entry['date_bucket'], entry['file_name'], entry['file_size'])
+                                         for entry in entries], 1)
+            return len(entries)
+        except Exception as e:
+            logger.error(f"记录存储索引失败: {e}")
+            return 0
+
+    def remove(self, file_paths: Iterable[str]) -> int:
+        """移除已删除文件的索引记录（不删除文件），返回移除的记录数"""
+        keys = [storage_key(path) for path in file_paths]
+        if not keys:
+            return 0
+        try:
+            with self._engine().begin() as conn:
+                return self._delete_rows(conn, self._select_by_paths(conn, keys))
+        except Exception as e:
+            logger.error(f"移除存储索引失败: {e}")
+            return 0
+
+    def _row_columns(self):
+        table = self.file_table
+        return table.c.id, table.c.file_path, table.c.file_name, table.c.file_size, table.c.date_bucket
+
+    def _select_by_paths(self, conn, keys: List[str]) -> List[Any]:
+        table = self.file_table
+        return conn.execute(
+            select(*self._row_columns()).where(and_(
+                table.c.source_type == self.source_type,
+                table.c.file_path.in_(keys)
+            ))
+        ).all()
+
+    def _select_by_ids(self, conn, ids: List[int]) -> List[Any]:
+        return conn.execute(select(*self._row_columns()).where(self.file_table.c.id.in_(ids))).all()
+
+    def _select_batch(self, condition, last_id: int) -> List[Any]:
+        """按ID顺序读取一批满足条件的记录（不持有事务）"""
+        table = self.file_table
+        with self._engine().connect() as conn:
+            return conn.execute(
+                select(*self._row_columns()).where(and_(
+                    table.c.source_type == self.source_type,
+                    condition,
+                    table.c.id > last_id
+                )).order_by(table.c.id).limit(self.batch_size)
+            ).all()
+
+    def _delete_rows_by_ids(self, ids: List[int]) -> int:
+        """在短事务中删除仍存在的记录并扣减统计（读取与删除之间被替换的记录不重复扣减）"""
+        if not ids:
+            return 0
+        with self._engine().begin() as conn:
+            return self._delete_rows(conn, self._select_by_ids(conn, ids))
+
+    def _delete_rows(self, conn, rows: List[Any]) -> int:
+        """删除索引记录并扣减存储统计（在调用方的事务中执行）"""
+        if not rows:
+            return 0
+        conn.execute(delete(self.file_table).where(self.file_table.c.id.in_([row.id for row in rows])))
+        self._apply_stats(conn, [(row.date_bucket, row.file_name, row.file_size) for row in rows], -1)
+        return len(rows)
+
+    def _apply_stats(self, conn, files: List[Tuple[Optional[date], str, int]], sign: int):
+        """按 (日期分桶, 扩展名) 累加或扣减存储统计
+
+        MySQL使用 INSERT ... ON DUPLICATE KEY UPDATE，SQLite使用 ON CONFLICT DO UPDATE
+        """
+        deltas: Dict[Tuple[date, str], List[int]] = defaultdict(lambda: [0, 0])
+        for date_bucket, file_name, file_size in files:
+            key = (date_bucket or date(1970, 1, 1), os.path.splitext(file_name)[1].lower()[:20])
+            deltas[key][0] += sign
+            deltas[key][1] += sign * (file_size or 0)
+        rows = [
+            {'source_type': self.source_type, 'date_bucket': date_bucket, 'extension': extension,
+             'file_count': count, 'total_size': size}
+            for (date_bucket, extension), (count, size) in deltas.items()
+        ]
+
+        table = self.stat_table
+        if conn.dialect.name == 'mysql':
+            from sqlalchemy.dialects.mysql import insert
+            stmt = insert(table).values(rows)
+            stmt = stmt.on_duplicate_key_update(
+                file_count=table.c.file_count + stmt.inserted.file_count,
+                total_size=table.c.total_size + stmt.inserted.total_size
+            )
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+            stmt = insert(table).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['source_type', 'date_bucket', 'extension'],
+                set_={
+                    'file_count': table.c.file_count + stmt.excluded.file_count,
+                    'total_size': table.c.total_size + stmt.excluded.total_size
+                }
+            )
+        conn.execute(stmt)
+
+    # ---------- 统计 ----------
+
+    def get_stats(self) -> Dict[str, Any]:
+        """读取存储统计（按日期分桶与扩展名汇总，结构与遍历输出目录的统计相同）"""
+        stats = {'total_files': 0, 'total_size': 0, 'by_date': {}, 'by_type': {}}
+        table = self.stat_table
+        with self._engine().connect() as conn:
+            rows = conn.execute(
+                select(table.c.date_bucket, table.c.extension, table.c.file_count, table.c.total_size).where(and_(
+                    table.c.source_type == self.source_type,
+                    table.c.file_count > 0
+                )).order_by(table.c.date_bucket)
+            ).all()
+
+        for row in rows:
+            stats['total_files'] += row.file_count
+            stats['total_size'] += row.total_size
+            for group, key in (('by_date', row.date_bucket.strftime('%Y/%m/%d')), ('by_type', row.extension)):
+                bucket = stats[group].setdefault(key, {'files': 0, 'size': 0})
+                bucket['files'] += row.file_count
+                bucket['size'] += row.total_size
+        return stats
+
+    # ---------- 过期清理 ----------
+
+    def purge_expired(self, now: Optional[datetime] = None) -> int:
+        """删除过期（expires_at已到）的文件及其索引记录，返回删除的文件数"""
+        now = now or datetime.now()
+        deleted = self._purge(self.file_table.c.expires_at <= now)
+        if deleted:
+            logger.info(f"已清理过期输出文件 {deleted} 个")
+        return deleted
+
+    def purge_older_than(self, days: int, now: Optional[datetime] = None) -> int:
+        """删除日期分桶早于指定天数的文件及其索引记录（不考虑过期时间），返回删除的文件数"""
+        now = now or datetime.now()
+        deleted = self._purge(self.file_table.c.date_bucket < (now - timedelta(days=days)).date())
+        if deleted:
+            logger.info(f"已清理 {days} 天前的输出文件 {deleted} 个")
+        return deleted
+
+    def _purge(self, condition) -> int:
+        """
+        按索引范围扫描分批清理：读取一批记录后在事务外删除文件，
+        再在一个短事务中删除记录并扣减统计，文件IO期间不持有数据库事务
+        """
+        deleted = 0
+        last_id = 0
+        while True:
+            rows = self._select_batch(condition, last_id)
+            if not rows:
+                break
+            last_id = rows[-1].id
+            removed = [row for row in rows if self._remove_file(row.file_path)]
+            deleted += self._delete_rows_by_ids([row.id for row in removed])
+            self._clear_results([row.file_path for row in removed])
+            if len(rows) < self.batch_size:
+                break
+        return deleted
+
+    def _clear_results(self, keys: List[str]) -> int:
+        """删除引用已清理文件的任务结果记录，返回删除的记录数
+
+        结果记录中的路径是写入时的原始路径（通常相对于工作目录），按绝对路径和相对路径两种形式匹配
+        """
+        if not keys:
+            return 0
+        paths = set(keys)
+        for key in keys:
+            try:
+                paths.add(os.path.relpath(key).replace('\\', '/'))
+            except ValueError:
+                # Windows下文件与工作目录不在同一驱动器
+                pass
+
+        cleared = 0
+        for db_name, table in self.result_tables:
+            try:
+                with self.db_manager.get_engine(db_name).begin() as conn:
+                    cleared += conn.execute(delete(table).where(table.c.file_path.in_(paths))).rowcount
+            except Exception as e:
+                logger.error(f"删除已清理文件的结果记录失败 [{db_name}]: {e}")
+        if cleared:
+            logger.info(f"已删除引用已清理文件的结果记录 {cleared} 条")
+        return cleared
+
+    def _remove_file(self, file_path: str) -> bool:
+        """删除文件及其缩略图，文件已不存在也视为成功；删除后清理空目录"""
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error(f"删除文件失败 [{file_path}]: {e}")
+            return False
+
+        name = os.path.splitext(file_path)[0]
+        for thumbnail in glob.glob(f"{glob.escape(name)}_thumb_*.webp"):
+            try:
+                os.remove(thumbnail)
+            except OSError:
+                pass
+
+        directory = os.path.dirname(os.path.abspath(file_path))
+        while directory.startswith(self.root_dir + os.sep):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                break
+            directory = os.path.dirname(directory)
+        return True
+
+    # ---------- 补录 ----------
+
+    def rebuild(self, exclude_dirs: Iterable[str] = ('cache',)) -> int:
+        """
+        按输出目录重新建立索引：遍历一次输出目录，返回索引的文件数
+
+        用于启用索引前已有的文件或索引与磁盘不一致时，跳过隐藏目录（暂存目录）、
+        exclude_dirs 中的顶层目录（节点文件缓存，自行按LRU淘汰）和缩略图。
+        不预先清空索引：逐批补录或更新变化的记录，最后删除磁盘上已不存在的文件的记录，
+        重建期间统计与清理照常读取完整的索引。
+        """
+        excluded = {os.path.join(self.root_dir, name) for name in exclude_dirs}
+        indexed = 0
+        batch: List[str] = []
+        for root, dirs, filenames in os.walk(self.root_dir):
+            dirs[:] = [d for d in dirs if not d.startswith('.') and os.path.join(root, d) not in excluded]
+            for filename in filenames:
+                if filename.startswith('.') or _THUMBNAIL_PATTERN.search(filename):
+                    continue
+                batch.append(os.path.join(root, filename))
+                if len(batch) >= self.batch_size:
+                    indexed += self._sync_paths(batch)
+                    batch = []
+        if batch:
+            indexed += self._sync_paths(batch)
+        removed = self._remove_missing()
+        logger.info(f"存储索引已重建: {indexed} 个文件，移除 {removed} 条失效记录")
+        return indexed
+
+    def _sync_paths(self, file_paths: List[str]) -> int:
+        """补录一批文件：已有记录且大小、日期分桶未变时保留原记录（所属用户与过期时间不变），否则新增或替换"""
+        entries = [entry for entry in (self._entry(path, None, False) for path in file_paths) if entry]
+        if not entries:
+            return 0
+        try:
+            with self._engine().begin() as conn:
+                existing = {row.file_path: row for row in
+                            self._select_by_paths(conn, [entry['file_path'] for entry in entries])}
+                changed = [
+                    entry for entry in entries
+                    if entry['file_path'] not in existing
+                    or (existing[entry['file_path']].file_size, existing[entry['file_path']].date_bucket)
+                    != (entry['file_size'], entry['date_bucket'])
+                ]
+                if changed:
+                    self._delete_rows(conn, [existing[entry['file_path']] for entry in changed
+                                             if entry['file_path'] in existing])
+                    conn.execute(self.file_table.insert(), changed)
+                    self._apply_stats(conn, [(entry['date_bucket'], entry['file_name'], entry['file_size'])
+                                             for entry in changed], 1)
+            return len(entries)
+        except Exception as e:
+            logger.error(f"补录存储索引失败: {e}")
+            return 0
+
+    def _remove_missing(self) -> int:
+        """分批删除磁盘上已不存在的文件的记录，返回删除的记录数"""
+        removed = 0
+        last_id = 0
+        while True:
+            rows = self._select_batch(true(), last_id)
+            if not rows:
+                break
+            last_id = rows[-1].id
+            removed += self._delete_rows_by_ids([row.id for row in rows if not os.path.exists(row.file_path)])
+            if len(rows) < self.batch_size:
+                break
+        return removed
+
+
+# 全局存储索引实例
+_storage_index = None
+
+
+def get_storage_index() -> Optional[StorageIndex]:
+    """获取全局存储索引实例，未启用时返回None（调用方回退到遍历输出目录）"""
+    global _storage_index
+    if _storage_index is None:
+        from ..core.config_manager import get_config_manager
+        index_config = get_config_manager().get_config('storage_index') or {}
+        if not index_config.get('enabled', True):
+            return None
+        _storage_index = StorageIndex(
+            retention_days=index_config.get('retention_days', 0),
+            temporary_retention_hours=index_config.get('temporary_retention_hours', 24),
+            batch_size=index_config.get('batch_size', 500)
+        )
+    return _storage_index
@@ -4,155 +4,249 @@
 """
 import logging
 import asyncio
+import time
 from typing import Dict, Any, List
 from datetime import datetime, timedelta
+from sqlalchemy import and_, or_, func, case
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 
 from .connection import get_database_manager
 from .models.client_models import ClientTask
-from .models.shared_models import GlobalTask
-from .dao.task_dao import GlobalTaskDAO, ClientTaskDAO
+from .models.shared_models import SyncWatermark
+from .dao.task_dao import GlobalTaskDAO, ClientTaskDAO, TERMINAL_STATUSES
+from .outbox_relay import get_task_outbox_relay
 
 logger = logging.getLogger(__name__)
 
+# 客户端任务同步到全局任务表时更新的列（新记录额外写入创建时的字段）
+SYNC_UPDATE_COLUMNS = (
+    'status', 'progress', 'message', 'error_message', 'actual_time',
+    'started_at', 'completed_at', 'updated_at'
+)
+
+
+def _upsert_statement(session: Session, table, rows: List[Dict[str, Any]], update_columns) -> Any:
+    """构建批量upsert语句：按唯一键冲突时只在传入记录更新时间不早于现有记录时更新
+
+    与DAO中的状态更新规则一致：终态记录不会被非终态覆盖，进度只增不减。
+    MySQL使用 INSERT ... ON DUPLICATE KEY UPDATE，SQLite使用 ON CONFLICT DO UPDATE
+    """
+    dialect = session.get_bind().dialect.name
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table).values(rows)
+        incoming = stmt.inserted
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(table).values(rows)
+        incoming = stmt.excluded
+
+    applies = and_(
+        incoming.updated_at >= table.c.updated_at,
+        or_(table.c.status.notin_(TERMINAL_STATUSES), incoming.status.in_(TERMINAL_STATUSES))
+    )
+    values = {column: incoming[column] for column in update_columns}
+    if 'progress' in values:
+        values['progress'] = case((table.c.progress > incoming.progress, table.c.progress), else_=incoming.progress)
+
+    if dialect == 'mysql':
+        # MySQL按顺序求值赋值表达式，条件中用到的status和updated_at必须最后更新，
+        # 前面的判断才使用原值（status更新后条件的结果不变）
+        ordered = [column for column in values if column not in ('status', 'updated_at')]
+        ordered += [column for column in ('status', 'updated_at') if column in values]
+        return stmt.on_duplicate_key_update([
+            (column, func.if_(applies, values[column], table.c[column])) for column in ordered
+        ])
+
+    return stmt.on_conflict_do_update(index_elements=['task_id'], set_=values, where=applies)
+
 
 class DataSyncService:
     """数据同步服务"""
-    
+
+    WATERMARK_NAME = 'client_tasks_to_global_tasks'
+
     def __init__(self):
         self.db_manager = get_database_manager()
         self.global_task_dao = GlobalTaskDAO()
         self.client_task_dao = ClientTaskDAO()
-        self.sync_interval = 30  # 同步间隔（秒）
         self.is_running = False
-    
+
+        # 增量同步参数：每批读取的记录数、单次最多批数、只同步已稳定若干秒的记录
+        # （避免跳过更新时间更早但提交更晚的事务）、周期对账间隔
+        self.chunk_size = 500
+        self.max_chunks = 20
+        self.settle_seconds = 5
+        self.reconcile_interval = 300
+
+        self.metrics = {
+            'total_synced': 0,
+            'last_run_synced': 0,
+            'last_run_seconds': 0.0,
+            'last_run_time': None,
+            'watermark_at': None,
+            'watermark_id': 0
+        }
+
     async def start_sync_service(self):
-        """启动同步服务"""
+        """启动同步服务
+
+        状态变更通过发件箱同步：全局任务更新时在同一事务中写入发件箱，
+        由中继批量应用到客户端任务表；另外按较长间隔从水位处增量对账客户端任务
+        """
         if self.is_running:
             logger.warning("同步服务已在运行")
             return
-        
+
+        # 启动时先应用积压的发件箱记录
+        relay = get_task_outbox_relay()
+        await asyncio.to_thread(relay.relay_all)
+        relay.start()
+
         self.is_running = True
-        logger.info("数据同步服务已启动")
-        
+        logger.info("数据同步服务已启动（发件箱中继 + 增量对账）")
+
         try:
             while self.is_running:
                 await self.sync_client_to_shared()
-                await asyncio.sleep(self.sync_interval)
+                await asyncio.sleep(self.reconcile_interval)
         except Exception as e:
             logger.error(f"同步服务异常: {e}")
         finally:
             self.is_running = False
-            logger.info("数据同步服务已停止")
-    
+
     def stop_sync_service(self):
         """停止同步服务"""
+        if self.is_running:
+            get_task_outbox_relay().stop()
         self.is_running = False
-    
-    async def sync_client_to_shared(self):
-        """同步客户端数据到共享数据库"""
-        try:
-            # 获取需要同步的客户端任务
-            client_session = self.db_manager.get_session_direct('client')
-            shared_session = self.db_manager.get_session_direct('shared')
-            
-            try:
-                # 查找最近更新的客户端任务
-                recent_time = datetime.now() - timedelta(minutes=5)
-                client_tasks = client_session.query(ClientTask).filter(
-                    ClientTask.updated_at >= recent_time
-                ).all()
-                
-                synced_count = 0
-                for client_task in client_tasks:
-                    if await self._sync_single_task(client_task, shared_session):
-                        synced_count += 1
-                
-                if synced_count > 0:
-                    shared_session.commit()
-                    logger.debug(f"同步了 {synced_count} 个客户端任务到共享数据库")
-                
-            except SQLAlchemyError as e:
-                shared_session.rollback()
-                logger.error(f"同步客户端任务失败: {e}")
-            finally:
-                client_session.close()
-                shared_session.close()
-                
-        except Exception as e:
-            logger.error(f"同步服务执行失败: {e}")
-    
-    async def _sync_single_task(self, client_task: ClientTask, shared_session: Session) -> bool:
-        """同步单个任务"""
+        logger.info("数据同步服务已停止")
+
+    async def sync_client_to_shared(self) -> int:
+        """从水位处增量同步客户端任务到共享数据库，返回同步的任务数"""
+        return await asyncio.to_thread(self.sync_increment)
+
+    def sync_increment(self) -> int:
+        """按 (updated_at, id) 水位分批读取客户端任务，每批一条upsert写入全局任务表
+
+        每批的upsert与水位推进在同一个共享库事务中提交
+        """
+        started = time.perf_counter()
+        synced = 0
+        client_model = self.client_task_dao.model_class
+        cutoff = datetime.now() - timedelta(seconds=self.settle_seconds)
+
+        watermark_at, watermark_id = None, 0
+        client_session = self.client_task_dao.get_session()
+        shared_session = self.global_task_dao.get_session()
         try:
-            # 检查共享数据库中是否已存在该任务
-            existing_task = shared_session.query(GlobalTask).filter(
-                GlobalTask.task_id == client_task.task_id
-            ).first()
-            
-            if existing_task:
-                # 更新现有任务
-                existing_task.status = client_task.status
-                existing_task.progress = client_task.progress
-                existing_task.message = client_task.message
-                existing_task.error_message = client_task.error_message
-                existing_task.actual_time = client_task.actual_time
-                existing_task.started_at = client_task.started_at
-                existing_task.completed_at = client_task.completed_at
-                existing_task.updated_at = client_task.updated_at
-            else:
-                # 创建新任务
-                global_task = GlobalTask(
-                    task_id=client_task.task_id,
-                    source_type='client',
-                    source_user_id=client_task.client_id,
-                    task_type=client_task.task_type,
-                    workflow_name=client_task.workflow_name,
-                    status=client_task.status,
-                    priority=1,  # 默认优先级
-                    progress=client_task.progress,
-                    message=client_task.message,
-                    error_message=client_task.error_message,
-                    estimated_time=client_task.estimated_time,
-                    actual_time=client_task.actual_time,
-                    started_at=client_task.started_at,
-                    completed_at=client_task.completed_at,
-                    created_at=client_task.created_at,
-                    updated_at=client_task.updated_at
-                )
-                shared_session.add(global_task)
-            
-            return True
-            
-        except Exception as e:
-            logger.error(f"同步任务失败 [{client_task.task_id}]: {e}")
-            return False
-    
+            watermark = shared_session.get(SyncWatermark, self.WATERMARK_NAME)
+            if watermark:
+                watermark_at, watermark_id = watermark.watermark_at, watermark.watermark_id
+
+            for _ in range(self.max_chunks):
+                query = client_session.query(client_model).filter(client_model.updated_at <= cutoff)
+                if watermark_at is not None:
+                    query = query.filter(or_(
+                        client_model.updated_at > watermark_at,
+                        and_(client_model.updated_at == watermark_at, client_model.id > watermark_id)
+                    ))
+                client_tasks = query.order_by(client_model.updated_at, client_model.id).limit(self.chunk_size).all()
+                if not client_tasks:
+                    break
+
+                self._upsert_global_tasks(shared_session, client_tasks)
+                shared_session.merge(SyncWatermark(
+                    name=self.WATERMARK_NAME,
+                    watermark_at=client_tasks[-1].updated_at,
+                    watermark_id=client_tasks[-1].id
+                ))
+                shared_session.commit()
+                watermark_at, watermark_id = client_tasks[-1].updated_at, client_tasks[-1].id
+
+                synced += len(client_tasks)
+                self._invalidate_status_cache([task.task_id for task in client_tasks])
+                if len(client_tasks) < self.chunk_size:
+                    break
+
+        except SQLAlchemyError as e:
+            shared_session.rollback()
+            logger.error(f"增量同步客户端任务失败: {e}")
+        finally:
+            client_session.close()
+            shared_session.close()
+
+        elapsed = time.perf_counter() - started
+        self.metrics.update({
+            'total_synced': self.metrics['total_synced'] + synced,
+            'last_run_synced': synced,
+            'last_run_seconds': round(elapsed, 3),
+            'last_run_time': datetime.now().isoformat(),
+            'watermark_at': watermark_at.isoformat() if watermark_at else None,
+            'watermark_id': watermark_id
+        })
+        if synced:
+            logger.debug(f"增量同步了 {synced} 个客户端任务到共享数据库，耗时 {elapsed:.3f}s")
+        return synced
+
+    def _upsert_global_tasks(self, shared_session: Session, client_tasks: List[ClientTask]):
+        """将一批客户端任务以一条upsert语句写入全局任务表（更新时间较新者生效）"""
+        rows = [
+            {
+                'task_id': task.task_id,
+                'source_type': 'client',
+                'source_user_id': task.client_id,
+                'task_type': task.task_type,
+                'workflow_name': task.workflow_name,
+                'status': task.status,
+                'priority': 1,  # 默认优先级
+                'progress': task.progress,
+                'message': task.message,
+                'error_message': task.error_message,
+                'estimated_time': task.estimated_time,
+                'actual_time': task.actual_time,
+                'started_at': task.started_at,
+                'completed_at': task.completed_at,
+                'created_at': task.created_at,
+                'updated_at': task.updated_at
+            }
+            for task in client_tasks
+        ]
+        table = self.global_task_dao.model_class.__table__
+        shared_session.execute(_upsert_statement(shared_session, table, rows, SYNC_UPDATE_COLUMNS))
+
+    def _invalidate_status_cache(self, task_ids):
+        """同步写入共享库后使任务状态读缓存失效"""
+        from .status_cache import get_task_status_cache
+        status_cache = get_task_status_cache()
+        if status_cache:
+            status_cache.invalidate_many(task_ids)
+
     def sync_task_immediately(self, task_id: str) -> bool:
         """立即同步指定任务"""
         try:
-            client_session = self.db_manager.get_session_direct('client')
-            shared_session = self.db_manager.get_session_direct('shared')
-            
+            client_session = self.client_task_dao.get_session()
+            shared_session = self.global_task_dao.get_session()
+
             try:
                 # 获取客户端任务
-                client_task = client_session.query(ClientTask).filter(
-                    ClientTask.task_id == task_id
+                client_model = self.client_task_dao.model_class
+                client_task = client_session.query(client_model).filter(
+                    client_model.task_id == task_id
                 ).first()
-                
+
                 if not client_task:
                     logger.warning(f"客户端任务不存在: {task_id}")
                     return False
-                
+
                 # 同步任务
-                success = asyncio.run(self._sync_single_task(client_task, shared_session))
-                if success:
-                    shared_session.commit()
-                    logger.info(f"任务立即同步成功: {task_id}")
-                
-                return success
-                
+                self._upsert_global_tasks(shared_session, [client_task])
+                shared_session.commit()
+                self._invalidate_status_cache([task_id])
+                logger.info(f"任务立即同步成功: {task_id}")
+                return True
+
             except SQLAlchemyError as e:
                 shared_session.rollback()
                 logger.error(f"立即同步任务失败: {e}")
@@ -160,24 +254,46 @@ class DataSyncService:
             finally:
                 client_session.close()
                 shared_session.close()
-                
+
         except Exception as e:
             logger.error(f"立即同步任务异常 [{task_id}]: {e}")
             return False
-    
+
     def get_sync_status(self) -> Dict[str, Any]:
-        """获取同步服务状态"""
+        """获取同步服务状态（含增量同步的延迟与吞吐）"""
+        metrics = dict(self.metrics)
+        watermark_at = metrics['watermark_at']
+        metrics['lag_seconds'] = (
+            round((datetime.now() - datetime.fromisoformat(watermark_at)).total_seconds(), 3)
+            if watermark_at else None
+        )
+        metrics['throughput_per_second'] = (
+            round(metrics['last_run_synced'] / metrics['last_run_seconds'], 2)
+            if metrics['last_run_seconds'] else 0.0
+        )
         return {
             'is_running': self.is_running,
-            'sync_interval': self.sync_interval,
-            'last_sync_time': datetime.now().isoformat()
+            'reconcile_interval': self.reconcile_interval,
+            'chunk_size': self.chunk_size,
+            'incremental_sync': metrics,
+            'outbox': get_task_outbox_relay().get_status()
         }
-    
+
     def update_sync_config(self, config: Dict[str, Any]):
         """更新同步配置"""
-        if 'sync_interval' in config:
-            self.sync_interval = max(10, config['sync_interval'])  # 最小10秒
-            logger.info(f"同步间隔已更新为: {self.sync_interval}秒")
+        relay = get_task_outbox_relay()
+        if 'relay_interval' in config:
+            relay.relay_interval = max(0.1, config['relay_interval'])
+            logger.info(f"发件箱中继间隔已更新为: {relay.relay_interval}秒")
+        if 'batch_size' in config:
+            relay.batch_size = max(1, int(config['batch_size']))
+            logger.info(f"发件箱中继批量大小已更新为: {relay.batch_size}")
+        if 'reconcile_interval' in config:
+            self.reconcile_interval = max(10, config['reconcile_interval'])  # 最小10秒
+            logger.info(f"增量对账间隔已更新为: {self.reconcile_interval}秒")
+        if 'chunk_size' in config:
+            self.chunk_size = max(1, int(config['chunk_size']))
+            logger.info(f"增量同步批量大小已更新为: {self.chunk_size}")
 
 
 # 全局同步服务实例
@@ -5,58 +5,168 @@
 import logging
 import json
 import os
+import base64
 from typing import Dict, Any, Optional, List
 from datetime import datetime
 
-from .dao.task_dao import GlobalTaskDAO, ClientTaskDAO
+from .dao.task_dao import GlobalTaskDAO, ClientTaskDAO, TERMINAL_STATUSES
+from .dao.async_task_dao import AsyncGlobalTaskDAO, AsyncClientTaskDAO
+from .executor import run_sync
+from .status_buffer import get_task_status_buffer
+from .status_cache import get_task_status_cache
+from .outbox_relay import get_task_outbox_relay
+from .unit_of_work import unit_of_work, run_after_commit
+from .storage_index import get_storage_index
+from ..utils.path_utils import output_path_to_url
+from ..utils.thumbnails import get_thumbnail_service, thumbnail_urls
 from ..core.task_status_manager import TaskStatusManager as BaseTaskStatusManager
 
 logger = logging.getLogger(__name__)
 
 
+def encode_task_cursor(task) -> str:
+    """将任务的 (created_at, id) 编码为不透明的分页游标"""
+    payload = json.dumps({'t': task.created_at.isoformat(), 'i': task.id}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_task_cursor(cursor: str) -> tuple:
+    """解析分页游标为 (created_at, id)，格式错误时抛出ValueError"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return datetime.fromisoformat(payload['t']), int(payload['i'])
+    except Exception as e:
+        raise ValueError(f"无效的分页游标: {cursor}") from e
+
+
 class DatabaseTaskStatusManager(BaseTaskStatusManager):
     """基于数据库的任务状态管理器"""
     
     def __init__(self):
         self.global_task_dao = GlobalTaskDAO()
         self.client_task_dao = ClientTaskDAO()
+        # 异步路由使用的读取路径
+        self.async_global_task_dao = AsyncGlobalTaskDAO(self.global_task_dao)
+        self.async_client_task_dao = AsyncClientTaskDAO(self.client_task_dao)
         logger.info("数据库任务状态管理器已初始化")
     
     def set_task_status(self, task_id: str, status_data: Dict[str, Any]) -> bool:
         """设置任务状态"""
         try:
-            # 提取结果数据
-            result_data = status_data.pop('result_data', None)
-
-            # 为全局任务过滤字段
-            global_status_data = self._filter_global_task_fields(status_data.copy())
-
-            # 为客户端任务过滤字段
-            client_status_data = self._filter_client_task_fields(status_data.copy())
-
-            # 更新全局任务状态
-            global_updated = self.global_task_dao.update_task_status(task_id, global_status_data)
+            # 状态更新、发件箱与结果在同一工作单元中提交
+            with unit_of_work():
+                # 提取结果数据
+                result_data = status_data.pop('result_data', None)
+
+                # 为全局任务过滤字段
+                global_status_data = self._filter_global_task_fields(status_data.copy())
+
+                # 为客户端任务过滤字段
+                client_status_data = self._filter_client_task_fields(status_data.copy())
+
+                # 更新全局任务状态，客户端任务的变更写入发件箱由中继同步
+                global_updated = self.global_task_dao.update_task_status(
+                    task_id, global_status_data, replicate=client_status_data
+                )
+                if global_updated:
+                    self._notify_outbox_relay()
+                    client_updated = False
+                else:
+                    # 只存在于客户端库的任务直接更新
+                    client_updated = self.client_task_dao.update_task_status(task_id, client_status_data)
 
-            # 更新客户端任务状态（如果存在）
-            client_updated = self.client_task_dao.update_task_status(task_id, client_status_data)
+                # 如果任务完成且有结果数据，保存结果
+                if result_data and status_data.get('status') == 'completed':
+                    self._save_task_results(task_id, result_data)
 
-            # 如果任务完成且有结果数据，保存结果
-            if result_data and status_data.get('status') == 'completed':
-                self._save_task_results(task_id, result_data)
+                self._invalidate_status_cache(task_id)
 
-            if global_updated or client_updated:
-                logger.debug(f"任务状态已更新: {task_id} -> {status_data.get('status', 'unknown')}")
-                return True
-            else:
-                logger.warning(f"任务状态更新失败，任务不存在: {task_id}")
-                return False
+                if global_updated or client_updated:
+                    logger.debug(f"任务状态已更新: {task_id} -> {status_data.get('status', 'unknown')}")
+                    return True
+                else:
+                    logger.warning(f"任务状态更新失败，任务不存在: {task_id}")
+                    return False
 
         except Exception as e:
             logger.error(f"设置任务状态失败 [{task_id}]: {e}")
             return False
     
     def get_task_status(self, task_id: str) -> Optional[Dict[str, Any]]:
-        """获取任务状态"""
+        """获取任务状态
+
+        数据库中的状态文档经Redis读缓存读取，再合并状态缓冲中尚未刷新的进度
+        """
+        status_cache = get_task_status_cache()
+        if status_cache:
+            task_dict = status_cache.get(task_id, self._load_task_status)
+        else:
+            task_dict = self._load_task_status(task_id)
+
+        if task_dict is None:
+            return None
+        return self._merge_buffered([task_dict])[0]
+
+    async def get_task_status_async(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """获取任务状态（异步路由使用）
+
+        数据库查询使用异步引擎，Redis读缓存与状态缓冲的同步调用在数据库线程池中执行，不阻塞事件循环
+        """
+        status_cache = get_task_status_cache()
+        if status_cache:
+            task_dict = await status_cache.get_async(task_id, self._load_task_status_async)
+        else:
+            task_dict = await self._load_task_status_async(task_id)
+
+        if task_dict is None:
+            return None
+        if get_task_status_buffer():
+            task_dict = (await run_sync(self._merge_buffered, [task_dict]))[0]
+        return task_dict
+
+    async def _load_task_status_async(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """异步从数据库加载任务状态文档（先查全局任务，再查客户端任务）"""
+        try:
+            for task_dao in (self.async_global_task_dao, self.async_client_task_dao):
+                task = await task_dao.get_task_by_task_id(task_id)
+                if task is None:
+                    continue
+                results = {}
+                if task.status == 'completed':
+                    results = await task_dao.get_results_by_task_ids([task.id])
+                return self._task_to_dict(task, [self._result_to_dict(r) for r in results.get(task.id, [])])
+
+            logger.warning(f"[DB_GET] 任务 {task_id} 在数据库中不存在")
+            return None
+
+        except Exception as e:
+            logger.error(f"[DB_GET] 获取任务状态失败 [{task_id}]: {e}")
+            return None
+
+    def _notify_outbox_relay(self):
+        """发件箱有新记录时启动并唤醒中继（处于工作单元中时在提交后唤醒）"""
+        def notify():
+            relay = get_task_outbox_relay()
+            relay.start()
+            relay.notify()
+        run_after_commit(notify)
+
+    def _schedule_result_sync(self, task_id: str, task_db_id: int):
+        """分布式结果提交后立即开始下载到主机（未启用文件同步时忽略）"""
+        from ..core.result_sync import get_result_file_sync
+        result_sync = get_result_file_sync()
+        if result_sync:
+            run_after_commit(lambda: result_sync.submit(task_id, task_db_id))
+
+    def _invalidate_status_cache(self, *task_ids: str):
+        """任务写入后使读缓存失效（处于工作单元中时在提交后失效）"""
+        status_cache = get_task_status_cache()
+        if status_cache:
+            run_after_commit(lambda: status_cache.invalidate_many(task_ids))
+
+    def _load_task_status(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """从数据库加载任务状态文档（不合并状态缓冲）"""
         try:
             logger.info(f"[DB_GET] 开始获取任务状态: {task_id}")
 
@@ -64,7 +174,7 @@ class DatabaseTaskStatusManager(BaseTaskStatusManager):
             global_task = self.global_task_dao.get_task_by_task_id(task_id)
             if global_task:
                 logger.info(f"[DB_GET] 任务 {task_id} 从全局任务表获取成功")
-                task_dict = self._task_to_dict(global_task)
+                task_dict = self._tasks_to_dicts([global_task])[0]
 
                 # 调试日志：显示获取到的任务数据
                 # logger.info(f"[DB_GET] 任务 {task_id} 全局任务数据:")
@@ -84,7 +194,7 @@ class DatabaseTaskStatusManager(BaseTaskStatusManager):
             client_task = self.client_task_dao.get_task_by_task_id(task_id)
             if client_task:
                 # logger.info(f"[DB_GET] 任务 {task_id} 从客户端任务表获取成功")
-                task_dict = self._task_to_dict(client_task)
+                task_dict = self._tasks_to_dicts([client_task])[0]
 
                 # 调试日志：显示获取到的任务数据
                 # logger.info(f"[DB_GET] 任务 {task_id} 客户端任务数据:")
@@ -109,26 +219,115 @@ class DatabaseTaskStatusManager(BaseTaskStatusManager):
             logger.error(f"[DB_GET] 错误堆栈: {traceback.format_exc()}")
             return None
     
-    def update_task_status(self, task_id: str, updates: Dict[str, Any]) -> bool:
-        """更新任务状态（合并更新）"""
+    def update_task_status(self, task_id: str, updates: Dict[str, Any],
+                           expected_version: Optional[int] = None) -> bool:
+        """部分更新任务状态
+
+        中间状态写入Redis状态缓冲并由后台线程批量刷新到数据库；
+        终态或包含其他字段的更新直接对每张表执行一条只包含变更列的UPDATE，
+        由SQL保证进度不回退、终态不再变化。
+        expected_version不为空时按全局任务的版本号做乐观并发校验（不经过缓冲）
+
+        Returns:
+            bool: False表示任务不存在、已是终态或版本号不匹配
+        """
         try:
-            # 获取当前状态
-            current_status = self.get_task_status(task_id)
-            if not current_status:
-                logger.warning(f"任务不存在，无法更新: {task_id}")
-                return False
-            
-            # 合并更新数据
-            current_status.update(updates)
-            current_status['updated_at'] = datetime.now()
-            
-            # 保存更新
-            return self.set_task_status(task_id, current_status)
+            status_buffer = get_task_status_buffer()
+            if status_buffer and expected_version is None and status_buffer.is_bufferable(updates):
+                if status_buffer.write(task_id, updates):
+                    status_buffer.start(self.apply_buffered_updates)
+                    return True
+
+            fields = dict(updates)
+            result_data = fields.pop('result_data', None)
+            if status_buffer and fields.get('status') in TERMINAL_STATUSES:
+                # 终态写入时带上缓冲中尚未刷新的字段（如node_id、prompt_id）
+                fields = {**status_buffer.read(task_id), **fields}
+
+            # 状态更新、发件箱与结果在同一工作单元中提交
+            with unit_of_work():
+                # 只更新全局任务表，客户端任务表的变更与其在同一事务中写入发件箱
+                client_fields = self._filter_client_task_fields(fields)
+                global_updated = self.global_task_dao.partial_update_status(
+                    task_id, self._filter_global_task_fields(fields), expected_version, replicate=client_fields
+                )
+                client_updated = False
+                if global_updated:
+                    self._notify_outbox_relay()
+                elif expected_version is None:
+                    # 只存在于客户端库的任务直接更新（已是终态的任务由SQL条件拒绝）
+                    client_updated = self.client_task_dao.partial_update_status(task_id, client_fields)
+
+                if not (global_updated or client_updated):
+                    logger.warning(f"任务状态未更新（任务不存在、已是终态或版本冲突）: {task_id}")
+                    return False
+
+                # 如果任务完成且有结果数据，保存结果
+                if result_data and fields.get('status') == 'completed':
+                    self._save_task_results(task_id, result_data)
+
+                # 终态已落库，缓冲中的中间状态不再需要
+                if status_buffer and fields.get('status') in TERMINAL_STATUSES:
+                    run_after_commit(lambda: status_buffer.discard(task_id))
+
+                self._invalidate_status_cache(task_id)
+
+            logger.debug(f"任务状态已更新: {task_id} -> {fields.get('status', 'unknown')}")
+            return True
             
         except Exception as e:
             logger.error(f"更新任务状态失败 [{task_id}]: {e}")
             return False
+
+    def apply_buffered_updates(self, updates: Dict[str, Dict[str, Any]]) -> bool:
+        """将状态缓冲中的中间状态批量写入数据库（终态记录不会被覆盖，进度不回退）"""
+        global_records = []
+        client_records = []
+        for task_id, buffered in updates.items():
+            global_records.append(dict(self._filter_global_task_fields(buffered), task_id=task_id))
+            client_records.append(dict(self._filter_client_task_fields(buffered), task_id=task_id))
+
+        ok = self.global_task_dao.bulk_partial_update_status(global_records, replicate_records=client_records)
+        if ok:
+            self._notify_outbox_relay()
+        self._invalidate_status_cache(*updates.keys())
+        return ok
+
+    def _merge_buffered(self, task_dicts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """合并状态缓冲中尚未刷新到数据库的中间状态"""
+        status_buffer = get_task_status_buffer()
+        if not status_buffer or not task_dicts:
+            return task_dicts
+
+        pending_ids = [t['task_id'] for t in task_dicts if t.get('status') not in TERMINAL_STATUSES]
+        buffered = status_buffer.read_many(pending_ids)
+        for task_dict in task_dicts:
+            status_buffer.merge(task_dict, buffered.get(task_dict['task_id']))
+        return task_dicts
     
+    def resolve_task_id(self, task_id: str) -> Optional[str]:
+        """将任务ID或celery_task_id解析为任务ID，均通过索引查询"""
+        try:
+            if self.global_task_dao.get_task_by_task_id(task_id):
+                return task_id
+
+            global_task = self.global_task_dao.get_task_by_celery_id(task_id)
+            if global_task:
+                return global_task.task_id
+
+            if self.client_task_dao.get_task_by_task_id(task_id):
+                return task_id
+
+            return None
+
+        except Exception as e:
+            logger.error(f"解析任务ID失败 [{task_id}]: {e}")
+            return None
+
+    def is_task_cancelled(self, task_id: str) -> bool:
+        """检查任务是否已被取消（只查询status列）"""
+        return self.global_task_dao.get_task_status_value(task_id) == 'cancelled'
+
     def delete_task_status(self, task_id: str) -> bool:
         """删除任务状态"""
         try:
@@ -137,7 +336,8 @@ class DatabaseTaskStatusManager(BaseTaskStatusManager):
             
             # 删除客户端任务
             client_deleted = self.client_task_dao.delete_by_field('task_id', task_id)
-            
+
+            self._invalidate_status_cache(task_id)
             return global_deleted or client_deleted
             
         except Exception as e:
@@ -155,8 +355,8 @@ class DatabaseTaskStatusManager(BaseTaskStatusManager):
             else:
                 global_tasks = self.global_task_dao.get_all(limit=limit)
             
-            for task in global_tasks:
-                tasks[task.task_id] = self._task_to_dict(task)
+            for task_dict in self._merge_buffered(self._tasks_to_dicts(global_tasks)):
+                tasks[task_dict['task_id']] = task_dict
             
             return tasks
             
@@ -172,17 +372,60 @@ class DatabaseTaskStatusManager(BaseTaskStatusManager):
             else:
                 tasks = self.global_task_dao.get_tasks_by_user(user_id, source_type, limit=limit)
             
-            return [self._task_to_dict(task) for task in tasks]
+            return self._merge_buffered(self._tasks_to_dicts(tasks))
             
         except Exception as e:
             logger.error(f"获取用户任务失败 [{user_id}]: {e}")
             return []
     
+    def list_user_tasks_page(self, user_id: str, source_type: str = None, status: str = None,
+                             task_type: str = None, limit: int = 20, cursor: str = None,
+                             offset: int = 0) -> Dict[str, Any]:
+        """分页获取用户任务，过滤与分页均在数据库中完成
+
+        提供cursor时按 (created_at, id) 键集分页，否则使用offset；
+        total只在首页（无游标）统计，后续翻页不再执行COUNT（为None）。
+        按状态过滤时，合并缓冲中的最新状态后不再匹配的任务从本页移除（本页可能少于limit条），
+        仅在缓冲中变为该状态、数据库尚未刷新的任务会在刷新后出现
+        """
+        keyset = decode_task_cursor(cursor) if cursor else None
+
+        if source_type == 'client':
+            dao = self.client_task_dao
+            tasks = dao.get_tasks_page(user_id, status=status, task_type=task_type,
+                                       limit=limit + 1, cursor=keyset, offset=offset)
+        else:
+            dao = self.global_task_dao
+            tasks = dao.get_tasks_page(user_id, source_type, status=status, task_type=task_type,
+                                       limit=limit + 1, cursor=keyset, offset=offset)
+
+        # 多取一条判断是否还有下一页
+        has_more = len(tasks) > limit
+        tasks = tasks[:limit]
+
+        total = None
+        if not cursor:
+            if source_type == 'client':
+                total = dao.count_client_tasks(user_id, status=status, task_type=task_type)
+            else:
+                total = dao.count_user_tasks(user_id, source_type, status=status, task_type=task_type)
+
+        task_dicts = self._merge_buffered(self._tasks_to_dicts(tasks))
+        if status:
+            task_dicts = [task_dict for task_dict in task_dicts if task_dict.get('status') == status]
+
+        return {
+            'tasks': task_dicts,
+            # 游标取自数据库中的最后一行，与过滤后剩余的条数无关
+            'next_cursor': encode_task_cursor(tasks[-1]) if has_more else None,
+            'total': total
+        }
+
     def get_running_tasks(self) -> List[Dict[str, Any]]:
         """获取正在运行的任务"""
         try:
             tasks = self.global_task_dao.get_running_tasks()
-            return [self._task_to_dict(task) for task in tasks]
+            return self._merge_buffered(self._tasks_to_dicts(tasks))
             
         except Exception as e:
             logger.error(f"获取运行中任务失败: {e}")
@@ -199,122 +442,218 @@ class DatabaseTaskStatusManager(BaseTaskStatusManager):
             # for key, value in task_data.items():
             #     logger.info(f"  - {key}: {value}")
 
-            # 提取参数
-            parameters = task_data.pop('parameters', [])
-
-            if source_type == 'client':
-                # 为客户端任务准备数据（包含所有必要字段）
-                client_task_data = {
-                    'task_id': task_data.get('task_id'),
-                    'client_id': task_data.get('client_id'),
-                    'task_type': task_data.get('task_type'),
-                    'workflow_name': task_data.get('workflow_name'),
-                    'prompt': task_data.get('prompt', ''),
-                    'negative_prompt': task_data.get('negative_prompt', ''),
-                    # 添加关键生成参数
-                    'model_name': task_data.get('model_name'),
-                    'width': task_data.get('width'),
-                    'height': task_data.get('height'),
-                    'steps': task_data.get('steps'),
-                    'cfg_scale': task_data.get('cfg_scale'),
-                    'sampler': task_data.get('sampler'),
-                    'scheduler': task_data.get('scheduler'),
-                    'seed': task_data.get('seed'),
-                    'batch_size': task_data.get('batch_size', 1),
-                    'status': task_data.get('status'),
-                    'progress': task_data.get('progress', 0),
-                    'message': task_data.get('message'),
-                    'estimated_time': task_data.get('estimated_time')
-                }
-
-                # 调试日志：显示客户端任务数据
-                # logger.info(f"[DB_CREATE] 任务 {task_id} 客户端任务数据:")
-                # for key, value in client_task_data.items():
-                #     logger.info(f"  - {key}: {value}")
-
-                # 特别关注关键参数
-                # critical_params = ['model_name', 'width', 'height', 'seed', 'steps', 'cfg_scale']
-                # logger.info(f"[DB_CREATE] 任务 {task_id} 客户端关键参数检查:")
-                # for param in critical_params:
-                #     value = client_task_data.get(param)
-                #     logger.info(f"  - {param}: {value} ({'✓' if value is not None else '✗'})")
-
-                # 创建客户端任务
-                logger.info(f"[DB_CREATE] 任务 {task_id} 开始创建客户端任务...")
-                client_task = self.client_task_dao.create_task(client_task_data, parameters)
-                if not client_task:
-                    logger.error(f"[DB_CREATE] 任务 {task_id} 客户端任务创建失败")
-                    return False
+            # 客户端任务与全局任务在同一工作单元中写入，任一失败时全部回滚
+            with unit_of_work():
+                # 提取参数
+                parameters = task_data.pop('parameters', [])
+
+                if source_type == 'client':
+                    # 为客户端任务准备数据（包含所有必要字段）
+                    client_task_data = self._build_client_task_data(task_data)
+
+                    # 调试日志：显示客户端任务数据
+                    # logger.info(f"[DB_CREATE] 任务 {task_id} 客户端任务数据:")
+                    # for key, value in client_task_data.items():
+                    #     logger.info(f"  - {key}: {value}")
+
+                    # 特别关注关键参数
+                    # critical_params = ['model_name', 'width', 'height', 'seed', 'steps', 'cfg_scale']
+                    # logger.info(f"[DB_CREATE] 任务 {task_id} 客户端关键参数检查:")
+                    # for param in critical_params:
+                    #     value = client_task_data.get(param)
+                    #     logger.info(f"  - {param}: {value} ({'✓' if value is not None else '✗'})")
+
+                    # 创建客户端任务
+                    logger.info(f"[DB_CREATE] 任务 {task_id} 开始创建客户端任务...")
+                    client_task = self.client_task_dao.create_task(client_task_data, parameters)
+                    if not client_task:
+                        logger.error(f"[DB_CREATE] 任务 {task_id} 客户端任务创建失败")
+                        return False
+                    else:
+                        logger.info(f"[DB_CREATE] 任务 {task_id} 客户端任务创建成功，数据库ID: {client_task.id}")
+
+                    # 为全局任务准备数据（包含所有必要字段）
+                    global_task_data = self._build_global_task_data(task_data, source_type)
+
+                    # 调试日志：显示全局任务数据
+                    # logger.info(f"[DB_CREATE] 任务 {task_id} 全局任务数据:")
+                    # for key, value in global_task_data.items():
+                    #     logger.info(f"  - {key}: {value}")
+
+                    # 特别关注关键参数
+                    # critical_params = ['model_name', 'width', 'height', 'seed', 'steps', 'cfg_scale']
+                    # logger.info(f"[DB_CREATE] 任务 {task_id} 全局关键参数检查:")
+                    # for param in critical_params:
+                    #     value = global_task_data.get(param)
+                    #     logger.info(f"  - {param}: {value} ({'✓' if value is not None else '✗'})")
+
+                    # 同步到全局任务
+                    logger.info(f"[DB_CREATE] 任务 {task_id} 开始创建全局任务...")
+                    global_task = self.global_task_dao.create_task(global_task_data, parameters)
+
+                    if global_task:
+                        logger.info(f"[DB_CREATE] 任务 {task_id} 全局任务创建成功，数据库ID: {global_task.id}")
+                        return True
+                    else:
+                        logger.error(f"[DB_CREATE] 任务 {task_id} 全局任务创建失败")
+                        return False
                 else:
-                    logger.info(f"[DB_CREATE] 任务 {task_id} 客户端任务创建成功，数据库ID: {client_task.id}")
-
-                # 为全局任务准备数据（包含所有必要字段）
-                global_task_data = {
-                    'task_id': task_data.get('task_id'),
-                    'source_type': source_type,
-                    'source_user_id': task_data.get('client_id', ''),  # 使用client_id作为source_user_id
-                    'task_type': task_data.get('task_type'),
-                    'workflow_name': task_data.get('workflow_name'),
-                    'prompt': task_data.get('prompt', ''),
-                    'negative_prompt': task_data.get('negative_prompt', ''),
-                    # 添加关键生成参数
-                    'model_name': task_data.get('model_name'),
-                    'width': task_data.get('width'),
-                    'height': task_data.get('height'),
-                    'steps': task_data.get('steps'),
-                    'cfg_scale': task_data.get('cfg_scale'),
-                    'sampler': task_data.get('sampler'),
-                    'scheduler': task_data.get('scheduler'),
-                    'seed': task_data.get('seed'),
-                    'batch_size': task_data.get('batch_size', 1),
-                    'status': task_data.get('status'),
-                    'priority': task_data.get('priority', 1),
-                    'progress': task_data.get('progress', 0),
-                    'message': task_data.get('message'),
-                    'estimated_time': task_data.get('estimated_time')
-                }
-
-                # 调试日志：显示全局任务数据
-                # logger.info(f"[DB_CREATE] 任务 {task_id} 全局任务数据:")
-                # for key, value in global_task_data.items():
-                #     logger.info(f"  - {key}: {value}")
+                    # 直接创建全局任务
+                    logger.info(f"[DB_CREATE] 任务 {task_id} 直接创建全局任务...")
+                    task_data['source_type'] = source_type
+                    global_task = self.global_task_dao.create_task(task_data, parameters)
+
+                    if global_task:
+                        logger.info(f"[DB_CREATE] 任务 {task_id} 全局任务创建成功，数据库ID: {global_task.id}")
+                        return True
+                    else:
+                        logger.error(f"[DB_CREATE] 任务 {task_id} 全局任务创建失败")
+                        return False
 
-                # 特别关注关键参数
-                # critical_params = ['model_name', 'width', 'height', 'seed', 'steps', 'cfg_scale']
-                # logger.info(f"[DB_CREATE] 任务 {task_id} 全局关键参数检查:")
-                # for param in critical_params:
-                #     value = global_task_data.get(param)
-                #     logger.info(f"  - {param}: {value} ({'✓' if value is not None else '✗'})")
+        except Exception as e:
+            logger.error(f"[DB_CREATE] 任务 {task_id} 创建失败: {e}")
+            import traceback
+            logger.error(f"[DB_CREATE] 错误堆栈: {traceback.format_exc()}")
+            return False
 
-                # 同步到全局任务
-                logger.info(f"[DB_CREATE] 任务 {task_id} 开始创建全局任务...")
-                global_task = self.global_task_dao.create_task(global_task_data, parameters)
+    def create_tasks_bulk(self, tasks: List[Dict[str, Any]], source_type: str = 'client') -> bool:
+        """批量创建任务
 
-                if global_task:
-                    logger.info(f"[DB_CREATE] 任务 {task_id} 全局任务创建成功，数据库ID: {global_task.id}")
-                    return True
-                else:
-                    logger.error(f"[DB_CREATE] 任务 {task_id} 全局任务创建失败")
+        客户端任务及参数一次写入client库，全局任务及参数一次写入shared库，
+        两者在同一工作单元中提交，任一失败时全部回滚。
+        tasks中每项为任务数据字典，可包含parameters参数列表。
+        """
+        if not tasks:
+            return True
+
+        try:
+            global_entries = []
+            client_entries = []
+            for task_data in tasks:
+                parameters = task_data.get('parameters') or []
+                global_entries.append({
+                    'task_data': self._build_global_task_data(task_data, source_type),
+                    'parameters': parameters
+                })
+                if source_type == 'client':
+                    client_entries.append({
+                        'task_data': self._build_client_task_data(task_data),
+                        # 客户端参数表没有parameter_type字段
+                        'parameters': [
+                            {'parameter_name': p['parameter_name'], 'parameter_value': p.get('parameter_value')}
+                            for p in parameters
+                        ]
+                    })
+
+            with unit_of_work():
+                if client_entries and not self.client_task_dao.bulk_create_tasks(client_entries):
+                    logger.error(f"[DB_CREATE] 批量创建客户端任务失败，共 {len(tasks)} 个")
                     return False
-            else:
-                # 直接创建全局任务
-                logger.info(f"[DB_CREATE] 任务 {task_id} 直接创建全局任务...")
-                task_data['source_type'] = source_type
-                global_task = self.global_task_dao.create_task(task_data, parameters)
 
-                if global_task:
-                    logger.info(f"[DB_CREATE] 任务 {task_id} 全局任务创建成功，数据库ID: {global_task.id}")
-                    return True
-                else:
-                    logger.error(f"[DB_CREATE] 任务 {task_id} 全局任务创建失败")
+                if not self.global_task_dao.bulk_create_tasks(global_entries):
+                    logger.error(f"[DB_CREATE] 批量创建全局任务失败，共 {len(tasks)} 个")
                     return False
 
+            logger.info(f"[DB_CREATE] 批量创建任务成功，共 {len(tasks)} 个")
+            return True
+
         except Exception as e:
-            logger.error(f"[DB_CREATE] 任务 {task_id} 创建失败: {e}")
-            import traceback
-            logger.error(f"[DB_CREATE] 错误堆栈: {traceback.format_exc()}")
+            logger.error(f"[DB_CREATE] 批量创建任务失败: {e}")
             return False
 
+    def set_tasks_status_bulk(self, task_ids: List[str], status_data: Dict[str, Any]) -> int:
+        """批量设置任务状态，返回更新的全局任务数"""
+        try:
+            global_updated = self.global_task_dao.bulk_update_status(
+                task_ids, self._filter_global_task_fields(status_data.copy()),
+                replicate=self._filter_client_task_fields(status_data.copy())
+            )
+            if global_updated:
+                self._notify_outbox_relay()
+            self._invalidate_status_cache(*task_ids)
+            return global_updated
+        except Exception as e:
+            logger.error(f"批量设置任务状态失败: {e}")
+            return 0
+
+    def get_batch_status(self, batch_id: str, user_id: str = None) -> Optional[Dict[str, Any]]:
+        """获取批次聚合状态"""
+        try:
+            tasks = self.global_task_dao.get_batch_tasks(batch_id, user_id)
+            if not tasks:
+                return None
+            tasks = self._merge_buffered(tasks)
+
+            status_counts = {}
+            for task in tasks:
+                status_counts[task['status']] = status_counts.get(task['status'], 0) + 1
+
+            finished_states = ('completed', 'failed', 'cancelled')
+            return {
+                'batch_id': batch_id,
+                'total_tasks': len(tasks),
+                'status_counts': status_counts,
+                'progress': round(sum(task['progress'] for task in tasks) / len(tasks), 2),
+                'finished': all(task['status'] in finished_states for task in tasks),
+                'tasks': tasks
+            }
+        except Exception as e:
+            logger.error(f"获取批次状态失败 [{batch_id}]: {e}")
+            return None
+
+    def _build_client_task_data(self, task_data: Dict[str, Any]) -> Dict[str, Any]:
+        """构建客户端任务表数据"""
+        return {
+            'task_id': task_data.get('task_id'),
+            'client_id': task_data.get('client_id'),
+            'task_type': task_data.get('task_type'),
+            'workflow_name': task_data.get('workflow_name'),
+            'prompt': task_data.get('prompt', ''),
+            'negative_prompt': task_data.get('negative_prompt', ''),
+            # 添加关键生成参数
+            'model_name': task_data.get('model_name'),
+            'width': task_data.get('width'),
+            'height': task_data.get('height'),
+            'steps': task_data.get('steps'),
+            'cfg_scale': task_data.get('cfg_scale'),
+            'sampler': task_data.get('sampler'),
+            'scheduler': task_data.get('scheduler'),
+            'seed': task_data.get('seed'),
+            'batch_size': task_data.get('batch_size', 1),
+            'status': task_data.get('status'),
+            'progress': task_data.get('progress', 0),
+            'message': task_data.get('message'),
+            'estimated_time': task_data.get('estimated_time')
+        }
+
+    def _build_global_task_data(self, task_data: Dict[str, Any], source_type: str) -> Dict[str, Any]:
+        """构建全局任务表数据"""
+        return {
+            'task_id': task_data.get('task_id'),
+            'source_type': source_type,
+            'source_user_id': task_data.get('client_id', ''),  # 使用client_id作为source_user_id
+            'task_type': task_data.get('task_type'),
+            'workflow_name': task_data.get('workflow_name'),
+            'prompt': task_data.get('prompt', ''),
+            'negative_prompt': task_data.get('negative_prompt', ''),
+            # 添加关键生成参数
+            'model_name': task_data.get('model_name'),
+            'width': task_data.get('width'),
+            'height': task_data.get('height'),
+            'steps': task_data.get('steps'),
+            'cfg_scale': task_data.get('cfg_scale'),
+            'sampler': task_data.get('sampler'),
+            'scheduler': task_data.get('scheduler'),
+            'seed': task_data.get('seed'),
+            'batch_size': task_data.get('batch_size', 1),
+            'status': task_data.get('status'),
+            'priority': task_data.get('priority', 1),
+            'progress': task_data.get('progress', 0),
+            'message': task_data.get('message'),
+            'celery_task_id': task_data.get('celery_task_id'),
+            'estimated_time': task_data.get('estimated_time')
+        }
+
     def _save_task_results(self, task_id: str, result_data: Dict[str, Any]) -> bool:
         """保存任务结果到数据库"""
         try:
@@ -322,6 +661,11 @@ class DatabaseTaskStatusManager(BaseTaskStatusManager):
             global_task = self.global_task_dao.get_task_by_task_id(task_id)
             if global_task:
                 self._save_global_task_results(global_task.id, result_data)
+                if result_data.get('locations'):
+                    self._schedule_result_sync(task_id, global_task.id)
+                else:
+                    self._schedule_thumbnails(result_data.get('files', []))
+                    self._schedule_storage_index(result_data.get('files', []), global_task.source_user_id)
 
             # 保存到客户端任务结果表
             client_task = self.client_task_dao.get_task_by_task_id(task_id)
@@ -335,6 +679,29 @@ class DatabaseTaskStatusManager(BaseTaskStatusManager):
             logger.error(f"保存任务结果失败 [{task_id}]: {e}")
             return False
 
+    @staticmethod
+    def _result_metadata(file_path: str, index: int, result_data: Dict[str, Any]) -> Dict[str, Any]:
+        """结果元数据，分布式结果附带文件所在的节点、子目录和文件名，本地结果附带内容版本"""
+        from ..core.file_response import content_version
+        metadata = {
+            'original_filename': os.path.basename(file_path),
+            'result_index': index
+        }
+        for location in result_data.get('locations') or []:
+            if location.get('file_path') == file_path:
+                metadata.update({
+                    'node_id': location['node_id'],
+                    'subfolder': location.get('subfolder', ''),
+                    'filename': location['filename']
+                })
+                break
+        else:
+            # 结果URL带上 ?v=<内容版本> 后可以长期缓存（文件名被重新使用时版本不再匹配）
+            version = content_version(file_path)
+            if version:
+                metadata['content_version'] = version
+        return metadata
+
     def _save_global_task_results(self, task_db_id: int, result_data: Dict[str, Any]):
         """保存全局任务结果"""
         from .dao.task_dao import GlobalTaskResultDAO
@@ -351,10 +718,7 @@ class DatabaseTaskStatusManager(BaseTaskStatusManager):
                 'file_path': file_path,
                 'file_name': os.path.basename(file_path),
                 'file_size': os.path.getsize(file_path) if os.path.exists(file_path) else 0,
-                'result_metadata': {
-                    'original_filename': os.path.basename(file_path),
-                    'result_index': i
-                }
+                'result_metadata': self._result_metadata(file_path, i, result_data)
             }
             result_dao.create(**result_record)
 
@@ -374,10 +738,7 @@ class DatabaseTaskStatusManager(BaseTaskStatusManager):
                 'file_path': file_path,
                 'file_name': os.path.basename(file_path),
                 'file_size': os.path.getsize(file_path) if os.path.exists(file_path) else 0,
-                'result_metadata': {
-                    'original_filename': os.path.basename(file_path),
-                    'result_index': i
-                }
+                'result_metadata': self._result_metadata(file_path, i, result_data)
             }
             result_dao.create(**result_record)
     
@@ -389,7 +750,8 @@ class DatabaseTaskStatusManager(BaseTaskStatusManager):
             
             # 添加到客户端任务结果
             client_added = self.client_task_dao.add_task_result(task_id, result_data)
-            
+
+            self._invalidate_status_cache(task_id)
             return global_added or client_added
             
         except Exception as e:
@@ -412,8 +774,25 @@ class DatabaseTaskStatusManager(BaseTaskStatusManager):
             logger.error(f"获取任务结果失败 [{task_id}]: {e}")
             return []
     
-    def _task_to_dict(self, task) -> Dict[str, Any]:
-        """将任务对象转换为字典"""
+    def _tasks_to_dicts(self, tasks) -> List[Dict[str, Any]]:
+        """批量将任务对象转换为字典，已完成任务的结果通过一次IN查询获取"""
+        if not tasks:
+            return []
+
+        task_dao = self.client_task_dao if isinstance(tasks[0], self.client_task_dao.model_class) else self.global_task_dao
+        completed_ids = [task.id for task in tasks if task.status == 'completed']
+        results_by_task = task_dao.get_results_by_task_ids(completed_ids)
+
+        return [
+            self._task_to_dict(task, [self._result_to_dict(r) for r in results_by_task.get(task.id, [])])
+            for task in tasks
+        ]
+
+    def _task_to_dict(self, task, results: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """将任务对象转换为字典
+
+        results为已查询的任务结果，为None时单独查询（列表场景请使用_tasks_to_dicts）
+        """
         task_dict = {
             'task_id': task.task_id,
             'status': task.status,
@@ -432,6 +811,8 @@ class DatabaseTaskStatusManager(BaseTaskStatusManager):
             'completed_at': task.completed_at.isoformat() if task.completed_at else None,
             'celery_task_id': getattr(task, 'celery_task_id', None),
             'node_id': getattr(task, 'node_id', None),
+            'prompt_id': getattr(task, 'prompt_id', None),
+            'version': getattr(task, 'version', None),
             'source_type': getattr(task, 'source_type', 'client'),
             'source_user_id': getattr(task, 'source_user_id', getattr(task, 'client_id', ''))
         }
@@ -439,21 +820,21 @@ class DatabaseTaskStatusManager(BaseTaskStatusManager):
         # 如果任务已完成，添加结果数据
         if task.status == 'completed':
             try:
-                results = self.get_task_results(task.task_id)
+                if results is None:
+                    results = self.get_task_results(task.task_id)
                 if results:
+                    from ..core.file_response import versioned_url
                     # 提取文件路径列表并转换为URL
-                    files = [result.get('file_path') for result in results if result.get('file_path')]
+                    file_results = [result for result in results if result.get('file_path')]
+                    files = [result['file_path'] for result in file_results]
                     if files:
-                        # 生成可访问的URL列表
+                        # 生成可访问的URL列表，记录了内容版本的结果附带版本参数
                         result_urls = []
                         for i, file_path in enumerate(files):
-                            # 尝试生成静态文件URL
-                            static_url = self._convert_file_path_to_url(file_path)
-                            if static_url:
-                                result_urls.append(static_url)
-                            else:
-                                # 兜底使用下载接口
-                                result_urls.append(f"/api/v2/tasks/{task.task_id}/download?index={i}")
+                            # 尝试生成静态文件URL，兜底使用下载接口
+                            url = (self._convert_file_path_to_url(file_path)
+                                   or f"/api/v2/tasks/{task.task_id}/download?index={i}")
+                            result_urls.append(versioned_url(url, file_results[i].get('content_version')))
 
                         task_dict['result_data'] = {
                             'files': files,
@@ -462,23 +843,35 @@ class DatabaseTaskStatusManager(BaseTaskStatusManager):
                         # 添加前端需要的URL字段
                         task_dict['resultUrls'] = result_urls
                         task_dict['resultUrl'] = result_urls[0] if result_urls else None
+                        task_dict['thumbnailUrls'] = thumbnail_urls(task.task_id, files)
             except Exception as e:
                 logger.error(f"获取任务结果失败 [{task.task_id}]: {e}")
                 task_dict['result_data'] = None
                 task_dict['resultUrls'] = []
                 task_dict['resultUrl'] = None
+                task_dict['thumbnailUrls'] = []
         else:
             task_dict['result_data'] = None
             task_dict['resultUrls'] = []
             task_dict['resultUrl'] = None
+            task_dict['thumbnailUrls'] = []
 
         return task_dict
 
+    def _schedule_thumbnails(self, files: List[str]):
+        """本地结果提交后预先生成缩略图（分布式结果在同步到主机后生成）"""
+        thumbnail_service = get_thumbnail_service()
+        if thumbnail_service:
+            run_after_commit(lambda: thumbnail_service.submit(files))
+
+    def _schedule_storage_index(self, files: List[str], owner: Optional[str]):
+        """本地结果提交后记录到存储索引（分布式结果在同步到主机时记录）"""
+        storage_index = get_storage_index()
+        if storage_index:
+            run_after_commit(lambda: storage_index.add(files, owner))
+
     def _convert_file_path_to_url(self, file_path: str) -> str:
         """将文件路径转换为静态文件URL"""
-        import os
-        import re
-
         # 调试日志
         logger.debug(f"转换文件路径: {file_path}")
 
@@ -494,47 +887,11 @@ class DatabaseTaskStatusManager(BaseTaskStatusManager):
         except Exception as e:
             logger.warning(f"检查分布式模式失败: {e}")
 
-        # 标准化路径分隔符
-        file_path = file_path.replace('\\', '/')
-
-        # 尝试匹配backend/outputs目录
-        if '/backend/outputs/' in file_path or 'backend/outputs/' in file_path:
-            # 使用正则表达式匹配outputs之后的路径
-            match = re.search(r'backend/outputs/(.+)$', file_path)
-            if match:
-                url_path = match.group(1)
-                logger.debug(f"Backend输出URL: /outputs/{url_path}")
-                return f"/outputs/{url_path}"
-
-        # 尝试匹配项目根目录下的outputs目录
-        if '/outputs/' in file_path:
-            # 使用正则表达式匹配最后一个outputs之后的路径
-            match = re.search(r'outputs/(.+)$', file_path)
-            if match:
-                url_path = match.group(1)
-                logger.debug(f"项目输出URL: /outputs/{url_path}")
-                return f"/outputs/{url_path}"
-
-        # 尝试匹配ComfyUI output目录
-        if '/ComfyUI/output/' in file_path or 'ComfyUI/output/' in file_path:
-            # 使用正则表达式匹配output之后的路径
-            match = re.search(r'ComfyUI/output/(.+)$', file_path)
-            if match:
-                url_path = match.group(1)
-                logger.debug(f"ComfyUI输出URL: /comfyui-output/{url_path}")
-                return f"/comfyui-output/{url_path}"
-
-        # 尝试匹配任何output目录（兜底）
-        if '/output/' in file_path:
-            match = re.search(r'output/(.+)$', file_path)
-            if match:
-                url_path = match.group(1)
-                logger.debug(f"通用输出URL: /comfyui-output/{url_path}")
-                return f"/comfyui-output/{url_path}"
-
-        # 默认返回None（使用下载接口作为兜底）
-        logger.debug(f"无法转换路径: {file_path}")
-        return None
+        # 标准化路径分隔符后按前缀表匹配，无法匹配时返回None（使用下载接口作为兜底）
+        url = output_path_to_url(file_path.replace('\\', '/'))
+        if url is None:
+            logger.debug(f"无法转换路径: {file_path}")
+        return url
 
     def _result_to_dict(self, result) -> Dict[str, Any]:
         """将结果对象转换为字典"""
@@ -547,6 +904,7 @@ class DatabaseTaskStatusManager(BaseTaskStatusManager):
             'height': result.height,
             'duration': float(result.duration) if result.duration else None,
             'thumbnail_path': getattr(result, 'thumbnail_path', None),
+            'content_version': (getattr(result, 'result_metadata', None) or {}).get('content_version'),
             'download_count': result.download_count,
             'created_at': result.created_at.isoformat() if result.created_at else None
         }
@@ -555,7 +913,7 @@ class DatabaseTaskStatusManager(BaseTaskStatusManager):
         """过滤全局任务表字段"""
         allowed_fields = {
             'status', 'priority', 'progress', 'message', 'error_message',
-            'celery_task_id', 'node_id', 'estimated_time', 'actual_time',
+            'celery_task_id', 'node_id', 'prompt_id', 'estimated_time', 'actual_time',
             'started_at', 'completed_at',
             # 生成参数字段
             'model_name', 'width', 'height', 'steps', 'cfg_scale',
@@ -0,0 +1,147 @@
+"""
+工作单元（Unit of Work）
+在一个请求或Celery任务的处理范围内，所有DAO共享同一组数据库会话（每个数据库一个），
+DAO内部的commit变为flush，由工作单元在结束时统一提交一次；
+DAO内部发生错误回滚时，整个工作单元在结束时回滚并抛出UnitOfWorkError。
+
+未开启工作单元时DAO行为不变：每次调用使用独立会话并立即提交。
+
+    with unit_of_work():
+        status_manager.create_task(task_data)
+        status_manager.set_task_status(task_id, initial_status)
+
+注意：多个数据库的会话按顺序分别提交，跨库提交不是原子的
+"""
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Callable, Optional, List
+
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+_current_unit_of_work: ContextVar[Optional['UnitOfWork']] = ContextVar('current_unit_of_work', default=None)
+
+
+class UnitOfWorkError(RuntimeError):
+    """工作单元中有DAO操作失败，全部变更已回滚"""
+    pass
+
+
+class _UnitOfWorkSession:
+    """交给DAO使用的会话代理：commit改为flush，close不关闭会话，rollback标记工作单元失败"""
+
+    def __init__(self, unit: 'UnitOfWork', session: Session):
+        self._unit = unit
+        self._session = session
+
+    def commit(self):
+        self._session.flush()
+
+    def close(self):
+        pass
+
+    def rollback(self):
+        self._unit.mark_failed()
+        self._session.rollback()
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+
+class UnitOfWork:
+    """工作单元：按数据库名惰性创建会话，结束时统一提交或回滚"""
+
+    def __init__(self, session_factory: Optional[Callable[[str], Session]] = None):
+        if session_factory is None:
+            from .connection import get_database_manager
+            session_factory = get_database_manager().get_session_direct
+        self._session_factory = session_factory
+        self._sessions: Dict[str, Session] = {}
+        self._after_commit: List[Callable[[], None]] = []
+        self.failed = False
+
+    def session(self, db_name: str) -> _UnitOfWorkSession:
+        """获取指定数据库在本工作单元中的共享会话"""
+        session = self._sessions.get(db_name)
+        if session is None:
+            session = self._session_factory(db_name)
+            # 提交后返回给调用方的对象仍可访问
+            session.expire_on_commit = False
+            self._sessions[db_name] = session
+        return _UnitOfWorkSession(self, session)
+
+    def mark_failed(self):
+        """标记工作单元失败，结束时回滚所有会话"""
+        self.failed = True
+
+    def after_commit(self, callback: Callable[[], None]):
+        """注册提交成功后执行的回调（如缓存失效、唤醒中继）"""
+        self._after_commit.append(callback)
+
+    def commit(self):
+        """提交所有会话，失败时回滚并抛出异常"""
+        try:
+            for session in self._sessions.values():
+                session.commit()
+        except Exception:
+            self.rollback()
+            raise
+
+        for callback in self._after_commit:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"工作单元提交后回调失败: {e}")
+
+    def rollback(self):
+        """回滚所有会话"""
+        for db_name, session in self._sessions.items():
+            try:
+                session.rollback()
+            except Exception as e:
+                logger.error(f"工作单元回滚失败 [{db_name}]: {e}")
+
+    def close(self):
+        """关闭所有会话，归还连接"""
+        for session in self._sessions.values():
+            session.close()
+        self._sessions.clear()
+
+
+def get_current_unit_of_work() -> Optional[UnitOfWork]:
+    """获取当前上下文中的工作单元"""
+    return _current_unit_of_work.get()
+
+
+def run_after_commit(callback: Callable[[], None]):
+    """在当前工作单元提交后执行回调，没有工作单元时立即执行"""
+    unit = _current_unit_of_work.get()
+    if unit is None:
+        callback()
+    else:
+        unit.after_commit(callback)
+
+
+@contextmanager
+def unit_of_work(session_factory: Optional[Callable[[str], Session]] = None):
+    """开启工作单元，已处于工作单元中时加入外层工作单元"""
+    outer = _current_unit_of_work.get()
+    if outer is not None:
+        yield outer
+        return
+
+    unit = UnitOfWork(session_factory)
+    token = _current_unit_of_work.set(unit)
+    try:
+        yield unit
+        if unit.failed:
+            raise UnitOfWorkError("工作单元中有数据库操作失败，已回滚全部变更")
+        unit.commit()
+    except Exception:
+        unit.rollback()
+        raise
+    finally:
+        _current_unit_of_work.reset(token)
+        unit.close()
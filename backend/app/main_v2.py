@@ -1,6 +1,7 @@
 """
 多模态内容生成工作流管理系统 - 主应用
 """
+import asyncio
 import logging
 import time
 from contextlib import asynccontextmanager
@@ -36,6 +37,25 @@ async def lifespan(app: FastAPI):
         # 初始化核心组件
         await initialize_system()
 
+        # 启动事件循环阻塞检测（同步调用阻塞事件循环时记录耗时和调用栈）
+        try:
+            from .core.loop_monitor import get_loop_block_detector
+            loop_detector = get_loop_block_detector()
+            if loop_detector:
+                loop_detector.start()
+                print("🩺 事件循环阻塞检测已启动")
+        except Exception as e:
+            print(f"⚠️  事件循环阻塞检测启动失败: {e}")
+
+        # 在线程中加载节点文件缓存索引，首批请求即可命中已缓存的文件
+        try:
+            from .core.file_cache import get_node_file_cache
+            file_cache = get_node_file_cache()
+            if file_cache:
+                await file_cache.load()
+        except Exception as e:
+            print(f"⚠️  节点文件缓存加载失败: {e}")
+
         # 初始化所有服务（避免动态导入导致的表冲突）
         try:
             from .services.file_service import get_file_service
@@ -53,6 +73,26 @@ async def lifespan(app: FastAPI):
         except Exception as e:
             print(f"⚠️  服务预初始化失败: {e}")
 
+        # 启动数据保留任务（维护月分区、归档过期数据）
+        try:
+            from .core.config_manager import get_config_manager
+            if get_config_manager().get_config('retention').get('enabled', False):
+                from .database.retention import get_retention_manager
+                get_retention_manager().start()
+                print("🗃️  数据保留任务已启动")
+        except Exception as e:
+            print(f"⚠️  数据保留任务启动失败: {e}")
+
+        # 启动结果文件同步（分布式结果下载到主机，并定期补扫遗漏的结果）
+        try:
+            from .core.result_sync import get_result_file_sync
+            result_sync = get_result_file_sync()
+            if result_sync:
+                result_sync.start(sweep=True)
+                print("📥 结果文件同步已启动")
+        except Exception as e:
+            print(f"⚠️  结果文件同步启动失败: {e}")
+
         print("✅ 系统启动完成，服务已就绪！")
         print("="*60 + "\n")
 
@@ -78,16 +118,10 @@ async def initialize_system():
         # 2. 初始化数据库连接
         from .database.connection import initialize_database
         config = config_manager.get_config()
-        initialize_database(config)
+        initialize_database(config, use_async=True)
         print("🗄️  数据库连接已初始化")
 
-        # 3. 测试数据库连接
-        from .database.connection import get_database_manager
-        db_manager = get_database_manager()
-        test_results = db_manager.test_connections()
-        for db_name, success in test_results.items():
-            status = "✅" if success else "❌"
-            print(f"   {status} {db_name} 数据库连接测试")
+        # 3. 数据库连接测试与其他依赖探测一起并行执行（见check_system_dependencies）
 
         # 4. 初始化任务类型管理器
         from .core.task_manager import get_task_type_manager
@@ -129,118 +163,186 @@ async def initialize_system():
         raise
 
 
-async def check_system_dependencies():
-    """检查系统依赖"""
-    from .core.config_manager import get_config_manager
+async def _probe_database():
+    """探测数据库连接（同步驱动，放到线程中执行）"""
+    from .database.connection import get_database_manager
+    return await asyncio.to_thread(get_database_manager().test_connections)
 
-    config_manager = get_config_manager()
 
-    # 检查Redis连接（带重试机制）
-    redis_available = False
+async def _probe_redis(redis_config: dict):
+    """探测Redis连接，返回 (是否可用, 错误信息)"""
     try:
-        import redis
-        import time
-        redis_config = config_manager.get_redis_config()
-
-        # 重试3次，每次间隔1秒
-        for attempt in range(3):
-            try:
-                r = redis.Redis(
-                    host=redis_config.get('host', 'localhost'),
-                    port=redis_config.get('port', 6379),
-                    db=redis_config.get('db', 0),
-                    password=redis_config.get('password'),
-                    socket_connect_timeout=2,  # 连接超时2秒
-                    socket_timeout=2,          # 操作超时2秒
-                    retry_on_timeout=True
-                )
-                r.ping()
-                redis_available = True
-                break
-            except Exception as e:
-                if attempt < 2:  # 前两次失败时等待
-                    time.sleep(1)
-                else:
-                    # 最后一次失败，记录详细错误
-                    print(f"🟡 Redis: 连接失败 ({e})")
-
-        if redis_available:
-            print("🔴 Redis: 已连接")
-        else:
-            print("🟡 Redis: 不可用 (使用内存模式)")
-
+        import redis.asyncio as aioredis
     except ImportError:
-        print("🟡 Redis: 模块未安装 (使用内存模式)")
+        return False, "模块未安装"
+
+    client = aioredis.Redis(
+        host=redis_config.get('host', 'localhost'),
+        port=redis_config.get('port', 6379),
+        db=redis_config.get('db', 0),
+        password=redis_config.get('password'),
+        socket_connect_timeout=2,  # 连接超时2秒
+        socket_timeout=2           # 操作超时2秒
+    )
+    try:
+        await client.ping()
+        return True, ""
     except Exception as e:
-        print(f"🟡 Redis: 检查异常 ({e}) (使用内存模式)")
+        return False, str(e)
+    finally:
+        await client.aclose()
+
+
+async def _probe_comfyui(session, url: str):
+    """探测ComfyUI实例，返回HTTP状态码或异常"""
+    import aiohttp
 
-    # 检查ComfyUI连接 - 支持分布式模式
     try:
-        import aiohttp
+        async with session.get(f"{url}/system_stats", timeout=aiohttp.ClientTimeout(total=5)) as response:
+            return response.status
+    except Exception as e:
+        return e
 
-        if config_manager.is_distributed_mode():
-            # 分布式模式：检查所有节点
-            try:
-                from .core.node_manager import get_node_manager
-                node_manager = get_node_manager()
-                nodes_dict = node_manager.get_all_nodes()
-
-                if not nodes_dict:
-                    print("❌ ComfyUI: 没有配置的分布式节点")
-                else:
-                    print(f"🌐 ComfyUI: 分布式模式 ({len(nodes_dict)} 个节点)")
-                    healthy_count = 0
-
-                    async with aiohttp.ClientSession() as session:
-                        for node_id, node in nodes_dict.items():
-                            try:
-                                async with session.get(f"{node.url}/system_stats", timeout=5) as response:
-                                    if response.status == 200:
-                                        print(f"  ✅ {node_id}: 已连接 ({node.url})")
-                                        healthy_count += 1
-                                    else:
-                                        print(f"  🟡 {node_id}: 响应异常 ({response.status}) - {node.url}")
-                            except Exception as e:
-                                print(f"  ❌ {node_id}: 连接失败 - {node.url} ({str(e)[:50]})")
-
-                    if healthy_count > 0:
-                        print(f"🎨 ComfyUI: {healthy_count}/{len(nodes_dict)} 个节点可用")
-                    else:
-                        print("❌ ComfyUI: 所有分布式节点都不可用")
 
-            except Exception as e:
-                # 分布式组件初始化失败，降级到单机模式
-                print(f"🟡 ComfyUI: 分布式检查失败，降级到单机模式 ({str(e)[:50]})")
-                comfyui_config = config_manager.get_comfyui_config()
-                host = comfyui_config.get('host', '127.0.0.1')
-                port = comfyui_config.get('port', 8188)
-
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(f"http://{host}:{port}/system_stats", timeout=5) as response:
-                        if response.status == 200:
-                            print(f"🎨 ComfyUI: 已连接 ({host}:{port}) [单机模式]")
-                        else:
-                            print(f"🟡 ComfyUI: 响应异常 ({response.status}) [单机模式]")
-        else:
-            # 单机模式：检查配置文件中的ComfyUI实例
-            comfyui_config = config_manager.get_comfyui_config()
-            host = comfyui_config.get('host', '127.0.0.1')
-            port = comfyui_config.get('port', 8188)
-
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"http://{host}:{port}/system_stats", timeout=5) as response:
-                    if response.status == 200:
-                        print(f"🎨 ComfyUI: 已连接 ({host}:{port}) [单机模式]")
-                    else:
-                        print(f"🟡 ComfyUI: 响应异常 ({response.status}) [单机模式]")
+async def check_system_dependencies():
+    """检查系统依赖
 
-    except Exception as e:
-        print(f"❌ ComfyUI: 连接检查失败 ({str(e)[:50]})")
+    数据库、Redis与所有ComfyUI节点的探测并行执行，
+    启动耗时取决于最慢的一个探测，而不是所有探测超时之和。
+    """
+    import aiohttp
+    from .core.config_manager import get_config_manager
+
+    config_manager = get_config_manager()
+
+    # 确定需要探测的ComfyUI实例
+    comfyui_targets = {}
+    distributed = False
+    if config_manager.is_distributed_mode():
+        try:
+            from .core.node_manager import get_node_manager
+            nodes_dict = get_node_manager().get_all_nodes()
+            if nodes_dict:
+                distributed = True
+                comfyui_targets = {node_id: node.url for node_id, node in nodes_dict.items()}
+            else:
+                print("❌ ComfyUI: 没有配置的分布式节点")
+        except Exception as e:
+            # 分布式组件初始化失败，降级到单机模式
+            print(f"🟡 ComfyUI: 分布式检查失败，降级到单机模式 ({str(e)[:50]})")
+
+    if not distributed:
+        comfyui_config = config_manager.get_comfyui_config()
+        host = comfyui_config.get('host', '127.0.0.1')
+        port = comfyui_config.get('port', 8188)
+        comfyui_targets = {'default': f"http://{host}:{port}"}
+
+    async with aiohttp.ClientSession() as session:
+        db_result, redis_result, *comfyui_results = await asyncio.gather(
+            _probe_database(),
+            _probe_redis(config_manager.get_redis_config()),
+            *(_probe_comfyui(session, url) for url in comfyui_targets.values()),
+            return_exceptions=True
+        )
+
+    # 数据库
+    if isinstance(db_result, Exception):
+        print(f"❌ 数据库连接测试失败: {db_result}")
+    else:
+        for db_name, success in db_result.items():
+            status = "✅" if success else "❌"
+            print(f"   {status} {db_name} 数据库连接测试")
+
+    # Redis
+    if isinstance(redis_result, Exception):
+        print(f"🟡 Redis: 检查异常 ({redis_result}) (使用内存模式)")
+    elif redis_result[0]:
+        print("🔴 Redis: 已连接")
+    else:
+        print(f"🟡 Redis: 不可用 ({redis_result[1]}) (使用内存模式)")
+
+    # ComfyUI
+    if distributed:
+        print(f"🌐 ComfyUI: 分布式模式 ({len(comfyui_targets)} 个节点)")
+        healthy_count = 0
+        for (node_id, url), result in zip(comfyui_targets.items(), comfyui_results):
+            if result == 200:
+                print(f"  ✅ {node_id}: 已连接 ({url})")
+                healthy_count += 1
+            elif isinstance(result, int):
+                print(f"  🟡 {node_id}: 响应异常 ({result}) - {url}")
+            else:
+                print(f"  ❌ {node_id}: 连接失败 - {url} ({str(result)[:50]})")
+
+        if healthy_count > 0:
+            print(f"🎨 ComfyUI: {healthy_count}/{len(comfyui_targets)} 个节点可用")
+        else:
+            print("❌ ComfyUI: 所有分布式节点都不可用")
+    else:
+        url, result = comfyui_targets['default'], comfyui_results[0]
+        if result == 200:
+            print(f"🎨 ComfyUI: 已连接 ({url}) [单机模式]")
+        elif isinstance(result, int):
+            print(f"🟡 ComfyUI: 响应异常 ({result}) [单机模式]")
+        else:
+            print(f"❌ ComfyUI: 连接检查失败 ({str(result)[:50]})")
 
 
 async def cleanup_system():
     """清理系统资源"""
     try:
+        # 关闭节点文件代理连接池
+        try:
+            from .core.file_proxy import get_node_file_proxy
+            await get_node_file_proxy().close()
+        except Exception as e:
+            print(f"⚠️  关闭文件代理连接池时出错: {e}")
+
+        # 停止数据保留任务
+        try:
+            from .core.config_manager import get_config_manager
+            if get_config_manager().get_config('retention').get('enabled', False):
+                from .database.retention import get_retention_manager
+                await asyncio.to_thread(get_retention_manager().stop)
+        except Exception as e:
+            print(f"⚠️  停止数据保留任务时出错: {e}")
+
+        # 关闭缩略图进程池
+        try:
+            from .utils.thumbnails import get_thumbnail_service
+            thumbnail_service = get_thumbnail_service()
+            if thumbnail_service:
+                thumbnail_service.shutdown()
+        except Exception as e:
+            print(f"⚠️  关闭缩略图进程池时出错: {e}")
+
+        # 停止结果文件同步
+        try:
+            from .core.result_sync import get_result_file_sync
+            result_sync = get_result_file_sync()
+            if result_sync:
+                await asyncio.to_thread(result_sync.stop)
+        except Exception as e:
+            print(f"⚠️  停止结果文件同步时出错: {e}")
+
+        # 停止事件循环阻塞检测
+        try:
+            from .core.loop_monitor import get_loop_block_detector
+            loop_detector = get_loop_block_detector()
+            if loop_detector:
+                await loop_detector.stop()
+        except Exception as e:
+            print(f"⚠️  停止事件循环阻塞检测时出错: {e}")
+
+        # 关闭异步数据库引擎和数据库线程池
+        try:
+            from .database.connection import get_database_manager
+            from .database.executor import get_database_executor
+            await get_database_manager().close_async_engines()
+            await asyncio.to_thread(get_database_executor().shutdown)
+        except Exception as e:
+            print(f"⚠️  关闭数据库线程池时出错: {e}")
+
         # 停止分布式组件
         try:
             from .core.config_manager import get_config_manager
@@ -324,6 +426,7 @@ app.add_middleware(
 # 静态文件服务
 import os
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import FileResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 # 挂载输出目录 - 支持分布式模式
@@ -345,21 +448,19 @@ try:
         def __init__(self, *args, **kwargs):
             super().__init__(*args, **kwargs)
 
-        def file_response(self, *args, **kwargs):
-            """添加缓存控制头"""
-            response = super().file_response(*args, **kwargs)
+        async def get_response(self, path, scope):
+            """输出文件返回内容哈希ETag，支持304与Range"""
+            from .core.file_response import conditional_file_response, IMMUTABLE_PUBLIC, REVALIDATE_PUBLIC
 
-            # 为图片和视频文件添加缓存控制
-            if hasattr(response, 'headers'):
-                # 图片和视频文件缓存1小时
-                if any(response.headers.get('content-type', '').startswith(ct) for ct in
-                       ['image/', 'video/']):
-                    response.headers['Cache-Control'] = 'public, max-age=3600'
-                # 其他文件缓存10分钟
-                else:
-                    response.headers['Cache-Control'] = 'public, max-age=600'
+            response = await super().get_response(path, scope)
+            if response.status_code != 200 or not isinstance(response, FileResponse):
+                return response
 
-            return response
+            # 文件名清理后可能被新结果重新使用，按ETag重新验证；带内容版本参数的URL长期缓存
+            return await conditional_file_response(
+                Request(scope), response.path, media_type=response.media_type,
+                cache_control=REVALIDATE_PUBLIC, immutable_cache_control=IMMUTABLE_PUBLIC
+            )
 
     app.mount("/outputs", OptimizedStaticFiles(directory=outputs_dir, check_dir=True, html=True), name="outputs")
 
@@ -451,6 +552,7 @@ except ImportError as e:
 
 # 保持向后兼容的旧版API
 from .auth import create_access_token, verify_token
+from .database.executor import run_sync
 from fastapi import Form, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
@@ -464,7 +566,7 @@ async def login(username: str = Form(...), password: str = Form(...)):
         auth_service = get_client_auth_service()
 
         # 验证用户凭据
-        user = auth_service.authenticate_user(username, password)
+        user = await run_sync(auth_service.authenticate_user, username, password)
         if not user:
             raise HTTPException(status_code=401, detail="用户名或密码错误")
 
@@ -507,12 +609,12 @@ async def get_profile(credentials: HTTPAuthorizationCredentials = Depends(securi
         username = payload.get("sub")
 
         # 获取用户信息
-        user = auth_service.get_user_by_username(username)
+        user = await run_sync(auth_service.get_user_by_username, username)
         if not user:
             raise HTTPException(status_code=404, detail="用户不存在")
 
         # 获取配额信息
-        quota_info = auth_service.check_quota(username)
+        quota_info = await run_sync(auth_service.check_quota, username)
 
         return {
             "username": user["username"],
@@ -530,7 +632,7 @@ async def get_profile(credentials: HTTPAuthorizationCredentials = Depends(securi
 
 
 @app.post("/api/admin/migrate-client-db")
-async def migrate_client_database():
+def migrate_client_database():
     """迁移客户端数据库（管理员功能）"""
     try:
         from sqlalchemy import text
@@ -583,7 +685,7 @@ async def migrate_client_database():
 
 
 @app.post("/api/admin/init-test-users")
-async def init_test_users():
+def init_test_users():
     """初始化测试用户（管理员功能）"""
     try:
         from sqlalchemy import text
@@ -672,7 +774,7 @@ async def sync_config_to_database():
         from .services.config_service import get_config_service
         config_service = get_config_service()
 
-        success = config_service.sync_config_to_database()
+        success = await run_sync(config_service.sync_config_to_database)
         if success:
             return {"message": "配置同步到数据库成功"}
         else:
@@ -690,7 +792,7 @@ async def get_all_configs(category: str = None):
         from .services.config_service import get_config_service
         config_service = get_config_service()
 
-        configs = config_service.get_all_configs(category)
+        configs = await run_sync(config_service.get_all_configs, category)
         return {"configs": configs}
 
     except Exception as e:
@@ -705,7 +807,7 @@ async def get_config(config_key: str):
         from .services.config_service import get_config_service
         config_service = get_config_service()
 
-        config_value = config_service.get_config(config_key)
+        config_value = await run_sync(config_service.get_config, config_key)
         return {"config_key": config_key, "config_value": config_value}
 
     except Exception as e:
@@ -723,7 +825,7 @@ async def update_config(config_key: str, config_data: dict):
         config_value = config_data.get('config_value')
         description = config_data.get('description')
 
-        success = config_service.set_config(config_key, config_value, description, 'admin_api')
+        success = await run_sync(config_service.set_config, config_key, config_value, description, 'admin_api')
         if success:
             return {"message": f"配置 {config_key} 更新成功"}
         else:
@@ -738,14 +840,17 @@ async def update_config(config_key: str, config_data: dict):
 async def get_access_logs(
     client_id: str = None,
     limit: int = 100,
-    offset: int = 0
+    offset: int = 0,
+    days: int = 7
 ):
-    """获取访问日志（管理员功能）"""
+    """获取访问日志（管理员功能），默认只查询最近7天（days<=0时不限制）"""
     try:
         from .services.log_service import get_log_service
+        from datetime import datetime, timedelta
         log_service = get_log_service()
 
-        logs = log_service.get_client_access_logs(client_id, limit, offset)
+        since = datetime.utcnow() - timedelta(days=days) if days > 0 else None
+        logs = await run_sync(log_service.get_client_access_logs, client_id, limit, offset, since)
         return {"logs": logs, "total": len(logs)}
 
     except Exception as e:
@@ -758,14 +863,17 @@ async def get_system_logs(
     event_type: str = None,
     level: str = None,
     limit: int = 100,
-    offset: int = 0
+    offset: int = 0,
+    days: int = 7
 ):
-    """获取系统日志（管理员功能）"""
+    """获取系统日志（管理员功能），默认只查询最近7天（days<=0时不限制）"""
     try:
         from .services.log_service import get_log_service
+        from datetime import datetime, timedelta
         log_service = get_log_service()
 
-        logs = log_service.get_system_logs(event_type, level, limit, offset)
+        since = datetime.utcnow() - timedelta(days=days) if days > 0 else None
+        logs = await run_sync(log_service.get_system_logs, event_type, level, limit, offset, since)
         return {"logs": logs, "total": len(logs)}
 
     except Exception as e:
@@ -774,13 +882,15 @@ async def get_system_logs(
 
 
 @app.get("/api/admin/logs/statistics")
-async def get_access_statistics(client_id: str = None):
-    """获取访问统计（管理员功能）"""
+async def get_access_statistics(client_id: str = None, days: int = 7):
+    """获取访问统计（管理员功能），默认统计最近7天（days<=0时不限制）"""
     try:
         from .services.log_service import get_log_service
+        from datetime import datetime, timedelta
         log_service = get_log_service()
 
-        stats = log_service.get_access_statistics(client_id)
+        start_date = datetime.utcnow() - timedelta(days=days) if days > 0 else None
+        stats = await run_sync(log_service.get_access_statistics, client_id, start_date)
         return {"statistics": stats}
 
     except Exception as e:
@@ -795,7 +905,7 @@ async def get_current_performance():
         from .services.performance_service import get_performance_service
         performance_service = get_performance_service()
 
-        metrics = performance_service.collect_system_metrics()
+        metrics = await run_sync(performance_service.collect_system_metrics)
         return {"metrics": metrics}
 
     except Exception as e:
@@ -820,7 +930,8 @@ async def get_performance_history(
         end_time = datetime.utcnow()
         start_time = end_time - timedelta(hours=hours)
 
-        metrics = performance_service.get_performance_metrics(
+        metrics = await run_sync(
+            performance_service.get_performance_metrics,
             metric_type=metric_type,
             metric_name=metric_name,
             start_time=start_time,
@@ -842,7 +953,7 @@ async def get_performance_summary(hours: int = 24):
         from .services.performance_service import get_performance_service
         performance_service = get_performance_service()
 
-        summary = performance_service.get_performance_summary(hours)
+        summary = await run_sync(performance_service.get_performance_summary, hours)
         return {"summary": summary}
 
     except Exception as e:
@@ -857,7 +968,7 @@ async def collect_performance_metrics():
         from .services.performance_service import get_performance_service
         performance_service = get_performance_service()
 
-        success = performance_service.record_system_metrics()
+        success = await run_sync(performance_service.record_system_metrics)
         if success:
             return {"message": "性能指标收集成功"}
         else:
@@ -867,6 +978,54 @@ async def collect_performance_metrics():
         logger.error(f"收集性能指标失败: {e}")
         raise HTTPException(status_code=500, detail=f"收集性能指标失败: {str(e)}")
 
+
+@app.get("/api/admin/storage/stats")
+async def get_storage_stats():
+    """获取输出文件存储统计（管理员功能）"""
+    try:
+        from .utils.output_manager import get_output_manager
+
+        stats = await run_sync(get_output_manager().get_storage_stats)
+        return {"stats": stats}
+
+    except Exception as e:
+        logger.error(f"获取存储统计失败: {e}")
+        raise HTTPException(status_code=500, detail=f"获取存储统计失败: {str(e)}")
+
+
+@app.post("/api/admin/storage/cleanup")
+async def cleanup_storage(days: int = None):
+    """清理输出文件（管理员功能）：days为空时清理已过期的文件，否则只清理早于该天数的文件"""
+    try:
+        from .utils.output_manager import get_output_manager
+
+        deleted = await run_sync(get_output_manager().cleanup_old_files, days)
+        return {"message": f"已清理 {deleted} 个文件", "deleted_files": deleted}
+
+    except Exception as e:
+        logger.error(f"清理输出文件失败: {e}")
+        raise HTTPException(status_code=500, detail=f"清理输出文件失败: {str(e)}")
+
+
+@app.post("/api/admin/storage/rebuild-index")
+async def rebuild_storage_index():
+    """遍历输出目录重建存储索引（管理员功能，用于补录启用索引前已有的文件）"""
+    try:
+        from .database.storage_index import get_storage_index
+
+        storage_index = get_storage_index()
+        if storage_index is None:
+            raise HTTPException(status_code=400, detail="存储索引未启用")
+
+        indexed = await run_sync(storage_index.rebuild)
+        return {"message": f"存储索引已重建，共 {indexed} 个文件", "indexed_files": indexed}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"重建存储索引失败: {e}")
+        raise HTTPException(status_code=500, detail=f"重建存储索引失败: {str(e)}")
+
 # 兼容旧版接口
 @app.post("/api/generate/image")
 async def generate_image_legacy(
@@ -0,0 +1,427 @@
+"""
+异步工作流执行器
+在Worker进程内以单个事件循环驱动大量并发任务协程：
+ComfyUI提交/轮询走共享的aiohttp连接池，状态写入在独立线程池中执行，
+每个节点通过信号量限制同时占用的槽位数。
+
+Celery 5.x没有原生asyncio执行池，异步模式需配合 --pool=threads 启动，
+各执行线程只阻塞在Future上，所有网络等待都在同一事件循环中复用。
+"""
+import asyncio
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Any, Optional, Tuple
+
+import aiohttp
+
+from ..core.base import TaskType, TaskStatus, WorkflowExecutionError, NodeStatus, TaskCancelledError
+from ..core.config_manager import get_config_manager
+
+logger = logging.getLogger(__name__)
+
+
+# 各任务类型的执行参数（与同步执行逻辑保持一致）
+WORKFLOW_PROFILES = {
+    'text_to_image': {
+        'task_type': TaskType.TEXT_TO_IMAGE,
+        'default_workflow': 'sd_basic',
+        'label': '文生图',
+        'max_wait': 300,      # 5分钟
+        'poll_interval': 3
+    },
+    'image_to_video': {
+        'task_type': TaskType.IMAGE_TO_VIDEO,
+        'default_workflow': 'svd_basic',
+        'label': '图生视频',
+        'max_wait': 600,      # 10分钟（视频生成需要更长时间）
+        'poll_interval': 5    # 视频生成检查间隔更长
+    }
+}
+
+
+def is_async_worker_mode() -> bool:
+    """检查是否启用异步Worker模式"""
+    try:
+        task_queue_config = get_config_manager().get_task_queue_config()
+        return task_queue_config.get('worker_mode', 'prefork') == 'async'
+    except Exception:
+        return False
+
+
+class AsyncWorkflowRunner:
+    """异步工作流执行器"""
+
+    def __init__(self, connection_limit: int = 200, status_write_workers: int = 8):
+        self.connection_limit = connection_limit
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._start_lock = threading.Lock()
+        self.status_write_workers = status_write_workers
+        self._status_executor: Optional[ThreadPoolExecutor] = None
+        self._node_slots: Dict[str, asyncio.Semaphore] = {}
+        self._node_waiting: Dict[str, int] = {}
+
+    @property
+    def running(self) -> bool:
+        return self._loop is not None and self._loop.is_running()
+
+    def start(self):
+        """启动事件循环线程"""
+        with self._start_lock:
+            if self.running:
+                return
+
+            # 状态写入线程池随事件循环创建，停止后再次启动时重新创建
+            self._status_executor = ThreadPoolExecutor(
+                max_workers=self.status_write_workers, thread_name_prefix='status-writer'
+            )
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(
+                target=self._loop.run_forever, name='async-workflow-loop', daemon=True
+            )
+            self._thread.start()
+            asyncio.run_coroutine_threadsafe(self._create_session(), self._loop).result()
+            logger.info(f"异步工作流执行器已启动，连接池上限: {self.connection_limit}")
+
+    def stop(self):
+        """停止事件循环线程"""
+        with self._start_lock:
+            if not self.running:
+                return
+
+            try:
+                asyncio.run_coroutine_threadsafe(self._close_session(), self._loop).result(timeout=5)
+            except Exception as e:
+                logger.warning(f"关闭HTTP连接池失败: {e}")
+
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._loop.close()
+            self._loop = None
+            self._status_executor.shutdown(wait=False)
+            self._status_executor = None
+            # 信号量绑定在已关闭的事件循环上，重新启动后按需重建
+            self._node_slots.clear()
+            self._node_waiting.clear()
+            logger.info("异步工作流执行器已停止")
+
+    def run(self, coro, timeout: Optional[float] = None):
+        """在事件循环中执行协程并阻塞等待结果（供Celery执行线程调用）"""
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout)
+
+    async def _create_session(self):
+        connector = aiohttp.TCPConnector(limit=self.connection_limit)
+        self._session = aiohttp.ClientSession(connector=connector)
+
+    async def _close_session(self):
+        if self._session:
+            await self._session.close()
+            self._session = None
+
+    # ---------------- 节点槽位 ----------------
+
+    def _get_node_slot(self, node_id: str, limit: int) -> asyncio.Semaphore:
+        """获取节点槽位信号量（仅在事件循环线程中调用）"""
+        slot = self._node_slots.get(node_id)
+        if slot is None:
+            slot = asyncio.Semaphore(max(1, limit))
+            self._node_slots[node_id] = slot
+        return slot
+
+    async def _select_node(self, task_type: TaskType) -> Tuple[str, str, int]:
+        """选择执行节点
+
+        Returns:
+            tuple: (comfyui_url, node_id, 节点槽位数)
+        """
+        config_manager = get_config_manager()
+
+        if config_manager.is_distributed_mode():
+            try:
+                from ..core.node_manager import get_node_manager
+                from ..core.load_balancer import get_load_balancer
+
+                node_manager = get_node_manager()
+                if not node_manager._running:
+                    await node_manager.start()
+
+                candidates = [
+                    node for node in node_manager.get_all_nodes().values()
+                    if node.status == NodeStatus.ONLINE
+                    and (not node.capabilities or task_type.value in node.capabilities)
+                ]
+
+                if candidates:
+                    available = [node for node in candidates if node.is_available]
+                    selected_node = get_load_balancer().select_node(available, task_type) if available else None
+                    if not selected_node:
+                        # 所有节点都已满载，选择排队最短的节点在其槽位上等待
+                        selected_node = min(
+                            candidates,
+                            key=lambda n: n.current_load + self._node_waiting.get(n.node_id, 0)
+                        )
+                    return selected_node.url, selected_node.node_id, selected_node.max_concurrent
+
+                logger.warning("分布式模式：没有在线的ComfyUI节点，降级到单机模式")
+
+            except Exception as e:
+                logger.error(f"分布式节点选择失败: {e}")
+
+        comfyui_config = config_manager.get_comfyui_config()
+        comfyui_url = f"http://{comfyui_config.get('host', '127.0.0.1')}:{comfyui_config.get('port', 8188)}"
+        return comfyui_url, "default", config_manager.get_max_concurrent_tasks(task_type)
+
+    async def _assign_node(self, node_id: str, task_id: str):
+        if node_id == "default":
+            return
+        from ..core.node_manager import get_node_manager
+        await get_node_manager().assign_task_to_node(node_id, task_id)
+
+    async def _release_node(self, node_id: str, task_id: str):
+        if node_id == "default":
+            return
+        try:
+            from ..core.node_manager import get_node_manager
+            await get_node_manager().remove_task_from_node(node_id, task_id)
+            logger.debug(f"已清理节点任务分配: {task_id} <- {node_id}")
+        except Exception as e:
+            logger.warning(f"清理节点任务分配失败: {e}")
+
+    # ---------------- ComfyUI交互 ----------------
+
+    async def submit_prompt(self, comfyui_url: str, workflow: Dict[str, Any]) -> str:
+        """提交工作流到ComfyUI，返回prompt_id"""
+        logger.info(f"向ComfyUI提交工作流: {comfyui_url}/prompt")
+        try:
+            async with self._session.post(
+                f"{comfyui_url}/prompt",
+                json={"prompt": workflow},
+                timeout=aiohttp.ClientTimeout(total=30)
+            ) as response:
+                if response.status != 200:
+                    text = await response.text()
+                    error_detail = f"状态码: {response.status}, 响应: {text[:500]}"
+                    logger.error(f"ComfyUI API调用失败: {error_detail}")
+                    raise WorkflowExecutionError(f"ComfyUI API调用失败: {error_detail}")
+
+                response_data = await response.json(content_type=None)
+
+        except asyncio.TimeoutError:
+            raise Exception(f"ComfyUI请求超时 (URL: {comfyui_url})")
+        except aiohttp.ClientConnectionError:
+            raise Exception(f"无法连接到ComfyUI服务器 (URL: {comfyui_url})")
+
+        if "prompt_id" not in response_data:
+            logger.error(f"ComfyUI响应格式异常: {response_data}")
+            raise Exception("ComfyUI响应中缺少prompt_id")
+
+        return response_data["prompt_id"]
+
+    async def wait_for_history(self, comfyui_url: str, prompt_id: str,
+                               max_wait: float, poll_interval: float,
+                               cancel_check=None) -> Dict[str, Any]:
+        """轮询ComfyUI历史记录直到任务完成
+
+        cancel_check为可选的协程函数，返回True时抛出TaskCancelledError停止等待
+        """
+        deadline = time.monotonic() + max_wait
+
+        while time.monotonic() < deadline:
+            if cancel_check and await cancel_check():
+                raise TaskCancelledError(f"提示词所属任务已被取消: {prompt_id}")
+
+            try:
+                async with self._session.get(
+                    f"{comfyui_url}/history/{prompt_id}",
+                    timeout=aiohttp.ClientTimeout(total=10)
+                ) as response:
+                    if response.status == 200:
+                        history = await response.json(content_type=None)
+                        if prompt_id in history:
+                            logger.info(f"工作流执行完成: {prompt_id}")
+                            return history[prompt_id]
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.warning(f"查询历史记录失败: {e}")
+
+            await asyncio.sleep(poll_interval)
+
+        raise Exception("任务超时，ComfyUI可能处理时间过长")
+
+    # ---------------- 任务执行 ----------------
+
+    async def _write_status(self, task, task_id: str, status_data: Dict[str, Any],
+                            celery_task_id: Optional[str] = None):
+        """在状态写入线程池中更新任务状态，不阻塞事件循环"""
+        await self._loop.run_in_executor(
+            self._status_executor,
+            functools.partial(task.update_task_status, task_id, status_data, celery_task_id=celery_task_id)
+        )
+
+    async def execute_workflow(self, task, request_data: Dict[str, Any], task_type: str,
+                               celery_task_id: Optional[str] = None) -> Dict[str, Any]:
+        """执行单个工作流任务（协程版本的任务主体）"""
+        profile = WORKFLOW_PROFILES[task_type]
+        label = profile['label']
+        task_id = request_data.get('task_id')
+        if not task_id:
+            logger.error("任务ID缺失，无法执行任务")
+            return {
+                'status': 'failed',
+                'error': '任务ID缺失，无法执行任务',
+                'message': '任务ID缺失，无法执行任务'
+            }
+
+        write_status = functools.partial(self._write_status, task, task_id, celery_task_id=celery_task_id)
+        # 异常分支会读取这些变量，提前初始化，避免在赋值前失败时引用未定义的名称
+        comfyui_url = None
+        node_id = None
+        prompt_id = None
+
+        try:
+            logger.info(f"开始执行{label}任务(异步): {task_id}")
+            await write_status({
+                'status': 'processing',
+                'progress': 0,
+                'message': f'正在处理{label}任务...'
+            })
+
+            # 工作流参数处理涉及文件读取，放到默认线程池中执行
+            from ..core.workflow_parameter_processor import get_workflow_parameter_processor
+            workflow_name = request_data.get('workflow_name', profile['default_workflow'])
+            logger.info(f"处理工作流参数: {workflow_name}")
+            complete_workflow = await self._loop.run_in_executor(
+                None, get_workflow_parameter_processor().process_workflow_request, workflow_name, request_data
+            )
+            if not complete_workflow:
+                raise Exception(f"工作流 {workflow_name} 处理失败")
+
+            await write_status({
+                'status': 'processing',
+                'progress': 20,
+                'message': '工作流参数处理完成，正在等待节点槽位...'
+            })
+
+            comfyui_url, node_id, slot_limit = await self._select_node(profile['task_type'])
+            slot = self._get_node_slot(node_id, slot_limit)
+
+            self._node_waiting[node_id] = self._node_waiting.get(node_id, 0) + 1
+            try:
+                await slot.acquire()
+            finally:
+                self._node_waiting[node_id] -= 1
+
+            try:
+                await self._assign_node(node_id, task_id)
+                logger.info(f"任务 {task_id} 分配到节点 {node_id} ({comfyui_url})")
+
+                prompt_id = await self.submit_prompt(comfyui_url, complete_workflow)
+                logger.info(f"工作流已成功提交到ComfyUI，prompt_id: {prompt_id}")
+
+                submitted_status = {
+                    'status': 'processing',
+                    'progress': 30,
+                    'message': f'工作流已提交，正在等待ComfyUI处理... (ID: {prompt_id})',
+                    'prompt_id': prompt_id
+                }
+                if node_id != "default":
+                    submitted_status['node_id'] = node_id
+                await write_status(submitted_status)
+
+                result_data = await self.wait_for_history(
+                    comfyui_url, prompt_id, profile['max_wait'], profile['poll_interval'],
+                    cancel_check=functools.partial(
+                        self._loop.run_in_executor, self._status_executor, task._is_task_cancelled, task_id
+                    )
+                )
+            finally:
+                slot.release()
+                await self._release_node(node_id, task_id)
+
+            # 结果处理会写数据库并整理输出文件，同样在状态写入线程池中执行
+            processed_result = await self._loop.run_in_executor(
+                self._status_executor, task._process_comfyui_result, result_data, task_id, node_id
+            )
+            output_files = processed_result.get('files', [])
+
+            if task_type == 'image_to_video' and not output_files:
+                raise Exception("未生成任何输出文件")
+
+            update_data = {
+                'status': TaskStatus.COMPLETED.value,
+                'progress': 100,
+                'message': f'{label}任务完成',
+                'result_data': processed_result,
+                'completed_at': datetime.now(),
+                'updated_at': datetime.now().isoformat()
+            }
+            if task_type == 'text_to_image':
+                for key, value in task._extract_generation_params(request_data, complete_workflow).items():
+                    if value is not None and key not in ['batch_id', 'created_at']:
+                        update_data[key] = value
+
+            await write_status(update_data)
+
+            logger.info(f"{label}任务完成: {task_id}")
+            return {
+                'status': 'completed',
+                'task_id': task_id,
+                'result': {k: v for k, v in processed_result.items() if k != 'original_result'},
+                'files': output_files,
+                'message': f'{label}任务完成'
+            }
+
+        except TaskCancelledError:
+            # 取消状态已由取消方持久化，这里只停止节点上的提示词并清理部分输出（节点槽位已在finally中释放）
+            logger.info(f"任务已被取消，停止执行: {task_id}")
+            if prompt_id:
+                from ..core.task_canceller import get_task_canceller
+                await get_task_canceller().stop_prompt(prompt_id, node_id, comfyui_url)
+            return {
+                'status': 'cancelled',
+                'message': '任务已取消',
+                'task_id': task_id
+            }
+
+        except Exception as e:
+            logger.error(f"{label}任务执行失败 {task_id}: {e}")
+
+            await write_status({
+                'status': TaskStatus.FAILED.value,
+                'message': f'任务执行失败: {str(e)}',
+                'error_message': str(e),
+                'progress': 0,
+                'completed_at': datetime.now(),
+                'updated_at': datetime.now().isoformat()
+            })
+
+            return {
+                'status': 'failed',
+                'error': str(e),
+                'message': f'任务执行失败: {str(e)}',
+                'task_id': task_id
+            }
+
+
+# 全局异步执行器实例（每个Worker进程一个）
+_async_runner = None
+_async_runner_lock = threading.Lock()
+
+
+def get_async_runner() -> AsyncWorkflowRunner:
+    """获取异步工作流执行器实例"""
+    global _async_runner
+    if _async_runner is None:
+        with _async_runner_lock:
+            if _async_runner is None:
+                async_config = get_config_manager().get_task_queue_config().get('async_worker', {})
+                _async_runner = AsyncWorkflowRunner(
+                    connection_limit=async_config.get('connection_limit', 200),
+                    status_write_workers=async_config.get('status_write_workers', 8)
+                )
+    return _async_runner
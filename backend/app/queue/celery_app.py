@@ -25,30 +25,32 @@ else:
 # 创建Celery应用
 celery_app = Celery('comfyui_workflow_manager')
 
-# 检查Redis可用性（带重试机制）
-redis_available = False
-try:
-    import redis
-    import time
-
-    # 重试3次检查Redis连接
-    for attempt in range(3):
-        try:
-            r = redis.Redis(
-                host=redis_host,
-                port=redis_port,
-                db=redis_db,
-                password=redis_password,
-                socket_connect_timeout=2,  # 连接超时2秒
-                socket_timeout=2,          # 操作超时2秒
-                retry_on_timeout=True
-            )
-            r.ping()
-            redis_available = True
-            break
-        except Exception:
-            if attempt < 2:  # 前两次失败时等待
-                time.sleep(0.5)
+
+def _resolve_broker_settings() -> dict:
+    """解析消息代理与结果后端（延迟执行）
+
+    通过 celery_app.add_defaults 注册，只有在首次读取Celery配置时才执行
+    （例如Worker启动或API首次提交任务），导入本模块时不会访问Redis。
+    只探测一次且不重试等待，Redis不可用时使用内存模式。
+    """
+    redis_available = False
+    try:
+        import redis
+
+        r = redis.Redis(
+            host=redis_host,
+            port=redis_port,
+            db=redis_db,
+            password=redis_password,
+            socket_connect_timeout=1,  # 连接超时1秒
+            socket_timeout=1           # 操作超时1秒
+        )
+        r.ping()
+        redis_available = True
+    except ImportError:
+        print("[Celery] Redis模块未安装，使用内存模式")
+    except Exception:
+        pass
 
     if redis_available:
         # Redis可用，使用Redis作为broker和backend
@@ -61,25 +63,41 @@ try:
         final_result_backend = 'cache+memory://'
         print("[Celery] Redis不可用，使用内存模式")
 
-except ImportError:
-    # Redis模块未安装，使用内存后端
-    final_broker_url = 'memory://'
-    final_result_backend = 'cache+memory://'
-    print("[Celery] Redis模块未安装，使用内存模式")
-except Exception as e:
-    # 其他异常，使用内存后端
-    final_broker_url = 'memory://'
-    final_result_backend = 'cache+memory://'
-    print(f"[Celery] Redis检查异常 ({e})，使用内存模式")
-    
+    return {
+        'broker_url': final_broker_url,
+        'result_backend': final_result_backend,  # Redis可用时使用Redis结果后端，进度可跨进程查询
+        # 内存后端特殊配置
+        'task_always_eager': final_broker_url == 'memory://',  # 如果使用内存后端，立即执行任务
+    }
+
+
+celery_app.add_defaults(_resolve_broker_settings)
+
+
+def _resolve_result_serializer(serializer: str) -> str:
+    """解析结果序列化器，msgpack不可用时回退为json"""
+    if serializer == 'msgpack':
+        try:
+            import msgpack  # noqa: F401
+        except ImportError:
+            print("[Celery] msgpack模块未安装，结果序列化回退为json")
+            return 'json'
+    return serializer
+
+
+# 结果序列化：优先使用紧凑的msgpack，进度meta只包含少量字段（见tasks.BaseWorkflowTask）
+final_result_serializer = _resolve_result_serializer(task_queue_config.get('result_serializer', 'json'))
+final_accept_content = list(task_queue_config.get('accept_content', ['json']))
+if final_result_serializer not in final_accept_content:
+    final_accept_content.append(final_result_serializer)
 
 # 配置Celery
+# broker_url/result_backend/task_always_eager由_resolve_broker_settings延迟提供
 celery_app.conf.update(
-    broker_url=final_broker_url,
-    result_backend='cache+memory://',  # 使用内存后端，避免Redis序列化问题
     task_serializer=task_queue_config.get('task_serializer', 'json'),
-    result_serializer=task_queue_config.get('result_serializer', 'json'),
-    accept_content=task_queue_config.get('accept_content', ['json']),
+    result_serializer=final_result_serializer,
+    accept_content=final_accept_content,
+    result_accept_content=final_accept_content,
     timezone=task_queue_config.get('timezone', 'UTC'),
     enable_utc=task_queue_config.get('enable_utc', True),
     task_routes=task_queue_config.get('task_routes', {}),
@@ -88,8 +106,8 @@ celery_app.conf.update(
     task_reject_on_worker_lost=True,  # Worker丢失时拒绝任务
     worker_max_tasks_per_child=task_queue_config.get('worker_max_tasks_per_child', 100),
 
-    # 任务结果过期时间
-    result_expires=3600,  # 1小时
+    # 任务结果过期时间 - 结果后端只保存进度meta，最终状态以数据库为准
+    result_expires=task_queue_config.get('result_expires', 600),  # 10分钟
 
     # 任务超时设置
     task_soft_time_limit=1800,  # 30分钟软超时
@@ -107,8 +125,6 @@ celery_app.conf.update(
     worker_send_task_events=True,
     task_send_sent_event=True,
 
-    # 内存后端特殊配置
-    task_always_eager=final_broker_url == 'memory://',  # 如果使用内存后端，立即执行任务
     task_eager_propagates=True,
 )
 
@@ -117,7 +133,7 @@ celery_app.autodiscover_tasks(['app.queue'])
 
 
 # Worker启动时的信号处理
-from celery.signals import worker_ready, worker_shutdown
+from celery.signals import worker_ready, worker_shutdown, worker_process_shutdown
 
 @worker_ready.connect
 def init_worker(sender, **kwargs):
@@ -223,16 +239,37 @@ def init_worker(sender, **kwargs):
         print(f"详细错误: {traceback.format_exc()}")
 
 
+def _flush_status_buffer():
+    """将本进程状态缓冲中尚未刷新的中间状态写入数据库，并应用发件箱积压"""
+    from ..database import status_buffer
+    if status_buffer._task_status_buffer_resolved and status_buffer._task_status_buffer:
+        status_buffer._task_status_buffer.stop()
+
+    # 缓冲刷新会写入发件箱，随后把本进程启动的中继积压记录应用到客户端任务表
+    from ..database import outbox_relay
+    if outbox_relay._task_outbox_relay:
+        outbox_relay._task_outbox_relay.stop()
+
+
 @worker_shutdown.connect
 def cleanup_worker(sender, **kwargs):
     """Worker关闭时清理资源"""
     try:
         print("🔄 Celery Worker: 正在清理数据库连接...")
-        # 这里可以添加数据库连接清理逻辑
+        _flush_status_buffer()
     except Exception as e:
         print(f"⚠️ Celery Worker: 清理资源失败: {e}")
 
 
+@worker_process_shutdown.connect
+def cleanup_worker_process(**kwargs):
+    """prefork子进程退出时刷新状态缓冲"""
+    try:
+        _flush_status_buffer()
+    except Exception as e:
+        print(f"⚠️ Celery Worker: 刷新状态缓冲失败: {e}")
+
+
 def get_celery_app():
     """获取Celery应用实例"""
     return celery_app
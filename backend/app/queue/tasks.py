@@ -4,10 +4,12 @@ Celery任务定义
 import asyncio
 import logging
 import os
+import threading
+from collections import OrderedDict
 from typing import Dict, Any, Optional
 from datetime import datetime
 from celery import Task
-from ..core.base import TaskType, TaskRequest, TaskResult, TaskStatus, WorkflowExecutionError
+from ..core.base import TaskType, TaskRequest, TaskResult, TaskStatus, WorkflowExecutionError, TaskCancelledError
 from ..core.task_manager import get_task_type_manager
 from ..core.config_manager import get_config_manager
 from ..core.workflow_executor import get_workflow_executor
@@ -25,6 +27,80 @@ def get_celery_app_instance():
 celery_app = get_celery_app_instance()
 
 
+# 自定义状态到Celery状态的映射
+CELERY_STATE_MAP = {
+    'queued': 'PENDING',
+    'processing': 'PROGRESS',
+    'completed': 'SUCCESS',
+    'failed': 'FAILURE',
+    'cancelled': 'REVOKED'
+}
+
+# Celery要求这些状态的meta为异常对象
+CELERY_EXCEPTION_STATES = {'FAILURE', 'REVOKED'}
+
+# 写入结果后端的进度字段（保持meta紧凑，可被msgpack/json直接序列化）
+CELERY_META_FIELDS = ('status', 'progress', 'message', 'error_message', 'node_id')
+
+
+def compact_celery_meta(status_data: Dict[str, Any]) -> Dict[str, Any]:
+    """从任务状态数据中提取紧凑的Celery进度meta"""
+    meta = {}
+    for key in CELERY_META_FIELDS:
+        value = status_data.get(key)
+        if value is None:
+            continue
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        elif not isinstance(value, (str, int, float, bool)):
+            value = str(value)
+        meta[key] = value
+
+    # 完成状态只保留文件列表，不写入完整的ComfyUI历史记录
+    result_data = status_data.get('result_data')
+    if isinstance(result_data, dict) and result_data.get('files'):
+        meta['files'] = [str(f) for f in result_data['files']]
+
+    return meta
+
+
+# celery_task_id（或任务ID）到任务ID的进程内LRU映射，进度更新时无需重复解析
+TASK_ID_CACHE_SIZE = 1024
+_task_id_cache: "OrderedDict[str, str]" = OrderedDict()
+_task_id_cache_lock = threading.Lock()
+
+
+def resolve_task_id(task_id: str) -> Optional[str]:
+    """将任务ID或celery_task_id解析为数据库中的任务ID
+
+    命中LRU时不查询数据库；未命中时按task_id、celery_task_id索引各查询一次，
+    只缓存解析成功的结果
+    """
+    with _task_id_cache_lock:
+        target_task_id = _task_id_cache.get(task_id)
+        if target_task_id is not None:
+            _task_id_cache.move_to_end(task_id)
+            return target_task_id
+
+    from ..database.task_status_manager import get_database_task_status_manager
+    target_task_id = get_database_task_status_manager().resolve_task_id(task_id)
+    if target_task_id is None:
+        return None
+
+    with _task_id_cache_lock:
+        _task_id_cache[task_id] = target_task_id
+        _task_id_cache.move_to_end(task_id)
+        while len(_task_id_cache) > TASK_ID_CACHE_SIZE:
+            _task_id_cache.popitem(last=False)
+    return target_task_id
+
+
+def forget_task_id(task_id: str):
+    """从LRU中移除映射（任务被删除或更新失败时）"""
+    with _task_id_cache_lock:
+        _task_id_cache.pop(task_id, None)
+
+
 class BaseWorkflowTask(Task):
     """基础工作流任务类"""
     
@@ -54,56 +130,87 @@ class BaseWorkflowTask(Task):
             'progress': 0
         })
     
-    def update_task_status(self, task_id: str, status_data: Dict[str, Any]):
-        """更新任务状态 - 优化版本，减少竞态条件"""
+    def update_task_status(self, task_id: str, status_data: Dict[str, Any], celery_task_id: str = None):
+        """更新任务状态 - 优化版本，减少竞态条件
+
+        celery_task_id用于在非执行线程（如异步模式的状态写入线程）中指定要更新的Celery任务
+        """
         try:
-            # 映射自定义状态到Celery状态
             status = status_data.get('status', 'processing')
-            celery_state_map = {
-                'queued': 'PENDING',
-                'processing': 'PROGRESS',
-                'completed': 'SUCCESS',
-                'failed': 'FAILURE',
-                'cancelled': 'REVOKED'
-            }
-
-            celery_state = celery_state_map.get(status, 'PROGRESS')
 
-            # 更新Celery任务状态
-            self.update_state(
-                state=celery_state,
-                meta=status_data
-            )
+            # 同步进度到Celery结果后端（跨进程可见）
+            self._publish_celery_state(status, status_data, celery_task_id)
 
             # 使用数据库状态管理器
             from ..database.task_status_manager import get_database_task_status_manager
 
             status_manager = get_database_task_status_manager()
 
-            # 查找任务ID，可能是原始task_id或celery_task_id
-            target_task_id = None
-
-            # 首先尝试直接匹配（task_id就是实际任务ID）
-            if status_manager.get_task_status(task_id):
-                target_task_id = task_id
-            else:
-                # 如果直接匹配失败，查找celery_task_id匹配的任务
-                all_tasks = status_manager.list_tasks()
-                for stored_task_id, task_info in all_tasks.items():
-                    if task_info.get('celery_task_id') == task_id:
-                        target_task_id = stored_task_id
-                        break
+            # 查找任务ID，可能是原始task_id或celery_task_id（通过索引查询并缓存）
+            target_task_id = resolve_task_id(task_id)
 
             if target_task_id:
                 # 更新状态管理器
-                status_manager.update_task_status(target_task_id, status_data)
-                logger.debug(f"任务状态已更新: {target_task_id} -> {status}")
+                if status_manager.update_task_status(target_task_id, status_data):
+                    logger.debug(f"任务状态已更新: {target_task_id} -> {status}")
+                else:
+                    forget_task_id(task_id)
             else:
                 logger.warning(f"未找到任务ID进行状态更新: {task_id}")
 
         except Exception as e:
             logger.error(f"更新任务状态失败 [{task_id}]: {e}")
 
+    def _publish_celery_state(self, status: str, status_data: Dict[str, Any], celery_task_id: str = None):
+        """将自定义状态映射为Celery状态并写入结果后端
+
+        FAILURE/REVOKED属于Celery异常状态，meta必须是异常对象，
+        这两种终态由Celery在任务失败/撤销时自行记录，这里不再写入。
+        """
+        celery_state = CELERY_STATE_MAP.get(status, 'PROGRESS')
+        if celery_state in CELERY_EXCEPTION_STATES:
+            return
+
+        # 无请求上下文（例如直接调用任务函数）时没有可更新的结果
+        celery_task_id = celery_task_id or getattr(self.request, 'id', None)
+        if not celery_task_id:
+            return
+
+        try:
+            self.update_state(task_id=celery_task_id, state=celery_state, meta=compact_celery_meta(status_data))
+        except Exception as e:
+            logger.debug(f"更新Celery结果后端失败 [{celery_task_id}]: {e}")
+
+    def _execute_workflow_async(self, request_data: Dict[str, Any], task_type: str) -> Dict[str, Any]:
+        """异步Worker模式：将任务主体交给进程内事件循环执行，当前线程只等待结果"""
+        from .async_runner import get_async_runner
+
+        runner = get_async_runner()
+        return runner.run(runner.execute_workflow(self, request_data, task_type, celery_task_id=self.request.id))
+
+    def _is_task_cancelled(self, task_id: str) -> bool:
+        """检查任务是否已被取消，查询失败时视为未取消"""
+        try:
+            from ..database.task_status_manager import get_database_task_status_manager
+            return get_database_task_status_manager().is_task_cancelled(task_id)
+        except Exception as e:
+            logger.debug(f"检查任务取消状态失败 [{task_id}]: {e}")
+            return False
+
+    def _handle_task_cancelled(self, task_id: str, node_id: str, prompt_id: str, comfyui_url: str) -> Dict[str, Any]:
+        """任务在执行中被取消：停止节点上的提示词、清理部分输出并释放节点，不覆盖已持久化的取消状态"""
+        logger.info(f"任务已被取消，停止执行: {task_id}")
+
+        from ..core.task_canceller import get_task_canceller
+        asyncio.run(get_task_canceller().stop_prompt(prompt_id, node_id, comfyui_url))
+        self._cleanup_node_assignment(task_id, node_id)
+
+        return {
+            'status': 'cancelled',
+            'message': '任务已取消',
+            'task_id': task_id
+        }
+
     def _select_comfyui_node_for_task(self, task_id: str, task_type: str) -> tuple[str, str]:
         """为任务选择ComfyUI节点 - 支持分布式模式
 
@@ -224,6 +331,9 @@ class BaseWorkflowTask(Task):
             output_dir = get_output_dir()
 
             files = []
+            # 分布式模式下输出文件所在位置（节点、子目录、文件名），随结果记录保存供下载时直接路由
+            locations = []
+            execution_node_id = node_id
 
             # 从ComfyUI历史记录中提取输出文件
             if 'outputs' in result_data:
@@ -246,7 +356,14 @@ class BaseWorkflowTask(Task):
                                     else:
                                         file_path = filename
                                     files.append(file_path)
-                                    logger.info(f"分布式模式文件路径: {file_path} (节点: {node_id})")
+                                    if execution_node_id != "default":
+                                        locations.append({
+                                            'file_path': file_path,
+                                            'node_id': execution_node_id,
+                                            'subfolder': subfolder,
+                                            'filename': filename
+                                        })
+                                    logger.info(f"分布式模式文件路径: {file_path} (节点: {execution_node_id})")
                                 else:
                                     # 单机模式：使用完整本地路径
                                     if subfolder:
@@ -261,9 +378,14 @@ class BaseWorkflowTask(Task):
                                     else:
                                         logger.warning(f"输出文件不存在: {file_path}")
 
+            if locations:
+                from ..database.result_locations import get_result_location_index
+                get_result_location_index().record(locations)
+
             # 返回处理后的结果
             processed_result = {
                 'files': files,
+                'locations': locations,
                 'original_result': result_data,
                 'task_id': task_id
             }
@@ -437,12 +559,16 @@ class BaseWorkflowTask(Task):
                 logger.error(f"提交工作流失败: {e}")
                 raise
 
-            # 更新进度
-            self.update_task_status(task_id, {
+            # 更新进度，记录prompt_id和节点以便取消时定位
+            submitted_status = {
                 'status': 'processing',
                 'progress': 30,
-                'message': f'工作流已提交，正在等待ComfyUI处理... (ID: {prompt_id})'
-            })
+                'message': f'工作流已提交，正在等待ComfyUI处理... (ID: {prompt_id})',
+                'prompt_id': prompt_id
+            }
+            if selected_node_id != "default":
+                submitted_status['node_id'] = selected_node_id
+            self.update_task_status(task_id, submitted_status)
 
             # 等待完成
             max_wait = 300  # 5分钟
@@ -450,6 +576,9 @@ class BaseWorkflowTask(Task):
             result_data = None
 
             while time.time() - start_time < max_wait:
+                if self._is_task_cancelled(task_id):
+                    raise TaskCancelledError(f"任务已被取消: {task_id}")
+
                 try:
                     history_response = requests.get(f"{comfyui_url}/history/{prompt_id}", timeout=10)
                     if history_response.status_code == 200:
@@ -507,7 +636,8 @@ class BaseWorkflowTask(Task):
                 logger.info(f"文生图任务完成: {task_id}")
                 return {
                     'status': 'completed',
-                    'result': result.result_data,
+                    # 返回值会写入结果后端，不携带完整的ComfyUI历史记录
+                    'result': {k: v for k, v in result.result_data.items() if k != 'original_result'},
                     'message': '文生图任务完成'
                 }
             else:
@@ -533,6 +663,9 @@ class BaseWorkflowTask(Task):
                     'task_id': task_id
                 }
 
+        except TaskCancelledError:
+            return self._handle_task_cancelled(task_id, selected_node_id, prompt_id, comfyui_url)
+
         except Exception as e:
             logger.error(f"文生图任务执行失败 {task_id}: {e}")
 
@@ -662,12 +795,16 @@ class BaseWorkflowTask(Task):
                 logger.error(f"提交工作流失败: {e}")
                 raise
 
-            # 更新进度
-            self.update_task_status(task_id, {
+            # 更新进度，记录prompt_id和节点以便取消时定位
+            submitted_status = {
                 'status': 'processing',
                 'progress': 30,
-                'message': f'工作流已提交，正在等待ComfyUI处理... (ID: {prompt_id})'
-            })
+                'message': f'工作流已提交，正在等待ComfyUI处理... (ID: {prompt_id})',
+                'prompt_id': prompt_id
+            }
+            if selected_node_id != "default":
+                submitted_status['node_id'] = selected_node_id
+            self.update_task_status(task_id, submitted_status)
 
             # 等待完成
             max_wait = 600  # 10分钟（视频生成需要更长时间）
@@ -675,6 +812,9 @@ class BaseWorkflowTask(Task):
             result_data = None
 
             while time.time() - start_time < max_wait:
+                if self._is_task_cancelled(task_id):
+                    raise TaskCancelledError(f"任务已被取消: {task_id}")
+
                 try:
                     history_response = requests.get(f"{comfyui_url}/history/{prompt_id}", timeout=10)
                     if history_response.status_code == 200:
@@ -724,6 +864,9 @@ class BaseWorkflowTask(Task):
                 'message': '图生视频任务执行成功'
             }
 
+        except TaskCancelledError:
+            return self._handle_task_cancelled(task_id, selected_node_id, prompt_id, comfyui_url)
+
         except Exception as e:
             logger.error(f"图生视频任务执行失败 {task_id}: {e}")
 
@@ -933,7 +1076,8 @@ def execute_text_to_image_task(self, request_data: Dict[str, Any]) -> Dict[str,
             logger.info(f"文生图任务完成: {task_id}")
             return {
                 'status': 'completed',
-                'result': result.result_data,
+                # 返回值会写入结果后端，不携带完整的ComfyUI历史记录
+                'result': {k: v for k, v in result.result_data.items() if k != 'original_result'},
                 'message': '文生图任务完成'
             }
         else:
@@ -989,6 +1133,10 @@ def execute_text_to_image_task(self, request_data: Dict[str, Any]) -> Dict[str,
 @celery_app.task(bind=True, base=BaseWorkflowTask, queue='image_to_video')
 def execute_image_to_video_task(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
     """执行图生视频任务 - 兼容性包装器"""
+    from .async_runner import is_async_worker_mode
+    if is_async_worker_mode():
+        return self._execute_workflow_async(request_data, 'image_to_video')
+
     # 直接调用核心逻辑，避免任务套任务
     return self._execute_image_to_video_logic(request_data)
 
@@ -996,6 +1144,10 @@ def execute_image_to_video_task(self, request_data: Dict[str, Any]) -> Dict[str,
 @celery_app.task(bind=True, base=BaseWorkflowTask, queue='text_to_image')
 def execute_text_to_image_task(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
     """执行文生图任务 - 兼容性包装器"""
+    from .async_runner import is_async_worker_mode
+    if is_async_worker_mode():
+        return self._execute_workflow_async(request_data, 'text_to_image')
+
     # 直接调用核心逻辑，避免任务套任务
     return self._execute_text_to_image_logic(request_data)
 
@@ -1013,6 +1165,10 @@ def execute_generic_workflow_task(self, request_data: Dict[str, Any]) -> Dict[st
         task_type = task_manager.identify_task_type(request_data)
 
         # 直接执行对应的业务逻辑，而不是调用其他任务
+        from .async_runner import is_async_worker_mode
+        if is_async_worker_mode() and task_type in (TaskType.TEXT_TO_IMAGE, TaskType.IMAGE_TO_VIDEO):
+            return self._execute_workflow_async(request_data, task_type.value)
+
         if task_type == TaskType.TEXT_TO_IMAGE:
             return self._execute_text_to_image_logic(request_data)
         elif task_type == TaskType.IMAGE_TO_VIDEO:
@@ -1123,7 +1279,11 @@ def get_task_status(task_id: str) -> Optional[Dict[str, Any]]:
 
 # 任务取消函数
 def cancel_task(task_id: str) -> bool:
-    """取消任务"""
+    """撤销Celery任务
+
+    只负责撤销Celery任务本身；停止ComfyUI节点上的提示词、释放节点和清理输出
+    由core.task_canceller中的TaskCanceller完成
+    """
     try:
         celery_app.control.revoke(task_id, terminate=True)
         logger.info(f"任务已取消: {task_id}")
@@ -3,21 +3,39 @@
 负责文件上传、存储、查询等操作的数据库集成
 """
 import os
+import io
 import uuid
+import asyncio
 import hashlib
 import mimetypes
 from datetime import datetime
-from typing import Optional, List, Dict, Any
-from PIL import Image
+from typing import Optional, List, Dict, Any, Tuple
 import logging
 
+import anyio
+
 from ..database.dao.base_dao import BaseDAO
 from ..database.models.client_models import ClientUpload
 from ..database.models.shared_models import GlobalFile
+from ..database.unit_of_work import unit_of_work, UnitOfWorkError
+from ..core.base import ValidationError
 from ..utils.path_utils import get_upload_dir, clean_filename, ensure_dir_exists
 
 logger = logging.getLogger(__name__)
 
+# 上传文件的读写块大小
+UPLOAD_CHUNK_SIZE = 256 * 1024
+# 读取图片尺寸时保留的文件头大小
+PROBE_HEADER_SIZE = 64 * 1024
+
+
+class UploadTooLargeError(ValidationError):
+    """上传文件超过大小上限"""
+
+    def __init__(self, max_size: int):
+        super().__init__(f"文件大小超过限制（最大{max_size // (1024 * 1024)}MB）")
+        self.max_size = max_size
+
 
 class FileService:
     """文件管理服务"""
@@ -26,89 +44,153 @@ class FileService:
         self.client_upload_dao = BaseDAO('client', ClientUpload)
         self.global_file_dao = BaseDAO('shared', GlobalFile)
     
-    def calculate_file_hash(self, file_path: str) -> str:
-        """计算文件哈希值"""
-        hash_sha256 = hashlib.sha256()
-        with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_sha256.update(chunk)
-        return hash_sha256.hexdigest()
-    
-    def get_image_dimensions(self, file_path: str) -> tuple:
-        """获取图片尺寸"""
+    async def save_upload_stream(self, upload, client_id: str, file_type: str = 'image',
+                                 max_size: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        流式保存上传文件并记录到数据库
+
+        分块写入临时文件，同时计算sha256并检查大小上限；内容与已有文件相同时复用已有文件，
+        不再重复存储。数据库操作在线程池中执行，不阻塞事件循环。
+
+        Raises:
+            UploadTooLargeError: 文件超过大小上限
+        """
+        tmp_dir = os.path.join(get_upload_dir(), '.tmp')
+        await asyncio.to_thread(ensure_dir_exists, tmp_dir)
+        tmp_path = os.path.join(tmp_dir, f"{uuid.uuid4()}.part")
+        try:
+            file_size, file_hash, head = await self._stream_to_file(upload, tmp_path, max_size)
+            return await asyncio.to_thread(
+                self._store_upload, tmp_path, file_size, file_hash, head,
+                upload.filename or 'upload', client_id, file_type
+            )
+        finally:
+            if os.path.exists(tmp_path):
+                await asyncio.to_thread(os.remove, tmp_path)
+
+    async def _stream_to_file(self, upload, dest_path: str, max_size: Optional[int]) -> Tuple[int, str, bytes]:
+        """分块写入文件，返回文件大小、sha256和文件头（用于读取图片尺寸）"""
+        file_hash = hashlib.sha256()
+        file_size = 0
+        head = b''
+        async with await anyio.open_file(dest_path, 'wb') as f:
+            while True:
+                chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                file_size += len(chunk)
+                if max_size is not None and file_size > max_size:
+                    raise UploadTooLargeError(max_size)
+                file_hash.update(chunk)
+                if len(head) < PROBE_HEADER_SIZE:
+                    head += chunk[:PROBE_HEADER_SIZE - len(head)]
+                await f.write(chunk)
+        return file_size, file_hash.hexdigest(), head
+
+    def probe_image_size(self, head: bytes, file_path: Optional[str] = None) -> Tuple[int, int]:
+        """
+        只解析文件头获取图片尺寸（PIL打开图片时只读取头部，不解码像素）
+
+        文件头不足以解析时（如JPEG前有较大的EXIF段）再从文件读取头部
+        """
+        from PIL import Image
+
         try:
-            with Image.open(file_path) as img:
-                return img.size  # (width, height)
+            with Image.open(io.BytesIO(head)) as img:
+                return img.size
         except Exception:
-            return (0, 0)
-    
-    def save_uploaded_file(self, file_content: bytes, original_filename: str, 
-                          client_id: str, file_type: str = 'image') -> Optional[Dict[str, Any]]:
-        """保存上传的文件并记录到数据库"""
+            pass
+        if file_path:
+            try:
+                with Image.open(file_path) as img:
+                    return img.size
+            except Exception:
+                pass
+        return (0, 0)
+
+    def _find_duplicate(self, file_hash: str, file_size: int) -> Optional[GlobalFile]:
+        """按哈希查找内容相同且文件仍存在的已有文件"""
+        try:
+            with self.global_file_dao.get_session() as session:
+                candidates = session.query(GlobalFile).filter(
+                    GlobalFile.file_hash == file_hash,
+                    GlobalFile.file_size == file_size
+                ).order_by(GlobalFile.id).limit(5).all()
+                for candidate in candidates:
+                    if os.path.exists(candidate.file_path):
+                        session.expunge(candidate)
+                        return candidate
+        except Exception as e:
+            logger.warning(f"查找重复文件失败: {e}")
+        return None
+
+    def _store_upload(self, tmp_path: str, file_size: int, file_hash: str, head: bytes,
+                      original_filename: str, client_id: str, file_type: str) -> Optional[Dict[str, Any]]:
+        """将临时文件落盘为正式文件（或复用相同内容的已有文件）并记录到数据库"""
         try:
-            # 创建日期目录结构
             now = datetime.now()
-            date_path = now.strftime("%Y/%m/%d")
-            upload_date_dir = os.path.join(get_upload_dir(), date_path)
-            ensure_dir_exists(upload_date_dir)
-            
-            # 生成唯一文件名
-            file_extension = original_filename.split('.')[-1].lower() if '.' in original_filename else ''
-            timestamp = now.strftime("%H%M%S")
             file_id = str(uuid.uuid4())
-            unique_filename = f"{timestamp}_{file_id[:8]}.{file_extension}"
-            file_path = os.path.join(upload_date_dir, unique_filename)
-            
-            # 保存文件
-            with open(file_path, "wb") as f:
-                f.write(file_content)
-            
-            # 获取文件信息
-            file_size = len(file_content)
             mime_type = mimetypes.guess_type(original_filename)[0] or 'application/octet-stream'
-            file_hash = self.calculate_file_hash(file_path)
-            
-            # 获取图片尺寸（如果是图片）
-            width, height = 0, 0
-            if file_type == 'image' and mime_type.startswith('image/'):
-                width, height = self.get_image_dimensions(file_path)
-            
-            # 保存到客户端上传表
-            client_upload = self.client_upload_dao.create(
-                file_id=file_id,
-                client_id=client_id,
-                original_name=clean_filename(original_filename),
-                file_path=file_path,
-                file_size=file_size,
-                mime_type=mime_type,
-                width=width,
-                height=height,
-                is_processed=False
-            )
-            
-            if not client_upload:
-                # 如果数据库保存失败，删除文件
-                os.remove(file_path)
+
+            duplicate = self._find_duplicate(file_hash, file_size)
+            if duplicate:
+                # 复用已有文件，新记录指向同一路径
+                file_path = duplicate.file_path
+                unique_filename = duplicate.file_name
+                width, height = duplicate.width or 0, duplicate.height or 0
+                created_file = False
+                logger.info(f"上传文件与已有文件内容相同，复用: {file_path}")
+            else:
+                # 创建日期目录结构，生成唯一文件名
+                upload_date_dir = os.path.join(get_upload_dir(), now.strftime("%Y/%m/%d"))
+                ensure_dir_exists(upload_date_dir)
+                file_extension = original_filename.split('.')[-1].lower() if '.' in original_filename else ''
+                unique_filename = f"{now.strftime('%H%M%S')}_{file_id[:8]}.{file_extension}"
+                file_path = os.path.join(upload_date_dir, unique_filename)
+                os.replace(tmp_path, file_path)
+                created_file = True
+
+                width, height = 0, 0
+                if file_type == 'image' and mime_type.startswith('image/'):
+                    width, height = self.probe_image_size(head, file_path)
+
+            # 客户端上传表与全局文件表在同一工作单元中写入，任一写入失败时都不保留记录
+            try:
+                with unit_of_work():
+                    self.client_upload_dao.create(
+                        file_id=file_id,
+                        client_id=client_id,
+                        original_name=clean_filename(original_filename),
+                        file_path=file_path,
+                        file_size=file_size,
+                        mime_type=mime_type,
+                        width=width,
+                        height=height,
+                        is_processed=False
+                    )
+                    self.global_file_dao.create(
+                        file_id=file_id,
+                        source_type='client_upload',
+                        source_user_id=client_id,
+                        original_name=clean_filename(original_filename),
+                        file_name=unique_filename,
+                        file_path=file_path,
+                        file_size=file_size,
+                        mime_type=mime_type,
+                        file_hash=file_hash,
+                        file_type=file_type,
+                        width=width,
+                        height=height
+                    )
+            except UnitOfWorkError as e:
+                logger.error(f"保存上传文件记录失败: {e}")
+                # 删除新写入的文件
+                if created_file:
+                    os.remove(file_path)
                 return None
-            
-            # 同步到全局文件表
-            global_file = self.global_file_dao.create(
-                file_id=file_id,
-                source_type='client_upload',
-                source_user_id=client_id,
-                original_name=clean_filename(original_filename),
-                file_name=unique_filename,
-                file_path=file_path,
-                file_size=file_size,
-                mime_type=mime_type,
-                file_hash=file_hash,
-                file_type=file_type,
-                width=width,
-                height=height
-            )
-            
+
             logger.info(f"文件上传成功: {original_filename} -> {file_path}")
-            
+
             return {
                 'file_id': file_id,
                 'original_name': original_filename,
@@ -118,13 +200,14 @@ class FileService:
                 'mime_type': mime_type,
                 'width': width,
                 'height': height,
+                'deduplicated': not created_file,
                 'upload_time': now.isoformat()
             }
-            
+
         except Exception as e:
             logger.error(f"文件上传失败: {e}")
             return None
-    
+
     def get_user_files(self, client_id: str, file_type: str = None,
                       limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
         """获取用户上传的文件列表"""
@@ -186,9 +269,7 @@ class FileService:
                 if not upload:
                     return False
 
-                # 删除物理文件
-                if os.path.exists(upload.file_path):
-                    os.remove(upload.file_path)
+                file_path = upload.file_path
 
                 # 由于数据库表中没有status字段，直接删除记录
                 session.delete(upload)
@@ -204,6 +285,21 @@ class FileService:
                     session.delete(file_record)
                     session.commit()
 
+                # 内容相同的上传共用一个文件，没有其他记录引用时才删除物理文件
+                still_referenced = session.query(GlobalFile.id).filter(
+                    GlobalFile.file_path == file_path
+                ).first() is not None
+
+            # 全局文件表记录可能缺失（如同步失败的旧数据），客户端上传表中的引用同样保留文件
+            if not still_referenced:
+                with self.client_upload_dao.get_session() as session:
+                    still_referenced = session.query(ClientUpload.id).filter(
+                        ClientUpload.file_path == file_path
+                    ).first() is not None
+
+            if not still_referenced and os.path.exists(file_path):
+                os.remove(file_path)
+
             logger.info(f"文件删除成功: {file_id}")
             return True
 
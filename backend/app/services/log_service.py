@@ -77,14 +77,17 @@ class LogService:
             return False
     
     def get_client_access_logs(self, client_id: str = None, limit: int = 100, 
-                              offset: int = 0) -> List[Dict[str, Any]]:
-        """获取客户端访问日志"""
+                              offset: int = 0, since: datetime = None) -> List[Dict[str, Any]]:
+        """获取客户端访问日志（指定since时只扫描其后的月分区）"""
         try:
             with self.access_log_dao.get_session() as session:
                 query = session.query(ClientAccessLog)
                 
                 if client_id:
                     query = query.filter(ClientAccessLog.client_id == client_id)
+
+                if since:
+                    query = query.filter(ClientAccessLog.access_time >= since)
                 
                 logs = query.order_by(ClientAccessLog.access_time.desc()).offset(offset).limit(limit).all()
                 
@@ -95,11 +98,14 @@ class LogService:
             return []
     
     def get_system_logs(self, event_type: str = None, level: str = None, 
-                       limit: int = 100, offset: int = 0) -> List[Dict[str, Any]]:
-        """获取系统日志"""
+                       limit: int = 100, offset: int = 0, since: datetime = None) -> List[Dict[str, Any]]:
+        """获取系统日志（指定since时只扫描其后的月分区）"""
         try:
             with self.system_log_dao.get_session() as session:
                 query = session.query(SystemLog)
+
+                if since:
+                    query = query.filter(SystemLog.created_at >= since)
                 
                 if event_type:
                     query = query.filter(SystemLog.event_type == event_type)
@@ -157,24 +163,23 @@ class LogService:
             return {}
     
     def clean_old_logs(self, days: int = 30) -> bool:
-        """清理旧日志"""
+        """清理旧日志
+
+        按主键分批删除，避免一次大DELETE长时间锁表；
+        已按月分区的表由数据保留任务整区归档删除（见 database/retention.py）
+        """
         try:
+            from ..database.retention import get_retention_manager
             cutoff_date = datetime.utcnow() - timedelta(days=days)
-            
-            # 清理访问日志
-            with self.access_log_dao.get_session() as session:
-                deleted_access = session.query(ClientAccessLog).filter(
-                    ClientAccessLog.access_time < cutoff_date
-                ).delete()
-                session.commit()
-            
-            # 清理系统日志
-            with self.system_log_dao.get_session() as session:
-                deleted_system = session.query(SystemLog).filter(
-                    SystemLog.created_at < cutoff_date
-                ).delete()
-                session.commit()
-            
+            retention_manager = get_retention_manager()
+
+            deleted_access = retention_manager.purge_before(
+                'client', ClientAccessLog.__table__, 'access_time', cutoff_date
+            )
+            deleted_system = retention_manager.purge_before(
+                'shared', SystemLog.__table__, 'created_at', cutoff_date
+            )
+
             logger.info(f"清理旧日志完成: 访问日志 {deleted_access} 条, 系统日志 {deleted_system} 条")
             return True
             
@@ -2,7 +2,6 @@
 性能监控服务
 负责系统性能指标的收集和数据库持久化
 """
-import psutil
 import time
 from datetime import datetime, timedelta
 from typing import Dict, Any, List, Optional
@@ -23,6 +22,8 @@ class PerformanceService:
     def collect_system_metrics(self) -> Dict[str, Any]:
         """收集系统性能指标"""
         try:
+            import psutil
+
             # CPU使用率
             cpu_percent = psutil.cpu_percent(interval=1)
             cpu_count = psutil.cpu_count()
@@ -215,15 +216,18 @@ class PerformanceService:
             return {}
     
     def clean_old_metrics(self, days: int = 7) -> bool:
-        """清理旧的性能指标"""
+        """清理旧的性能指标
+
+        按主键分批删除，避免一次大DELETE长时间锁表；
+        已按月分区时由数据保留任务整区归档删除（见 database/retention.py）
+        """
         try:
+            from ..database.retention import get_retention_manager
             cutoff_date = datetime.utcnow() - timedelta(days=days)
-            
-            with self.metric_dao.get_session() as session:
-                deleted_count = session.query(PerformanceMetric).filter(
-                    PerformanceMetric.recorded_at < cutoff_date
-                ).delete()
-                session.commit()
+
+            deleted_count = get_retention_manager().purge_before(
+                'shared', PerformanceMetric.__table__, 'recorded_at', cutoff_date
+            )
             
             logger.info(f"清理旧性能指标完成: {deleted_count} 条")
             return True
@@ -1,6 +1,7 @@
 """
 输出文件管理器
-管理ComfyUI生成的文件，支持按日期分类存储
+管理ComfyUI生成的文件，支持按日期分类存储；
+整理后的文件记录到存储索引，存储统计和过期清理读取索引（未启用索引时遍历输出目录）
 """
 import os
 import logging
@@ -16,10 +17,18 @@ logger = logging.getLogger(__name__)
 
 class OutputManager:
     """输出文件管理器"""
+
+    # 存储索引，为None时存储统计和清理遍历输出目录
+    storage_index = None
     
     def __init__(self):
         self.output_dir = get_output_dir()
         ensure_dir_exists(self.output_dir)
+        try:
+            from ..database.storage_index import get_storage_index
+            self.storage_index = get_storage_index()
+        except Exception as e:
+            logger.warning(f"存储索引不可用，存储统计与清理将遍历输出目录: {e}")
     
     def get_date_subdir(self, date: Optional[datetime] = None) -> str:
         """获取按日期分类的子目录"""
@@ -33,13 +42,14 @@ class OutputManager:
         
         return full_path
     
-    def organize_output_files(self, file_paths: List[str], task_id: str) -> List[str]:
+    def organize_output_files(self, file_paths: List[str], task_id: str, owner: Optional[str] = None) -> List[str]:
         """
         整理输出文件，按日期分类存储
         
         Args:
             file_paths: 原始文件路径列表
             task_id: 任务ID
+            owner: 文件所属用户（记录到存储索引）
         
         Returns:
             整理后的文件路径列表
@@ -84,6 +94,9 @@ class OutputManager:
                 logger.error(f"整理文件失败 [{file_path}]: {e}")
                 # 如果整理失败，保留原路径
                 organized_paths.append(file_path)
+
+        if self.storage_index is not None:
+            self.storage_index.add([path for path in organized_paths if path.startswith(date_subdir)], owner)
         
         return organized_paths
     
@@ -107,16 +120,30 @@ class OutputManager:
         
         return files
     
-    def cleanup_old_files(self, days: int = 30) -> int:
+    def cleanup_old_files(self, days: Optional[int] = None) -> int:
         """
         清理旧文件
         
+        启用存储索引时按索引范围扫描：指定天数时只删除日期分桶早于该天数的文件，
+        否则删除已过期（expires_at）的文件（数据保留任务也按过期时间清理）；
+        未启用索引时遍历输出目录删除修改时间早于保留天数的文件
+        
         Args:
-            days: 保留天数
+            days: 保留天数（未启用索引时默认30天）
         
         Returns:
             删除的文件数量
         """
+        if self.storage_index is not None:
+            try:
+                if days is not None:
+                    return self.storage_index.purge_older_than(days)
+                return self.storage_index.purge_expired()
+            except Exception as e:
+                logger.error(f"清理过期文件失败: {e}")
+                return 0
+
+        days = 30 if days is None else days
         deleted_count = 0
         cutoff_time = datetime.now().timestamp() - (days * 24 * 60 * 60)
         
@@ -149,13 +176,20 @@ class OutputManager:
         return deleted_count
     
     def get_storage_stats(self) -> Dict[str, Any]:
-        """获取存储统计信息"""
+        """获取存储统计信息（启用存储索引时读取聚合统计，否则遍历输出目录）"""
         stats = {
             'total_files': 0,
             'total_size': 0,
             'by_date': {},
             'by_type': {}
         }
+
+        if self.storage_index is not None:
+            try:
+                return self.storage_index.get_stats()
+            except Exception as e:
+                logger.error(f"读取存储统计失败: {e}")
+                return stats
         
         try:
             for root, dirs, filenames in os.walk(self.output_dir):
@@ -189,7 +223,7 @@ class OutputManager:
     
     def create_thumbnail(self, image_path: str, max_size: tuple = (200, 200)) -> Optional[str]:
         """
-        创建缩略图
+        创建WebP缩略图（与缩略图服务使用相同的命名规则，在当前进程中同步生成）
         
         Args:
             image_path: 原图路径
@@ -199,20 +233,10 @@ class OutputManager:
             缩略图路径，失败返回None
         """
         try:
-            from PIL import Image
-            
-            # 生成缩略图路径
-            dir_path = os.path.dirname(image_path)
-            filename = os.path.basename(image_path)
-            name, ext = os.path.splitext(filename)
-            thumb_filename = f"{name}_thumb{ext}"
-            thumb_path = os.path.join(dir_path, thumb_filename)
-            
-            # 创建缩略图
-            with Image.open(image_path) as img:
-                img.thumbnail(max_size, Image.Resampling.LANCZOS)
-                img.save(thumb_path, optimize=True, quality=85)
-            
+            from .thumbnails import render_thumbnails
+
+            size = max(max_size)
+            thumb_path = render_thumbnails(image_path, [size])[size]
             logger.debug(f"缩略图创建成功: {thumb_path}")
             return thumb_path
             
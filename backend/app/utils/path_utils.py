@@ -217,6 +217,29 @@ def clean_filename(filename: str) -> str:
     return cleaned
 
 
+# 输出文件路径到静态URL前缀的映射表，按优先级排列：
+# (路径中需包含的标识, 从首次出现处截取的目录标记, URL前缀)
+OUTPUT_URL_PREFIXES = (
+    ('backend/outputs/', 'backend/outputs/', '/outputs/'),
+    ('/outputs/', 'outputs/', '/outputs/'),
+    ('ComfyUI/output/', 'ComfyUI/output/', '/comfyui-output/'),
+    ('/output/', 'output/', '/comfyui-output/'),
+)
+
+
+def output_path_to_url(file_path: str) -> Optional[str]:
+    """按前缀表将输出文件路径转换为静态文件URL，无法匹配时返回None
+
+    file_path需已统一为'/'分隔符
+    """
+    for guard, marker, url_prefix in OUTPUT_URL_PREFIXES:
+        if guard in file_path:
+            url_path = file_path[file_path.find(marker) + len(marker):]
+            if url_path:
+                return f"{url_prefix}{url_path}"
+    return None
+
+
 def get_unique_filename(dir_path: str, filename: str) -> str:
     """
     获取唯一的文件名（如果文件已存在，则添加数字后缀）
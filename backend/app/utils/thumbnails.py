@@ -0,0 +1,193 @@
+"""
+缩略图生成
+为输出图片生成多种尺寸的WebP缩略图，保存在原图旁（<文件名>_thumb_<尺寸>.webp）。
+图片解码和缩放占用CPU，在独立进程池中执行，不阻塞API事件循环；
+任务完成时预先生成，缩略图接口首次访问时按需生成，同一张图片的并发请求只生成一次。
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 可生成缩略图的图片格式
+THUMBNAIL_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp', '.bmp', '.gif')
+
+
+def is_thumbnailable(file_path: str) -> bool:
+    """是否为可生成缩略图的图片"""
+    return os.path.splitext(file_path)[1].lower() in THUMBNAIL_EXTENSIONS
+
+
+def thumbnail_path(source: str, size: int) -> str:
+    """缩略图保存路径"""
+    name = os.path.splitext(source)[0]
+    return f"{name}_thumb_{size}.webp"
+
+
+def render_thumbnails(source: str, sizes: List[int], quality: int = 80) -> Dict[int, str]:
+    """
+    生成各尺寸缩略图（在进程池中执行，需为模块级函数）
+
+    Returns:
+        尺寸到缩略图路径的映射
+    """
+    from PIL import Image
+
+    results = {}
+    with Image.open(source) as image:
+        # JPEG按目标尺寸降采样解码，减少解码开销
+        image.draft('RGB', (max(sizes), max(sizes)))
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+
+        # 从大到小逐级缩放，较小尺寸基于上一级结果生成
+        current = image
+        for size in sorted(set(sizes), reverse=True):
+            current = current.copy()
+            current.thumbnail((size, size), Image.Resampling.LANCZOS)
+            path = thumbnail_path(source, size)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            current.save(tmp_path, 'WEBP', quality=quality, method=4)
+            os.replace(tmp_path, path)
+            results[size] = path
+    return results
+
+
+def thumbnail_urls(task_id: str, files: List[str]) -> List[Optional[str]]:
+    """结果文件对应的缩略图URL（缩略图接口首次访问时生成），非图片结果或未启用缩略图时为None"""
+    if get_thumbnail_service() is None:
+        return [None] * len(files)
+    return [
+        f"/api/v2/tasks/{task_id}/thumbnail?index={i}" if is_thumbnailable(file_path) else None
+        for i, file_path in enumerate(files)
+    ]
+
+
+class ThumbnailService:
+    """缩略图服务"""
+
+    def __init__(self, sizes: Optional[List[int]] = None, quality: int = 80, max_workers: int = 2,
+                 result_dao=None, executor: Optional[Executor] = None):
+        self.sizes = sorted(set(sizes or [256, 512]))
+        self.quality = quality
+        self.max_workers = max_workers
+        self._result_dao = result_dao
+        self._executor = executor
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self.generated_count = 0
+
+    @property
+    def result_dao(self):
+        if self._result_dao is None:
+            from ..database.dao.task_dao import GlobalTaskResultDAO
+            self._result_dao = GlobalTaskResultDAO()
+        return self._result_dao
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if multiprocessing.current_process().daemon:
+                # Celery prefork的子进程为守护进程，不能再创建子进程，改用线程
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='thumbnail')
+            else:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def select_size(self, size: Optional[int] = None) -> int:
+        """选择不小于请求尺寸的最小已配置尺寸"""
+        if size is None:
+            return self.sizes[0]
+        return next((s for s in self.sizes if s >= size), self.sizes[-1])
+
+    def generate(self, source: str) -> Future:
+        """提交生成任务，同一张图片正在生成时返回同一个Future"""
+        with self._lock:
+            future = self._inflight.get(source)
+            if future is not None:
+                return future
+            future = self._get_executor().submit(render_thumbnails, source, self.sizes, self.quality)
+            self._inflight[source] = future
+        future.add_done_callback(lambda f: self._on_generated(source, f))
+        return future
+
+    def _on_generated(self, source: str, future: Future):
+        with self._lock:
+            self._inflight.pop(source, None)
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            logger.error(f"生成缩略图失败 [{source}]: {error}")
+            return
+        self.generated_count += 1
+        # 结果记录只保存最小尺寸的缩略图路径，其他尺寸按命名规则推出
+        try:
+            self.result_dao.set_thumbnail_path(source, future.result()[self.sizes[0]])
+        except Exception as e:
+            logger.warning(f"记录缩略图路径失败 [{source}]: {e}")
+
+    def submit(self, file_paths: List[str]):
+        """任务完成后为本地图片结果预先生成缩略图（不阻塞调用方）"""
+        for file_path in file_paths:
+            if is_thumbnailable(file_path) and os.path.exists(file_path) and not self.exists(file_path):
+                try:
+                    self.generate(file_path)
+                except Exception as e:
+                    logger.error(f"提交缩略图生成失败 [{file_path}]: {e}")
+
+    def exists(self, source: str, size: Optional[int] = None) -> bool:
+        return os.path.exists(thumbnail_path(source, self.select_size(size)))
+
+    async def ensure(self, source: str, size: Optional[int] = None) -> Optional[str]:
+        """返回指定尺寸的缩略图路径，不存在时生成；原图不是图片或生成失败时返回None"""
+        size = self.select_size(size)
+        path = thumbnail_path(source, size)
+        if os.path.exists(path):
+            return path
+        if not is_thumbnailable(source):
+            return None
+        try:
+            results = await asyncio.wrap_future(self.generate(source))
+            return results.get(size)
+        except Exception as e:
+            logger.error(f"生成缩略图失败 [{source}]: {e}")
+            return None
+
+    def shutdown(self):
+        """关闭进程池"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def get_status(self) -> Dict:
+        """获取缩略图服务状态"""
+        return {
+            'sizes': self.sizes,
+            'generated_count': self.generated_count,
+            'inflight': len(self._inflight)
+        }
+
+
+# 全局缩略图服务实例
+_thumbnail_service = None
+
+
+def get_thumbnail_service() -> Optional[ThumbnailService]:
+    """获取全局缩略图服务实例，未启用时返回None"""
+    global _thumbnail_service
+    if _thumbnail_service is None:
+        from ..core.config_manager import get_config_manager
+        thumbnail_config = get_config_manager().get_config('thumbnails') or {}
+        if not thumbnail_config.get('enabled', True):
+            return None
+        _thumbnail_service = ThumbnailService(
+            sizes=thumbnail_config.get('sizes', [256, 512]),
+            quality=thumbnail_config.get('quality', 80),
+            max_workers=thumbnail_config.get('max_workers', 2)
+        )
+    return _thumbnail_service
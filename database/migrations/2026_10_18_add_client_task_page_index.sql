@@ -0,0 +1,27 @@
+-- Database: client
+-- Description: 客户端任务表添加(client_id, created_at)联合索引，用于任务列表的键集分页
+-- Author: ComfyUI Web Service
+-- Created: 2026-10-18 14:00:00
+
+USE comfyui_client;
+
+-- 添加(client_id, created_at)联合索引
+SET @index_exists = (
+    SELECT COUNT(*)
+    FROM INFORMATION_SCHEMA.STATISTICS
+    WHERE TABLE_SCHEMA = 'comfyui_client'
+    AND TABLE_NAME = 'client_tasks'
+    AND INDEX_NAME = 'idx_client_created'
+);
+
+SET @sql = IF(@index_exists = 0,
+    'ALTER TABLE client_tasks ADD INDEX idx_client_created (client_id, created_at)',
+    'SELECT "idx_client_created索引已存在" as message'
+);
+
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- 验证结果
+SELECT 'add_client_task_page_index completed' as status;
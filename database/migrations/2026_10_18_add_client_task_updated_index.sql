@@ -0,0 +1,27 @@
+-- Database: client
+-- Description: 客户端任务表添加(updated_at, id)联合索引，用于按水位增量同步
+-- Author: ComfyUI Web Service
+-- Created: 2026-10-18 17:00:00
+
+USE comfyui_client;
+
+-- 添加(updated_at, id)联合索引
+SET @index_exists = (
+    SELECT COUNT(*)
+    FROM INFORMATION_SCHEMA.STATISTICS
+    WHERE TABLE_SCHEMA = 'comfyui_client'
+    AND TABLE_NAME = 'client_tasks'
+    AND INDEX_NAME = 'idx_updated_id'
+);
+
+SET @sql = IF(@index_exists = 0,
+    'ALTER TABLE client_tasks ADD INDEX idx_updated_id (updated_at, id)',
+    'SELECT "idx_updated_id索引已存在" as message'
+);
+
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- 验证结果
+SELECT 'add_client_task_updated_index completed' as status;
@@ -0,0 +1,27 @@
+-- Database: shared
+-- Description: 全局任务表添加(source_user_id, status, created_at)联合索引，用于按用户和状态过滤的任务列表分页
+-- Author: ComfyUI Web Service
+-- Created: 2026-10-18 14:00:00
+
+USE comfyui_shared;
+
+-- 添加(source_user_id, status, created_at)联合索引
+SET @index_exists = (
+    SELECT COUNT(*)
+    FROM INFORMATION_SCHEMA.STATISTICS
+    WHERE TABLE_SCHEMA = 'comfyui_shared'
+    AND TABLE_NAME = 'global_tasks'
+    AND INDEX_NAME = 'idx_source_user_status_created'
+);
+
+SET @sql = IF(@index_exists = 0,
+    'ALTER TABLE global_tasks ADD INDEX idx_source_user_status_created (source_user_id, status, created_at)',
+    'SELECT "idx_source_user_status_created索引已存在" as message'
+);
+
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- 验证结果
+SELECT 'add_global_task_page_index completed' as status;
@@ -0,0 +1,45 @@
+-- Database: shared
+-- Description: 全局任务表添加prompt_id字段，用于取消任务时定位ComfyUI节点上的提示词
+-- Author: ComfyUI Web Service
+-- Created: 2026-10-18 10:00:00
+
+USE comfyui_shared;
+
+-- 添加prompt_id字段
+SET @column_exists = (
+    SELECT COUNT(*)
+    FROM INFORMATION_SCHEMA.COLUMNS
+    WHERE TABLE_SCHEMA = 'comfyui_shared'
+    AND TABLE_NAME = 'global_tasks'
+    AND COLUMN_NAME = 'prompt_id'
+);
+
+SET @sql = IF(@column_exists = 0,
+    'ALTER TABLE global_tasks ADD COLUMN prompt_id VARCHAR(64) NULL COMMENT ''ComfyUI提示词ID'' AFTER node_id',
+    'SELECT "prompt_id字段已存在" as message'
+);
+
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- 添加prompt_id索引
+SET @index_exists = (
+    SELECT COUNT(*)
+    FROM INFORMATION_SCHEMA.STATISTICS
+    WHERE TABLE_SCHEMA = 'comfyui_shared'
+    AND TABLE_NAME = 'global_tasks'
+    AND INDEX_NAME = 'idx_prompt_id'
+);
+
+SET @sql = IF(@index_exists = 0,
+    'ALTER TABLE global_tasks ADD INDEX idx_prompt_id (prompt_id)',
+    'SELECT "idx_prompt_id索引已存在" as message'
+);
+
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- 验证结果
+SELECT 'add_global_task_prompt_id completed' as status;
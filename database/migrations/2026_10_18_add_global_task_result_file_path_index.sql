@@ -0,0 +1,27 @@
+-- Database: shared
+-- Description: 全局任务结果表添加file_path前缀索引，用于按文件路径查询输出文件所在节点
+-- Author: ComfyUI Web Service
+-- Created: 2026-10-18 18:00:00
+
+USE comfyui_shared;
+
+-- 添加file_path前缀索引（utf8mb4下前191个字符，兼容MyISAM索引长度限制）
+SET @index_exists = (
+    SELECT COUNT(*)
+    FROM INFORMATION_SCHEMA.STATISTICS
+    WHERE TABLE_SCHEMA = 'comfyui_shared'
+    AND TABLE_NAME = 'global_task_results'
+    AND INDEX_NAME = 'idx_file_path'
+);
+
+SET @sql = IF(@index_exists = 0,
+    'ALTER TABLE global_task_results ADD INDEX idx_file_path (file_path(191))',
+    'SELECT "idx_file_path索引已存在" as message'
+);
+
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- 验证结果
+SELECT 'add_global_task_result_file_path_index completed' as status;
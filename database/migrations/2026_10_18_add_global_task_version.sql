@@ -0,0 +1,27 @@
+-- Database: shared
+-- Description: global_tasks表添加version乐观锁版本号字段，用于部分状态更新的并发校验
+-- Author: ComfyUI Web Service
+-- Created: 2026-10-18 14:00:00
+
+USE comfyui_shared;
+
+-- 添加version字段
+SET @column_exists = (
+    SELECT COUNT(*)
+    FROM INFORMATION_SCHEMA.COLUMNS
+    WHERE TABLE_SCHEMA = 'comfyui_shared'
+    AND TABLE_NAME = 'global_tasks'
+    AND COLUMN_NAME = 'version'
+);
+
+SET @sql = IF(@column_exists = 0,
+    'ALTER TABLE global_tasks ADD COLUMN version INT NOT NULL DEFAULT 0 COMMENT ''乐观锁版本号'' AFTER completed_at',
+    'SELECT "version字段已存在" as message'
+);
+
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- 验证结果
+SELECT 'add_global_task_version completed' as status;
@@ -0,0 +1,56 @@
+-- Database: shared
+-- Description: 输出文件存储索引：全局文件表添加日期分桶列与file_path前缀索引，创建按日期与扩展名累计的存储统计表
+-- Author: ComfyUI Web Service
+-- Created: 2026-10-18 23:00:00
+
+USE comfyui_shared;
+
+-- 添加date_bucket字段
+SET @column_exists = (
+    SELECT COUNT(*)
+    FROM INFORMATION_SCHEMA.COLUMNS
+    WHERE TABLE_SCHEMA = 'comfyui_shared'
+    AND TABLE_NAME = 'global_files'
+    AND COLUMN_NAME = 'date_bucket'
+);
+
+SET @sql = IF(@column_exists = 0,
+    'ALTER TABLE global_files ADD COLUMN date_bucket DATE NULL COMMENT ''日期分桶（存储统计按此汇总）'' AFTER expires_at',
+    'SELECT "date_bucket字段已存在" as message'
+);
+
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- 添加file_path前缀索引（按路径替换或移除索引记录）
+SET @index_exists = (
+    SELECT COUNT(*)
+    FROM INFORMATION_SCHEMA.STATISTICS
+    WHERE TABLE_SCHEMA = 'comfyui_shared'
+    AND TABLE_NAME = 'global_files'
+    AND INDEX_NAME = 'idx_file_path'
+);
+
+SET @sql = IF(@index_exists = 0,
+    'ALTER TABLE global_files ADD INDEX idx_file_path (file_path(191))',
+    'SELECT "idx_file_path索引已存在" as message'
+);
+
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- 创建存储统计表
+CREATE TABLE IF NOT EXISTS storage_stats (
+    source_type VARCHAR(20) NOT NULL COMMENT '文件来源',
+    date_bucket DATE NOT NULL COMMENT '日期分桶',
+    extension VARCHAR(20) NOT NULL COMMENT '扩展名',
+    file_count BIGINT NOT NULL DEFAULT 0 COMMENT '文件数',
+    total_size BIGINT NOT NULL DEFAULT 0 COMMENT '总大小(字节)',
+    updated_at DATETIME NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+    PRIMARY KEY (source_type, date_bucket, extension)
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_unicode_ci COMMENT = '存储统计表';
+
+-- 验证结果
+SELECT 'create_storage_index completed' as status;
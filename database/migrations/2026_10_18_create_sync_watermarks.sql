@@ -0,0 +1,18 @@
+-- Database: shared
+-- Description: 创建数据同步水位表，客户端任务增量同步从已记录的 (updated_at, id) 位置继续
+-- Author: ComfyUI Web Service
+-- Created: 2026-10-18 17:00:00
+
+USE comfyui_shared;
+
+-- 创建同步水位表
+CREATE TABLE IF NOT EXISTS sync_watermarks (
+    name VARCHAR(50) NOT NULL COMMENT '同步任务名称',
+    watermark_at DATETIME NULL COMMENT '已同步记录的最大更新时间',
+    watermark_id BIGINT NOT NULL DEFAULT 0 COMMENT '同一更新时间内已同步的最大记录ID',
+    updated_at DATETIME NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+    PRIMARY KEY (name)
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_unicode_ci COMMENT = '数据同步水位表';
+
+-- 验证结果
+SELECT 'create_sync_watermarks completed' as status;
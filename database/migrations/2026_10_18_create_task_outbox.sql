@@ -0,0 +1,37 @@
+-- Database: shared
+-- Description: 创建任务状态发件箱表，并将全局任务表转换为InnoDB，使状态更新与发件箱写入处于同一事务
+-- Author: ComfyUI Web Service
+-- Created: 2026-10-18 16:00:00
+
+USE comfyui_shared;
+
+-- 全局任务表转换为InnoDB（MyISAM不支持事务）
+SET @engine = (
+    SELECT ENGINE
+    FROM INFORMATION_SCHEMA.TABLES
+    WHERE TABLE_SCHEMA = 'comfyui_shared'
+    AND TABLE_NAME = 'global_tasks'
+);
+
+SET @sql = IF(@engine <> 'InnoDB',
+    'ALTER TABLE global_tasks ENGINE = InnoDB',
+    'SELECT "global_tasks已是InnoDB" as message'
+);
+
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- 创建发件箱表
+CREATE TABLE IF NOT EXISTS task_outbox (
+    id BIGINT NOT NULL AUTO_INCREMENT,
+    task_id VARCHAR(36) NOT NULL COMMENT '任务UUID',
+    target VARCHAR(20) NOT NULL DEFAULT 'client' COMMENT '目标表',
+    payload TEXT NOT NULL COMMENT '变更字段JSON',
+    created_at DATETIME NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+    PRIMARY KEY (id),
+    INDEX idx_task_id (task_id)
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_unicode_ci COMMENT = '任务状态变更发件箱表';
+
+-- 验证结果
+SELECT 'create_task_outbox completed' as status;
@@ -0,0 +1,52 @@
+-- Database: shared
+-- Description: 系统日志表按created_at月分区，过期数据由保留任务整区归档删除（见 backend/app/database/retention.py）
+-- Author: ComfyUI Web Service
+-- Created: 2026-10-18 19:05:00
+
+USE comfyui_shared;
+
+SET @partitioned = (
+    SELECT COUNT(*)
+    FROM INFORMATION_SCHEMA.PARTITIONS
+    WHERE TABLE_SCHEMA = 'comfyui_shared'
+    AND TABLE_NAME = 'system_logs'
+    AND PARTITION_NAME IS NOT NULL
+);
+
+-- 分区列必须包含在主键中；MySQL 8 只有InnoDB支持原生分区
+SET @sql = IF(@partitioned = 0,
+    'ALTER TABLE system_logs ENGINE = InnoDB, DROP PRIMARY KEY, ADD PRIMARY KEY (id, created_at)',
+    'SELECT "system_logs已分区" as message'
+);
+
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- 分区边界按执行当天生成：当月之前的数据进入p_history，当月起的4个月各一个分区，
+-- 之后的数据进入p_future，由保留任务按月拆分（p_future已有数据时保留任务不拆分，只记录警告）
+SET @month0 = DATE(DATE_FORMAT(CURDATE(), '%Y-%m-01'));
+SET @partitions = CONCAT(
+    'PARTITION p_history VALUES LESS THAN (''', @month0, '''), ',
+    'PARTITION ', DATE_FORMAT(@month0, 'p%Y%m'),
+    ' VALUES LESS THAN (''', DATE_ADD(@month0, INTERVAL 1 MONTH), '''), ',
+    'PARTITION ', DATE_FORMAT(DATE_ADD(@month0, INTERVAL 1 MONTH), 'p%Y%m'),
+    ' VALUES LESS THAN (''', DATE_ADD(@month0, INTERVAL 2 MONTH), '''), ',
+    'PARTITION ', DATE_FORMAT(DATE_ADD(@month0, INTERVAL 2 MONTH), 'p%Y%m'),
+    ' VALUES LESS THAN (''', DATE_ADD(@month0, INTERVAL 3 MONTH), '''), ',
+    'PARTITION ', DATE_FORMAT(DATE_ADD(@month0, INTERVAL 3 MONTH), 'p%Y%m'),
+    ' VALUES LESS THAN (''', DATE_ADD(@month0, INTERVAL 4 MONTH), '''), ',
+    'PARTITION p_future VALUES LESS THAN (MAXVALUE)'
+);
+
+SET @sql = IF(@partitioned = 0,
+    CONCAT('ALTER TABLE system_logs PARTITION BY RANGE COLUMNS(created_at) (', @partitions, ')'),
+    'SELECT "system_logs已分区" as message'
+);
+
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- 验证结果
+SELECT 'partition_system_logs completed' as status;
@@ -0,0 +1,27 @@
+-- Database: client
+-- Description: 客户端任务结果表添加file_path前缀索引，用于清理输出文件时删除引用它们的结果记录
+-- Author: ComfyUI Web Service
+-- Created: 2026-10-19 10:00:00
+
+USE comfyui_client;
+
+-- 添加file_path前缀索引（utf8mb4下前191个字符，兼容MyISAM索引长度限制）
+SET @index_exists = (
+    SELECT COUNT(*)
+    FROM INFORMATION_SCHEMA.STATISTICS
+    WHERE TABLE_SCHEMA = 'comfyui_client'
+    AND TABLE_NAME = 'client_task_results'
+    AND INDEX_NAME = 'idx_file_path'
+);
+
+SET @sql = IF(@index_exists = 0,
+    'ALTER TABLE client_task_results ADD INDEX idx_file_path (file_path(191))',
+    'SELECT "idx_file_path索引已存在" as message'
+);
+
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- 验证结果
+SELECT 'add_client_task_result_file_path_index completed' as status;
@@ -186,10 +186,36 @@ def migration_status():
         return False
 
 
+def run_retention():
+    """执行一次数据保留任务（维护月分区、归档并删除过期数据），可由cron调用"""
+    try:
+        from app.core.config_manager import get_config_manager
+        from app.database.connection import initialize_database
+        from app.database.retention import get_retention_manager
+
+        print("🗃️  正在执行数据保留任务...")
+        initialize_database(get_config_manager().get_config())
+        summary = get_retention_manager().run()
+
+        success = True
+        for table, result in summary.items():
+            if 'error' in result:
+                success = False
+                print(f"  ❌ {table}: {result['error']}")
+            else:
+                print(f"  ✅ {table}: {result}")
+        return success
+
+    except Exception as e:
+        logger.error(f"执行数据保留任务失败: {e}")
+        print(f"❌ 执行数据保留任务失败: {e}")
+        return False
+
+
 def main():
     """主函数"""
     parser = argparse.ArgumentParser(description='ComfyUI 数据库管理工具')
-    parser.add_argument('action', choices=['init', 'migrate', 'status', 'migration-status'], 
+    parser.add_argument('action', choices=['init', 'migrate', 'status', 'migration-status', 'retention'], 
                        help='要执行的操作')
     
     args = parser.parse_args()
@@ -205,6 +231,8 @@ def main():
         success = check_database_status()
     elif args.action == 'migration-status':
         success = migration_status()
+    elif args.action == 'retention':
+        success = run_retention()
     else:
         print("❌ 未知操作")
         success = False
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+启动耗时基准测试
+在全新的子进程中测量API服务与Celery Worker的冷启动导入耗时，
+并与config.yaml中system.startup_budget配置的预算比较，超出预算时返回非零退出码。
+
+用法:
+    python scripts/startup_benchmark.py            # 默认每个目标测量3次取中位数
+    python scripts/startup_benchmark.py --runs 5 --top 15
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+backend_path = Path(__file__).parent.parent / "backend"
+
+# 测量目标: 名称 -> (导入语句, 预算配置键)
+TARGETS = {
+    'api': ("import app.main_v2", 'api_import'),
+    'worker': ("import app.queue.tasks", 'worker_import'),
+}
+
+# 未配置预算时的默认值（秒）
+DEFAULT_BUDGET = {
+    'api_import': 1.5,
+    'worker_import': 1.0,
+}
+
+
+def measure_import(statement: str):
+    """在新进程中执行导入语句，返回 (耗时秒数, -X importtime输出)"""
+    code = (
+        "import time; _t = time.perf_counter(); "
+        f"{statement}; "
+        "print('__ELAPSED__', time.perf_counter() - _t)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=str(backend_path),
+        capture_output=True,
+        text=True,
+        timeout=120
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"导入失败: {statement}\n{result.stderr[-2000:]}")
+
+    elapsed = None
+    for line in result.stdout.splitlines():
+        if line.startswith('__ELAPSED__'):
+            elapsed = float(line.split()[1])
+    return elapsed, result.stderr
+
+
+def parse_importtime(output: str, top: int = 10):
+    """解析 -X importtime 输出，返回自身耗时最高的模块 [(模块名, 自身耗时us, 累计耗时us)]"""
+    entries = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            entries.append((name.strip(), int(self_us), int(cumulative_us)))
+        except ValueError:
+            continue
+    entries.sort(key=lambda e: e[1], reverse=True)
+    return entries[:top]
+
+
+def load_budget():
+    """从配置读取启动预算"""
+    budget = dict(DEFAULT_BUDGET)
+    try:
+        sys.path.insert(0, str(backend_path))
+        from app.core.config_manager import get_config_manager
+        budget.update(get_config_manager().get_system_config().get('startup_budget', {}) or {})
+    except Exception as e:
+        print(f"⚠️  读取启动预算配置失败，使用默认值: {e}")
+    return budget
+
+
+def run_benchmark(runs: int = 3, top: int = 10):
+    """执行基准测试，返回 {目标: {'median':..., 'budget':..., 'ok':...}}"""
+    budget = load_budget()
+    report = {}
+
+    for name, (statement, budget_key) in TARGETS.items():
+        timings = []
+        importtime_output = ""
+        for _ in range(runs):
+            elapsed, importtime_output = measure_import(statement)
+            timings.append(elapsed)
+
+        median = statistics.median(timings)
+        limit = budget.get(budget_key)
+        report[name] = {
+            'median': median,
+            'timings': timings,
+            'budget': limit,
+            'ok': limit is None or median <= limit,
+            'top_modules': parse_importtime(importtime_output, top)
+        }
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动耗时基准测试")
+    parser.add_argument('--runs', type=int, default=3, help="每个目标的测量次数")
+    parser.add_argument('--top', type=int, default=10, help="显示自身耗时最高的模块数")
+    args = parser.parse_args()
+
+    print("⏱️  启动耗时基准测试")
+    print("=" * 60)
+
+    report = run_benchmark(args.runs, args.top)
+
+    all_ok = True
+    for name, item in report.items():
+        status = "✅" if item['ok'] else "❌"
+        timings = ", ".join(f"{t:.3f}" for t in item['timings'])
+        print(f"\n{status} {name}: 中位数 {item['median']:.3f}s (预算 {item['budget']}s) [{timings}]")
+        print("   自身耗时最高的模块:")
+        for module, self_us, cumulative_us in item['top_modules']:
+            print(f"     {self_us / 1000:8.1f}ms  (累计 {cumulative_us / 1000:8.1f}ms)  {module}")
+        all_ok = all_ok and item['ok']
+
+    print("\n" + "=" * 60)
+    print("✅ 所有目标均在预算内" if all_ok else "❌ 存在超出预算的启动目标")
+    return all_ok
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(0 if main() else 1)
+    except KeyboardInterrupt:
+        print("\n\n⏹️  基准测试被用户中断")
+        sys.exit(1)
@@ -0,0 +1,134 @@
+"""
+测试用的SQLite演示数据库：按真实模型建表、演示任务表模型、使用演示会话的DAO与数据库管理器
+
+测试文件在导入本模块前已将backend目录加入sys.path
+"""
+from contextlib import contextmanager
+
+from sqlalchemy import (
+    BigInteger, Column, DateTime, DECIMAL, DefaultClause, ForeignKey, Integer, MetaData, String, Text,
+    create_engine, event, text
+)
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import StaticPool
+
+
+@compiles(BigInteger, 'sqlite')
+def _compile_big_integer(type_, compiler, **kw):
+    # SQLite只有INTEGER主键才自增
+    return 'INTEGER'
+
+
+def create_sqlite_engine(url: str = 'sqlite://', statements: list = None):
+    """创建SQLite引擎，内存库使用单连接（多个会话和线程看到同一份数据）
+
+    传入statements列表时记录执行的SQL语句
+    """
+    kwargs = {}
+    if url == 'sqlite://':
+        kwargs = {'poolclass': StaticPool, 'connect_args': {'check_same_thread': False}}
+    engine = create_engine(url, **kwargs)
+    if statements is not None:
+        event.listen(engine, 'before_cursor_execute',
+                     lambda conn, cursor, statement, *args: statements.append(statement))
+    return engine
+
+
+def create_model_tables(engine, model_class, table_names):
+    """按真实模型在SQLite中建表，返回 {表名: 表}
+
+    表先复制到独立的MetaData再调整，不影响模型本身：
+    MySQL的索引名按表区分，SQLite按库区分，演示库不建索引；
+    模型中的 server_default='CURRENT_TIMESTAMP' 在SQLite中会被当作字符串
+    """
+    metadata = MetaData()
+    for source_table in model_class.metadata.sorted_tables:
+        source_table.to_metadata(metadata)
+    tables = [metadata.tables[name] for name in table_names]
+    for table in tables:
+        table.indexes.clear()
+        for column in table.columns:
+            if column.server_default is not None and getattr(column.server_default, 'arg', None) == 'CURRENT_TIMESTAMP':
+                column.server_default = DefaultClause(text('CURRENT_TIMESTAMP'))
+    metadata.create_all(engine, tables=tables)
+    return {table.name: table for table in tables}
+
+
+def create_demo_task_models():
+    """创建演示用的全局任务、客户端任务与客户端任务参数模型（只包含测试用到的列）
+
+    返回 (Base, DemoGlobalTask, DemoClientTask, DemoParameter)
+    """
+    Base = declarative_base()
+
+    def task_columns():
+        return {
+            'id': Column(Integer, primary_key=True),
+            'task_id': Column(String(36), unique=True, nullable=False),
+            'task_type': Column(String(20)),
+            'workflow_name': Column(String(100)),
+            'status': Column(String(20)),
+            'progress': Column(DECIMAL(5, 2), default=0),
+            'message': Column(Text),
+            'error_message': Column(Text),
+            'estimated_time': Column(Integer),
+            'actual_time': Column(Integer),
+            'started_at': Column(DateTime),
+            'completed_at': Column(DateTime),
+            'created_at': Column(DateTime),
+            'updated_at': Column(DateTime),
+            'version': Column(Integer, nullable=False, default=0),
+        }
+
+    DemoGlobalTask = type('DemoGlobalTask', (Base,), dict(
+        __tablename__='demo_global_tasks', source_type=Column(String(20)), source_user_id=Column(String(36)),
+        priority=Column(Integer), **task_columns()
+    ))
+    DemoClientTask = type('DemoClientTask', (Base,), dict(
+        __tablename__='demo_client_tasks', client_id=Column(String(36)), **task_columns()
+    ))
+    DemoParameter = type('DemoParameter', (Base,), dict(
+        __tablename__='demo_task_parameters',
+        id=Column(Integer, primary_key=True), task_id=Column(Integer, ForeignKey('demo_client_tasks.id')),
+        parameter_name=Column(String(100)), parameter_value=Column(Text)
+    ))
+    return Base, DemoGlobalTask, DemoClientTask, DemoParameter
+
+
+def create_demo_db_manager(session_factories=None, engines=None, async_makers=None):
+    """创建演示数据库管理器，按数据库名返回会话、引擎或异步会话
+
+    session_factories/engines/async_makers 为 {数据库名: 会话工厂/引擎/异步会话工厂}
+    """
+    session_factories = session_factories or {}
+    engines = engines or {}
+    async_makers = async_makers or {}
+    return type('DemoManager', (), {
+        'get_session_direct': staticmethod(lambda db_name: session_factories[db_name]()),
+        'get_engine': staticmethod(lambda db_name: engines[db_name]),
+        'has_async_engine': staticmethod(lambda db_name: db_name in async_makers),
+        'get_async_session_direct': staticmethod(lambda db_name: async_makers[db_name]())
+    })()
+
+
+def make_demo_dao(dao_class, model_class, db_name, db_manager):
+    """构造使用演示数据库管理器的DAO（获取会话仍走BaseDAO中的工作单元逻辑）"""
+    dao = dao_class.__new__(dao_class)
+    dao.db_name = db_name
+    dao.model_class = model_class
+    dao.db_manager = db_manager
+    return dao
+
+
+@contextmanager
+def use_demo_db_manager(db_manager):
+    """临时替换全局数据库管理器（未指定会话工厂的工作单元从中获取会话）"""
+    import app.database.connection as connection
+
+    previous = connection._db_manager
+    connection._db_manager = db_manager
+    try:
+        yield db_manager
+    finally:
+        connection._db_manager = previous
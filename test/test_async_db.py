@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+测试异步数据库访问：异步DAO经aiosqlite查询、无异步引擎时回退到线程池中的同步DAO、
+数据库线程池限制并发、事件循环阻塞检测（慢查询经线程池执行时不阻塞，事件循环中的同步调用被检出）
+"""
+import sys
+import os
+import asyncio
+import tempfile
+import threading
+import time
+
+# 添加正确的路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+backend_path = os.path.join(project_root, 'backend')
+
+sys.path.insert(0, backend_path)
+
+# 切换到项目根目录
+os.chdir(project_root)
+
+
+def _create_task_db(db_path, use_async=True):
+    """在SQLite文件中创建全局任务表与结果表，返回 (演示数据库管理器, 同步会话工厂)"""
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from sqlalchemy.orm import sessionmaker
+    from app.database.models.shared_models import GlobalTask
+    from db_helpers import create_demo_db_manager, create_model_tables, create_sqlite_engine
+
+    engine = create_sqlite_engine(f'sqlite:///{db_path}')
+    create_model_tables(engine, GlobalTask, ['global_tasks', 'global_task_results'])
+    Session = sessionmaker(bind=engine)
+
+    async_makers = {}
+    if use_async:
+        async_makers['shared'] = async_sessionmaker(
+            create_async_engine(f'sqlite+aiosqlite:///{db_path}'), expire_on_commit=False
+        )
+    return create_demo_db_manager({'shared': Session}, async_makers=async_makers), Session
+
+
+def _insert_task(Session, task_id, status='completed', files=()):
+    from app.database.models.shared_models import GlobalTask, GlobalTaskResult
+
+    session = Session()
+    task = GlobalTask(
+        task_id=task_id, source_type='client', source_user_id='client-1',
+        task_type='text_to_image', workflow_name='sd_basic', status=status, prompt='a cat', version=0
+    )
+    session.add(task)
+    session.flush()
+    for file_path in files:
+        session.add(GlobalTaskResult(
+            task_id=task.id, result_type='image', file_path=file_path, file_name=os.path.basename(file_path)
+        ))
+    session.commit()
+    session.close()
+
+
+def _create_status_manager(db_manager):
+    """使用演示数据库的状态管理器（不启用Redis读缓存和状态缓冲）"""
+    import app.database.task_status_manager as tsm_module
+    from app.database.dao.task_dao import GlobalTaskDAO, ClientTaskDAO
+    from app.database.dao.async_task_dao import AsyncGlobalTaskDAO, AsyncClientTaskDAO
+
+    tsm_module.get_task_status_cache = lambda: None
+    tsm_module.get_task_status_buffer = lambda: None
+
+    manager = tsm_module.DatabaseTaskStatusManager.__new__(tsm_module.DatabaseTaskStatusManager)
+    manager.global_task_dao = GlobalTaskDAO.__new__(GlobalTaskDAO)
+    manager.global_task_dao.db_name = 'shared'
+    manager.global_task_dao.model_class = GlobalTaskDAO().model_class
+    manager.global_task_dao.db_manager = db_manager
+    manager.client_task_dao = ClientTaskDAO()
+    manager.async_global_task_dao = AsyncGlobalTaskDAO(manager.global_task_dao)
+    manager.async_global_task_dao.db_manager = db_manager
+    manager.async_global_task_dao.result_dao.db_manager = db_manager
+    manager.async_client_task_dao = AsyncClientTaskDAO(manager.client_task_dao)
+    return manager
+
+
+def test_async_task_dao():
+    """测试异步DAO经异步引擎查询任务与结果，状态文档与同步路径一致"""
+    print("⚡ 测试异步任务DAO")
+    print("-" * 40)
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_manager, Session = _create_task_db(os.path.join(tmp_dir, 'shared.db'))
+            _insert_task(Session, 'task-done', files=['outputs/a.png', 'outputs/b.png'])
+            _insert_task(Session, 'task-running', status='processing')
+            manager = _create_status_manager(db_manager)
+            dao = manager.async_global_task_dao
+            assert dao.is_async
+
+            async def run():
+                task = await dao.get_task_by_task_id('task-done')
+                results = await dao.get_results_by_task_ids([task.id])
+                missing = await dao.get_task_by_task_id('task-missing')
+                document = await manager.get_task_status_async('task-done')
+                running = await manager.get_task_status_async('task-running')
+                return task, results, missing, document, running
+
+            task, results, missing, document, running = asyncio.run(run())
+            print(f"任务: {task.task_id}，结果数: {len(results[task.id])}")
+            assert task.task_id == 'task-done' and missing is None
+            assert [r.file_path for r in results[task.id]] == ['outputs/a.png', 'outputs/b.png']
+
+            # 异步路径与同步路径生成相同的状态文档
+            assert document == manager._load_task_status('task-done')
+            assert document['result_data']['files'] == ['outputs/a.png', 'outputs/b.png']
+            assert running['status'] == 'processing' and running['result_data'] is None
+
+        print("✅ 异步任务DAO测试通过")
+
+    except Exception as e:
+        print(f"❌ 异步任务DAO测试失败: {e}")
+        raise
+
+
+def test_sync_fallback():
+    """测试没有异步引擎时回退到线程池中的同步DAO"""
+    print("\n🔁 测试同步回退")
+    print("-" * 40)
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_manager, Session = _create_task_db(os.path.join(tmp_dir, 'shared.db'), use_async=False)
+            _insert_task(Session, 'task-done', files=['outputs/a.png'])
+            manager = _create_status_manager(db_manager)
+            assert not manager.async_global_task_dao.is_async
+
+            loop_thread = threading.get_ident()
+            query_threads = []
+            sync_query = manager.global_task_dao.get_task_by_task_id
+
+            def tracked_query(task_id):
+                query_threads.append(threading.current_thread().name)
+                return sync_query(task_id)
+
+            manager.global_task_dao.get_task_by_task_id = tracked_query
+
+            async def run():
+                return await manager.get_task_status_async('task-done')
+
+            document = asyncio.run(run())
+            print(f"查询线程: {query_threads}")
+            assert document['result_data']['files'] == ['outputs/a.png']
+            assert query_threads and all(name.startswith('db') for name in query_threads)
+            assert threading.get_ident() == loop_thread
+
+        print("✅ 同步回退测试通过")
+
+    except Exception as e:
+        print(f"❌ 同步回退测试失败: {e}")
+        raise
+
+
+def test_executor_bounded():
+    """测试数据库线程池限制同时执行的同步调用数"""
+    print("\n🧵 测试数据库线程池")
+    print("-" * 40)
+
+    try:
+        from app.database.executor import DatabaseExecutor
+
+        executor = DatabaseExecutor(max_workers=4)
+        lock = threading.Lock()
+        state = {'running': 0, 'peak': 0}
+
+        def slow_query(i):
+            with lock:
+                state['running'] += 1
+                state['peak'] = max(state['peak'], state['running'])
+            time.sleep(0.05)
+            with lock:
+                state['running'] -= 1
+            return i
+
+        async def run():
+            return await asyncio.gather(*(executor.run(slow_query, i) for i in range(20)))
+
+        results = asyncio.run(run())
+        executor.shutdown()
+        status = executor.get_status()
+        print(f"并发峰值: {state['peak']}，排队峰值: {status['max_pending']}")
+        assert results == list(range(20))
+        assert state['peak'] == 4 and status['max_pending'] == 20 and status['completed'] == 20
+
+        print("✅ 数据库线程池测试通过")
+
+    except Exception as e:
+        print(f"❌ 数据库线程池测试失败: {e}")
+        raise
+
+
+# 阻塞检测阈值与同步调用的固定阻塞时长：阈值远高于GC停顿等调度抖动，阻塞时长远高于阈值
+BLOCK_THRESHOLD = 0.5
+BLOCK_DURATION = 1.5
+
+
+def _blocking_handler():
+    """在事件循环中直接执行的同步调用"""
+    time.sleep(BLOCK_DURATION)
+
+
+def test_loop_block_detector():
+    """测试慢查询经线程池执行时事件循环不被阻塞，事件循环中的同步调用被检出"""
+    print("\n🩺 测试事件循环阻塞检测")
+    print("-" * 40)
+
+    try:
+        from app.core.loop_monitor import LoopBlockDetector
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_manager, Session = _create_task_db(os.path.join(tmp_dir, 'shared.db'), use_async=False)
+            _insert_task(Session, 'task-done', files=['outputs/a.png'])
+            manager = _create_status_manager(db_manager)
+            sync_query = manager.global_task_dao.get_task_by_task_id
+
+            def slow_query(task_id):
+                time.sleep(0.2)
+                return sync_query(task_id)
+
+            manager.global_task_dao.get_task_by_task_id = slow_query
+            detector = LoopBlockDetector(threshold=BLOCK_THRESHOLD)
+
+            async def run():
+                detector.start()
+                await asyncio.sleep(0.05)
+                documents = await asyncio.gather(*(manager.get_task_status_async('task-done') for _ in range(20)))
+                clean_count = detector.blocked_count
+
+                _blocking_handler()
+                await asyncio.sleep(0.1)
+                await detector.stop()
+                return documents, clean_count
+
+            documents, clean_count = asyncio.run(run())
+            status = detector.get_status()
+            print(f"慢查询期间阻塞次数: {clean_count}，同步调用后: {status['blocked_count']}，最长 {status['max_block_ms']}ms")
+            assert all(d['task_id'] == 'task-done' for d in documents)
+            assert clean_count == 0
+            assert status['blocked_count'] == 1
+            assert status['max_block_ms'] >= (BLOCK_DURATION - BLOCK_THRESHOLD) * 1000
+            assert '_blocking_handler' in status['recent'][0]['stack']
+
+        print("✅ 事件循环阻塞检测测试通过")
+
+    except Exception as e:
+        print(f"❌ 事件循环阻塞检测测试失败: {e}")
+        raise
+
+
+def main():
+    """主测试函数"""
+    print("🧪 异步数据库访问测试")
+    print("=" * 50)
+
+    test_async_task_dao()
+    test_sync_fallback()
+    test_executor_bounded()
+    test_loop_block_detector()
+
+    print("\n🎉 所有测试完成!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+测试异步Worker模式的执行器
+使用本地模拟的ComfyUI服务驱动execute_workflow，验证并发、节点槽位限制与释放、停止后重启
+"""
+import sys
+import os
+import asyncio
+import threading
+import time
+
+# 添加正确的路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+backend_path = os.path.join(project_root, 'backend')
+
+sys.path.insert(0, backend_path)
+
+# 切换到项目根目录
+os.chdir(project_root)
+
+
+async def _start_fake_comfyui(port_holder, state):
+    """启动模拟的ComfyUI服务：提交后约0.2秒出现在history中，工作流带fail时返回500
+
+    state['active']为已提交但结果尚未被取走的提示词数，即节点上同时占用的槽位数
+    """
+    from aiohttp import web
+
+    async def prompt(request):
+        data = await request.json()
+        if data['prompt'].get('fail'):
+            return web.Response(status=500, text='node error')
+        state['submitted'] += 1
+        prompt_id = f"p{state['submitted']}"
+        state['done_at'][prompt_id] = time.monotonic() + 0.2
+        state['active'] += 1
+        state['max_active'] = max(state['max_active'], state['active'])
+        return web.json_response({'prompt_id': prompt_id})
+
+    async def history(request):
+        prompt_id = request.match_info['prompt_id']
+        if time.monotonic() >= state['done_at'].get(prompt_id, float('inf')):
+            if state['done_at'].pop(prompt_id, None) is not None:
+                state['active'] -= 1
+            return web.json_response({prompt_id: {'outputs': {}}})
+        return web.json_response({})
+
+    app = web.Application()
+    app.router.add_post('/prompt', prompt)
+    app.router.add_get('/history/{prompt_id}', history)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port_holder.append(site._server.sockets[0].getsockname()[1])
+    return runner
+
+
+class _FakeTask:
+    """模拟Celery任务对象：记录状态写入与结果处理所在的线程"""
+
+    def __init__(self):
+        self.statuses = {}
+        self.write_threads = set()
+
+    def update_task_status(self, task_id, status_data, celery_task_id=None):
+        self.write_threads.add(threading.current_thread().name)
+        self.statuses.setdefault(task_id, []).append(status_data['status'])
+
+    def _is_task_cancelled(self, task_id):
+        return False
+
+    def _process_comfyui_result(self, result_data, task_id, node_id):
+        self.write_threads.add(threading.current_thread().name)
+        return {'files': [f"outputs/{task_id}.png"]}
+
+    def _extract_generation_params(self, request_data, workflow):
+        return {}
+
+
+def _create_runner(slot_limit, runner=None):
+    """创建（或重新启动）执行器：节点选择固定返回模拟ComfyUI，工作流参数处理直接返回请求数据"""
+    import app.core.workflow_parameter_processor as processor_module
+    import app.queue.async_runner as runner_module
+    from app.queue.async_runner import AsyncWorkflowRunner
+
+    runner = runner or AsyncWorkflowRunner(connection_limit=50, status_write_workers=2)
+    state = {'submitted': 0, 'done_at': {}, 'active': 0, 'max_active': 0}
+    port_holder = []
+    server = runner.run(_start_fake_comfyui(port_holder, state))
+    comfyui_url = f"http://127.0.0.1:{port_holder[0]}"
+
+    async def select_node(task_type):
+        return comfyui_url, 'default', slot_limit
+
+    runner._select_node = select_node
+    processor = type('DemoProcessor', (), {
+        'process_workflow_request': staticmethod(lambda workflow_name, request_data: dict(request_data))
+    })()
+    original_getter = processor_module.get_workflow_parameter_processor
+    processor_module.get_workflow_parameter_processor = lambda: processor
+    # 缩短轮询间隔，模拟服务约0.2秒完成
+    original_profile = runner_module.WORKFLOW_PROFILES['text_to_image']
+    runner_module.WORKFLOW_PROFILES['text_to_image'] = dict(original_profile, poll_interval=0.05)
+
+    def cleanup():
+        processor_module.get_workflow_parameter_processor = original_getter
+        runner_module.WORKFLOW_PROFILES['text_to_image'] = original_profile
+        if runner.running:
+            runner.run(server.cleanup())
+            runner.stop()
+
+    return runner, state, cleanup
+
+
+def _run_tasks(runner, task, requests):
+    async def run_all():
+        return await asyncio.gather(*(
+            runner.execute_workflow(task, request_data, 'text_to_image') for request_data in requests
+        ))
+    return runner.run(run_all(), timeout=60)
+
+
+def test_concurrent_workflows_with_node_slots():
+    """测试单个事件循环并发执行大量工作流，遵守节点槽位限制，成功与失败后都释放槽位"""
+    print("⚡ 测试异步执行器并发与槽位限制")
+    print("-" * 40)
+
+    try:
+        slot_limit = 8
+        task_count = 40
+        runner, state, cleanup = _create_runner(slot_limit)
+        try:
+            task = _FakeTask()
+            # 每5个任务中有1个在提交时失败
+            requests = [
+                {'task_id': f"t{i}", 'prompt': 'a cat', 'fail': i % 5 == 0}
+                for i in range(task_count)
+            ]
+
+            start = time.time()
+            results = _run_tasks(runner, task, requests)
+            elapsed = time.time() - start
+
+            completed = [r for r in results if r['status'] == 'completed']
+            failed = [r for r in results if r['status'] == 'failed']
+            slot = runner._node_slots['default']
+            print(f"完成 {len(completed)} 个，失败 {len(failed)} 个，耗时: {elapsed:.2f}s")
+            print(f"最大同时占用槽位: {state['max_active']} (上限 {slot_limit})")
+
+            assert len(completed) == 32 and len(failed) == 8
+            assert completed[0]['files'] == ['outputs/t1.png']
+            assert task.statuses['t0'][-1] == 'failed' and task.statuses['t1'][-1] == 'completed'
+            # 节点上同时运行的提示词数达到且不超过槽位数
+            assert state['max_active'] == slot_limit
+
+            # 成功和失败的任务都归还了槽位，没有残留的等待计数
+            assert slot._value == slot_limit and not slot.locked()
+            assert runner._node_waiting == {'default': 0}
+            # 状态写入与结果处理都不在事件循环线程中执行
+            assert task.write_threads and all(name.startswith('status-writer') for name in task.write_threads)
+        finally:
+            cleanup()
+
+        print("✅ 异步执行器并发测试完成")
+
+    except Exception as e:
+        print(f"❌ 异步执行器并发测试失败: {e}")
+        raise
+
+
+def test_restart_after_stop():
+    """测试停止后再次启动的执行器重新创建状态写入线程池与节点槽位"""
+    print("\n🔁 测试执行器停止后重启")
+    print("-" * 40)
+
+    try:
+        runner, state, cleanup = _create_runner(slot_limit=2)
+        try:
+            assert _run_tasks(runner, _FakeTask(), [{'task_id': 'before'}])[0]['status'] == 'completed'
+        finally:
+            cleanup()
+        assert not runner.running
+        assert runner._status_executor is None and runner._node_slots == {}
+
+        # 同一执行器再次启动后，状态写入与节点槽位照常工作
+        runner, state, cleanup = _create_runner(slot_limit=2, runner=runner)
+        try:
+            task = _FakeTask()
+            results = _run_tasks(runner, task, [{'task_id': f"after{i}"} for i in range(4)])
+            print(f"重启后完成 {len(results)} 个任务，最大同时占用槽位: {state['max_active']}")
+            assert [r['status'] for r in results] == ['completed'] * 4
+            assert task.statuses['after0'] == ['processing', 'processing', 'processing', 'completed']
+            assert state['max_active'] == 2
+        finally:
+            cleanup()
+
+        print("✅ 执行器停止后重启测试完成")
+
+    except Exception as e:
+        print(f"❌ 执行器停止后重启测试失败: {e}")
+        raise
+
+
+def test_cancelled_before_submit():
+    """测试提交提示词之前被取消时直接返回取消结果，不停止节点上的提示词"""
+    print("\n🛑 测试提交前取消")
+    print("-" * 40)
+
+    try:
+        import app.core.task_canceller as canceller_module
+        from app.core.base import TaskCancelledError
+
+        runner, state, cleanup = _create_runner(slot_limit=2)
+        stopped = []
+
+        async def cancelled_select_node(task_type):
+            raise TaskCancelledError('t-cancel')
+
+        class RecordingCanceller:
+            async def stop_prompt(self, *args):
+                stopped.append(args)
+
+        original_getter = canceller_module.get_task_canceller
+        canceller_module.get_task_canceller = lambda: RecordingCanceller()
+        runner._select_node = cancelled_select_node
+        try:
+            result = _run_tasks(runner, _FakeTask(), [{'task_id': 't-cancel'}])[0]
+            print(f"提交前取消的结果: {result['status']}")
+            assert result['status'] == 'cancelled' and stopped == []
+            assert state['submitted'] == 0
+        finally:
+            canceller_module.get_task_canceller = original_getter
+            cleanup()
+
+        print("✅ 提交前取消测试完成")
+
+    except Exception as e:
+        print(f"❌ 提交前取消测试失败: {e}")
+        raise
+
+
+def test_worker_mode_switch():
+    """测试Worker模式按配置切换，读取配置失败时回退到prefork"""
+    print("\n🔀 测试Worker模式配置")
+    print("-" * 40)
+
+    import app.queue.async_runner as runner_module
+    original_getter = runner_module.get_config_manager
+    try:
+        def config_with(task_queue_config):
+            return lambda: type('DemoConfig', (), {
+                'get_task_queue_config': staticmethod(lambda: task_queue_config)
+            })()
+
+        runner_module.get_config_manager = config_with({'worker_mode': 'async'})
+        assert runner_module.is_async_worker_mode() is True
+        runner_module.get_config_manager = config_with({'worker_mode': 'prefork'})
+        assert runner_module.is_async_worker_mode() is False
+        runner_module.get_config_manager = config_with({})
+        assert runner_module.is_async_worker_mode() is False
+
+        def broken():
+            raise RuntimeError("配置不可用")
+        runner_module.get_config_manager = broken
+        assert runner_module.is_async_worker_mode() is False
+
+        print("✅ Worker模式配置测试完成")
+
+    except Exception as e:
+        print(f"❌ Worker模式配置测试失败: {e}")
+        raise
+    finally:
+        runner_module.get_config_manager = original_getter
+
+
+def main():
+    """主测试函数"""
+    print("🧪 测试异步Worker模式")
+    print("=" * 50)
+
+    test_concurrent_workflows_with_node_slots()
+    test_restart_after_stop()
+    test_cancelled_before_submit()
+    test_worker_mode_switch()
+
+    print("\n🎯 异步Worker模式测试完成！")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+测试批量提交文生图任务：每个任务的任务数据与参数和单个提交一致、整批一次入队，
+任一任务写入失败时客户端库与共享库全部回滚
+"""
+import sys
+import os
+import asyncio
+
+# 添加正确的路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+backend_path = os.path.join(project_root, 'backend')
+
+sys.path.insert(0, backend_path)
+
+# 切换到项目根目录
+os.chdir(project_root)
+
+
+def _create_demo_env():
+    """在内存SQLite中创建客户端与共享库的任务表和参数表，返回使用它们的状态管理器"""
+    from sqlalchemy import text
+    from sqlalchemy.orm import sessionmaker
+    from app.database.dao.task_dao import GlobalTaskDAO, ClientTaskDAO
+    from app.database.models.client_models import ClientTask
+    from app.database.models.shared_models import GlobalTask
+    from app.database.task_status_manager import DatabaseTaskStatusManager
+    from db_helpers import create_demo_db_manager, create_model_tables, create_sqlite_engine, make_demo_dao
+
+    client_engine = create_sqlite_engine()
+    create_model_tables(client_engine, ClientTask, ['client_tasks', 'client_task_parameters'])
+    shared_engine = create_sqlite_engine()
+    create_model_tables(shared_engine, GlobalTask, ['global_tasks', 'global_task_parameters'])
+    # 提示词为reject的全局任务写入失败，模拟批次中途的数据库错误
+    with shared_engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TRIGGER reject_task BEFORE INSERT ON global_tasks WHEN NEW.prompt = 'reject' "
+            "BEGIN SELECT RAISE(ABORT, 'rejected'); END"
+        ))
+
+    sessions = {'client': sessionmaker(bind=client_engine), 'shared': sessionmaker(bind=shared_engine)}
+    db_manager = create_demo_db_manager(sessions)
+
+    manager = DatabaseTaskStatusManager.__new__(DatabaseTaskStatusManager)
+    manager.global_task_dao = make_demo_dao(GlobalTaskDAO, GlobalTask, 'shared', db_manager)
+    manager.client_task_dao = make_demo_dao(ClientTaskDAO, ClientTask, 'client', db_manager)
+    return manager, sessions, db_manager
+
+
+def _submit(manager, db_manager, request_body):
+    """调用批量提交路由，Celery group只记录签名，返回 (响应或HTTP异常, 入队的签名)"""
+    import celery
+    import app.api.routes as routes
+    from fastapi import HTTPException
+    from fastapi.security import HTTPAuthorizationCredentials
+    from app.api.schemas import BatchTaskRequest
+    # 导入时注册文生图任务处理器
+    import app.processors.text_to_image_processor  # noqa: F401
+    from db_helpers import use_demo_db_manager
+
+    enqueued = []
+
+    class RecordingGroup:
+        def __init__(self, signatures):
+            self.signatures = list(signatures)
+
+        def apply_async(self):
+            enqueued.extend(self.signatures)
+
+    originals = (routes.verify_token, routes.get_status_manager, celery.group)
+    routes.verify_token = lambda token: {'sub': 'user-1', 'client_id': 'client-1'}
+    routes.get_status_manager = lambda: manager
+    celery.group = RecordingGroup
+    try:
+        with use_demo_db_manager(db_manager):
+            credentials = HTTPAuthorizationCredentials(scheme='Bearer', credentials='token')
+            try:
+                response = asyncio.run(routes.submit_batch_tasks(BatchTaskRequest(**request_body), credentials))
+            except HTTPException as e:
+                response = e
+    finally:
+        routes.verify_token, routes.get_status_manager, celery.group = originals
+    return response, enqueued
+
+
+def _count(session_factory, model):
+    session = session_factory()
+    try:
+        return session.query(model).count()
+    finally:
+        session.close()
+
+
+def test_batch_submit():
+    """测试批量提交的任务数据、参数与入队签名"""
+    print("📦 测试批量提交文生图任务")
+    print("-" * 40)
+
+    try:
+        from app.database.models.client_models import ClientTask, ClientTaskParameter
+        from app.database.models.shared_models import GlobalTask, GlobalTaskParameter
+
+        manager, sessions, db_manager = _create_demo_env()
+        response, enqueued = _submit(manager, db_manager, {
+            'batch_name': 'cats',
+            'priority': 3,
+            'tasks': [
+                {'prompt': 'a cat', 'steps': 30, 'cfg_scale': 6.5, 'sampler': 'dpmpp_2m', 'scheduler': 'karras'},
+                {'prompt': 'a dog', 'width': 768, 'priority': 5},
+            ]
+        })
+        print(f"批次 {response.batch_id}: {response.total_tasks} 个任务，入队 {len(enqueued)} 个")
+        assert response.total_tasks == 2 and len(enqueued) == 2
+
+        session = sessions['shared']()
+        try:
+            tasks = {t.task_id: t for t in session.query(GlobalTask).all()}
+            first, second = (tasks[task_id] for task_id in response.task_ids)
+            # 采样参数与单个提交一样写入任务表
+            assert (first.steps, float(first.cfg_scale), first.sampler, first.scheduler) == (30, 6.5, 'dpmpp_2m', 'karras')
+            assert first.priority == 3 and second.priority == 5 and second.width == 768
+            assert first.celery_task_id == enqueued[0].id
+
+            parameters = {
+                p.parameter_name: p.parameter_value
+                for p in session.query(GlobalTaskParameter).filter(GlobalTaskParameter.task_id == first.id)
+            }
+        finally:
+            session.close()
+        # 参数表保存请求的全部字段，另加批次信息
+        assert parameters['prompt'] == 'a cat' and parameters['steps'] == '30' and parameters['sampler'] == 'dpmpp_2m'
+        assert parameters['batch_id'] == response.batch_id and parameters['batch_index'] == '0'
+        assert parameters['batch_name'] == 'cats'
+
+        # 入队的请求数据与任务数据一致
+        assert enqueued[0].args[0]['task_id'] == first.task_id and enqueued[0].args[0]['steps'] == 30
+        assert _count(sessions['client'], ClientTask) == 2
+        assert _count(sessions['client'], ClientTaskParameter) == _count(sessions['shared'], GlobalTaskParameter)
+
+        print("✅ 批量提交文生图任务测试通过")
+
+    except Exception as e:
+        print(f"❌ 批量提交文生图任务测试失败: {e}")
+        raise
+
+
+def test_batch_submit_rollback():
+    """测试批次中任一全局任务写入失败时两个库全部回滚且不入队"""
+    print("\n↩️ 测试批量提交失败回滚")
+    print("-" * 40)
+
+    try:
+        from app.database.models.client_models import ClientTask, ClientTaskParameter
+        from app.database.models.shared_models import GlobalTask, GlobalTaskParameter
+
+        manager, sessions, db_manager = _create_demo_env()
+        response, enqueued = _submit(manager, db_manager, {
+            'tasks': [{'prompt': 'a cat'}, {'prompt': 'reject'}, {'prompt': 'a dog'}]
+        })
+        print(f"响应: {response.status_code} {response.detail}")
+        assert response.status_code == 500 and enqueued == []
+        assert _count(sessions['client'], ClientTask) == 0
+        assert _count(sessions['client'], ClientTaskParameter) == 0
+        assert _count(sessions['shared'], GlobalTask) == 0
+        assert _count(sessions['shared'], GlobalTaskParameter) == 0
+
+        print("✅ 批量提交失败回滚测试通过")
+
+    except Exception as e:
+        print(f"❌ 批量提交失败回滚测试失败: {e}")
+        raise
+
+
+def main():
+    """主测试函数"""
+    print("🧪 批量提交测试")
+    print("=" * 50)
+
+    test_batch_submit()
+    test_batch_submit_rollback()
+
+    print("\n🎉 所有测试完成!")
+
+
+if __name__ == "__main__":
+    main()
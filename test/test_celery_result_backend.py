@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+测试Celery结果后端与紧凑进度meta
+"""
+import sys
+import os
+from datetime import datetime
+
+# 添加正确的路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+backend_path = os.path.join(project_root, 'backend')
+
+sys.path.insert(0, backend_path)
+
+# 切换到项目根目录
+os.chdir(project_root)
+
+def test_result_backend_config():
+    """测试结果后端配置"""
+    print("🗄️ 测试Celery结果后端配置")
+    print("-" * 40)
+
+    try:
+        from app.queue.celery_app import get_celery_app
+
+        celery_app = get_celery_app()
+        conf = celery_app.conf
+
+        print(f"消息代理: {conf.broker_url}")
+        print(f"结果后端: {conf.result_backend}")
+        print(f"结果序列化: {conf.result_serializer}")
+        print(f"允许的内容类型: {conf.accept_content}")
+        print(f"结果过期时间: {conf.result_expires}")
+
+        # 结果后端应与消息代理保持一致，不再固定为内存后端
+        if conf.broker_url == 'memory://':
+            print("  Redis不可用，使用内存模式")
+        else:
+            print(f"  {'✅' if conf.result_backend.startswith('redis') else '❌'} 使用Redis结果后端")
+
+        print(f"  {'✅' if conf.result_serializer in conf.accept_content else '❌'} 结果序列化器已加入accept_content")
+
+        print("✅ 结果后端配置测试完成")
+
+    except Exception as e:
+        print(f"❌ 结果后端配置测试失败: {e}")
+
+def test_compact_celery_meta():
+    """测试紧凑进度meta"""
+    print("\n📦 测试紧凑进度meta")
+    print("-" * 40)
+
+    try:
+        from app.queue.tasks import compact_celery_meta
+
+        status_data = {
+            'status': 'completed',
+            'progress': 100,
+            'message': '文生图任务完成',
+            'completed_at': datetime.now(),
+            'result_data': {
+                'files': ['2024/01/01/test.png'],
+                'original_result': {'outputs': {'9': {'images': []}}}
+            }
+        }
+
+        meta = compact_celery_meta(status_data)
+        print(f"meta: {meta}")
+
+        assert 'original_result' not in meta
+        assert 'completed_at' not in meta
+        assert meta['files'] == ['2024/01/01/test.png']
+
+        try:
+            import msgpack
+            packed = msgpack.packb(meta)
+            print(f"  ✅ msgpack序列化成功，大小: {len(packed)} bytes")
+        except ImportError:
+            print("  msgpack未安装，跳过序列化检查")
+
+        print("✅ 紧凑进度meta测试完成")
+
+    except Exception as e:
+        print(f"❌ 紧凑进度meta测试失败: {e}")
+
+def main():
+    """主测试函数"""
+    print("🧪 测试Celery结果后端")
+    print("=" * 50)
+
+    test_result_backend_config()
+    test_compact_celery_meta()
+
+    print("\n🎯 Celery结果后端测试完成！")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+测试数据保留：月分区规划、过期分区判定、分批归档删除与全局任务归档
+"""
+import sys
+import os
+import gzip
+import json
+import tempfile
+from datetime import datetime, timedelta
+
+# 添加正确的路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+backend_path = os.path.join(project_root, 'backend')
+
+sys.path.insert(0, backend_path)
+
+# 切换到项目根目录
+os.chdir(project_root)
+
+
+def _read_archives(directory):
+    """读取目录下所有归档文件中的记录"""
+    records = []
+    for name in sorted(os.listdir(directory)):
+        assert name.endswith('.jsonl.gz'), name
+        with gzip.open(os.path.join(directory, name), 'rt', encoding='utf-8') as f:
+            records.extend(json.loads(line) for line in f)
+    return records
+
+
+def _create_demo_manager(archive_dir):
+    """在内存SQLite中创建演示用的日志表与全局任务表"""
+    from types import SimpleNamespace
+    from sqlalchemy import create_engine, event, MetaData, Table, Column, Integer, String, DateTime, ForeignKey
+    from sqlalchemy.pool import StaticPool
+    from app.database.retention import RetentionManager
+
+    engine = create_engine('sqlite://', poolclass=StaticPool)
+    statements = []
+    event.listen(engine, 'before_cursor_execute',
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+
+    metadata = MetaData()
+    logs = Table('demo_logs', metadata,
+                 Column('id', Integer, primary_key=True), Column('message', String(100)),
+                 Column('created_at', DateTime))
+    tasks = Table('demo_tasks', metadata,
+                  Column('id', Integer, primary_key=True), Column('task_id', String(36)),
+                  Column('status', String(20)), Column('updated_at', DateTime))
+    results = Table('demo_task_results', metadata,
+                    Column('id', Integer, primary_key=True),
+                    Column('task_id', Integer, ForeignKey('demo_tasks.id')), Column('file_path', String(200)))
+    metadata.create_all(engine)
+
+    db_manager = SimpleNamespace(get_engine=lambda db_name: engine)
+    manager = RetentionManager(db_manager=db_manager, archive_dir=archive_dir, batch_size=3)
+    return manager, engine, logs, tasks, results, statements
+
+
+def test_partition_planning():
+    """测试未来分区规划、过期分区判定与分区DDL"""
+    print("🗓️ 测试月分区规划")
+    print("-" * 40)
+
+    try:
+        from app.database.retention import (
+            add_months, parse_partition_bound, plan_future_partitions, expired_partitions,
+            reorganize_future_sql
+        )
+
+        partitions = [
+            ('p_history', parse_partition_bound("'2026-10-01'")),
+            ('p202610', parse_partition_bound("'2026-11-01 00:00:00'")),
+            ('p202611', parse_partition_bound("'2026-12-01'")),
+            ('p_future', parse_partition_bound('MAXVALUE')),
+        ]
+        assert partitions[0][1] == datetime(2026, 10, 1) and partitions[-1][1] is None
+        assert add_months(datetime(2026, 11, 15), 2) == datetime(2027, 1, 1)
+        assert add_months(datetime(2026, 1, 31), -1) == datetime(2025, 12, 1)
+
+        # 当前为2026年11月，需要覆盖到2027年2月
+        months = plan_future_partitions(partitions, datetime(2026, 11, 20), months_ahead=3)
+        assert months == [datetime(2026, 12, 1), datetime(2027, 1, 1), datetime(2027, 2, 1)]
+        assert plan_future_partitions(partitions, datetime(2026, 9, 1), months_ahead=1) == []
+
+        sql = reorganize_future_sql('system_logs', months)
+        print(f"分区DDL: {sql}")
+        assert sql.startswith('ALTER TABLE system_logs REORGANIZE PARTITION p_future INTO (')
+        assert "PARTITION p202612 VALUES LESS THAN ('2027-01-01')" in sql
+        assert "PARTITION p202702 VALUES LESS THAN ('2027-03-01')" in sql
+        assert sql.endswith('PARTITION p_future VALUES LESS THAN (MAXVALUE))')
+
+        # 保留1个月：2026年12月运行时，上界不晚于11月1日的分区整体过期
+        assert expired_partitions(partitions, add_months(datetime(2026, 12, 5), -1)) == ['p_history', 'p202610']
+
+        print("✅ 月分区规划测试完成")
+
+    except Exception as e:
+        print(f"❌ 月分区规划测试失败: {e}")
+        raise
+
+
+def test_skip_split_of_non_empty_future_partition():
+    """测试兜底分区已有数据时不拆分未来分区，为空时拆分出缺少的月份"""
+    print("\n🚧 测试兜底分区保护")
+    print("-" * 40)
+
+    try:
+        from contextlib import contextmanager
+        from types import SimpleNamespace
+        from app.database.retention import RetentionManager, parse_partition_bound
+
+        # SQLite不支持分区语法，这里用记录DDL的引擎代替，并替换分区数据检查
+        executed = []
+
+        @contextmanager
+        def begin():
+            yield SimpleNamespace(execute=lambda statement: executed.append(str(statement)))
+
+        engine = SimpleNamespace(begin=begin)
+        manager = RetentionManager(db_manager=SimpleNamespace(get_engine=lambda db_name: engine), months_ahead=1)
+        partitions = [
+            ('p_history', parse_partition_bound("'2026-10-01'")),
+            ('p202610', parse_partition_bound("'2026-11-01'")),
+            ('p_future', parse_partition_bound('MAXVALUE')),
+        ]
+
+        # 迁移后长期未运行保留任务，新数据已写入p_future
+        manager.partition_has_rows = lambda db_name, table, partition: True
+        assert manager.ensure_future_partitions('shared', 'system_logs', datetime(2027, 1, 10), partitions) == []
+        assert executed == []
+
+        manager.partition_has_rows = lambda db_name, table, partition: False
+        created = manager.ensure_future_partitions('shared', 'system_logs', datetime(2027, 1, 10), partitions)
+        print(f"新建分区: {created}")
+        assert created == ['p202611', 'p202612', 'p202701', 'p202702']
+        assert len(executed) == 1 and 'REORGANIZE PARTITION p_future' in executed[0]
+
+        print("✅ 兜底分区保护测试完成")
+
+    except Exception as e:
+        print(f"❌ 兜底分区保护测试失败: {e}")
+        raise
+
+
+def test_purge_in_batches_with_archive():
+    """测试未分区表按批归档并删除过期记录"""
+    print("\n🧹 测试分批归档删除")
+    print("-" * 40)
+
+    try:
+        with tempfile.TemporaryDirectory() as archive_dir:
+            manager, engine, logs, tasks, results, statements = _create_demo_manager(archive_dir)
+            now = datetime.now()
+            with engine.begin() as conn:
+                conn.execute(logs.insert(), [
+                    {'message': f'old-{i}', 'created_at': now - timedelta(days=40 + i)} for i in range(7)
+                ] + [{'message': 'recent', 'created_at': now - timedelta(days=1)}])
+            statements.clear()
+
+            deleted = manager.purge_before('client', logs, 'created_at', now - timedelta(days=30))
+            deletes = [s for s in statements if s.upper().startswith('DELETE FROM DEMO_LOGS')]
+            print(f"删除 {deleted} 条，DELETE语句 {len(deletes)} 条")
+            assert deleted == 7
+            assert len(deletes) == 3
+
+            with engine.connect() as conn:
+                assert [row.message for row in conn.execute(logs.select())] == ['recent']
+
+            archived = _read_archives(os.path.join(archive_dir, 'client', 'demo_logs'))
+            assert sorted(record['message'] for record in archived) == [f'old-{i}' for i in range(7)]
+            assert not any(name.endswith('.tmp') for name in os.listdir(os.path.join(archive_dir, 'client', 'demo_logs')))
+
+        print("✅ 分批归档删除测试完成")
+
+    except Exception as e:
+        print(f"❌ 分批归档删除测试失败: {e}")
+        raise
+
+
+def test_archive_finished_tasks():
+    """测试已结束的旧任务连同结果归档后删除，进行中和较新的任务保留"""
+    print("\n📦 测试全局任务归档")
+    print("-" * 40)
+
+    try:
+        with tempfile.TemporaryDirectory() as archive_dir:
+            manager, engine, logs, tasks, results, statements = _create_demo_manager(archive_dir)
+            old = datetime.now() - timedelta(days=200)
+            with engine.begin() as conn:
+                conn.execute(tasks.insert(), [
+                    {'id': 1, 'task_id': 't1', 'status': 'completed', 'updated_at': old},
+                    {'id': 2, 'task_id': 't2', 'status': 'processing', 'updated_at': old},
+                    {'id': 3, 'task_id': 't3', 'status': 'failed', 'updated_at': old},
+                    {'id': 4, 'task_id': 't4', 'status': 'completed', 'updated_at': datetime.now()},
+                ])
+                conn.execute(results.insert(), [
+                    {'task_id': 1, 'file_path': 'outputs/t1_0.png'},
+                    {'task_id': 1, 'file_path': 'outputs/t1_1.png'},
+                    {'task_id': 4, 'file_path': 'outputs/t4_0.png'},
+                ])
+
+            archived = manager.archive_tasks(datetime.now() - timedelta(days=180), tasks, {'results': results})
+            assert archived == 2
+
+            with engine.connect() as conn:
+                assert sorted(row.task_id for row in conn.execute(tasks.select())) == ['t2', 't4']
+                assert [row.file_path for row in conn.execute(results.select())] == ['outputs/t4_0.png']
+
+            records = {r['task_id']: r for r in _read_archives(os.path.join(archive_dir, 'shared', 'demo_tasks'))}
+            print(f"归档任务: {sorted(records)}")
+            assert sorted(records) == ['t1', 't3']
+            assert [r['file_path'] for r in records['t1']['results']] == ['outputs/t1_0.png', 'outputs/t1_1.png']
+            assert records['t3']['results'] == []
+
+        print("✅ 全局任务归档测试完成")
+
+    except Exception as e:
+        print(f"❌ 全局任务归档测试失败: {e}")
+        raise
+
+
+def main():
+    """主测试函数"""
+    print("🧪 测试数据保留与归档")
+    print("=" * 50)
+
+    test_partition_planning()
+    test_skip_split_of_non_empty_future_partition()
+    test_purge_in_batches_with_archive()
+    test_archive_finished_tasks()
+
+    print("\n🎯 数据保留与归档测试完成！")
+
+if __name__ == "__main__":
+    main()
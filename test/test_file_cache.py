@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+测试节点文件磁盘缓存：并发请求只下载一次、按大小LRU淘汰、TTL过期、重启后从磁盘恢复
+"""
+import sys
+import os
+import asyncio
+import tempfile
+import time
+
+# 添加正确的路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+backend_path = os.path.join(project_root, 'backend')
+
+sys.path.insert(0, backend_path)
+
+# 切换到项目根目录
+os.chdir(project_root)
+
+
+async def _start_demo_node(state):
+    """启动演示用的ComfyUI /view 接口，每个文件内容为1000字节"""
+    from aiohttp import web
+    from aiohttp.test_utils import TestServer
+
+    async def view(request):
+        filename = request.query.get('filename')
+        state['requests'].append(filename)
+        if filename == 'missing.png':
+            return web.Response(status=404)
+        # 放慢响应，保证并发请求在下载完成前到达
+        await asyncio.sleep(0.1)
+        size = 5000 if filename == 'large.mp4' else 1000
+        return web.Response(body=filename.encode()[:1].ljust(size, b'x'), content_type='image/png')
+
+    app = web.Application()
+    app.router.add_get('/view', view)
+    server = TestServer(app)
+    await server.start_server()
+    return server
+
+
+def _cached_files(cache_dir):
+    return sorted(name for _, _, names in os.walk(cache_dir) for name in names)
+
+
+def test_parse_size():
+    """测试缓存大小配置解析"""
+    print("📏 测试大小解析")
+    print("-" * 40)
+
+    try:
+        from app.core.file_cache import parse_size
+
+        assert parse_size('1GB') == 1024 ** 3
+        assert parse_size('512 MB') == 512 * 1024 ** 2
+        assert parse_size('1.5kb') == 1536
+        assert parse_size(4096) == 4096
+        try:
+            parse_size('lots')
+            assert False, "应当拒绝无效的大小"
+        except ValueError:
+            pass
+
+        print("✅ 大小解析测试完成")
+
+    except Exception as e:
+        print(f"❌ 大小解析测试失败: {e}")
+        raise
+
+
+def test_singleflight_and_eviction():
+    """测试并发请求共享一次下载，以及超过容量时淘汰最久未访问的文件"""
+    print("\n🗄️ 测试文件缓存")
+    print("-" * 40)
+
+    async def scenario(cache_dir):
+        from app.core.file_proxy import NodeFileProxy
+        from app.core.file_cache import NodeFileCache
+
+        state = {'requests': []}
+        server = await _start_demo_node(state)
+        proxy = NodeFileProxy()
+        node_url = str(server.make_url('')).rstrip('/')
+        cache = NodeFileCache(cache_dir, max_size=2500, ttl=3600, max_entry_size=2000)
+
+        def fetch(name):
+            return cache.fetch(f"node-a/{name}", name, lambda: proxy.open(node_url, name))
+
+        try:
+            paths = await asyncio.gather(*[fetch('a.png') for _ in range(5)])
+            print(f"5个并发请求，上游请求 {len(state['requests'])} 次")
+            assert state['requests'] == ['a.png']
+            assert len(set(paths)) == 1 and paths[0].endswith('.png')
+            with open(paths[0], 'rb') as f:
+                assert f.read() == b'a'.ljust(1000, b'x')
+
+            # 命中不再请求上游
+            assert await fetch('a.png') == paths[0]
+            assert state['requests'] == ['a.png']
+
+            # 文件不存在、超过单文件上限时不缓存
+            assert await fetch('missing.png') is None
+            assert await fetch('large.mp4') is None
+
+            # 超过单文件上限时，发起请求取回已打开的上游响应直接转发，不再重复请求节点
+            state['requests'].clear()
+            from app.core.file_cache import StreamThrough
+            through = await cache.fetch('node-a/large.mp4', 'large.mp4',
+                                        lambda: proxy.open(node_url, 'large.mp4'), stream_through=True)
+            assert isinstance(through, StreamThrough) and through.upstream.status == 200
+            assert await through.upstream.read() == b'l'.ljust(5000, b'x')
+            through.close()
+            assert state['requests'] == ['large.mp4']
+
+            # 容量2500字节只能放下两个文件，a最近访问过，淘汰b
+            await fetch('b.png')
+            assert await cache.get('node-a/a.png')
+            await fetch('c.png')
+            assert await cache.get('node-a/b.png') is None
+            assert await cache.get('node-a/a.png') and await cache.get('node-a/c.png')
+            assert len(_cached_files(cache_dir)) == 2
+            assert not any(name.endswith('.tmp') for name in _cached_files(cache_dir))
+
+            status = cache.get_status()
+            print(f"缓存状态: {status}")
+            assert status['files'] == 2 and status['total_size'] == 2000 and status['downloads'] == 6
+
+            from fastapi import Request
+            request = Request({'type': 'http', 'method': 'GET', 'headers': [], 'query_string': b''})
+            response = await cache.file_response(request, await cache.get('node-a/a.png'), 'a.png')
+            assert response.media_type == 'image/png'
+            assert response.headers['content-disposition'] == 'inline; filename="a.png"'
+        finally:
+            await proxy.close()
+            await server.close()
+
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            asyncio.run(scenario(cache_dir))
+        print("✅ 文件缓存测试完成")
+
+    except Exception as e:
+        print(f"❌ 文件缓存测试失败: {e}")
+        raise
+
+
+def test_buffered_writes():
+    """测试下载数据按写缓冲大小分批写入磁盘，文件内容完整"""
+    print("\n✍️ 测试分批写入")
+    print("-" * 40)
+
+    async def scenario(cache_dir):
+        from app.core.file_proxy import NodeFileProxy
+        from app.core.file_cache import NodeFileCache
+
+        state = {'requests': []}
+        server = await _start_demo_node(state)
+        proxy = NodeFileProxy()
+        node_url = str(server.make_url('')).rstrip('/')
+        cache = NodeFileCache(cache_dir, max_size=10000, chunk_size=100, write_buffer_size=300)
+
+        writes = []
+        original_to_thread = asyncio.to_thread
+
+        async def recording_to_thread(func, *args):
+            writes.append(getattr(func, '__name__', ''))
+            return await original_to_thread(func, *args)
+
+        asyncio.to_thread = recording_to_thread
+        try:
+            path = await cache.fetch('node-a/d.png', 'd.png', lambda: proxy.open(node_url, 'd.png'))
+        finally:
+            asyncio.to_thread = original_to_thread
+            await proxy.close()
+            await server.close()
+
+        with open(path, 'rb') as f:
+            assert f.read() == b'd'.ljust(1000, b'x')
+        print(f"线程调用: {writes}")
+        # 1000字节按300字节缓冲写入3次，剩余100字节在提交时写入
+        assert writes.count('writelines') == 3
+        assert writes.count('_open_temp') == 1 and writes.count('_commit_temp') == 1
+
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            asyncio.run(scenario(cache_dir))
+        print("✅ 分批写入测试完成")
+
+    except Exception as e:
+        print(f"❌ 分批写入测试失败: {e}")
+        raise
+
+
+def test_reload_and_ttl():
+    """测试重启后从缓存目录恢复索引，清理临时文件，过期条目被删除"""
+    print("\n⏳ 测试缓存恢复与过期")
+    print("-" * 40)
+
+    try:
+        from app.core.file_cache import NodeFileCache
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = NodeFileCache(cache_dir, max_size=10000, ttl=60)
+            old_path = cache._cache_path(cache._hash('node-a/old.png'), 'old.png')
+            new_path = cache._cache_path(cache._hash('node-a/new.png'), 'new.png')
+            for path in (old_path, new_path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'wb') as f:
+                    f.write(b'x' * 100)
+            with open(new_path + '.abc.tmp', 'wb') as f:
+                f.write(b'partial')
+            stale = time.time() - 120
+            os.utime(old_path, (stale, stale))
+
+            cache = NodeFileCache(cache_dir, max_size=10000, ttl=60)
+            # 索引在首次使用时于线程中加载，加载前视为未命中
+            assert asyncio.run(cache.get('node-a/new.png')) is None
+            asyncio.run(cache.load())
+            print(f"恢复后缓存状态: {cache.get_status()}")
+            assert asyncio.run(cache.get('node-a/new.png')) == new_path
+            assert asyncio.run(cache.get('node-a/old.png')) is None
+            assert _cached_files(cache_dir) == [os.path.basename(new_path)]
+
+        print("✅ 缓存恢复与过期测试完成")
+
+    except Exception as e:
+        print(f"❌ 缓存恢复与过期测试失败: {e}")
+        raise
+
+
+def main():
+    """主测试函数"""
+    print("🧪 测试节点文件磁盘缓存")
+    print("=" * 50)
+
+    test_parse_size()
+    test_singleflight_and_eviction()
+    test_buffered_writes()
+    test_reload_and_ttl()
+
+    print("\n🎯 节点文件磁盘缓存测试完成！")
+
+if __name__ == "__main__":
+    main()
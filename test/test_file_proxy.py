@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+测试节点文件流式代理：透传Range与响应头、分块转发、客户端断开时中止上游传输，任务下载转交文件路由
+"""
+import sys
+import os
+import asyncio
+
+# 添加正确的路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+backend_path = os.path.join(project_root, 'backend')
+
+sys.path.insert(0, backend_path)
+
+# 切换到项目根目录
+os.chdir(project_root)
+
+FILE_CONTENT = bytes(range(256)) * 4096  # 1MB
+
+
+async def _start_demo_node(state):
+    """启动演示用的ComfyUI /view 接口"""
+    from aiohttp import web
+    from aiohttp.test_utils import TestServer
+
+    async def view(request):
+        state['requests'].append(dict(request.query))
+        if request.query.get('filename') != 'image.png':
+            return web.Response(status=404)
+        range_header = request.headers.get('Range')
+        if range_header:
+            start, end = range_header.replace('bytes=', '').split('-')
+            body = FILE_CONTENT[int(start):int(end) + 1]
+            return web.Response(body=body, status=206, content_type='image/png', headers={
+                'Content-Range': f"bytes {start}-{end}/{len(FILE_CONTENT)}"
+            })
+
+        # repeat>1时模拟大视频文件（超过内核套接字缓冲，客户端不读取时上游写入会阻塞）
+        repeat = state.get('repeat', 1)
+        response = web.StreamResponse(headers={'Content-Type': 'image/png',
+                                               'Content-Length': str(len(FILE_CONTENT) * repeat)})
+        await response.prepare(request)
+        try:
+            for offset in range(0, len(FILE_CONTENT) * repeat, 64 * 1024):
+                chunk_offset = offset % len(FILE_CONTENT)
+                await response.write(FILE_CONTENT[chunk_offset:chunk_offset + 64 * 1024])
+                state['sent'] += 64 * 1024
+            state['completed'] = True
+        except (ConnectionResetError, asyncio.CancelledError):
+            state['aborted'] = True
+            raise
+        return response
+
+    app = web.Application()
+    app.router.add_get('/view', view)
+    server = TestServer(app)
+    await server.start_server()
+    return server
+
+
+async def _run_asgi(response, disconnect_after: int = None):
+    """以ASGI方式执行响应，disconnect_after不为空时在收到指定数量的数据块后模拟客户端断开"""
+    messages = []
+    disconnected = asyncio.Event()
+
+    async def receive():
+        await disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        messages.append(message)
+        body_chunks = [m for m in messages if m['type'] == 'http.response.body' and m.get('body')]
+        if disconnect_after is not None and len(body_chunks) >= disconnect_after:
+            disconnected.set()
+            await asyncio.sleep(0.05)
+
+    await response({'type': 'http', 'method': 'GET', 'headers': []}, receive, send)
+    start = messages[0]
+    headers = {k.decode().lower(): v.decode() for k, v in start['headers']}
+    body = b''.join(m.get('body', b'') for m in messages[1:])
+    return start['status'], headers, body
+
+
+def test_stream_and_range_passthrough():
+    """测试完整文件分块转发与Range透传"""
+    print("📡 测试文件流式代理")
+    print("-" * 40)
+
+    async def scenario():
+        from app.core.file_proxy import NodeFileProxy
+
+        state = {'requests': [], 'sent': 0, 'completed': False, 'aborted': False}
+        server = await _start_demo_node(state)
+        proxy = NodeFileProxy(chunk_size=16 * 1024)
+        node_url = str(server.make_url('')).rstrip('/')
+        try:
+            assert await proxy.open(node_url, 'missing.png') is None
+
+            upstream = await proxy.open(node_url, 'image.png', subfolder='2026/10/18')
+            assert state['requests'][-1] == {'filename': 'image.png', 'subfolder': '2026/10/18'}
+            status, headers, body = await _run_asgi(proxy.stream_response(upstream, 'image.png'))
+            print(f"完整请求: {status}, {headers.get('content-length')} bytes")
+            assert status == 200 and body == FILE_CONTENT
+            assert headers['content-type'] == 'image/png'
+            assert headers['content-length'] == str(len(FILE_CONTENT))
+            assert headers['accept-ranges'] == 'bytes'
+
+            upstream = await proxy.open(node_url, 'image.png', range_header='bytes=100-199')
+            status, headers, body = await _run_asgi(proxy.stream_response(upstream, 'image.png'))
+            print(f"Range请求: {status}, {headers.get('content-range')}")
+            assert status == 206 and body == FILE_CONTENT[100:200]
+            assert headers['content-range'] == f"bytes 100-199/{len(FILE_CONTENT)}"
+        finally:
+            await proxy.close()
+            await server.close()
+
+    try:
+        asyncio.run(scenario())
+        print("✅ 文件流式代理测试完成")
+
+    except Exception as e:
+        print(f"❌ 文件流式代理测试失败: {e}")
+        raise
+
+
+def test_client_disconnect_aborts_upstream():
+    """测试客户端断开后上游传输被中止，未读取整个文件"""
+    print("\n🔌 测试客户端断开")
+    print("-" * 40)
+
+    async def scenario():
+        from app.core.file_proxy import NodeFileProxy
+
+        state = {'requests': [], 'sent': 0, 'completed': False, 'aborted': False, 'repeat': 256}
+        server = await _start_demo_node(state)
+        proxy = NodeFileProxy(chunk_size=16 * 1024)
+        node_url = str(server.make_url('')).rstrip('/')
+        try:
+            upstream = await proxy.open(node_url, 'image.png')
+            status, headers, body = await _run_asgi(proxy.stream_response(upstream, 'image.png'), disconnect_after=2)
+            await asyncio.sleep(0.2)
+            print(f"客户端收到 {len(body)} bytes，上游已发送 {state['sent']} bytes")
+            assert len(body) < len(FILE_CONTENT)
+            assert upstream.closed
+            assert state['sent'] < len(FILE_CONTENT) * state['repeat']
+            assert not state['completed']
+        finally:
+            await proxy.close()
+            await server.close()
+
+    try:
+        asyncio.run(scenario())
+        print("✅ 客户端断开测试完成")
+
+    except Exception as e:
+        print(f"❌ 客户端断开测试失败: {e}")
+        raise
+
+
+def test_task_download_passes_request():
+    """测试任务下载在本地路径不存在时转交文件路由，请求（含Range）一并传递"""
+    print("\n📥 测试任务下载转交文件路由")
+    print("-" * 40)
+
+    import tempfile
+    import app.api.routes as routes
+    from fastapi.security import HTTPAuthorizationCredentials
+    from starlette.requests import Request
+
+    originals = (routes.verify_token, routes.get_status_manager, routes.get_output_dir)
+    try:
+        with tempfile.TemporaryDirectory() as output_dir:
+            relative_path = os.path.join('2026', '10', '18', 'task_image.png')
+            os.makedirs(os.path.join(output_dir, os.path.dirname(relative_path)))
+            with open(os.path.join(output_dir, relative_path), 'wb') as f:
+                f.write(FILE_CONTENT)
+
+            async def get_task_status_async(task_id):
+                return {'task_id': task_id, 'status': 'completed', 'result_data': {'files': [relative_path]}}
+
+            routes.verify_token = lambda token: {'sub': 'user-1'}
+            routes.get_status_manager = lambda: type('DemoStatusManager', (), {
+                'get_task_status_async': staticmethod(get_task_status_async)
+            })()
+            routes.get_output_dir = lambda: output_dir
+
+            request = Request({
+                'type': 'http', 'method': 'GET', 'path': '/api/v2/tasks/t1/download',
+                'headers': [(b'range', b'bytes=0-99')], 'query_string': b''
+            })
+            credentials = HTTPAuthorizationCredentials(scheme='Bearer', credentials='token')
+            response = asyncio.run(routes.download_task_result_v2('t1', request, None, credentials))
+            status, headers, body = asyncio.run(_run_asgi(response))
+            print(f"任务下载: {status}, {headers.get('content-range')}")
+            assert status == 206 and body == FILE_CONTENT[:100]
+
+        print("✅ 任务下载转交文件路由测试完成")
+
+    except Exception as e:
+        print(f"❌ 任务下载转交文件路由测试失败: {e}")
+        raise
+    finally:
+        routes.verify_token, routes.get_status_manager, routes.get_output_dir = originals
+
+
+def main():
+    """主测试函数"""
+    print("🧪 测试节点文件代理")
+    print("=" * 50)
+
+    test_stream_and_range_passthrough()
+    test_client_disconnect_aborts_upstream()
+    test_task_download_passes_request()
+
+    print("\n🎯 节点文件代理测试完成！")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+测试文件条件请求与范围请求：内容哈希ETag、304、Range/206/416、If-Range，以及代理转发条件请求头
+"""
+import sys
+import os
+import asyncio
+import tempfile
+
+# 添加正确的路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+backend_path = os.path.join(project_root, 'backend')
+
+sys.path.insert(0, backend_path)
+
+# 切换到项目根目录
+os.chdir(project_root)
+
+FILE_CONTENT = bytes(range(256)) * 1024  # 256KB，超过一个读取块
+
+
+async def _request(path, headers=None, method='GET', query='', **kwargs):
+    """构造请求并以ASGI方式执行文件响应，返回状态码、响应头与响应体"""
+    from fastapi import Request
+    from app.core.file_response import conditional_file_response
+
+    raw_headers = [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]
+    request = Request({'type': 'http', 'method': method, 'headers': raw_headers, 'query_string': query.encode()})
+    response = await conditional_file_response(request, path, **kwargs)
+
+    messages = []
+
+    async def receive():
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        messages.append(message)
+
+    await response({'type': 'http', 'method': method, 'headers': raw_headers}, receive, send)
+    start = messages[0]
+    response_headers = {k.decode().lower(): v.decode() for k, v in start['headers']}
+    body = b''.join(m.get('body', b'') for m in messages[1:])
+    return start['status'], response_headers, body
+
+
+def test_parse_range():
+    """测试字节范围解析"""
+    print("📐 测试Range解析")
+    print("-" * 40)
+
+    try:
+        from app.core.file_response import parse_range, etag_matches
+
+        assert parse_range(None, 100) is None
+        assert parse_range('bytes=0-9', 100) == (0, 9)
+        assert parse_range('bytes=90-', 100) == (90, 99)
+        assert parse_range('bytes=90-500', 100) == (90, 99)
+        assert parse_range('bytes=-10', 100) == (90, 99)
+        assert parse_range('bytes=-500', 100) == (0, 99)
+        # 多个范围按完整内容返回
+        assert parse_range('bytes=0-1,5-6', 100) is None
+        for unsatisfiable in ('bytes=100-', 'bytes=50-10', 'bytes=-0'):
+            try:
+                parse_range(unsatisfiable, 100)
+                assert False, unsatisfiable
+            except ValueError:
+                pass
+
+        assert etag_matches('"abc"', '"abc"')
+        assert etag_matches('W/"abc", "def"', '"abc"')
+        assert etag_matches('*', '"abc"')
+        assert not etag_matches('"def"', '"abc"')
+        assert not etag_matches(None, '"abc"')
+
+        print("✅ Range解析测试完成")
+
+    except Exception as e:
+        print(f"❌ Range解析测试失败: {e}")
+        raise
+
+
+def test_conditional_and_range_requests():
+    """测试ETag、304、206、416与If-Range"""
+    print("\n📦 测试条件请求与范围请求")
+    print("-" * 40)
+
+    async def scenario(path):
+        import hashlib
+
+        status, headers, body = await _request(path, filename='result.png')
+        etag = headers['etag']
+        print(f"完整请求: {status}, ETag {etag}, {headers['cache-control']}")
+        assert status == 200 and body == FILE_CONTENT
+        assert etag == f'"{hashlib.sha256(FILE_CONTENT).hexdigest()[:32]}"'
+        # 未带内容版本的URL每次按ETag重新验证
+        assert headers['cache-control'] == 'private, no-cache'
+        assert headers['accept-ranges'] == 'bytes' and 'last-modified' in headers
+        assert headers['content-disposition'] == 'attachment; filename="result.png"'
+
+        status, headers, body = await _request(path, {'If-None-Match': etag})
+        assert status == 304 and body == b'' and headers['etag'] == etag
+
+        # 版本参数与内容哈希一致时才长期缓存
+        _, headers, _ = await _request(path, query=f"v={etag.strip(chr(34))}")
+        assert headers['cache-control'] == 'private, max-age=31536000, immutable'
+        _, headers, _ = await _request(path, query='v=stale')
+        assert headers['cache-control'] == 'private, no-cache'
+
+        # 本地结果保存时记录内容版本，结果URL带上版本参数后长期缓存
+        from app.core.file_response import content_version, versioned_url
+        from app.database.task_status_manager import DatabaseTaskStatusManager
+        version = DatabaseTaskStatusManager._result_metadata(path, 0, {})['content_version']
+        assert version == etag.strip('"')
+        url = versioned_url('/api/v2/tasks/t1/download?index=0', version)
+        print(f"带版本的结果URL: {url}")
+        assert url == f"/api/v2/tasks/t1/download?index=0&v={version}"
+        assert versioned_url('/outputs/result.png', version) == f"/outputs/result.png?v={version}"
+        assert versioned_url('/outputs/result.png', None) == '/outputs/result.png'
+        _, headers, _ = await _request(path, query=url.split('?', 1)[1])
+        assert headers['cache-control'] == 'private, max-age=31536000, immutable'
+        assert content_version(path + '.missing') is None
+
+        status, headers, body = await _request(path, {'Range': 'bytes=70000-70009'})
+        print(f"Range请求: {status}, {headers['content-range']}")
+        assert status == 206 and body == FILE_CONTENT[70000:70010]
+        assert headers['content-range'] == f"bytes 70000-70009/{len(FILE_CONTENT)}"
+        assert headers['content-length'] == '10'
+
+        status, headers, body = await _request(path, {'Range': 'bytes=-100'})
+        assert status == 206 and body == FILE_CONTENT[-100:]
+
+        status, headers, body = await _request(path, {'Range': 'bytes=1000000-'})
+        assert status == 416 and headers['content-range'] == f"bytes */{len(FILE_CONTENT)}"
+
+        # If-Range与当前ETag一致时返回范围，不一致时返回完整内容
+        status, _, body = await _request(path, {'Range': 'bytes=0-9', 'If-Range': etag})
+        assert status == 206 and body == FILE_CONTENT[:10]
+        status, _, body = await _request(path, {'Range': 'bytes=0-9', 'If-Range': '"stale"'})
+        assert status == 200 and body == FILE_CONTENT
+
+        status, headers, body = await _request(path, {'Range': 'bytes=0-9'}, method='HEAD')
+        assert status == 206 and body == b'' and headers['content-length'] == '10'
+
+        # 内容变化后ETag随之变化
+        with open(path, 'ab') as f:
+            f.write(b'more')
+        _, headers, _ = await _request(path)
+        assert headers['etag'] != etag
+
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'result.png')
+            with open(path, 'wb') as f:
+                f.write(FILE_CONTENT)
+            asyncio.run(scenario(path))
+        print("✅ 条件请求与范围请求测试完成")
+
+    except Exception as e:
+        print(f"❌ 条件请求与范围请求测试失败: {e}")
+        raise
+
+
+def test_proxy_forwards_conditional_headers():
+    """测试代理把条件请求头转发给节点，并透传304"""
+    print("\n📡 测试代理条件请求")
+    print("-" * 40)
+
+    async def scenario(path):
+        from aiohttp import web
+        from aiohttp.test_utils import TestServer
+        from app.core.file_proxy import NodeFileProxy
+
+        async def view(request):
+            return web.FileResponse(path)
+
+        app = web.Application()
+        app.router.add_get('/view', view)
+        server = TestServer(app)
+        await server.start_server()
+        proxy = NodeFileProxy()
+        node_url = str(server.make_url('')).rstrip('/')
+        try:
+            upstream = await proxy.open(node_url, 'result.png')
+            etag = upstream.headers['ETag']
+            upstream.release()
+
+            upstream = await proxy.open(node_url, 'result.png', request_headers={'If-None-Match': etag})
+            print(f"带If-None-Match的代理请求: {upstream.status}")
+            assert upstream.status == 304
+            upstream.release()
+
+            upstream = await proxy.open(node_url, 'result.png', request_headers={'Range': 'bytes=0-9', 'Accept': '*/*'})
+            assert upstream.status == 206 and await upstream.read() == FILE_CONTENT[:10]
+        finally:
+            await proxy.close()
+            await server.close()
+
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'result.png')
+            with open(path, 'wb') as f:
+                f.write(FILE_CONTENT)
+            asyncio.run(scenario(path))
+        print("✅ 代理条件请求测试完成")
+
+    except Exception as e:
+        print(f"❌ 代理条件请求测试失败: {e}")
+        raise
+
+
+def main():
+    """主测试函数"""
+    print("🧪 测试文件条件请求与范围请求")
+    print("=" * 50)
+
+    test_parse_range()
+    test_conditional_and_range_requests()
+    test_proxy_forwards_conditional_headers()
+
+    print("\n🎯 文件条件请求与范围请求测试完成！")
+
+if __name__ == "__main__":
+    main()
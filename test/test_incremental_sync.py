@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+测试客户端任务按水位增量同步：分批读取、每批一条upsert、较新的全局记录不被覆盖
+"""
+import sys
+import os
+from datetime import datetime, timedelta
+
+# 添加正确的路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+backend_path = os.path.join(project_root, 'backend')
+
+sys.path.insert(0, backend_path)
+
+# 切换到项目根目录
+os.chdir(project_root)
+
+
+def _create_demo_service():
+    """在内存SQLite中创建演示用的客户端/全局任务表与同步水位表"""
+    from sqlalchemy.orm import sessionmaker
+    from app.database.dao.task_dao import GlobalTaskDAO, ClientTaskDAO
+    from app.database.models.shared_models import SyncWatermark
+    from app.database.sync_service import DataSyncService
+    from db_helpers import create_demo_db_manager, create_demo_task_models, create_sqlite_engine, make_demo_dao
+
+    Base, DemoGlobalTask, DemoClientTask, _ = create_demo_task_models()
+    statements = []
+    engine = create_sqlite_engine(statements=statements)
+    Base.metadata.create_all(engine)
+    SyncWatermark.__table__.create(engine)
+    Session = sessionmaker(bind=engine)
+    db_manager = create_demo_db_manager({'client': Session, 'shared': Session})
+
+    service = DataSyncService.__new__(DataSyncService)
+    service.global_task_dao = make_demo_dao(GlobalTaskDAO, DemoGlobalTask, 'shared', db_manager)
+    service.client_task_dao = make_demo_dao(ClientTaskDAO, DemoClientTask, 'client', db_manager)
+    service.is_running = False
+    service.chunk_size = 3
+    service.max_chunks = 20
+    service.settle_seconds = 5
+    service.reconcile_interval = 300
+    service.metrics = {
+        'total_synced': 0, 'last_run_synced': 0, 'last_run_seconds': 0.0,
+        'last_run_time': None, 'watermark_at': None, 'watermark_id': 0
+    }
+
+    return service, Session, DemoClientTask, DemoGlobalTask, statements
+
+
+def test_watermark_sync_in_chunks():
+    """测试按水位分批同步并持久化水位"""
+    print("🌊 测试水位增量同步")
+    print("-" * 40)
+
+    try:
+        from app.database.models.shared_models import SyncWatermark
+
+        service, Session, DemoClientTask, DemoGlobalTask, statements = _create_demo_service()
+        base_time = datetime.now() - timedelta(hours=1)
+
+        session = Session()
+        # 每两个任务共享同一更新时间，验证水位中的id能区分时间相同的记录
+        session.add_all([
+            DemoClientTask(
+                task_id=f"t{i}", client_id='c1', task_type='text_to_image', workflow_name='sd_basic',
+                status='completed' if i % 2 else 'processing', progress=100 if i % 2 else 50,
+                created_at=base_time, updated_at=base_time + timedelta(minutes=i // 2)
+            )
+            for i in range(1, 8)
+        ])
+        # 全局表中t1已有更新的终态记录，t2为较旧记录
+        session.add_all([
+            DemoGlobalTask(task_id='t1', source_type='client', source_user_id='c1', task_type='text_to_image',
+                           workflow_name='sd_basic', status='cancelled', progress=10,
+                           created_at=base_time, updated_at=base_time + timedelta(minutes=30)),
+            DemoGlobalTask(task_id='t2', source_type='client', source_user_id='c1', task_type='text_to_image',
+                           workflow_name='sd_basic', status='queued', progress=0,
+                           created_at=base_time, updated_at=base_time - timedelta(minutes=1)),
+        ])
+        # 仍在稳定期内的更新暂不同步
+        session.add(DemoClientTask(task_id='fresh', client_id='c1', task_type='text_to_image',
+                                   workflow_name='sd_basic', status='processing',
+                                   created_at=datetime.now(), updated_at=datetime.now()))
+        session.commit()
+        session.close()
+        statements.clear()
+
+        synced = service.sync_increment()
+        upserts = [s for s in statements if s.lstrip().upper().startswith('INSERT INTO DEMO_GLOBAL_TASKS')]
+        print(f"同步 {synced} 个任务，upsert语句 {len(upserts)} 条")
+        assert synced == 7
+        assert len(upserts) == 3
+
+        session = Session()
+        try:
+            global_tasks = {t.task_id: t for t in session.query(DemoGlobalTask).all()}
+            assert set(global_tasks) == {f"t{i}" for i in range(1, 8)}
+            assert global_tasks['t1'].status == 'cancelled'
+            assert global_tasks['t2'].status == 'processing' and float(global_tasks['t2'].progress) == 50
+            assert global_tasks['t7'].source_user_id == 'c1' and global_tasks['t7'].priority == 1
+
+            watermark = session.get(SyncWatermark, service.WATERMARK_NAME)
+            assert (watermark.watermark_at, watermark.watermark_id) == (base_time + timedelta(minutes=3), 7)
+
+            # 水位之后的更新在下一次同步中处理，已同步的记录不再读取
+            task = session.query(DemoClientTask).filter(DemoClientTask.task_id == 't3').one()
+            task.status = 'failed'
+            task.updated_at = base_time + timedelta(minutes=10)
+            session.commit()
+        finally:
+            session.close()
+
+        assert service.sync_increment() == 1
+        assert service.sync_increment() == 0
+
+        session = Session()
+        try:
+            assert session.query(DemoGlobalTask).filter(DemoGlobalTask.task_id == 't3').one().status == 'failed'
+        finally:
+            session.close()
+
+        print("✅ 水位增量同步测试完成")
+
+    except Exception as e:
+        print(f"❌ 水位增量同步测试失败: {e}")
+        raise
+
+
+def test_reconcile_keeps_terminal_and_progress():
+    """测试对账不把终态任务改回非终态，进度不回退"""
+    print("\n🔒 测试对账终态与进度保护")
+    print("-" * 40)
+
+    try:
+        service, Session, DemoClientTask, DemoGlobalTask, statements = _create_demo_service()
+        base_time = datetime.now() - timedelta(hours=1)
+        newer = base_time + timedelta(minutes=5)
+
+        def task(model, task_id, status, progress, updated_at, message=None, **extra):
+            return model(task_id=task_id, task_type='text_to_image', workflow_name='sd_basic', status=status,
+                         progress=progress, message=message, created_at=base_time, updated_at=updated_at, **extra)
+
+        session = Session()
+        # 客户端记录的更新时间都晚于全局记录（如中继应用合并后的中间状态时重写了更新时间）
+        session.add_all([
+            task(DemoClientTask, 'done', 'processing', 60, newer, '生成中', client_id='c1'),
+            task(DemoClientTask, 'slow', 'processing', 40, newer, '生成中', client_id='c1'),
+            task(DemoClientTask, 'failed', 'failed', 40, newer, '节点错误', client_id='c1'),
+        ])
+        session.add_all([
+            task(DemoGlobalTask, 'done', 'completed', 100, base_time, '完成', source_type='client'),
+            task(DemoGlobalTask, 'slow', 'processing', 80, base_time, '排队中', source_type='client'),
+            task(DemoGlobalTask, 'failed', 'processing', 80, base_time, '生成中', source_type='client'),
+        ])
+        session.commit()
+        session.close()
+
+        assert service.sync_increment() == 3
+
+        session = Session()
+        try:
+            rows = {
+                t.task_id: (t.status, float(t.progress), t.message, t.updated_at)
+                for t in session.query(DemoGlobalTask).all()
+            }
+        finally:
+            session.close()
+        print(f"对账后全局任务: {rows}")
+        # 终态记录整行保持不变
+        assert rows['done'] == ('completed', 100.0, '完成', base_time)
+        # 非终态记录更新其他列，但进度不回退
+        assert rows['slow'] == ('processing', 80.0, '生成中', newer)
+        # 终态可以覆盖非终态
+        assert rows['failed'] == ('failed', 80.0, '节点错误', newer)
+
+        print("✅ 对账终态与进度保护测试完成")
+
+    except Exception as e:
+        print(f"❌ 对账终态与进度保护测试失败: {e}")
+        raise
+
+
+def test_sync_status_metrics():
+    """测试同步状态中的延迟与吞吐指标"""
+    print("\n📈 测试同步指标")
+    print("-" * 40)
+
+    import app.database.sync_service as sync_module
+    original_relay_getter = sync_module.get_task_outbox_relay
+    try:
+        from types import SimpleNamespace
+
+        sync_module.get_task_outbox_relay = lambda: SimpleNamespace(get_status=lambda: {'pending': 0})
+        service, Session, DemoClientTask, DemoGlobalTask, statements = _create_demo_service()
+
+        updated_at = datetime.now() - timedelta(minutes=2)
+        session = Session()
+        session.add(DemoClientTask(task_id='t1', client_id='c1', task_type='text_to_image', workflow_name='sd_basic',
+                                   status='completed', created_at=updated_at, updated_at=updated_at))
+        session.commit()
+        session.close()
+
+        service.sync_increment()
+        status = service.get_sync_status()
+        metrics = status['incremental_sync']
+        print(f"同步指标: {metrics}")
+
+        assert metrics['last_run_synced'] == 1 and metrics['total_synced'] == 1
+        assert metrics['watermark_at'] == updated_at.isoformat()
+        assert 115 <= metrics['lag_seconds'] <= 180
+        assert metrics['throughput_per_second'] > 0
+        assert status['outbox'] == {'pending': 0}
+
+        print("✅ 同步指标测试完成")
+
+    except Exception as e:
+        print(f"❌ 同步指标测试失败: {e}")
+        raise
+    finally:
+        sync_module.get_task_outbox_relay = original_relay_getter
+
+
+def main():
+    """主测试函数"""
+    print("🧪 测试增量数据同步")
+    print("=" * 50)
+
+    test_watermark_sync_in_chunks()
+    test_reconcile_keeps_terminal_and_progress()
+    test_sync_status_metrics()
+
+    print("\n🎯 增量数据同步测试完成！")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+测试部分状态更新：单条UPDATE、版本号校验、进度单调与终态保护
+"""
+import sys
+import os
+
+# 添加正确的路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+backend_path = os.path.join(project_root, 'backend')
+
+sys.path.insert(0, backend_path)
+
+# 切换到项目根目录
+os.chdir(project_root)
+
+
+def _create_demo_dao():
+    """在内存SQLite中创建与任务表状态列一致的演示表"""
+    from sqlalchemy import create_engine, event, Column, Integer, String, DECIMAL, DateTime, Text
+    from sqlalchemy.orm import declarative_base, sessionmaker
+    from app.database.dao.task_dao import GlobalTaskDAO
+
+    Base = declarative_base()
+
+    class DemoTask(Base):
+        __tablename__ = 'demo_tasks'
+        id = Column(Integer, primary_key=True)
+        task_id = Column(String(36))
+        status = Column(String(20))
+        progress = Column(DECIMAL(5, 2), default=0)
+        message = Column(Text)
+        updated_at = Column(DateTime)
+        version = Column(Integer, nullable=False, default=0)
+
+    engine = create_engine('sqlite://')
+    statements = []
+    event.listen(engine, 'before_cursor_execute',
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+
+    class DemoDAO(GlobalTaskDAO):
+        def __init__(self):
+            self.db_name = 'shared'
+            self.model_class = DemoTask
+
+        def get_session(self):
+            return Session()
+
+    def row(task_id):
+        session = Session()
+        try:
+            task = session.query(DemoTask).filter(DemoTask.task_id == task_id).one()
+            return task.status, float(task.progress), task.version
+        finally:
+            session.close()
+
+    session = Session()
+    session.add_all([DemoTask(task_id=t, status='queued', progress=0) for t in ('a', 'b', 'c')])
+    session.commit()
+    session.close()
+    statements.clear()
+
+    return DemoDAO(), row, statements
+
+
+def test_partial_update_rules():
+    """测试单条UPDATE与SQL中的单调规则"""
+    print("🧩 测试部分状态更新规则")
+    print("-" * 40)
+
+    try:
+        dao, row, statements = _create_demo_dao()
+
+        assert dao.partial_update_status('a', {'status': 'processing', 'progress': 30})
+        print(f"一次部分更新执行的SQL: {statements}")
+        assert len(statements) == 1 and statements[0].lstrip().upper().startswith('UPDATE')
+        assert row('a') == ('processing', 30.0, 1)
+
+        # 进度不回退，状态不会从processing退回queued
+        assert dao.partial_update_status('a', {'progress': 10, 'message': '旧进度'})
+        assert row('a') == ('processing', 30.0, 2)
+        assert not dao.partial_update_status('a', {'status': 'queued'})
+        assert row('a')[0] == 'processing'
+
+        # 版本号不匹配时不更新
+        assert not dao.partial_update_status('a', {'progress': 50}, expected_version=1)
+        assert dao.partial_update_status('a', {'progress': 50}, expected_version=2)
+        assert row('a') == ('processing', 50.0, 3)
+
+        # 进入终态后不再接受任何更新
+        assert dao.partial_update_status('a', {'status': 'completed', 'progress': 100})
+        assert not dao.partial_update_status('a', {'status': 'failed', 'progress': 0})
+        assert not dao.partial_update_status('a', {'status': 'processing', 'progress': 60})
+        assert row('a') == ('completed', 100.0, 4)
+
+        # 任务不存在
+        assert not dao.partial_update_status('missing', {'progress': 10})
+
+        print("✅ 部分状态更新规则测试完成")
+
+    except Exception as e:
+        print(f"❌ 部分状态更新规则测试失败: {e}")
+        raise
+
+
+def test_bulk_partial_update():
+    """测试批量部分更新：列集合相同的记录合并为一条语句"""
+    print("\n🗃️ 测试批量部分更新")
+    print("-" * 40)
+
+    try:
+        dao, row, statements = _create_demo_dao()
+        assert dao.partial_update_status('c', {'status': 'cancelled'})
+        statements.clear()
+
+        assert dao.bulk_partial_update_status([
+            {'task_id': 'a', 'status': 'processing', 'progress': 30},
+            {'task_id': 'b', 'status': 'processing', 'progress': 10},
+            {'task_id': 'c', 'status': 'processing', 'progress': 50},
+        ])
+        print(f"3条记录执行的SQL语句数: {len(statements)}")
+        assert len(statements) == 1
+
+        assert row('a') == ('processing', 30.0, 1)
+        assert row('b') == ('processing', 10.0, 1)
+        assert row('c')[0] == 'cancelled'
+
+        print("✅ 批量部分更新测试完成")
+
+    except Exception as e:
+        print(f"❌ 批量部分更新测试失败: {e}")
+        raise
+
+
+def main():
+    """主测试函数"""
+    print("🧪 测试部分状态更新")
+    print("=" * 50)
+
+    test_partial_update_rules()
+    test_bulk_partial_update()
+
+    print("\n🎯 部分状态更新测试完成！")
+
+if __name__ == "__main__":
+    main()
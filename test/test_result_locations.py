@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+测试结果文件位置索引：完成时记录文件所在节点，按文件路径（两种分隔符写法）直接查到所属节点
+"""
+import sys
+import os
+
+# 添加正确的路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+backend_path = os.path.join(project_root, 'backend')
+
+sys.path.insert(0, backend_path)
+
+# 切换到项目根目录
+os.chdir(project_root)
+
+
+def _create_demo_dao():
+    """在内存SQLite中创建演示用的全局任务结果表"""
+    from sqlalchemy import create_engine, event, Column, Integer, String, JSON
+    from sqlalchemy.orm import declarative_base, sessionmaker
+    from sqlalchemy.pool import StaticPool
+    from app.database.dao.task_dao import GlobalTaskResultDAO
+
+    Base = declarative_base()
+    DemoResult = type('DemoResult', (Base,), dict(
+        __tablename__='demo_task_results',
+        id=Column(Integer, primary_key=True), task_id=Column(Integer),
+        file_path=Column(String(500)), file_name=Column(String(255)), result_metadata=Column(JSON)
+    ))
+
+    engine = create_engine('sqlite://', poolclass=StaticPool)
+    queries = []
+    event.listen(engine, 'before_cursor_execute',
+                 lambda conn, cursor, statement, *args: queries.append(statement))
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+
+    dao = GlobalTaskResultDAO.__new__(GlobalTaskResultDAO)
+    dao.db_name = 'shared'
+    dao.model_class = DemoResult
+    dao.db_manager = type('DemoManager', (), {'get_session_direct': staticmethod(lambda db_name: Session())})()
+
+    session = Session()
+    session.add_all([
+        DemoResult(task_id=1, file_path='2026\\10\\18\\ComfyUI_00001_.png', file_name='2026\\10\\18\\ComfyUI_00001_.png', result_metadata={
+            'original_filename': 'ComfyUI_00001_.png', 'result_index': 0,
+            'node_id': 'node-b', 'subfolder': '2026\\10\\18', 'filename': 'ComfyUI_00001_.png'
+        }),
+        DemoResult(task_id=2, file_path='ComfyUI_00002_.png', file_name='ComfyUI_00002_.png', result_metadata={
+            'original_filename': 'ComfyUI_00002_.png', 'result_index': 0
+        }),
+    ])
+    session.commit()
+    session.close()
+    return dao, queries
+
+
+def test_location_recorded_from_result():
+    """测试结果处理时记录位置，并写入结果元数据"""
+    print("📍 测试结果位置记录")
+    print("-" * 40)
+
+    try:
+        from app.queue.tasks import BaseWorkflowTask
+        from app.database.task_status_manager import DatabaseTaskStatusManager
+        import app.database.result_locations as result_locations
+
+        recorded = []
+        result_locations._result_location_index = type('DemoIndex', (), {'record': lambda self, l: recorded.extend(l)})()
+        try:
+            processor = BaseWorkflowTask.__new__(BaseWorkflowTask)
+            result = processor._process_comfyui_result({'outputs': {'9': {'images': [
+                {'filename': 'ComfyUI_00001_.png', 'subfolder': '2026/10/18', 'type': 'output'}
+            ]}}}, 'task-1', node_id='node-a')
+        finally:
+            result_locations._result_location_index = None
+
+        print(f"位置记录: {result['locations']}")
+        assert result['files'] == ['2026/10/18/ComfyUI_00001_.png']
+        assert result['locations'] == recorded == [{
+            'file_path': '2026/10/18/ComfyUI_00001_.png', 'node_id': 'node-a',
+            'subfolder': '2026/10/18', 'filename': 'ComfyUI_00001_.png'
+        }]
+
+        metadata = DatabaseTaskStatusManager._result_metadata('2026/10/18/ComfyUI_00001_.png', 0, result)
+        assert metadata['node_id'] == 'node-a' and metadata['subfolder'] == '2026/10/18'
+        assert 'node_id' not in DatabaseTaskStatusManager._result_metadata('other.png', 1, result)
+
+        print("✅ 结果位置记录测试完成")
+
+    except Exception as e:
+        print(f"❌ 结果位置记录测试失败: {e}")
+        raise
+
+
+def test_lookup_by_file_path():
+    """测试按文件路径查询所属节点，命中后走进程内缓存"""
+    print("\n🔎 测试位置查询")
+    print("-" * 40)
+
+    try:
+        from app.database.result_locations import ResultLocationIndex
+
+        dao, queries = _create_demo_dao()
+        index = ResultLocationIndex(result_dao=dao, max_entries=2)
+
+        # 结果记录中为反斜杠路径，URL中为正斜杠路径
+        location = index.lookup('2026/10/18/ComfyUI_00001_.png')
+        print(f"查询结果: {location}")
+        assert location == {'node_id': 'node-b', 'subfolder': '2026\\10\\18', 'filename': 'ComfyUI_00001_.png'}
+
+        queries.clear()
+        assert index.lookup('2026\\10\\18\\ComfyUI_00001_.png') == location
+        assert queries == []
+
+        # 未记录节点的结果返回None（由调用方回退为全节点查找）
+        assert index.lookup('ComfyUI_00002_.png') is None
+        assert index.lookup('missing.png') is None
+
+        # 缓存容量有限，最久未使用的条目被淘汰
+        index.record([{'file_path': 'a.png', 'node_id': 'n1', 'filename': 'a.png'},
+                      {'file_path': 'b.png', 'node_id': 'n2', 'filename': 'b.png'}])
+        assert list(index._cache) == ['a.png', 'b.png']
+
+        print("✅ 位置查询测试完成")
+
+    except Exception as e:
+        print(f"❌ 位置查询测试失败: {e}")
+        raise
+
+
+def main():
+    """主测试函数"""
+    print("🧪 测试结果文件位置索引")
+    print("=" * 50)
+
+    test_location_recorded_from_result()
+    test_lookup_by_file_path()
+
+    print("\n🎯 结果文件位置索引测试完成！")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+测试结果文件同步：完成后从节点下载结果并按日期整理，更新结果记录为本地副本，并发下载数受限，补扫重试失败的结果
+"""
+import sys
+import os
+import asyncio
+import tempfile
+from datetime import datetime
+from types import SimpleNamespace
+
+# 添加正确的路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+backend_path = os.path.join(project_root, 'backend')
+
+sys.path.insert(0, backend_path)
+
+# 切换到项目根目录
+os.chdir(project_root)
+
+
+def _create_demo_dao():
+    """在内存SQLite中创建演示用的全局任务结果表，写入三个节点结果和一个单机结果"""
+    from sqlalchemy import create_engine, Column, Integer, String, BigInteger, JSON
+    from sqlalchemy.orm import declarative_base, sessionmaker
+    from sqlalchemy.pool import StaticPool
+    from app.database.dao.task_dao import GlobalTaskResultDAO
+
+    Base = declarative_base()
+    DemoResult = type('DemoResult', (Base,), dict(
+        __tablename__='demo_task_results',
+        id=Column(Integer, primary_key=True), task_id=Column(Integer),
+        file_path=Column(String(500)), file_name=Column(String(255)), file_size=Column(BigInteger),
+        result_metadata=Column(JSON)
+    ))
+
+    engine = create_engine('sqlite://', poolclass=StaticPool, connect_args={'check_same_thread': False})
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+
+    dao = GlobalTaskResultDAO.__new__(GlobalTaskResultDAO)
+    dao.db_name = 'shared'
+    dao.model_class = DemoResult
+    dao.db_manager = type('DemoManager', (), {'get_session_direct': staticmethod(lambda db_name: Session())})()
+
+    def node_result(task_id, node_id, filename, index):
+        return DemoResult(task_id=task_id, file_path=f"2026/10/18/{filename}", file_name=filename, file_size=0,
+                          result_metadata={'original_filename': filename, 'result_index': index,
+                                           'node_id': node_id, 'subfolder': '2026/10/18', 'filename': filename})
+
+    session = Session()
+    session.add_all([
+        node_result(1, 'node-a', 'ComfyUI_00001_.png', 0),
+        node_result(1, 'node-a', 'ComfyUI_00002_.png', 1),
+        node_result(2, 'node-b', 'ComfyUI_00001_.png', 0),
+        DemoResult(task_id=3, file_path='/data/outputs/local.png', file_name='local.png', file_size=10,
+                   result_metadata={'original_filename': 'local.png', 'result_index': 0}),
+    ])
+    session.commit()
+    session.close()
+    return dao, DemoResult, Session
+
+
+async def _start_demo_node(state):
+    """启动演示用的ComfyUI /view 接口，记录同时进行的请求数"""
+    from aiohttp import web
+    from aiohttp.test_utils import TestServer
+
+    async def view(request):
+        state['active'] += 1
+        state['max_active'] = max(state['max_active'], state['active'])
+        try:
+            await asyncio.sleep(0.05)
+            filename = request.query['filename']
+            state['requests'].append((request.query.get('subfolder'), filename))
+            return web.Response(body=f"{state['name']}:{filename}".encode(), content_type='image/png')
+        finally:
+            state['active'] -= 1
+
+    app = web.Application()
+    app.router.add_get('/view', view)
+    server = TestServer(app)
+    await server.start_server()
+    return server
+
+
+def test_sync_task_results():
+    """测试任务结果下载到主机并更新结果记录"""
+    print("📥 测试结果文件同步")
+    print("-" * 40)
+
+    try:
+        from app.core.result_sync import ResultFileSync
+        from app.utils.output_manager import OutputManager
+        from app.database.result_locations import ResultLocationIndex
+        import app.database.result_locations as result_locations
+
+        dao, DemoResult, Session = _create_demo_dao()
+        state = {'name': 'node-a', 'active': 0, 'max_active': 0, 'requests': []}
+        node_urls = {}
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            output_manager = OutputManager.__new__(OutputManager)
+            output_manager.output_dir = output_dir
+            result_locations._result_location_index = ResultLocationIndex(result_dao=dao)
+
+            sync = ResultFileSync(
+                result_dao=dao, task_dao=SimpleNamespace(get_by_id=lambda id_value: SimpleNamespace(task_id=f"task-{id_value}")),
+                output_manager=output_manager, node_resolver=node_urls.get, max_concurrent_downloads=1
+            )
+            sync.start()
+            server = asyncio.run_coroutine_threadsafe(_start_demo_node(state), sync._loop).result()
+            node_urls['node-a'] = str(server.make_url('')).rstrip('/')
+            try:
+                def run(coro):
+                    return asyncio.run_coroutine_threadsafe(coro, sync._loop).result(timeout=10)
+
+                failed = run(sync.sync_task(1, 'task-1'))
+                print(f"节点请求: {state['requests']}，最大并发 {state['max_active']}")
+                assert failed == []
+                assert sorted(state['requests']) == [('2026/10/18', 'ComfyUI_00001_.png'), ('2026/10/18', 'ComfyUI_00002_.png')]
+                assert state['max_active'] == 1
+
+                session = Session()
+                rows = {row.id: row for row in session.query(DemoResult).all()}
+                session.close()
+                date_dir = os.path.join(output_dir, datetime.now().strftime("%Y/%m/%d"))
+                assert rows[1].file_path == os.path.join(date_dir, 'task-1_001_ComfyUI_00001_.png')
+                assert rows[2].file_path == os.path.join(date_dir, 'task-1_002_ComfyUI_00002_.png')
+                assert rows[1].result_metadata['node_file_path'] == '2026/10/18/ComfyUI_00001_.png'
+                assert rows[1].file_size == len(b'node-a:ComfyUI_00001_.png')
+                with open(rows[2].file_path, 'rb') as f:
+                    assert f.read() == b'node-a:ComfyUI_00002_.png'
+                assert sorted(os.listdir(output_dir)) == [datetime.now().strftime("%Y")]
+
+                # 按原节点路径仍能查到位置，并附带本地副本
+                location = dao.get_file_location(['2026/10/18/ComfyUI_00002_.png'])
+                assert location['node_id'] == 'node-a' and location['local_path'] == rows[2].file_path
+                assert result_locations._result_location_index.lookup('2026/10/18/ComfyUI_00001_.png')['local_path'] == rows[1].file_path
+
+                # node-b离线：补扫失败后游标停在其之前，节点恢复后同步
+                assert run(sync.sync_pending()) == 0
+                assert sync._cursor == 2 and sync._attempts == {3: 1}
+                node_urls['node-b'] = node_urls['node-a']
+                assert run(sync.sync_pending()) == 1
+                assert sync._cursor == 4 and sync._attempts == {}
+                assert dao.get_unsynced_node_results(0)[0] == []
+                print(f"同步状态: {sync.get_status()}")
+            finally:
+                asyncio.run_coroutine_threadsafe(server.close(), sync._loop).result()
+                sync.stop()
+                result_locations._result_location_index = None
+
+        print("✅ 结果文件同步测试完成")
+
+    except Exception as e:
+        print(f"❌ 结果文件同步测试失败: {e}")
+        raise
+
+
+def main():
+    """主测试函数"""
+    print("🧪 测试结果文件同步")
+    print("=" * 50)
+
+    test_sync_task_results()
+
+    print("\n🎯 结果文件同步测试完成！")
+
+if __name__ == "__main__":
+    main()
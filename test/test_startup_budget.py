@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+测试延迟的消息代理解析
+冷启动导入耗时预算受机器负载影响，不在单元测试中检查，由 scripts/startup_benchmark.py 单独运行
+"""
+import sys
+import os
+import subprocess
+
+# 添加正确的路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+backend_path = os.path.join(project_root, 'backend')
+
+sys.path.insert(0, backend_path)
+
+# 切换到项目根目录
+os.chdir(project_root)
+
+
+def test_celery_import_is_lazy():
+    """测试导入Celery应用时不解析消息代理（不访问Redis）"""
+    print("💤 测试Celery延迟配置")
+    print("-" * 40)
+
+    try:
+        code = (
+            "import app.queue.tasks as t; "
+            "print('configured', t.celery_app.configured)"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code], cwd=backend_path,
+            capture_output=True, text=True, timeout=60
+        )
+        print(result.stdout.strip())
+
+        assert result.returncode == 0, result.stderr[-1000:]
+        assert 'configured False' in result.stdout
+        assert '[Celery]' not in result.stdout  # 导入阶段未执行Redis探测
+
+        print("✅ Celery延迟配置测试完成")
+
+    except Exception as e:
+        print(f"❌ Celery延迟配置测试失败: {e}")
+        raise
+
+
+def main():
+    """主测试函数"""
+    print("🧪 测试启动耗时")
+    print("=" * 50)
+
+    test_celery_import_is_lazy()
+
+    print("\n🎯 启动耗时测试完成！")
+
+if __name__ == "__main__":
+    main()
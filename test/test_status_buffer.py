@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+测试任务状态写缓冲（Redis哈希 + 批量刷新）
+"""
+import sys
+import os
+
+# 添加正确的路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+backend_path = os.path.join(project_root, 'backend')
+
+sys.path.insert(0, backend_path)
+
+# 切换到项目根目录
+os.chdir(project_root)
+
+
+class _MemoryRedis:
+    """测试用的内存Redis，只实现状态缓冲用到的命令"""
+
+    def __init__(self):
+        self.hashes = {}
+        self.sets = {}
+
+    def pipeline(self, transaction=False):
+        return _MemoryPipeline(self)
+
+    def hset(self, key, mapping):
+        self.hashes.setdefault(key, {}).update(mapping)
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def expire(self, key, ttl):
+        return True
+
+    def delete(self, key):
+        return 1 if self.hashes.pop(key, None) is not None else 0
+
+    def sadd(self, key, *members):
+        self.sets.setdefault(key, set()).update(members)
+
+    def srem(self, key, *members):
+        self.sets.get(key, set()).difference_update(members)
+
+    def spop(self, key, count):
+        members = self.sets.get(key, set())
+        return [members.pop() for _ in range(min(count, len(members)))]
+
+
+class _MemoryPipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.commands.append((getattr(self.client, name), args, kwargs))
+        return queue
+
+    def execute(self):
+        return [command(*args, **kwargs) for command, args, kwargs in self.commands]
+
+
+def test_buffer_write_and_flush():
+    """测试中间状态合并写入缓冲，并以一次批量写入刷新"""
+    print("📝 测试状态写缓冲")
+    print("-" * 40)
+
+    try:
+        from app.database.status_buffer import TaskStatusBuffer
+
+        buffer = TaskStatusBuffer(_MemoryRedis(), batch_size=100)
+
+        assert buffer.is_bufferable({'status': 'processing', 'progress': 10, 'message': 'x'})
+        assert not buffer.is_bufferable({'status': 'completed', 'progress': 100})
+        assert not buffer.is_bufferable({'status': 'processing', 'result_data': {}})
+
+        for progress in (0, 10, 20, 30):
+            buffer.write('task-a', {'status': 'processing', 'progress': progress, 'message': f'进度{progress}'})
+        buffer.write('task-b', {'status': 'processing', 'progress': 5, 'prompt_id': 'p-1'})
+
+        # 读取时合并：数据库为中间状态时使用缓冲值，终态以数据库为准
+        merged = buffer.merge({'task_id': 'task-a', 'status': 'queued', 'progress': 0}, buffer.read('task-a'))
+        assert merged['status'] == 'processing' and merged['progress'] == 30
+        final = buffer.merge({'task_id': 'task-a', 'status': 'completed', 'progress': 100}, buffer.read('task-a'))
+        assert final['status'] == 'completed' and final['progress'] == 100
+
+        # 写入失败时任务重新标记为待刷新
+        assert buffer.flush(lambda updates: False) == 0
+        assert buffer.redis_client.sets[buffer.dirty_key] == {'task-a', 'task-b'}
+
+        writes = []
+        flushed = buffer.flush_all(lambda updates: writes.append(updates) or True)
+        print(f"5次状态更新 -> 刷新 {flushed} 个任务，批量写入 {len(writes)} 次")
+        assert flushed == 2
+        assert len(writes) == 1
+        assert writes[0]['task-a']['progress'] == 30
+        assert writes[0]['task-b']['prompt_id'] == 'p-1'
+        assert not buffer.redis_client.sets[buffer.dirty_key]
+
+        buffer.discard('task-a')
+        assert buffer.read('task-a') == {}
+
+        print("✅ 状态写缓冲测试完成")
+
+    except Exception as e:
+        print(f"❌ 状态写缓冲测试失败: {e}")
+        raise
+
+
+def main():
+    """主测试函数"""
+    print("🧪 测试任务状态写缓冲")
+    print("=" * 50)
+
+    test_buffer_write_and_flush()
+
+    print("\n🎯 任务状态写缓冲测试完成！")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+测试任务状态读缓存（read-through + 写入失效）
+"""
+import sys
+import os
+
+# 添加正确的路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+backend_path = os.path.join(project_root, 'backend')
+
+sys.path.insert(0, backend_path)
+
+# 切换到项目根目录
+os.chdir(project_root)
+
+
+class _MemoryRedis:
+    """测试用的内存Redis，只实现状态缓存用到的命令"""
+
+    def __init__(self):
+        self.values = {}
+        self.ttls = {}
+
+    def pipeline(self, transaction=True):
+        return _MemoryPipeline(self)
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value
+        self.ttls[key] = ex
+
+    def delete(self, key):
+        return 1 if self.values.pop(key, None) is not None else 0
+
+    def incr(self, key):
+        self.values[key] = str(int(self.values.get(key, 0)) + 1)
+        return int(self.values[key])
+
+    def expire(self, key, ttl):
+        self.ttls[key] = ttl
+
+
+class _MemoryPipeline:
+    """watch之后命令立即执行，multi之后命令排队到execute"""
+
+    def __init__(self, client):
+        self.client = client
+        self.commands = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def watch(self, *keys):
+        pass
+
+    def multi(self):
+        self.commands = []
+
+    def __getattr__(self, name):
+        command = getattr(self.client, name)
+        if self.commands is None and name == 'get':
+            return command
+
+        def queue(*args, **kwargs):
+            if self.commands is None:
+                self.commands = []
+            self.commands.append((command, args, kwargs))
+        return queue
+
+    def execute(self):
+        return [command(*args, **kwargs) for command, args, kwargs in self.commands or []]
+
+
+def test_read_through_and_invalidation():
+    """测试未命中时回填、命中时不访问数据库、写入后失效"""
+    print("🗄️ 测试状态读缓存")
+    print("-" * 40)
+
+    try:
+        from app.database.status_cache import TaskStatusCache
+
+        redis_client = _MemoryRedis()
+        cache = TaskStatusCache(redis_client, active_ttl=10, terminal_ttl=3600)
+        database = {'t1': {'task_id': 't1', 'status': 'processing', 'progress': 10.0}}
+        loads = []
+
+        def loader(task_id):
+            loads.append(task_id)
+            document = database.get(task_id)
+            return dict(document) if document else None
+
+        for _ in range(5):
+            assert cache.get('t1', loader)['progress'] == 10.0
+        assert loads == ['t1']
+        assert redis_client.ttls[cache._get_key('t1')] == 10
+
+        # 写入后失效，下次读取重新加载；终态使用长过期时间
+        database['t1'] = {'task_id': 't1', 'status': 'completed', 'progress': 100.0}
+        cache.invalidate('t1')
+        assert cache.get('t1', loader)['status'] == 'completed'
+        assert redis_client.ttls[cache._get_key('t1')] == 3600
+        assert len(loads) == 2
+
+        # 不存在的任务不缓存
+        assert cache.get('missing', loader) is None
+        assert cache._get_key('missing') not in redis_client.values
+
+        stats = cache.get_stats()
+        print(f"缓存统计: {stats}")
+        assert stats['hits'] == 4 and stats['misses'] == 3
+        assert stats['hit_ratio'] == round(4 / 7, 4)
+
+        print("✅ 状态读缓存测试完成")
+
+    except Exception as e:
+        print(f"❌ 状态读缓存测试失败: {e}")
+        raise
+
+
+def test_stale_fill_is_discarded():
+    """测试加载期间发生写入时，旧文档不会回填到缓存"""
+    print("\n⏱️ 测试并发写入下的缓存回填")
+    print("-" * 40)
+
+    try:
+        from app.database.status_cache import TaskStatusCache
+
+        redis_client = _MemoryRedis()
+        cache = TaskStatusCache(redis_client)
+
+        def racing_loader(task_id):
+            document = {'task_id': task_id, 'status': 'completed', 'progress': 100.0, 'resultUrls': []}
+            # 加载完成后、回填之前，写入方保存了结果并使缓存失效
+            cache.invalidate(task_id)
+            return document
+
+        assert cache.get('t1', racing_loader)['resultUrls'] == []
+        assert cache._get_key('t1') not in redis_client.values
+
+        # 之后的读取正常回填
+        assert cache.get('t1', lambda task_id: {'task_id': task_id, 'status': 'completed'})
+        assert cache._get_key('t1') in redis_client.values
+
+        print("✅ 并发写入下的缓存回填测试完成")
+
+    except Exception as e:
+        print(f"❌ 并发写入下的缓存回填测试失败: {e}")
+        raise
+
+
+def test_redis_failure_falls_back_to_loader():
+    """测试Redis不可用时直接查询数据库"""
+    print("\n🔌 测试Redis故障回退")
+    print("-" * 40)
+
+    try:
+        from app.database.status_cache import TaskStatusCache
+
+        class BrokenRedis:
+            def __getattr__(self, name):
+                def fail(*args, **kwargs):
+                    raise ConnectionError("redis down")
+                return fail
+
+        cache = TaskStatusCache(BrokenRedis())
+        assert cache.get('t1', lambda task_id: {'task_id': task_id, 'status': 'queued'})['status'] == 'queued'
+        cache.invalidate('t1')
+        assert cache.get_stats()['errors'] == 2
+
+        print("✅ Redis故障回退测试完成")
+
+    except Exception as e:
+        print(f"❌ Redis故障回退测试失败: {e}")
+        raise
+
+
+def main():
+    """主测试函数"""
+    print("🧪 测试任务状态读缓存")
+    print("=" * 50)
+
+    test_read_through_and_invalidation()
+    test_stale_fill_is_discarded()
+    test_redis_failure_falls_back_to_loader()
+
+    print("\n🎯 任务状态读缓存测试完成！")
+
+if __name__ == "__main__":
+    main()
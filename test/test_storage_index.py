@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+测试输出文件存储索引：整理输出时记录索引、统计读取聚合行且与遍历目录一致、
+按过期时间清理文件与缩略图、重建索引跳过缓存目录与缩略图
+"""
+import sys
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# 添加正确的路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+backend_path = os.path.join(project_root, 'backend')
+
+sys.path.insert(0, backend_path)
+
+# 切换到项目根目录
+os.chdir(project_root)
+
+
+def _create_storage_index(tmp_dir, output_dir, **kwargs):
+    """在SQLite文件中创建全局文件表、存储统计表与任务结果表，返回使用它们的存储索引"""
+    from app.database.models.shared_models import GlobalFile
+    from app.database.storage_index import StorageIndex
+    from db_helpers import create_demo_db_manager, create_model_tables, create_sqlite_engine
+
+    engine = create_sqlite_engine(f"sqlite:///{os.path.join(tmp_dir, 'shared.db')}")
+    create_model_tables(engine, GlobalFile, ['global_files', 'storage_stats', 'global_tasks', 'global_task_results'])
+    client_engine = create_sqlite_engine(f"sqlite:///{os.path.join(tmp_dir, 'client.db')}")
+    create_model_tables(client_engine, GlobalFile, ['client_tasks', 'client_task_results'])
+    db_manager = create_demo_db_manager(engines={'shared': engine, 'client': client_engine})
+    return StorageIndex(db_manager=db_manager, root_dir=output_dir, **kwargs), engine
+
+
+def _create_output_manager(output_dir, storage_index):
+    from app.utils.output_manager import OutputManager
+
+    manager = OutputManager.__new__(OutputManager)
+    manager.output_dir = output_dir
+    manager.storage_index = storage_index
+    return manager
+
+
+def _write(path, size, mtime=None):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(os.urandom(size))
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return path
+
+
+def _walk_stats(output_dir):
+    """不使用索引时遍历目录得到的统计"""
+    return _create_output_manager(output_dir, None).get_storage_stats()
+
+
+def test_index_on_organize():
+    """测试整理输出文件时记录索引，统计与遍历目录的结果一致"""
+    print("🗂️ 测试整理输出时记录存储索引")
+    print("-" * 40)
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output_dir = os.path.join(tmp_dir, 'outputs')
+            staging_dir = os.path.join(tmp_dir, 'staging')
+            storage_index, engine = _create_storage_index(tmp_dir, output_dir, retention_days=30)
+            manager = _create_output_manager(output_dir, storage_index)
+
+            sources = [_write(os.path.join(staging_dir, f"img_{i}.png"), 1000 + i) for i in range(3)]
+            sources.append(_write(os.path.join(staging_dir, 'clip.mp4'), 5000))
+            organized = manager.organize_output_files(sources, 'task-1', owner='client-1')
+            assert len(organized) == 4 and all(path.startswith(output_dir) for path in organized)
+
+            stats = manager.get_storage_stats()
+            print(f"索引统计: {stats['total_files']} 个文件, {stats['total_size']} 字节, 类型 {sorted(stats['by_type'])}")
+            walked = _walk_stats(output_dir)
+            assert stats == walked
+            assert stats['by_type']['.png'] == {'files': 3, 'size': 3003}
+
+            with engine.connect() as conn:
+                rows = conn.execute(storage_index.file_table.select()).mappings().all()
+            assert {row['source_user_id'] for row in rows} == {'client-1'}
+            assert {row['file_type'] for row in rows} == {'image', 'video'}
+            assert all(row['expires_at'] > datetime.now() + timedelta(days=29) for row in rows)
+
+            # 同一路径重新写入时替换原记录，不重复计数
+            _write(organized[0], 4000)
+            assert storage_index.add([organized[0]], 'client-1') == 1
+            stats = manager.get_storage_stats()
+            assert stats['total_files'] == 4 and stats == _walk_stats(output_dir)
+
+            # 移除记录后统计同步扣减
+            os.remove(organized[-1])
+            assert storage_index.remove([organized[-1]]) == 1
+            stats = manager.get_storage_stats()
+            assert stats['total_files'] == 3 and '.mp4' not in stats['by_type']
+            assert stats == _walk_stats(output_dir)
+
+        print("✅ 整理输出时记录存储索引测试通过")
+
+    except Exception as e:
+        print(f"❌ 整理输出时记录存储索引测试失败: {e}")
+        raise
+
+
+def test_purge_expired():
+    """测试按过期时间清理文件、缩略图和空目录，临时文件使用较短的保留期"""
+    print("\n🧹 测试清理过期文件")
+    print("-" * 40)
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output_dir = os.path.join(tmp_dir, 'outputs')
+            storage_index, _ = _create_storage_index(tmp_dir, output_dir, retention_days=30,
+                                                     temporary_retention_hours=1, batch_size=2)
+            manager = _create_output_manager(output_dir, storage_index)
+            old = time.time() - 40 * 86400
+
+            expired = [_write(os.path.join(output_dir, '2026/09/01', f"old_{i}.png"), 100, mtime=old)
+                       for i in range(3)]
+            thumbnail = _write(os.path.join(output_dir, '2026/09/01', 'old_0_thumb_256.webp'), 10, mtime=old)
+            fresh = _write(os.path.join(output_dir, '2026/10/18', 'new.png'), 200)
+            temporary = _write(os.path.join(output_dir, '2026/10/18', 'preview.png'), 50,
+                               mtime=time.time() - 2 * 3600)
+            assert storage_index.add(expired + [fresh]) == 4
+            assert storage_index.add([temporary], is_temporary=True) == 1
+
+            # 按天数清理时只看日期分桶：今天的临时文件虽已过期也不删除，过期清理留给数据保留任务
+            assert manager.cleanup_old_files(days=35) == 3
+            assert os.path.exists(temporary) and manager.get_storage_stats()['total_files'] == 2
+            expired = [_write(path, 100, mtime=old) for path in expired]
+            _write(thumbnail, 10, mtime=old)
+            assert storage_index.add(expired) == 3
+
+            deleted = manager.cleanup_old_files()
+            stats = manager.get_storage_stats()
+            print(f"删除 {deleted} 个文件，剩余 {stats['total_files']} 个")
+            assert deleted == 4
+            assert not any(os.path.exists(path) for path in expired + [thumbnail, temporary])
+            assert not os.path.exists(os.path.join(output_dir, '2026/09'))
+            assert os.path.exists(fresh) and os.path.isdir(output_dir)
+            assert stats['total_files'] == 1 and list(stats['by_date']) == [datetime.now().strftime('%Y/%m/%d')]
+
+            # 按天数清理日期分桶早于该天数的文件
+            assert manager.cleanup_old_files() == 0
+            assert storage_index.purge_older_than(1, now=datetime.now() + timedelta(days=2)) == 1
+            assert manager.get_storage_stats()['total_files'] == 0
+
+        print("✅ 清理过期文件测试通过")
+
+    except Exception as e:
+        print(f"❌ 清理过期文件测试失败: {e}")
+        raise
+
+
+def test_purge_clears_results():
+    """测试默认不过期，清理文件时删除引用它们的全局/客户端任务结果记录"""
+    print("\n🗑️ 测试清理文件时删除结果记录")
+    print("-" * 40)
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output_dir = os.path.join(tmp_dir, 'outputs')
+            storage_index, engine = _create_storage_index(tmp_dir, output_dir)
+            client_engine = storage_index.db_manager.get_engine('client')
+            old = time.time() - 40 * 86400
+
+            # 默认保留期为0，输出文件不过期
+            kept = _write(os.path.join(output_dir, '2026/09/01', 'kept.png'), 100, mtime=old)
+            assert storage_index.add([kept]) == 1
+            assert storage_index.purge_expired() == 0 and os.path.exists(kept)
+
+            storage_index.retention_days = 30
+            expired = _write(os.path.join(output_dir, '2026/09/01', 'expired.png'), 100, mtime=old)
+            assert storage_index.add([expired]) == 1
+
+            # 全局结果记录保存相对工作目录的路径，客户端结果记录保存绝对路径
+            (_, global_results), (_, client_results) = storage_index.result_tables
+            with engine.begin() as conn:
+                conn.execute(global_results.insert(), [
+                    {'task_id': 1, 'result_type': 'image', 'file_path': os.path.relpath(expired)},
+                    {'task_id': 1, 'result_type': 'image', 'file_path': os.path.relpath(kept)},
+                ])
+            with client_engine.begin() as conn:
+                conn.execute(client_results.insert(), [
+                    {'task_id': 1, 'result_type': 'image', 'file_path': expired},
+                ])
+
+            assert storage_index.purge_expired(now=datetime.now() + timedelta(days=31)) == 1
+            assert not os.path.exists(expired) and os.path.exists(kept)
+            with engine.connect() as conn:
+                global_paths = [row.file_path for row in conn.execute(global_results.select())]
+            with client_engine.connect() as conn:
+                client_paths = [row.file_path for row in conn.execute(client_results.select())]
+            print(f"剩余全局结果: {global_paths}，客户端结果: {client_paths}")
+            assert global_paths == [os.path.relpath(kept)]
+            assert client_paths == []
+
+        print("✅ 清理文件时删除结果记录测试通过")
+
+    except Exception as e:
+        print(f"❌ 清理文件时删除结果记录测试失败: {e}")
+        raise
+
+
+def test_rebuild():
+    """测试重建索引：遍历一次输出目录，跳过缩略图、暂存目录和节点文件缓存"""
+    print("\n🔄 测试重建存储索引")
+    print("-" * 40)
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output_dir = os.path.join(tmp_dir, 'outputs')
+            storage_index, engine = _create_storage_index(tmp_dir, output_dir, batch_size=3)
+
+            for i in range(7):
+                _write(os.path.join(output_dir, '2026/10/18', f"img_{i}.png"), 100 + i)
+            _write(os.path.join(output_dir, '2026/10/18', 'img_0_thumb_256.webp'), 10)
+            _write(os.path.join(output_dir, '.sync_abc', '0', 'partial.png'), 10)
+            _write(os.path.join(output_dir, 'cache', 'node-1', 'cached.png'), 10)
+
+            # 已有记录：img_0未变化，img_1重建前被重写，gone.png已从磁盘删除
+            _write(os.path.join(output_dir, '2026/10/18', 'img_1.png'), 50)
+            storage_index.add([os.path.join(output_dir, '2026/10/18', f"img_{i}.png") for i in range(2)], 'client-1')
+            gone = _write(os.path.join(output_dir, '2026/10/17', 'gone.png'), 500)
+            storage_index.add([gone], 'client-1')
+            os.remove(gone)
+            _write(os.path.join(output_dir, '2026/10/18', 'img_1.png'), 101)
+
+            # 重建不预先清空索引，每批更新都能读到完整的统计
+            snapshots = []
+            original_sync = storage_index._sync_paths
+
+            def recording_sync(batch):
+                snapshots.append(storage_index.get_stats()['total_files'])
+                return original_sync(batch)
+
+            storage_index._sync_paths = recording_sync
+            indexed = storage_index.rebuild()
+            stats = storage_index.get_stats()
+            print(f"重建索引: {indexed} 个文件，{stats['total_size']} 字节，各批更新前的文件数 {snapshots}")
+            assert indexed == 7 and snapshots[0] == 3
+            assert stats['total_files'] == 7 and stats['total_size'] == sum(100 + i for i in range(7))
+            assert list(stats['by_type']) == ['.png']
+
+            # 未变化的记录保留所属用户，不存在的文件的记录被删除
+            with engine.connect() as conn:
+                owners = {os.path.basename(row['file_path']): row['source_user_id']
+                          for row in conn.execute(storage_index.file_table.select()).mappings()}
+            assert owners['img_0.png'] == 'client-1' and owners['img_1.png'] is None
+            assert 'gone.png' not in owners and len(owners) == 7
+
+        print("✅ 重建存储索引测试通过")
+
+    except Exception as e:
+        print(f"❌ 重建存储索引测试失败: {e}")
+        raise
+
+
+def main():
+    """主测试函数"""
+    print("🧪 存储索引测试")
+    print("=" * 50)
+
+    test_index_on_organize()
+    test_purge_expired()
+    test_purge_clears_results()
+    test_rebuild()
+
+    print("\n🎉 所有测试完成!")
+
+
+if __name__ == "__main__":
+    main()
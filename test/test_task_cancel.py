@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+测试任务取消器
+使用本地模拟的ComfyUI服务验证排队提示词删除、执行中提示词的受保护中断与部分输出清理
+"""
+import sys
+import os
+import asyncio
+import tempfile
+import time
+
+# 添加正确的路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+backend_path = os.path.join(project_root, 'backend')
+
+sys.path.insert(0, backend_path)
+
+# 切换到项目根目录
+os.chdir(project_root)
+
+
+async def _start_fake_comfyui(state):
+    """启动模拟的ComfyUI服务：支持/queue、/interrupt与/history"""
+    from aiohttp import web
+
+    def queue_items(prompt_ids):
+        return [[i, prompt_id, {}, {}, []] for i, prompt_id in enumerate(prompt_ids)]
+
+    async def get_queue(request):
+        return web.json_response({
+            'queue_running': queue_items(state['running']),
+            'queue_pending': queue_items(state['pending'])
+        })
+
+    async def post_queue(request):
+        data = await request.json()
+        for prompt_id in data.get('delete', []):
+            if prompt_id in state['pending']:
+                state['pending'].remove(prompt_id)
+        return web.json_response({})
+
+    async def interrupt(request):
+        data = await request.json()
+        state['interrupts'].append(data.get('prompt_id'))
+        if data.get('prompt_id') in state['running']:
+            state['running'].remove(data['prompt_id'])
+        return web.json_response({})
+
+    async def get_history(request):
+        prompt_id = request.match_info['prompt_id']
+        if prompt_id in state['history']:
+            return web.json_response({prompt_id: state['history'][prompt_id]})
+        return web.json_response({})
+
+    async def post_history(request):
+        data = await request.json()
+        for prompt_id in data.get('delete', []):
+            state['history'].pop(prompt_id, None)
+        return web.json_response({})
+
+    app = web.Application()
+    app.router.add_get('/queue', get_queue)
+    app.router.add_post('/queue', post_queue)
+    app.router.add_post('/interrupt', interrupt)
+    app.router.add_get('/history/{prompt_id}', get_history)
+    app.router.add_post('/history', post_history)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    return runner, f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+
+
+def test_cancel_prompt():
+    """测试排队中删除、执行中受保护中断"""
+    print("🛑 测试取消ComfyUI提示词")
+    print("-" * 40)
+
+    async def run():
+        from app.core.task_canceller import TaskCanceller
+
+        state = {'running': ['p-other'], 'pending': ['p-queued'], 'interrupts': [], 'history': {}}
+        server, url = await _start_fake_comfyui(state)
+        canceller = TaskCanceller()
+        try:
+            # 排队中的提示词从队列删除，不触发中断
+            action = await canceller.cancel_prompt(url, 'p-queued')
+            print(f"排队中提示词: {action}")
+            assert action == 'dequeued'
+            assert state['pending'] == []
+            assert state['interrupts'] == []
+
+            # 节点正在执行其他任务的提示词时不中断
+            action = await canceller.cancel_prompt(url, 'p-mine')
+            print(f"未在节点上的提示词: {action}")
+            assert action == 'not_found'
+            assert state['interrupts'] == []
+            assert state['running'] == ['p-other']
+
+            # 正在执行的提示词通过/interrupt中断，并携带prompt_id
+            state['running'] = ['p-mine']
+            action = await canceller.cancel_prompt(url, 'p-mine')
+            print(f"执行中提示词: {action}")
+            assert action == 'interrupted'
+            assert state['interrupts'] == ['p-mine']
+        finally:
+            await server.cleanup()
+
+    try:
+        asyncio.run(run())
+        print("✅ 取消ComfyUI提示词测试完成")
+
+    except Exception as e:
+        print(f"❌ 取消ComfyUI提示词测试失败: {e}")
+        raise
+
+
+def test_cleanup_partial_outputs():
+    """测试清理已取消提示词的部分输出"""
+    print("\n🧹 测试清理部分输出")
+    print("-" * 40)
+
+    async def run(output_dir):
+        from app.core.task_canceller import TaskCanceller
+        from app.utils import path_utils
+
+        os.makedirs(os.path.join(output_dir, 'sub'))
+        partial_file = os.path.join(output_dir, 'sub', 'partial_00001_.png')
+        with open(partial_file, 'wb') as f:
+            f.write(b'png')
+
+        state = {
+            'running': [], 'pending': [], 'interrupts': [],
+            'history': {'p-mine': {'outputs': {'9': {'images': [
+                {'filename': 'partial_00001_.png', 'subfolder': 'sub', 'type': 'output'},
+                {'filename': '../../escape.png', 'subfolder': '', 'type': 'output'},
+                {'filename': 'preview.png', 'subfolder': '', 'type': 'temp'}
+            ]}}}}
+        }
+        server, url = await _start_fake_comfyui(state)
+
+        original_get_output_dir = path_utils.get_output_dir
+        path_utils.get_output_dir = lambda: output_dir
+        try:
+            removed = await TaskCanceller().cleanup_outputs(url, 'p-mine', 'default')
+            print(f"删除的部分输出文件数: {removed}")
+            assert removed == 1
+            assert not os.path.exists(partial_file)
+            assert 'p-mine' not in state['history']
+        finally:
+            path_utils.get_output_dir = original_get_output_dir
+            await server.cleanup()
+
+    try:
+        with tempfile.TemporaryDirectory() as output_dir:
+            asyncio.run(run(output_dir))
+        print("✅ 清理部分输出测试完成")
+
+    except Exception as e:
+        print(f"❌ 清理部分输出测试失败: {e}")
+        raise
+
+
+def test_cancel_task_does_not_block_loop():
+    """测试取消任务时数据库更新、Celery撤销与文件删除都不阻塞事件循环"""
+    print("\n⏱️ 测试取消任务不阻塞事件循环")
+    print("-" * 40)
+
+    slow_seconds = 0.3
+    calls = []
+
+    class SlowStatusManager:
+        def update_task_status(self, task_id, status_data):
+            time.sleep(slow_seconds)
+            calls.append(('update', task_id, status_data['status']))
+            return True
+
+    def slow_revoke(celery_task_id):
+        time.sleep(slow_seconds)
+        calls.append(('revoke', celery_task_id))
+        return True
+
+    async def run(output_dir):
+        from app.core.loop_monitor import LoopBlockDetector
+        from app.core.task_canceller import TaskCanceller
+        from app.database import task_status_manager as status_module
+        from app.queue import tasks as tasks_module
+        from app.utils import path_utils
+
+        partial_file = os.path.join(output_dir, 'partial_00001_.png')
+        with open(partial_file, 'wb') as f:
+            f.write(b'png')
+
+        def slow_output_dir():
+            time.sleep(slow_seconds)
+            return output_dir
+
+        state = {
+            'running': ['p-mine'], 'pending': [], 'interrupts': [],
+            'history': {'p-mine': {'outputs': {'9': {'images': [
+                {'filename': 'partial_00001_.png', 'subfolder': '', 'type': 'output'}
+            ]}}}}
+        }
+        server, url = await _start_fake_comfyui(state)
+        canceller = TaskCanceller()
+        canceller.resolve_node_url = lambda node_id: url
+
+        originals = (status_module.get_database_task_status_manager, tasks_module.cancel_task,
+                     path_utils.get_output_dir)
+        status_module.get_database_task_status_manager = lambda: SlowStatusManager()
+        tasks_module.cancel_task = slow_revoke
+        path_utils.get_output_dir = slow_output_dir
+        detector = LoopBlockDetector(threshold=slow_seconds * 2 / 3)
+        try:
+            detector.start()
+            await asyncio.sleep(0.05)
+            result = await canceller.cancel_task({
+                'task_id': 't1', 'node_id': 'default', 'prompt_id': 'p-mine', 'celery_task_id': 'c1'
+            })
+            await asyncio.sleep(0.05)
+        finally:
+            await detector.stop()
+            (status_module.get_database_task_status_manager, tasks_module.cancel_task,
+             path_utils.get_output_dir) = originals
+            await server.cleanup()
+
+        print(f"取消结果: {result}，阻塞次数: {detector.blocked_count}")
+        assert result['cancelled'] and result['prompt_action'] == 'interrupted'
+        assert result['removed_files'] == 1 and not os.path.exists(partial_file)
+        assert calls == [('update', 't1', 'cancelled'), ('revoke', 'c1')]
+        assert detector.blocked_count == 0
+
+    try:
+        with tempfile.TemporaryDirectory() as output_dir:
+            asyncio.run(run(output_dir))
+        print("✅ 取消任务不阻塞事件循环测试完成")
+
+    except Exception as e:
+        print(f"❌ 取消任务不阻塞事件循环测试失败: {e}")
+        raise
+
+
+def main():
+    """主测试函数"""
+    print("🧪 测试任务取消")
+    print("=" * 50)
+
+    test_cancel_prompt()
+    test_cleanup_partial_outputs()
+    test_cancel_task_does_not_block_loop()
+
+    print("\n🎯 任务取消测试完成！")
+
+if __name__ == "__main__":
+    main()
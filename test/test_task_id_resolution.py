@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+测试状态更新时的任务ID解析（celery_task_id索引查询 + LRU映射）
+"""
+import sys
+import os
+
+# 添加正确的路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+backend_path = os.path.join(project_root, 'backend')
+
+sys.path.insert(0, backend_path)
+
+# 切换到项目根目录
+os.chdir(project_root)
+
+
+class _CountingStatusManager:
+    """记录解析查询次数的状态管理器"""
+
+    def __init__(self, celery_map):
+        self.celery_map = celery_map
+        self.resolve_calls = 0
+
+    def resolve_task_id(self, task_id):
+        self.resolve_calls += 1
+        if task_id in self.celery_map.values():
+            return task_id
+        return self.celery_map.get(task_id)
+
+
+def test_resolve_task_id_lru():
+    """测试解析结果被缓存、未命中不缓存、容量有上限"""
+    print("🔎 测试任务ID解析与LRU映射")
+    print("-" * 40)
+
+    try:
+        from app.queue import tasks
+        from app.database import task_status_manager as manager_module
+
+        fake_manager = _CountingStatusManager({f"celery-{i}": f"task-{i}" for i in range(10)})
+        original_getter = manager_module.get_database_task_status_manager
+        original_size = tasks.TASK_ID_CACHE_SIZE
+        manager_module.get_database_task_status_manager = lambda: fake_manager
+        tasks.TASK_ID_CACHE_SIZE = 4
+        tasks._task_id_cache.clear()
+
+        try:
+            # 多次进度更新只解析一次
+            for _ in range(5):
+                assert tasks.resolve_task_id('celery-1') == 'task-1'
+            print(f"5次解析celery-1的查询次数: {fake_manager.resolve_calls}")
+            assert fake_manager.resolve_calls == 1
+
+            # 未找到的任务不进入缓存
+            assert tasks.resolve_task_id('missing') is None
+            assert 'missing' not in tasks._task_id_cache
+
+            # 超过容量时淘汰最久未使用的映射
+            for i in range(2, 8):
+                tasks.resolve_task_id(f"celery-{i}")
+            print(f"缓存条目: {list(tasks._task_id_cache)}")
+            assert len(tasks._task_id_cache) == 4
+            assert 'celery-1' not in tasks._task_id_cache
+
+            tasks.forget_task_id('celery-7')
+            assert 'celery-7' not in tasks._task_id_cache
+        finally:
+            manager_module.get_database_task_status_manager = original_getter
+            tasks.TASK_ID_CACHE_SIZE = original_size
+            tasks._task_id_cache.clear()
+
+        print("✅ 任务ID解析测试完成")
+
+    except Exception as e:
+        print(f"❌ 任务ID解析测试失败: {e}")
+        raise
+
+
+def main():
+    """主测试函数"""
+    print("🧪 测试任务ID解析")
+    print("=" * 50)
+
+    test_resolve_task_id_lru()
+
+    print("\n🎯 任务ID解析测试完成！")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+测试任务列表在SQL中过滤并按 (created_at, id) 键集分页
+"""
+import sys
+import os
+from datetime import datetime, timedelta
+
+# 添加正确的路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+backend_path = os.path.join(project_root, 'backend')
+
+sys.path.insert(0, backend_path)
+
+# 切换到项目根目录
+os.chdir(project_root)
+
+
+def _create_demo_dao():
+    """在内存SQLite中创建与客户端任务表分页列一致的演示表"""
+    from sqlalchemy import create_engine, event, Column, Integer, String, DateTime
+    from sqlalchemy.orm import declarative_base, sessionmaker
+    from app.database.dao.task_dao import ClientTaskDAO
+
+    Base = declarative_base()
+
+    class DemoTask(Base):
+        __tablename__ = 'demo_client_tasks'
+        id = Column(Integer, primary_key=True)
+        task_id = Column(String(36))
+        client_id = Column(String(36))
+        status = Column(String(20))
+        task_type = Column(String(50))
+        created_at = Column(DateTime)
+
+    engine = create_engine('sqlite://')
+    statements = []
+    event.listen(engine, 'before_cursor_execute',
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine, expire_on_commit=False)
+
+    class DemoDAO(ClientTaskDAO):
+        def __init__(self):
+            self.db_name = 'client'
+            self.model_class = DemoTask
+
+        def get_session(self):
+            return Session()
+
+    # 每两个任务共享同一创建时间，验证游标能区分时间相同的记录
+    base_time = datetime(2026, 1, 1, 12, 0, 0)
+    session = Session()
+    session.add_all([
+        DemoTask(
+            task_id=f"t{i:02d}", client_id='c1' if i % 5 else 'c2',
+            status='completed' if i % 3 else 'failed',
+            task_type='text_to_image' if i % 2 else 'image_to_video',
+            created_at=base_time + timedelta(minutes=i // 2)
+        )
+        for i in range(1, 31)
+    ])
+    session.commit()
+    session.close()
+    statements.clear()
+
+    return DemoDAO(), statements
+
+
+def test_keyset_pages_match_full_listing():
+    """测试键集分页逐页遍历的结果与一次性排序查询一致"""
+    print("📄 测试键集分页")
+    print("-" * 40)
+
+    try:
+        from app.database.task_status_manager import DatabaseTaskStatusManager
+
+        dao, statements = _create_demo_dao()
+
+        manager = DatabaseTaskStatusManager.__new__(DatabaseTaskStatusManager)
+        manager.client_task_dao = dao
+        manager._tasks_to_dicts = lambda tasks: [{'task_id': t.task_id, 'status': t.status} for t in tasks]
+        manager._merge_buffered = lambda task_dicts: task_dicts
+
+        expected = sorted(
+            [(i, f"t{i:02d}") for i in range(1, 31) if i % 5 and i % 3],
+            key=lambda item: (item[0] // 2, item[0]), reverse=True
+        )
+        expected_ids = [task_id for _, task_id in expected]
+
+        seen, cursor, pages = [], None, 0
+        while True:
+            page = manager.list_user_tasks_page('c1', source_type='client', status='completed',
+                                                limit=4, cursor=cursor)
+            pages += 1
+            if cursor is None:
+                assert page['total'] == len(expected_ids), page['total']
+            else:
+                assert page['total'] is None
+            seen.extend(t['task_id'] for t in page['tasks'])
+            cursor = page['next_cursor']
+            if not cursor:
+                break
+
+        print(f"共 {len(seen)} 个任务，{pages} 页")
+        assert seen == expected_ids, seen
+        # 只在首页执行一次COUNT
+        assert sum('COUNT(' in statement.upper() for statement in statements) == 1
+        assert len(statements) == pages + 1
+
+        # 类型过滤同样在SQL中完成
+        page = manager.list_user_tasks_page('c1', source_type='client', task_type='image_to_video', limit=100)
+        assert page['next_cursor'] is None
+        assert {t['task_id'] for t in page['tasks']} == {f"t{i:02d}" for i in range(2, 31, 2) if i % 5}
+
+        # offset分页仍然可用
+        page = manager.list_user_tasks_page('c1', source_type='client', status='completed', limit=3, offset=3)
+        assert [t['task_id'] for t in page['tasks']] == expected_ids[3:6]
+
+        print("✅ 键集分页测试完成")
+
+    except Exception as e:
+        print(f"❌ 键集分页测试失败: {e}")
+        raise
+
+
+def test_status_filter_after_buffer_merge():
+    """测试按状态过滤时，合并缓冲状态后不再匹配的任务从本页移除"""
+    print("\n🧮 测试状态过滤与缓冲合并")
+    print("-" * 40)
+
+    try:
+        from app.database.task_status_manager import DatabaseTaskStatusManager
+
+        dao, _ = _create_demo_dao()
+        session = dao.get_session()
+        for task in session.query(dao.model_class).filter(dao.model_class.task_id.in_(['t01', 't02', 't04'])):
+            task.status = 'queued'
+        session.commit()
+        session.close()
+
+        # 缓冲中t02已开始处理，数据库尚未刷新
+        buffered = {'t02': {'status': 'processing', 'progress': 10}}
+        manager = DatabaseTaskStatusManager.__new__(DatabaseTaskStatusManager)
+        manager.client_task_dao = dao
+        manager._tasks_to_dicts = lambda tasks: [{'task_id': t.task_id, 'status': t.status} for t in tasks]
+        manager._merge_buffered = lambda task_dicts: [dict(t, **buffered.get(t['task_id'], {})) for t in task_dicts]
+
+        page = manager.list_user_tasks_page('c1', source_type='client', status='queued', limit=10)
+        print(f"queued页: {[t['task_id'] for t in page['tasks']]}")
+        assert [t['task_id'] for t in page['tasks']] == ['t04', 't01']
+        assert all(t['status'] == 'queued' for t in page['tasks'])
+
+        # 不过滤状态时保留合并后的最新状态
+        page = manager.list_user_tasks_page('c1', source_type='client', limit=100)
+        assert {t['task_id']: t['status'] for t in page['tasks']}['t02'] == 'processing'
+
+        print("✅ 状态过滤与缓冲合并测试完成")
+
+    except Exception as e:
+        print(f"❌ 状态过滤与缓冲合并测试失败: {e}")
+        raise
+
+
+def test_cursor_round_trip():
+    """测试分页游标编码与错误游标处理"""
+    print("\n🔖 测试分页游标")
+    print("-" * 40)
+
+    try:
+        from types import SimpleNamespace
+        from app.database.task_status_manager import encode_task_cursor, decode_task_cursor
+
+        created_at = datetime(2026, 3, 4, 5, 6, 7, 890000)
+        cursor = encode_task_cursor(SimpleNamespace(created_at=created_at, id=42))
+        print(f"游标: {cursor}")
+        assert decode_task_cursor(cursor) == (created_at, 42)
+
+        for bad in ('not-a-cursor', '', 'e30'):
+            try:
+                decode_task_cursor(bad)
+            except ValueError:
+                continue
+            raise AssertionError(f"无效游标未被拒绝: {bad!r}")
+
+        print("✅ 分页游标测试完成")
+
+    except Exception as e:
+        print(f"❌ 分页游标测试失败: {e}")
+        raise
+
+
+def main():
+    """主测试函数"""
+    print("🧪 测试任务列表分页")
+    print("=" * 50)
+
+    test_keyset_pages_match_full_listing()
+    test_status_filter_after_buffer_merge()
+    test_cursor_round_trip()
+
+    print("\n🎯 任务列表分页测试完成！")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+测试任务列表序列化的查询次数与输出路径URL前缀表
+"""
+import sys
+import os
+from datetime import datetime
+from types import SimpleNamespace
+
+# 添加正确的路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+backend_path = os.path.join(project_root, 'backend')
+
+sys.path.insert(0, backend_path)
+
+# 切换到项目根目录
+os.chdir(project_root)
+
+
+class _CountingTaskDAO:
+    """记录结果查询次数的任务DAO"""
+
+    def __init__(self, model_class, tasks, results):
+        self.model_class = model_class
+        self.tasks = tasks
+        self.results = results
+        self.calls = {'get_results_by_task_ids': 0, 'get_task_results': 0}
+
+    def get_tasks_by_user(self, user_id, source_type=None, limit=50):
+        return self.tasks
+
+    def get_results_by_task_ids(self, task_db_ids):
+        self.calls['get_results_by_task_ids'] += 1
+        return {task_id: self.results[task_id] for task_id in task_db_ids if task_id in self.results}
+
+    def get_task_results(self, task_id):
+        self.calls['get_task_results'] += 1
+        return []
+
+
+def _make_task(db_id, status):
+    now = datetime.now()
+    return SimpleNamespace(
+        id=db_id, task_id=f"task-{db_id}", status=status, progress=100 if status == 'completed' else 0,
+        message='', error_message=None, task_type='text_to_image', workflow_name='sd_basic',
+        prompt='', negative_prompt='', estimated_time=None, actual_time=None,
+        created_at=now, updated_at=now, started_at=None, completed_at=None,
+        source_type='api', source_user_id='u1'
+    )
+
+
+def _make_result(file_path):
+    return SimpleNamespace(
+        result_type='image', file_path=file_path, file_name=os.path.basename(file_path), file_size=1,
+        mime_type='image/png', width=512, height=512, duration=None, download_count=0, created_at=None
+    )
+
+
+def test_user_tasks_single_results_query():
+    """测试用户任务列表只用一次查询获取所有已完成任务的结果"""
+    print("📋 测试任务列表结果查询次数")
+    print("-" * 40)
+
+    try:
+        from app.database.task_status_manager import DatabaseTaskStatusManager
+
+        class GlobalTaskModel:
+            pass
+
+        class ClientTaskModel:
+            pass
+
+        tasks = [_make_task(i, 'completed' if i % 2 else 'processing') for i in range(1, 21)]
+        results = {t.id: [_make_result(f"/srv/backend/outputs/2024/{t.task_id}.png")] for t in tasks if t.status == 'completed'}
+
+        manager = DatabaseTaskStatusManager.__new__(DatabaseTaskStatusManager)
+        manager.global_task_dao = _CountingTaskDAO(GlobalTaskModel, tasks, results)
+        manager.client_task_dao = _CountingTaskDAO(ClientTaskModel, [], {})
+
+        task_dicts = manager.get_user_tasks('u1')
+        calls = manager.global_task_dao.calls
+        print(f"任务数: {len(task_dicts)}，结果查询: {calls}")
+
+        assert len(task_dicts) == 20
+        assert calls == {'get_results_by_task_ids': 1, 'get_task_results': 0}
+
+        # 分布式模式下文件通过下载接口访问，单机模式使用静态文件URL
+        from app.core.config_manager import get_config_manager
+        distributed = get_config_manager().is_distributed_mode()
+        for t in task_dicts:
+            if t['status'] != 'completed':
+                continue
+            expected = (f"/api/v2/tasks/{t['task_id']}/download?index=0" if distributed
+                        else f"/outputs/2024/{t['task_id']}.png")
+            assert t['resultUrl'] == expected, t['resultUrl']
+        assert all(t['resultUrls'] == [] for t in task_dicts if t['status'] != 'completed')
+
+        print("✅ 任务列表结果查询次数测试完成")
+
+    except Exception as e:
+        print(f"❌ 任务列表结果查询次数测试失败: {e}")
+        raise
+
+
+def test_output_path_prefix_table():
+    """测试输出路径URL前缀表与原有匹配规则一致"""
+    print("\n🔗 测试输出路径URL前缀表")
+    print("-" * 40)
+
+    try:
+        from app.utils.path_utils import output_path_to_url
+
+        cases = {
+            'D:/work/backend/outputs/2024/01/a.png': '/outputs/2024/01/a.png',
+            'backend/outputs/b.png': '/outputs/b.png',
+            '/data/project/outputs/c.png': '/outputs/c.png',
+            'E:/ComfyUI/output/sub/d.png': '/comfyui-output/sub/d.png',
+            'ComfyUI/output/e.png': '/comfyui-output/e.png',
+            '/mnt/output/f.png': '/comfyui-output/f.png',
+            'outputs/relative.png': None,
+            '/tmp/other/g.png': None,
+            '/data/outputs/': None,
+        }
+        for file_path, expected in cases.items():
+            url = output_path_to_url(file_path)
+            print(f"  {file_path} -> {url}")
+            assert url == expected, (file_path, url, expected)
+
+        print("✅ 输出路径URL前缀表测试完成")
+
+    except Exception as e:
+        print(f"❌ 输出路径URL前缀表测试失败: {e}")
+        raise
+
+
+def main():
+    """主测试函数"""
+    print("🧪 测试任务列表查询")
+    print("=" * 50)
+
+    test_user_tasks_single_results_query()
+    test_output_path_prefix_table()
+
+    print("\n🎯 任务列表查询测试完成！")
+
+if __name__ == "__main__":
+    main()
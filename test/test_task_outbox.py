@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+测试任务状态发件箱：全局任务更新与发件箱同事务写入，中继批量同步到客户端任务表
+"""
+import sys
+import os
+from datetime import datetime
+
+# 添加正确的路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+backend_path = os.path.join(project_root, 'backend')
+
+sys.path.insert(0, backend_path)
+
+# 切换到项目根目录
+os.chdir(project_root)
+
+
+def _create_demo_env():
+    """在内存SQLite中创建演示用的全局/客户端任务表、发件箱表与同步水位表"""
+    from app.database.dao.task_dao import GlobalTaskDAO, ClientTaskDAO, TaskOutboxDAO
+    from app.database.models.shared_models import SyncWatermark, TaskOutbox
+    from app.database.task_status_manager import DatabaseTaskStatusManager
+    from sqlalchemy.orm import sessionmaker
+    from db_helpers import create_demo_db_manager, create_demo_task_models, create_sqlite_engine, make_demo_dao
+
+    Base, DemoGlobalTask, DemoClientTask, _ = create_demo_task_models()
+    statements = []
+    engine = create_sqlite_engine(statements=statements)
+    Base.metadata.create_all(engine)
+    TaskOutbox.__table__.create(engine)
+    SyncWatermark.__table__.create(engine)
+    Session = sessionmaker(bind=engine)
+    db_manager = create_demo_db_manager({'shared': Session, 'client': Session})
+
+    session = Session()
+    session.add_all([DemoGlobalTask(task_id=t, status='queued', progress=0) for t in ('a', 'b')])
+    session.add_all([DemoClientTask(task_id=t, status='queued', progress=0) for t in ('a', 'b', 'client-only')])
+    session.commit()
+    session.close()
+
+    manager = DatabaseTaskStatusManager.__new__(DatabaseTaskStatusManager)
+    manager.global_task_dao = make_demo_dao(GlobalTaskDAO, DemoGlobalTask, 'shared', db_manager)
+    manager.client_task_dao = make_demo_dao(ClientTaskDAO, DemoClientTask, 'client', db_manager)
+    manager._notify_outbox_relay = lambda: None
+    outbox_dao = make_demo_dao(TaskOutboxDAO, TaskOutbox, 'shared', db_manager)
+
+    def row(model, task_id):
+        session = Session()
+        try:
+            task = session.query(model).filter(model.task_id == task_id).one()
+            return task.status, float(task.progress), task.completed_at
+        finally:
+            session.close()
+
+    statements.clear()
+    return manager, outbox_dao, DemoGlobalTask, DemoClientTask, row, statements, db_manager
+
+
+def test_status_changes_written_once_with_outbox():
+    """测试状态变更只写全局任务表，客户端任务表由中继批量同步"""
+    print("📮 测试状态变更发件箱")
+    print("-" * 40)
+
+    try:
+        from app.database.outbox_relay import TaskOutboxRelay
+        from db_helpers import use_demo_db_manager
+
+        manager, outbox_dao, DemoGlobalTask, DemoClientTask, row, statements, db_manager = _create_demo_env()
+        with use_demo_db_manager(db_manager):
+            completed_at = datetime(2026, 10, 18, 12, 30, 0)
+
+            assert manager.update_task_status('a', {'status': 'processing', 'progress': 30})
+            assert manager.update_task_status('a', {'progress': 60, 'message': '生成中'})
+            assert manager.update_task_status('a', {'status': 'completed', 'progress': 100, 'completed_at': completed_at})
+            assert manager.update_task_status('b', {'status': 'processing', 'progress': 10})
+
+            # 写入阶段不访问客户端任务表
+            assert not any('demo_client_tasks' in statement for statement in statements)
+            assert row(DemoGlobalTask, 'a') == ('completed', 100.0, completed_at)
+            assert row(DemoClientTask, 'a')[0] == 'queued'
+            assert outbox_dao.count_pending() == 4
+
+            # 版本冲突的更新不写入发件箱
+            assert not manager.update_task_status('b', {'progress': 50}, expected_version=99)
+            assert outbox_dao.count_pending() == 4
+
+            statements.clear()
+            relay = TaskOutboxRelay(outbox_dao=outbox_dao, client_task_dao=manager.client_task_dao)
+            relayed = relay.relay_all()
+            client_updates = [s for s in statements if s.lstrip().upper().startswith('UPDATE DEMO_CLIENT_TASKS')]
+            print(f"中继应用 {relayed} 条记录，客户端UPDATE语句 {len(client_updates)} 条")
+
+            assert relayed == 4
+            assert len(client_updates) == 2
+            assert row(DemoClientTask, 'a') == ('completed', 100.0, completed_at)
+            assert row(DemoClientTask, 'b') == ('processing', 10.0, None)
+            assert outbox_dao.count_pending() == 0
+            assert relay.get_status()['relayed_count'] == 4
+
+        print("✅ 状态变更发件箱测试完成")
+
+    except Exception as e:
+        print(f"❌ 状态变更发件箱测试失败: {e}")
+        raise
+
+
+def test_client_only_task_and_bulk_updates():
+    """测试只存在于客户端库的任务直接更新，批量更新只为实际更新的任务写入发件箱"""
+    print("\n📦 测试客户端任务回退与批量更新")
+    print("-" * 40)
+
+    try:
+        from app.database.outbox_relay import TaskOutboxRelay
+        from db_helpers import use_demo_db_manager
+
+        manager, outbox_dao, DemoGlobalTask, DemoClientTask, row, statements, db_manager = _create_demo_env()
+        with use_demo_db_manager(db_manager):
+            assert manager.update_task_status('client-only', {'status': 'processing', 'progress': 20})
+            assert row(DemoClientTask, 'client-only') == ('processing', 20.0, None)
+            assert outbox_dao.count_pending() == 0
+
+            assert manager.apply_buffered_updates({
+                'a': {'status': 'processing', 'progress': 40},
+                'b': {'status': 'processing', 'progress': 70},
+            })
+            assert outbox_dao.count_pending() == 2
+
+            relay = TaskOutboxRelay(outbox_dao=outbox_dao, client_task_dao=manager.client_task_dao)
+            relay.relay_all()
+            assert row(DemoClientTask, 'a') == ('processing', 40.0, None)
+            assert row(DemoClientTask, 'b') == ('processing', 70.0, None)
+
+            # 批量更新中被终态规则拒绝的记录不写入发件箱（进度不回退由两边的更新语句保证）
+            assert manager.update_task_status('a', {'status': 'completed', 'progress': 100})
+            relay.relay_all()
+            statements.clear()
+            assert manager.apply_buffered_updates({
+                'a': {'status': 'processing', 'progress': 90},
+                'b': {'status': 'processing', 'progress': 50},
+            })
+            # 写缓冲的批量刷新仍是一条executemany的UPDATE
+            global_updates = [st for st in statements if st.lstrip().upper().startswith('UPDATE DEMO_GLOBAL_TASKS')]
+            assert len(global_updates) == 1
+            assert row(DemoGlobalTask, 'a')[:2] == ('completed', 100.0)
+            assert row(DemoGlobalTask, 'b')[:2] == ('processing', 70.0)
+            assert outbox_dao.count_pending() == 1
+            relay.relay_all()
+            assert row(DemoClientTask, 'a')[:2] == ('completed', 100.0)
+            assert row(DemoClientTask, 'b') == ('processing', 70.0, None)
+
+        print("✅ 客户端任务回退与批量更新测试完成")
+
+    except Exception as e:
+        print(f"❌ 客户端任务回退与批量更新测试失败: {e}")
+        raise
+
+
+def test_bulk_status_update_guards():
+    """测试批量设置状态遵守终态规则、version自增，只为实际更新的任务写入发件箱"""
+    print("\n🚧 测试批量设置状态")
+    print("-" * 40)
+
+    try:
+        from db_helpers import use_demo_db_manager
+
+        manager, outbox_dao, DemoGlobalTask, DemoClientTask, row, statements, db_manager = _create_demo_env()
+        with use_demo_db_manager(db_manager):
+            assert manager.update_task_status('a', {'status': 'completed', 'progress': 100})
+            pending = outbox_dao.count_pending()
+
+            updated = manager.set_tasks_status_bulk(['a', 'b', 'missing'], {'status': 'failed', 'message': '入队失败'})
+            print(f"请求更新3个任务，实际更新 {updated} 个")
+            assert updated == 1
+            # 已完成的任务不被覆盖，不存在的任务不写发件箱
+            assert row(DemoGlobalTask, 'a')[0] == 'completed'
+            assert row(DemoGlobalTask, 'b')[0] == 'failed'
+            assert outbox_dao.count_pending() == pending + 1
+
+            session = db_manager.get_session_direct('shared')
+            try:
+                versions = dict(session.query(DemoGlobalTask.task_id, DemoGlobalTask.version).all())
+            finally:
+                session.close()
+            assert versions['b'] == 1
+
+        print("✅ 批量设置状态测试完成")
+
+    except Exception as e:
+        print(f"❌ 批量设置状态测试失败: {e}")
+        raise
+
+
+def test_relayed_rows_not_resynced():
+    """测试中继沿用全局任务的更新时间，增量对账不会把中继写入的记录再同步回全局任务表"""
+    print("\n🔁 测试中继记录不被对账回写")
+    print("-" * 40)
+
+    try:
+        from app.database.outbox_relay import TaskOutboxRelay
+        from app.database.sync_service import DataSyncService
+        from db_helpers import use_demo_db_manager
+
+        manager, outbox_dao, DemoGlobalTask, DemoClientTask, row, statements, db_manager = _create_demo_env()
+        with use_demo_db_manager(db_manager):
+            def updated_at(model, task_id):
+                session = manager.global_task_dao.get_session()
+                try:
+                    return session.query(model.updated_at).filter(model.task_id == task_id).scalar()
+                finally:
+                    session.close()
+
+            assert manager.update_task_status('a', {'status': 'processing', 'progress': 30})
+            global_updated_at = updated_at(DemoGlobalTask, 'a')
+
+            relay = TaskOutboxRelay(outbox_dao=outbox_dao, client_task_dao=manager.client_task_dao)
+            assert relay.relay_all() == 1
+            assert updated_at(DemoClientTask, 'a') == global_updated_at
+
+            service = DataSyncService.__new__(DataSyncService)
+            service.global_task_dao = manager.global_task_dao
+            service.client_task_dao = manager.client_task_dao
+            service.chunk_size = 10
+            service.max_chunks = 5
+            service.settle_seconds = 0
+            service.metrics = {
+                'total_synced': 0, 'last_run_synced': 0, 'last_run_seconds': 0.0,
+                'last_run_time': None, 'watermark_at': None, 'watermark_id': 0
+            }
+            service.sync_increment()
+
+            # 中继写入的记录与全局任务更新时间相同，对账不会用更晚的时间覆盖全局任务
+            assert updated_at(DemoGlobalTask, 'a') == global_updated_at
+            assert row(DemoGlobalTask, 'a') == ('processing', 30.0, None)
+            assert outbox_dao.count_pending() == 0
+
+        print("✅ 中继记录不被对账回写测试完成")
+
+    except Exception as e:
+        print(f"❌ 中继记录不被对账回写测试失败: {e}")
+        raise
+
+
+def main():
+    """主测试函数"""
+    print("🧪 测试任务状态发件箱")
+    print("=" * 50)
+
+    test_status_changes_written_once_with_outbox()
+    test_client_only_task_and_bulk_updates()
+    test_bulk_status_update_guards()
+    test_relayed_rows_not_resynced()
+
+    print("\n🎯 任务状态发件箱测试完成！")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+测试缩略图生成：多尺寸WebP缩略图、结果记录缩略图路径、按需生成时同一张图片只生成一次
+"""
+import sys
+import os
+import asyncio
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+# 添加正确的路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+backend_path = os.path.join(project_root, 'backend')
+
+sys.path.insert(0, backend_path)
+
+# 切换到项目根目录
+os.chdir(project_root)
+
+
+def _create_image(path, size=(1600, 900), mode='RGB'):
+    from PIL import Image
+    Image.new(mode, size, (200, 80, 40) if mode == 'RGB' else (200, 80, 40, 128)).save(path)
+    return path
+
+
+def test_render_thumbnails():
+    """测试在原图旁生成各尺寸WebP缩略图"""
+    print("🖼️ 测试缩略图生成")
+    print("-" * 40)
+
+    try:
+        from PIL import Image
+        from app.utils.thumbnails import render_thumbnails, thumbnail_path, is_thumbnailable
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = _create_image(os.path.join(temp_dir, 'task_001_result.png'))
+            results = render_thumbnails(source, [512, 256], quality=80)
+            print(f"生成结果: {results}")
+            assert results == {size: thumbnail_path(source, size) for size in (256, 512)}
+            assert results[256] == os.path.join(temp_dir, 'task_001_result_thumb_256.webp')
+            for size, path in results.items():
+                with Image.open(path) as thumb:
+                    assert thumb.format == 'WEBP'
+                    assert thumb.size == (size, size * 900 // 1600)
+
+            # 带透明通道的图片保留透明通道
+            rgba = _create_image(os.path.join(temp_dir, 'alpha.png'), (300, 300), 'RGBA')
+            with Image.open(render_thumbnails(rgba, [256])[256]) as thumb:
+                assert thumb.mode == 'RGBA' and thumb.size == (256, 256)
+
+            assert not [name for name in os.listdir(temp_dir) if name.endswith('.tmp')]
+            assert is_thumbnailable('a/b.JPG') and not is_thumbnailable('a/b.mp4')
+
+        print("✅ 缩略图生成测试完成")
+
+    except Exception as e:
+        print(f"❌ 缩略图生成测试失败: {e}")
+        raise
+
+
+def test_thumbnail_service():
+    """测试预先生成、记录缩略图路径与按需生成"""
+    print("\n⚙️ 测试缩略图服务")
+    print("-" * 40)
+
+    class DemoResultDAO:
+        def __init__(self):
+            self.recorded = {}
+
+        def set_thumbnail_path(self, file_path, thumbnail_path):
+            self.recorded[file_path] = thumbnail_path
+            return True
+
+    async def scenario(service, source):
+        # 并发请求同一张图片只生成一次
+        paths = await asyncio.gather(*[service.ensure(source, 300) for _ in range(5)])
+        assert len(set(paths)) == 1 and paths[0].endswith('_thumb_512.webp')
+        assert service.generated_count == 1
+        # 已存在的缩略图直接返回
+        assert await service.ensure(source) == paths[0].replace('512', '256')
+        assert service.generated_count == 1
+
+    try:
+        from app.utils.thumbnails import ThumbnailService
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            dao = DemoResultDAO()
+            executor = ThreadPoolExecutor(max_workers=2)
+            service = ThumbnailService(sizes=[512, 256], result_dao=dao, executor=executor)
+            assert service.select_size(None) == 256 and service.select_size(300) == 512
+            assert service.select_size(4096) == 512
+
+            # 任务完成后预先生成，非图片与不存在的文件跳过
+            first = _create_image(os.path.join(temp_dir, 'first.png'))
+            video = os.path.join(temp_dir, 'clip.mp4')
+            open(video, 'wb').close()
+            service.submit([first, video, os.path.join(temp_dir, 'missing.png')])
+            executor.shutdown(wait=True)
+            print(f"记录的缩略图路径: {dao.recorded}")
+            assert dao.recorded == {first: os.path.join(temp_dir, 'first_thumb_256.webp')}
+            assert service.exists(first, 512) and not service.exists(video)
+
+            service = ThumbnailService(sizes=[512, 256], result_dao=dao,
+                                       executor=ThreadPoolExecutor(max_workers=2))
+            second = _create_image(os.path.join(temp_dir, 'second.png'))
+            asyncio.run(scenario(service, second))
+            assert asyncio.run(service.ensure(video)) is None
+            print(f"服务状态: {service.get_status()}")
+            assert service.get_status()['inflight'] == 0
+            service.shutdown()
+
+        print("✅ 缩略图服务测试完成")
+
+    except Exception as e:
+        print(f"❌ 缩略图服务测试失败: {e}")
+        raise
+
+
+def test_thumbnail_urls():
+    """测试任务列表中的缩略图URL"""
+    print("\n🔗 测试缩略图URL")
+    print("-" * 40)
+
+    try:
+        import app.utils.thumbnails as thumbnails
+
+        thumbnails._thumbnail_service = thumbnails.ThumbnailService(executor=ThreadPoolExecutor(max_workers=1))
+        try:
+            urls = thumbnails.thumbnail_urls('task-1', ['a.png', 'b.mp4', 'c.jpg'])
+            assert urls == ['/api/v2/tasks/task-1/thumbnail?index=0', None,
+                            '/api/v2/tasks/task-1/thumbnail?index=2']
+        finally:
+            thumbnails._thumbnail_service.shutdown()
+            thumbnails._thumbnail_service = None
+
+        print("✅ 缩略图URL测试完成")
+
+    except Exception as e:
+        print(f"❌ 缩略图URL测试失败: {e}")
+        raise
+
+
+def test_task_list_thumbnail_urls():
+    """测试任务列表接口的JSON中保留缩略图URL"""
+    print("\n📋 测试任务列表缩略图URL")
+    print("-" * 40)
+
+    try:
+        import json
+        import app.api.routes as routes
+        from fastapi.encoders import jsonable_encoder
+        from fastapi.responses import JSONResponse
+        from fastapi.security import HTTPAuthorizationCredentials
+
+        thumbnail = '/api/v2/tasks/task-1/thumbnail?index=0'
+
+        class DemoStatusManager:
+            def list_user_tasks_page(self, client_id, **kwargs):
+                return {
+                    'tasks': [
+                        {'task_id': 'task-1', 'status': 'completed', 'progress': 100,
+                         'result_data': {'files': ['a.png', 'b.mp4']}, 'thumbnailUrls': [thumbnail, None]},
+                        {'task_id': 'task-2', 'status': 'queued'},
+                    ],
+                    'total': 2,
+                    'next_cursor': None
+                }
+
+        originals = (routes.verify_token, routes.get_status_manager)
+        routes.verify_token = lambda token: {'sub': 'user-1', 'client_id': 'client-1'}
+        routes.get_status_manager = lambda: DemoStatusManager()
+        try:
+            credentials = HTTPAuthorizationCredentials(scheme='Bearer', credentials='token')
+            result = asyncio.run(routes.list_tasks_v2(
+                status=None, task_type=None, limit=50, offset=0, cursor=None, credentials=credentials
+            ))
+        finally:
+            routes.verify_token, routes.get_status_manager = originals
+
+        # 与FastAPI序列化路由返回值的方式一致
+        body = json.loads(JSONResponse(jsonable_encoder(result)).body)
+        print(f"任务列表缩略图: {[task['thumbnailUrls'] for task in body['tasks']]}")
+        assert body['tasks'][0]['thumbnailUrls'] == [thumbnail, None]
+        assert body['tasks'][1]['thumbnailUrls'] == []
+
+        print("✅ 任务列表缩略图URL测试完成")
+
+    except Exception as e:
+        print(f"❌ 任务列表缩略图URL测试失败: {e}")
+        raise
+
+
+def main():
+    """主测试函数"""
+    print("🧪 测试缩略图生成")
+    print("=" * 50)
+
+    test_render_thumbnails()
+    test_thumbnail_service()
+    test_thumbnail_urls()
+    test_task_list_thumbnail_urls()
+
+    print("\n🎯 缩略图生成测试完成！")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+测试工作单元：同一请求中的DAO共享会话并统一提交一次，任一操作失败时全部回滚
+"""
+import sys
+import os
+
+# 添加正确的路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+backend_path = os.path.join(project_root, 'backend')
+
+sys.path.insert(0, backend_path)
+
+# 切换到项目根目录
+os.chdir(project_root)
+
+
+def _create_demo_env():
+    """在内存SQLite中创建演示用的客户端/全局任务及参数表，DAO通过工作单元获取会话"""
+    from sqlalchemy import event
+    from sqlalchemy.orm import sessionmaker
+    from app.database.dao.task_dao import GlobalTaskDAO, ClientTaskDAO
+    from db_helpers import create_demo_db_manager, create_demo_task_models, create_sqlite_engine, make_demo_dao
+
+    Base, DemoGlobalTask, DemoClientTask, DemoParameter = create_demo_task_models()
+
+    # 单连接内存库，便于统计提交次数
+    engine = create_sqlite_engine()
+    statements = []
+    commits = []
+    event.listen(engine, 'before_cursor_execute',
+                 lambda conn, cursor, statement, parameters, context, executemany:
+                 statements.append((statement, executemany)))
+    event.listen(engine, 'commit', lambda conn: commits.append(conn))
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+
+    opened = []
+
+    def session_factory(db_name):
+        opened.append(db_name)
+        return Session()
+
+    db_manager = create_demo_db_manager({'client': Session, 'shared': Session})
+    client_dao = make_demo_dao(ClientTaskDAO, DemoClientTask, 'client', db_manager)
+    global_dao = make_demo_dao(GlobalTaskDAO, DemoGlobalTask, 'shared', db_manager)
+
+    def task_ids(model):
+        session = Session()
+        try:
+            return sorted(task.task_id for task in session.query(model).all())
+        finally:
+            session.close()
+
+    statements.clear()
+    commits.clear()
+    return locals()
+
+
+def test_single_commit_across_daos():
+    """测试工作单元中多个DAO调用只提交一次，每个数据库只打开一个会话"""
+    print("🧾 测试工作单元统一提交")
+    print("-" * 40)
+
+    try:
+        from app.database.unit_of_work import unit_of_work
+
+        env = _create_demo_env()
+        client_dao, global_dao = env['client_dao'], env['global_dao']
+
+        with unit_of_work(env['session_factory']) as unit:
+            client_task = client_dao.create(task_id='t1', status='queued')
+            global_dao.create(task_id='t1', status='queued')
+            assert client_dao.update_by_field('task_id', 't1', status='processing')
+            # 提交前同一工作单元中的读取可见已flush的写入
+            assert client_dao.get_by_field('task_id', 't1').status == 'processing'
+            assert env['commits'] == []
+
+        print(f"打开会话: {env['opened']}，提交次数: {len(env['commits'])}")
+        assert sorted(env['opened']) == ['client', 'shared']
+        assert len(env['commits']) == 2
+        assert unit.failed is False
+        # 提交后返回给调用方的对象仍可访问
+        assert client_task.task_id == 't1'
+        assert env['task_ids'](env['DemoClientTask']) == ['t1']
+        assert env['task_ids'](env['DemoGlobalTask']) == ['t1']
+
+        # 没有工作单元时行为不变：每次调用独立提交
+        env['commits'].clear()
+        client_dao.create(task_id='t2', status='queued')
+        client_dao.update_by_field('task_id', 't2', status='processing')
+        assert len(env['commits']) == 2
+
+        print("✅ 工作单元统一提交测试完成")
+
+    except Exception as e:
+        print(f"❌ 工作单元统一提交测试失败: {e}")
+        raise
+
+
+def test_rollback_on_dao_failure():
+    """测试工作单元中任一DAO失败时全部回滚，嵌套工作单元加入外层"""
+    print("\n↩️ 测试工作单元回滚")
+    print("-" * 40)
+
+    try:
+        from app.database.unit_of_work import unit_of_work, run_after_commit, UnitOfWorkError
+
+        env = _create_demo_env()
+        client_dao, global_dao = env['client_dao'], env['global_dao']
+        callbacks = []
+
+        try:
+            with unit_of_work(env['session_factory']) as outer:
+                client_dao.create(task_id='t1', status='queued')
+                with unit_of_work() as inner:
+                    assert inner is outer
+                    run_after_commit(lambda: callbacks.append('invalidate'))
+                    # task_id不可为空，全局任务创建失败
+                    assert global_dao.create(task_id=None, status='queued') is None
+            raise AssertionError("工作单元应抛出UnitOfWorkError")
+        except UnitOfWorkError as e:
+            print(f"工作单元已回滚: {e}")
+
+        assert env['task_ids'](env['DemoClientTask']) == []
+        assert env['task_ids'](env['DemoGlobalTask']) == []
+        assert callbacks == []
+
+        # 异常退出同样回滚
+        try:
+            with unit_of_work(env['session_factory']):
+                client_dao.create(task_id='t2', status='queued')
+                raise ValueError("请求处理失败")
+        except ValueError:
+            pass
+        assert env['task_ids'](env['DemoClientTask']) == []
+
+        # 提交成功后执行回调，没有工作单元时立即执行
+        with unit_of_work(env['session_factory']):
+            client_dao.create(task_id='t3', status='queued')
+            run_after_commit(lambda: callbacks.append('after_commit'))
+            assert callbacks == []
+        run_after_commit(lambda: callbacks.append('immediate'))
+        assert callbacks == ['after_commit', 'immediate']
+
+        print("✅ 工作单元回滚测试完成")
+
+    except Exception as e:
+        print(f"❌ 工作单元回滚测试失败: {e}")
+        raise
+
+
+def test_parameter_rows_bulk_insert():
+    """测试创建任务时参数行以一条executemany语句插入"""
+    print("\n📥 测试参数批量插入")
+    print("-" * 40)
+
+    try:
+        from app.database.dao.task_dao import _parameter_rows
+
+        env = _create_demo_env()
+        DemoParameter = env['DemoParameter']
+        parameters = [
+            {'parameter_name': f'p{i}', 'parameter_value': str(i), 'parameter_type': 'string'}
+            for i in range(20)
+        ]
+
+        session = env['Session']()
+        try:
+            task = env['DemoClientTask'](task_id='t1', status='queued')
+            session.add(task)
+            session.flush()
+            env['statements'].clear()
+
+            from sqlalchemy import insert
+            session.execute(insert(DemoParameter), _parameter_rows(DemoParameter, task.id, parameters))
+            session.commit()
+
+            inserts = [(s, many) for s, many in env['statements'] if s.upper().startswith('INSERT INTO DEMO_TASK_PARAMETERS')]
+            print(f"参数INSERT语句 {len(inserts)} 条，executemany: {inserts[0][1]}")
+            assert len(inserts) == 1 and inserts[0][1] is True
+            assert session.query(DemoParameter).filter(DemoParameter.task_id == task.id).count() == 20
+            # 调用方的参数字典不被修改，不存在的列被忽略
+            assert 'task_id' not in parameters[0]
+        finally:
+            session.close()
+
+        print("✅ 参数批量插入测试完成")
+
+    except Exception as e:
+        print(f"❌ 参数批量插入测试失败: {e}")
+        raise
+
+
+def main():
+    """主测试函数"""
+    print("🧪 测试工作单元")
+    print("=" * 50)
+
+    test_single_commit_across_daos()
+    test_rollback_on_dao_failure()
+    test_parameter_rows_bulk_insert()
+
+    print("\n🎯 工作单元测试完成！")
+
+if __name__ == "__main__":
+    main()
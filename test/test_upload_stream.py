@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+测试流式上传：分块写入并计算哈希、超过大小上限时中止、相同内容复用已有文件、只解析文件头获取图片尺寸
+"""
+import sys
+import os
+import io
+import asyncio
+import hashlib
+import tempfile
+
+# 添加正确的路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+backend_path = os.path.join(project_root, 'backend')
+
+sys.path.insert(0, backend_path)
+
+# 切换到项目根目录
+os.chdir(project_root)
+
+
+def _create_file_service(upload_dir):
+    """在内存SQLite中创建上传表与全局文件表，返回使用它们的文件服务、各库会话工厂与数据库管理器"""
+    from sqlalchemy.orm import sessionmaker
+    from app.database.dao.base_dao import BaseDAO
+    from app.database.models.client_models import ClientUpload
+    from app.database.models.shared_models import GlobalFile
+    import app.services.file_service as file_service_module
+    from db_helpers import create_demo_db_manager, create_model_tables, create_sqlite_engine, make_demo_dao
+
+    # 客户端库与共享库分别使用独立的数据库（索引名在SQLite中全库唯一）
+    sessions = {}
+    for db_name, model_class, table_names in (('client', ClientUpload, ['client_users', 'client_uploads']),
+                                              ('shared', GlobalFile, ['global_files'])):
+        engine = create_sqlite_engine()
+        create_model_tables(engine, model_class, table_names)
+        sessions[db_name] = sessionmaker(bind=engine)
+    db_manager = create_demo_db_manager(sessions)
+
+    file_service_module.get_upload_dir = lambda: upload_dir
+    service = file_service_module.FileService.__new__(file_service_module.FileService)
+    service.client_upload_dao = make_demo_dao(BaseDAO, ClientUpload, 'client', db_manager)
+    service.global_file_dao = make_demo_dao(BaseDAO, GlobalFile, 'shared', db_manager)
+    return service, sessions, db_manager
+
+
+def _png_bytes(size=(640, 480)):
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.frombytes('RGB', size, os.urandom(size[0] * size[1] * 3)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def _upload(content, filename='input.png'):
+    from starlette.datastructures import UploadFile
+    return UploadFile(io.BytesIO(content), filename=filename)
+
+
+def test_streaming_upload_and_dedupe():
+    """测试流式保存、哈希记录与相同内容复用"""
+    print("📤 测试流式上传与去重")
+    print("-" * 40)
+
+    try:
+        from app.database.models.shared_models import GlobalFile
+        from db_helpers import use_demo_db_manager
+
+        with tempfile.TemporaryDirectory() as upload_dir:
+            service, sessions, db_manager = _create_file_service(upload_dir)
+            Session = sessions['shared']
+            content = _png_bytes()
+
+            with use_demo_db_manager(db_manager):
+                first = asyncio.run(service.save_upload_stream(_upload(content), 'client-1'))
+            print(f"首次上传: {first['file_path']} {first['width']}x{first['height']}")
+            assert (first['width'], first['height']) == (640, 480)
+            assert first['file_size'] == len(content) and not first['deduplicated']
+            with open(first['file_path'], 'rb') as f:
+                assert f.read() == content
+
+            with use_demo_db_manager(db_manager):
+                second = asyncio.run(service.save_upload_stream(_upload(content, 'copy.png'), 'client-2'))
+            print(f"重复上传: {second['file_path']} (复用 {second['deduplicated']})")
+            assert second['deduplicated'] and second['file_path'] == first['file_path']
+            assert second['file_id'] != first['file_id'] and second['width'] == 640
+
+            session = Session()
+            hashes = {row.file_id: row.file_hash for row in session.query(GlobalFile).all()}
+            session.close()
+            assert set(hashes.values()) == {hashlib.sha256(content).hexdigest()}
+            assert len(hashes) == 2
+
+            # 临时文件已清理
+            assert os.listdir(os.path.join(upload_dir, '.tmp')) == []
+
+            # 删除其中一条记录时保留共用文件，全部删除后才删除文件
+            assert service.delete_file(first['file_id'], 'client-1')
+            assert os.path.exists(second['file_path'])
+            assert service.delete_file(second['file_id'], 'client-2')
+            assert not os.path.exists(second['file_path'])
+
+        print("✅ 流式上传与去重测试完成")
+
+    except Exception as e:
+        print(f"❌ 流式上传与去重测试失败: {e}")
+        raise
+
+
+def test_upload_size_cap():
+    """测试超过大小上限时中止写入并清理临时文件"""
+    print("\n📏 测试上传大小上限")
+    print("-" * 40)
+
+    try:
+        from app.services.file_service import UploadTooLargeError
+
+        with tempfile.TemporaryDirectory() as upload_dir:
+            service, _, _ = _create_file_service(upload_dir)
+            reads = []
+            upload = _upload(os.urandom(2 * 1024 * 1024))
+            original_read = upload.read
+
+            async def counting_read(size=-1):
+                reads.append(size)
+                return await original_read(size)
+
+            upload.read = counting_read
+            try:
+                asyncio.run(service.save_upload_stream(upload, 'client-1', max_size=512 * 1024))
+                assert False, "超过上限的上传应被拒绝"
+            except UploadTooLargeError as e:
+                print(f"拒绝上传: {e}")
+
+            # 超限后立即停止读取，且每次只读取一个块
+            assert len(reads) <= 3 and all(size > 0 for size in reads)
+            assert os.listdir(os.path.join(upload_dir, '.tmp')) == []
+
+        print("✅ 上传大小上限测试完成")
+
+    except Exception as e:
+        print(f"❌ 上传大小上限测试失败: {e}")
+        raise
+
+
+def test_upload_records_written_together():
+    """测试全局文件表写入失败时上传失败且不保留记录，以及只剩客户端上传记录引用时保留文件"""
+    print("\n🧾 测试上传记录一致性")
+    print("-" * 40)
+
+    try:
+        from sqlalchemy import text
+        from app.database.models.client_models import ClientUpload
+        from app.database.models.shared_models import GlobalFile
+        from db_helpers import use_demo_db_manager
+
+        with tempfile.TemporaryDirectory() as upload_dir:
+            service, sessions, db_manager = _create_file_service(upload_dir)
+            # 原始文件名为reject.png的全局文件记录写入失败
+            with sessions['shared']() as session:
+                session.execute(text(
+                    "CREATE TRIGGER reject_file BEFORE INSERT ON global_files WHEN NEW.original_name = 'reject.png' "
+                    "BEGIN SELECT RAISE(ABORT, 'rejected'); END"
+                ))
+                session.commit()
+
+            with use_demo_db_manager(db_manager):
+                assert asyncio.run(service.save_upload_stream(_upload(_png_bytes(), 'reject.png'), 'client-1')) is None
+                with sessions['client']() as session:
+                    assert session.query(ClientUpload).count() == 0
+                uploaded = [name for _, _, names in os.walk(upload_dir) for name in names]
+                print(f"写入失败后上传目录中的文件: {uploaded}")
+                assert uploaded == []
+
+                content = _png_bytes()
+                first = asyncio.run(service.save_upload_stream(_upload(content), 'client-1'))
+                second = asyncio.run(service.save_upload_stream(_upload(content, 'copy.png'), 'client-2'))
+                assert second['file_path'] == first['file_path']
+
+            # 第二条上传的全局文件记录缺失时，客户端上传表中的引用仍保留共用文件
+            with sessions['shared']() as session:
+                session.query(GlobalFile).filter(GlobalFile.file_id == second['file_id']).delete()
+                session.commit()
+            assert service.delete_file(first['file_id'], 'client-1')
+            assert os.path.exists(first['file_path'])
+            assert service.delete_file(second['file_id'], 'client-2')
+            assert not os.path.exists(first['file_path'])
+
+        print("✅ 上传记录一致性测试完成")
+
+    except Exception as e:
+        print(f"❌ 上传记录一致性测试失败: {e}")
+        raise
+
+
+def test_probe_image_size():
+    """测试只解析文件头获取图片尺寸"""
+    print("\n📐 测试图片尺寸探测")
+    print("-" * 40)
+
+    try:
+        from PIL import Image
+        from app.services.file_service import FileService, PROBE_HEADER_SIZE
+
+        service = FileService.__new__(FileService)
+        content = _png_bytes((800, 600))
+        assert len(content) > PROBE_HEADER_SIZE
+        assert service.probe_image_size(content[:PROBE_HEADER_SIZE]) == (800, 600)
+
+        # 文件头中EXIF过大时回退为从文件读取头部
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'exif.jpg')
+            exif = Image.Exif()
+            exif[0x010e] = 'x' * 60000
+            Image.new('RGB', (320, 240)).save(path, 'JPEG', exif=exif)
+            with open(path, 'rb') as f:
+                head = f.read(1024)
+            assert service.probe_image_size(head, path) == (320, 240)
+        assert service.probe_image_size(b'not an image') == (0, 0)
+
+        print("✅ 图片尺寸探测测试完成")
+
+    except Exception as e:
+        print(f"❌ 图片尺寸探测测试失败: {e}")
+        raise
+
+
+def main():
+    """主测试函数"""
+    print("🧪 测试流式上传")
+    print("=" * 50)
+
+    test_streaming_upload_and_dedupe()
+    test_upload_size_cap()
+    test_upload_records_written_together()
+    test_probe_image_size()
+
+    print("\n🎯 流式上传测试完成！")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+测试流式ZIP打包：本地文件与节点代理文件边读边打包、已压缩格式不再压缩、输出块大小不随归档增大，以及归档文件命名
+"""
+import sys
+import os
+import io
+import asyncio
+import tempfile
+import zipfile
+
+# 添加正确的路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+backend_path = os.path.join(project_root, 'backend')
+
+sys.path.insert(0, backend_path)
+
+# 切换到项目根目录
+os.chdir(project_root)
+
+LARGE_CONTENT = os.urandom(3 * 1024 * 1024)
+NODE_CONTENT = b'node-video' * 50000
+
+
+def test_stream_zip():
+    """测试本地文件、节点文件与缺失文件的打包"""
+    print("📦 测试流式ZIP打包")
+    print("-" * 40)
+
+    async def scenario(temp_dir):
+        from aiohttp import web
+        from aiohttp.test_utils import TestServer
+        from app.core.file_proxy import NodeFileProxy
+        from app.core.zip_stream import stream_zip, open_local_file, open_node_file
+
+        async def view(request):
+            if request.query['filename'] != 'clip.mp4':
+                return web.Response(status=404)
+            return web.Response(body=NODE_CONTENT, content_type='video/mp4')
+
+        app = web.Application()
+        app.router.add_get('/view', view)
+        server = TestServer(app)
+        await server.start_server()
+        proxy = NodeFileProxy()
+        node_url = str(server.make_url('')).rstrip('/')
+
+        image = os.path.join(temp_dir, 'result.png')
+        with open(image, 'wb') as f:
+            f.write(LARGE_CONTENT)
+        metadata = os.path.join(temp_dir, 'workflow.json')
+        with open(metadata, 'w') as f:
+            f.write('{"steps": 20}' * 1000)
+
+        entries = [
+            ('task-1/result.png', lambda: open_local_file(image)),
+            ('task-1/workflow.json', lambda: open_local_file(metadata)),
+            ('task-2/clip.mp4', lambda: open_node_file(proxy, node_url, 'clip.mp4', '2026/10/18')),
+            ('task-2/gone.png', lambda: open_node_file(proxy, node_url, 'gone.png')),
+            ('task-3/deleted.png', lambda: open_local_file(os.path.join(temp_dir, 'deleted.png'))),
+        ]
+        try:
+            chunks = [chunk async for chunk in stream_zip(entries, missing=['task-4/ (任务尚未完成)'])]
+        finally:
+            await proxy.close()
+            await server.close()
+        return chunks
+
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            chunks = asyncio.run(scenario(temp_dir))
+
+        data = b''.join(chunks)
+        print(f"归档大小 {len(data)} 字节，{len(chunks)} 个数据块，最大块 {max(map(len, chunks))} 字节")
+        # 输出按读取块转发，不会一次性缓存整个文件
+        assert max(map(len, chunks)) < 256 * 1024
+
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            assert archive.testzip() is None
+            infos = {info.filename: info for info in archive.infolist()}
+            assert list(infos) == ['task-1/result.png', 'task-1/workflow.json', 'task-2/clip.mp4', 'MISSING.txt']
+            assert archive.read('task-1/result.png') == LARGE_CONTENT
+            assert archive.read('task-2/clip.mp4') == NODE_CONTENT
+            assert infos['task-1/result.png'].compress_type == zipfile.ZIP_STORED
+            assert infos['task-2/clip.mp4'].compress_type == zipfile.ZIP_STORED
+            assert infos['task-1/workflow.json'].compress_type == zipfile.ZIP_DEFLATED
+            assert infos['task-1/workflow.json'].compress_size < infos['task-1/workflow.json'].file_size
+            assert archive.read('MISSING.txt').decode().splitlines() == [
+                'task-4/ (任务尚未完成)', 'task-2/gone.png', 'task-3/deleted.png'
+            ]
+
+        print("✅ 流式ZIP打包测试完成")
+
+    except Exception as e:
+        print(f"❌ 流式ZIP打包测试失败: {e}")
+        raise
+
+
+def test_stream_zip_abort():
+    """测试客户端中途断开时关闭数据源"""
+    print("\n🛑 测试中途中止")
+    print("-" * 40)
+
+    async def scenario():
+        from app.core.zip_stream import stream_zip, ZipSource
+
+        state = {'closed': False}
+
+        async def chunks():
+            try:
+                for _ in range(100):
+                    yield b'x' * 1024
+            finally:
+                state['closed'] = True
+
+        async def opener():
+            return ZipSource(chunks(), 100 * 1024)
+
+        stream = stream_zip([('big.bin', opener)])
+        await stream.__anext__()
+        await stream.aclose()
+        return state['closed']
+
+    try:
+        assert asyncio.run(scenario())
+        print("✅ 中途中止测试完成")
+
+    except Exception as e:
+        print(f"❌ 中途中止测试失败: {e}")
+        raise
+
+
+def test_archive_entry_names():
+    """测试归档内文件命名：多任务按任务分目录，同名文件追加序号"""
+    print("\n🏷️ 测试归档文件命名")
+    print("-" * 40)
+
+    try:
+        from app.api.routes import _archive_entries
+
+        task_files = {'task-1': ['/out/a/ComfyUI_00001_.png', '/out/b/ComfyUI_00001_.png', 'c/clip.mp4']}
+        names = [name for name, _ in _archive_entries(task_files, use_task_dirs=False)]
+        assert names == ['ComfyUI_00001_.png', 'ComfyUI_00001__1.png', 'clip.mp4']
+
+        task_files['task-2'] = ['/out/a/ComfyUI_00001_.png']
+        names = [name for name, _ in _archive_entries(task_files, use_task_dirs=True)]
+        assert names[0] == 'task-1/ComfyUI_00001_.png' and names[-1] == 'task-2/ComfyUI_00001_.png'
+
+        print("✅ 归档文件命名测试完成")
+
+    except Exception as e:
+        print(f"❌ 归档文件命名测试失败: {e}")
+        raise
+
+
+def main():
+    """主测试函数"""
+    print("🧪 测试流式ZIP打包")
+    print("=" * 50)
+
+    test_stream_zip()
+    test_stream_zip_abort()
+    test_archive_entry_names()
+
+    print("\n🎯 流式ZIP打包测试完成！")
+
+if __name__ == "__main__":
+    main()